@@ -0,0 +1,70 @@
+"""Compare loading a model from the binary format with parsing the GPX XML.
+
+Generates a document of typical track points, then reports the size of the
+XML, the pickle and the binary representations, and the time to load the
+model from each. Times are the best of several repetitions of CPU time, to
+reduce the noise from other processes. Run from the root of a checkout, so
+that revisions can be compared:
+
+    PYTHONPATH=. python benchmarks/binary.py
+"""
+from io import BytesIO
+import pickle
+import time
+
+from trailer.readers.binary.reader import parse_binary
+from trailer.readers.options import ReaderOptions
+from trailer.readers.parser import read_gpx
+from trailer.writers.binary.writer import render_binary
+
+COUNT = 20000
+
+REPEATS = 15
+
+HEADER = '<?xml version="1.0"?>\n<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="benchmark"><trk><trkseg>\n'
+
+POINT = ('<trkpt lat="50.{0:07d}" lon="0.{1:07d}"><ele>{2}.{3:02d}</ele>'
+         '<time>2012-11-26T{4:02d}:{5:02d}:{6:02d}Z</time><hdop>{7}.{8}</hdop><sat>{9}</sat></trkpt>\n')
+
+FOOTER = '</trkseg></trk></gpx>\n'
+
+
+def make_document(count=COUNT):
+    points = (POINT.format(i * 37 % 10000000, i * 53 % 10000000, 100 + i % 50, i * 7 % 100,
+                           i // 3600 % 24, i // 60 % 60, i % 60, i % 3, i % 10, 4 + i % 9)
+              for i in range(count))
+    return (HEADER + ''.join(points) + FOOTER).encode('utf-8')
+
+
+def best_time(function):
+    times = []
+    for _ in range(REPEATS):
+        start = time.process_time()
+        function()
+        times.append(time.process_time() - start)
+    return min(times)
+
+
+def main():
+    xml = make_document()
+    print("{0:<10} {1:<8} {2:>12} {3:>14} {4:>8}".format("Numeric", "Format", "Bytes/point", "Load µs/point", "Speedup"))
+    for numeric in ('decimal', 'float'):
+        options = ReaderOptions(numeric=numeric)
+        gpx = read_gpx(BytesIO(xml), options=options)
+        pickled = pickle.dumps(gpx, pickle.HIGHEST_PROTOCOL)
+        binary = render_binary(gpx)
+        loads = (
+            ('XML', xml, lambda: read_gpx(BytesIO(xml), options=options)),
+            ('pickle', pickled, lambda: pickle.loads(pickled)),
+            ('binary', binary, lambda: parse_binary(binary)),
+        )
+        xml_time = None
+        for name, data, load in loads:
+            load_time = best_time(load)
+            xml_time = xml_time or load_time
+            print("{0:<10} {1:<8} {2:>12.0f} {3:>14.1f} {4:>7.1f}x".format(
+                  numeric, name, len(data) / COUNT, load_time / COUNT * 1e6, xml_time / load_time))
+
+
+if __name__ == '__main__':
+    main()
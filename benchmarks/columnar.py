@@ -0,0 +1,65 @@
+"""Compare the time to export track points as JSON, NDJSON, CSV and Arrow.
+
+Generates a document of typical track points, then reports the time per
+point to write the latitude, longitude, elevation, time, hdop and number of
+satellites of each point: as a whole model with json.dumps() and
+GpxJsonEncoder, as newline-delimited JSON records, as CSV, and as an Arrow
+IPC file if pyarrow is installed. Models are read with Decimal and float
+numbers, and as columnar segments. Times are the best of several
+repetitions of CPU time. Run from the root of a checkout:
+
+    PYTHONPATH=. python benchmarks/columnar.py
+"""
+from io import BytesIO, StringIO
+import json
+import time
+
+from trailer.readers.options import ReaderOptions
+from trailer.readers.parser import read_gpx
+from trailer.writers.columnar.writer import pyarrow, write_arrow, write_csv
+from trailer.writers.json.renderer import GpxJsonEncoder
+from trailer.writers.ndjson.writer import write_ndjson
+
+from json_encoder import make_document
+
+COUNT = 20000
+
+REPEATS = 10
+
+COLUMNS = ('lat', 'lon', 'ele', 'time', 'hdop', 'sat')
+
+FIELDS = ('lat', 'lon', 'ele', 'time', 'hdop', 'numSatellites')
+
+
+def best_time(function):
+    times = []
+    for _ in range(REPEATS):
+        start = time.process_time()
+        function()
+        times.append(time.process_time() - start)
+    return min(times)
+
+
+def main():
+    xml = make_document(COUNT)
+    models = (
+        ('decimal', ReaderOptions(numeric='decimal')),
+        ('float', ReaderOptions(numeric='float')),
+        ('columnar', ReaderOptions(numeric='float', columnar=True)),
+    )
+    print("{0:<10} {1:<10} {2:>10}".format("Model", "Format", "µs/point"))
+    for model_name, options in models:
+        gpx = read_gpx(BytesIO(xml), options=options)
+        operations = [
+            ('json', lambda: json.dumps(gpx, cls=GpxJsonEncoder)),
+            ('ndjson', lambda: write_ndjson(gpx, StringIO(), fields=FIELDS)),
+            ('csv', lambda: write_csv(gpx, StringIO(), columns=COLUMNS)),
+        ]
+        if pyarrow is not None:
+            operations.append(('arrow', lambda: write_arrow(gpx, BytesIO(), columns=COLUMNS)))
+        for name, operation in operations:
+            print("{0:<10} {1:<10} {2:>10.1f}".format(model_name, name, best_time(operation) / COUNT * 1e6))
+
+
+if __name__ == '__main__':
+    main()
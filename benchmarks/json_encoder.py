@@ -0,0 +1,63 @@
+"""Measure the throughput of rendering a model as JSON with GpxJsonEncoder.
+
+Generates a document of typical track points, then reports the time per
+point for json.dumps() with the compact and the indented encoders, and the
+time per point spent building the structure which the json module encodes.
+Times are the best of several repetitions of CPU time, to reduce the noise
+from other processes. Run from the root of a checkout, so that revisions
+can be compared:
+
+    PYTHONPATH=. python benchmarks/json_encoder.py
+"""
+from io import BytesIO
+import json
+import time
+
+from trailer.readers.options import ReaderOptions
+from trailer.readers.parser import read_gpx
+from trailer.writers.json.renderer import GpxJsonEncoder
+
+COUNT = 20000
+
+REPEATS = 10
+
+HEADER = '<?xml version="1.0"?>\n<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="benchmark"><trk><trkseg>\n'
+
+POINT = ('<trkpt lat="50.{0:07d}" lon="0.{1:07d}"><ele>{2}.{3:02d}</ele>'
+         '<time>2012-11-26T{4:02d}:{5:02d}:{6:02d}Z</time><hdop>{7}.{8}</hdop><sat>{9}</sat></trkpt>\n')
+
+FOOTER = '</trkseg></trk></gpx>\n'
+
+
+def make_document(count=COUNT):
+    points = (POINT.format(i * 37 % 10000000, i * 53 % 10000000, 100 + i % 50, i * 7 % 100,
+                           i // 3600 % 24, i // 60 % 60, i % 60, i % 3, i % 10, 4 + i % 9)
+              for i in range(count))
+    return (HEADER + ''.join(points) + FOOTER).encode('utf-8')
+
+
+def best_time(function):
+    times = []
+    for _ in range(REPEATS):
+        start = time.process_time()
+        function()
+        times.append(time.process_time() - start)
+    return min(times)
+
+
+def main():
+    xml = make_document()
+    print("{0:<10} {1:<10} {2:>10}".format("Numeric", "Operation", "µs/point"))
+    for numeric in ('decimal', 'float'):
+        gpx = read_gpx(BytesIO(xml), options=ReaderOptions(numeric=numeric))
+        operations = (
+            ('build', lambda: GpxJsonEncoder().default(gpx)),
+            ('compact', lambda: json.dumps(gpx, cls=GpxJsonEncoder)),
+            ('indented', lambda: json.dumps(gpx, cls=GpxJsonEncoder, indent=4)),
+        )
+        for name, operation in operations:
+            print("{0:<10} {1:<10} {2:>10.1f}".format(numeric, name, best_time(operation) / COUNT * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Measure the memory used by each instance of the model classes.
+
+The figures include the values held by each instance, such as the Decimals
+and datetimes of a Waypoint, but not the text they were created from. Run
+from the root of a checkout, so that revisions can be compared:
+
+    PYTHONPATH=. python benchmarks/memory.py
+"""
+import gc
+import sys
+import tracemalloc
+
+from trailer.model.bounds import Bounds
+from trailer.model.fix import Fix
+from trailer.model.link import Link
+from trailer.model.route import Route
+from trailer.model.segment import Segment
+from trailer.model.track import Track
+from trailer.model.waypoint import Waypoint
+
+COUNT = 20000
+
+CASES = [
+    ('Waypoint (track point)',
+     lambda i: Waypoint('50.{0:07d}'.format(i), '0.{0:07d}'.format(i),
+                        elevation='{0}.5'.format(i % 1000),
+                        time='2012-11-26T19:{0:02d}:{1:02d}Z'.format(i // 60 % 60, i % 60))),
+    ('Waypoint (lat/lon only)',
+     lambda i: Waypoint('50.{0:07d}'.format(i), '0.{0:07d}'.format(i))),
+    ('Segment', lambda i: Segment()),
+    ('Track', lambda i: Track(name='Track {0}'.format(i))),
+    ('Route', lambda i: Route(name='Route {0}'.format(i))),
+    ('Link', lambda i: Link('http://example.com/{0}'.format(i))),
+    ('Fix', lambda i: Fix('3d')),
+    ('Bounds', lambda i: Bounds('50.{0}'.format(i), '-1', '51', '1')),
+]
+
+
+def measure(factory, count=COUNT):
+    """The mean number of bytes allocated for each object created by factory."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        objects = [factory(i) for i in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return (after - before - sys.getsizeof(objects)) / count
+
+
+def main():
+    print("{0:<26} {1:>14}".format("Class", "Bytes/object"))
+    for name, factory in CASES:
+        print("{0:<26} {1:>14.0f}".format(name, measure(factory)))
+
+
+if __name__ == '__main__':
+    main()
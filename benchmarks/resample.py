@@ -0,0 +1,93 @@
+"""Compare the time to resample segments point by point and with arrays.
+
+Generates a segment of track points at irregular intervals of about a
+second, then reports the time per point to resample it at one second
+intervals: with a loop over the Waypoints creating a Waypoint for each
+sample, as before trailer.analysis.resample, and with
+resample_segment_by_time(), for segments of Waypoints and columnar
+segments. Resampling at ten metre spacing with
+resample_segment_by_distance() is shown for comparison. Times are the
+best of several repetitions of CPU time. Run from the root of a checkout:
+
+    PYTHONPATH=. python benchmarks/resample.py
+"""
+from datetime import timedelta
+import time
+
+import numpy
+
+from trailer.analysis.resample import GREAT_CIRCLE, resample_segment_by_distance, resample_segment_by_time
+from trailer.model.columnar import ColumnarSegment
+from trailer.model.segment import Segment
+from trailer.model.waypoint import FloatWaypoint
+
+COUNTS = (10000, 100000, 1000000)
+
+REPEATS = 3
+
+INTERVAL = timedelta(seconds=1)
+
+
+def make_segment(count):
+    random = numpy.random.default_rng(1)
+    steps = random.normal(scale=1e-5, size=(2, count))
+    intervals = random.uniform(0.5, 1.5, count).cumsum()
+    times = numpy.datetime64('2016-06-01T00:00:00', 'us') + (intervals * 1e6).astype('timedelta64[us]')
+    return ColumnarSegment({'latitude': 50.0 + numpy.cumsum(steps[0]), 'longitude': numpy.cumsum(steps[1]),
+                            'elevation': 100 + numpy.cumsum(random.normal(size=count)),
+                            'time': times, 'time_offset': numpy.zeros(count, dtype=numpy.int32)},
+                           waypoint_type=FloatWaypoint)
+
+
+def loop_resample(segment, interval=INTERVAL):
+    """Linear interpolation, a point at a time."""
+    points = segment.points
+    samples = []
+    at = points[0].time
+    end = points[-1].time
+    index = 1
+    while at <= end:
+        while points[index].time < at:
+            index += 1
+        before, after = points[index - 1], points[index]
+        fraction = (at - before.time) / (after.time - before.time)
+        samples.append(FloatWaypoint(before.latitude + fraction * (after.latitude - before.latitude),
+                                     before.longitude + fraction * (after.longitude - before.longitude),
+                                     elevation=before.elevation + fraction * (after.elevation - before.elevation),
+                                     time=at))
+        at += interval
+    return Segment(samples, segment.extensions)
+
+
+def best_time(function, repeats=REPEATS):
+    times = []
+    for _ in range(repeats):
+        start = time.process_time()
+        function()
+        times.append(time.process_time() - start)
+    return min(times)
+
+
+def main():
+    print("{0:>8} {1:<10} {2:<20} {3:>8} {4:>10}".format("Points", "Model", "Method", "Samples", "µs/point"))
+    for count in COUNTS:
+        columnar = make_segment(count)
+        waypoints = columnar.to_segment()
+        operations = [
+            ('waypoints', 'loop', waypoints, loop_resample),
+            ('waypoints', 'time', waypoints, lambda segment: resample_segment_by_time(segment, 1.0)),
+            ('columnar', 'loop', columnar, loop_resample),
+            ('columnar', 'time', columnar, lambda segment: resample_segment_by_time(segment, 1.0)),
+            ('columnar', 'time great-circle', columnar,
+             lambda segment: resample_segment_by_time(segment, 1.0, GREAT_CIRCLE)),
+            ('columnar', 'distance', columnar, lambda segment: resample_segment_by_distance(segment, 10.0)),
+        ]
+        for model, method, segment, operation in operations:
+            samples = len(operation(segment).points)
+            seconds = best_time(lambda: operation(segment), 1 if count > 100000 else REPEATS)
+            print("{0:>8} {1:<10} {2:<20} {3:>8} {4:>10.2f}".format(count, model, method, samples,
+                                                                   seconds / count * 1e6))
+
+
+if __name__ == '__main__':
+    main()
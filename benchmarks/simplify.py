@@ -0,0 +1,103 @@
+"""Compare the time to simplify segments with loops and with arrays.
+
+Generates segments of a random walk of track points, roughly a metre
+apart, then reports the time per point to simplify them to a tolerance of
+five metres: with a recursive Douglas-Peucker loop over the Waypoints, as
+before trailer.analysis.simplify, and with simplify_segment() using each
+method, for segments of Waypoints and columnar segments. The loop is not
+run for the largest segment, which exceeds its recursion limit. Times are
+the best of several repetitions of CPU time. Run from the root of a
+checkout:
+
+    PYTHONPATH=. python benchmarks/simplify.py
+"""
+import math
+import sys
+import time
+
+import numpy
+
+from trailer.analysis.geodesy import EARTH_RADIUS
+from trailer.analysis.simplify import DOUGLAS_PEUCKER, VISVALINGAM_WHYATT, simplify_segment
+from trailer.model.columnar import ColumnarSegment
+from trailer.model.segment import Segment
+from trailer.model.waypoint import FloatWaypoint
+
+COUNTS = (10000, 100000, 1000000)
+
+REPEATS = 3
+
+TOLERANCE = 5.0
+
+
+def make_segment(count):
+    random = numpy.random.default_rng(1)
+    steps = random.normal(scale=1e-5, size=(2, count))
+    latitudes = 50.0 + numpy.cumsum(steps[0])
+    longitudes = 0.0 + numpy.cumsum(steps[1])
+    return ColumnarSegment({'latitude': latitudes, 'longitude': longitudes}, waypoint_type=FloatWaypoint)
+
+
+def loop_simplify(segment, tolerance=TOLERANCE):
+    """Douglas-Peucker, a point at a time."""
+    points = segment.points
+    scale = math.cos(math.radians(points[0].latitude))
+    xy = [(math.radians(point.longitude) * scale * EARTH_RADIUS, math.radians(point.latitude) * EARTH_RADIUS)
+          for point in points]
+
+    def distance(p, a, b):
+        dx, dy = b[0] - a[0], b[1] - a[1]
+        length_squared = dx * dx + dy * dy
+        if length_squared == 0:
+            return math.hypot(p[0] - a[0], p[1] - a[1])
+        t = max(0.0, min(1.0, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / length_squared))
+        return math.hypot(p[0] - a[0] - t * dx, p[1] - a[1] - t * dy)
+
+    def simplify(start, end):
+        furthest, greatest = None, tolerance
+        for index in range(start + 1, end):
+            d = distance(xy[index], xy[start], xy[end])
+            if d > greatest:
+                furthest, greatest = index, d
+        if furthest is None:
+            return [points[start]]
+        return simplify(start, furthest) + simplify(furthest, end)
+
+    return Segment(simplify(0, len(points) - 1) + [points[-1]])
+
+
+def best_time(function, repeats=REPEATS):
+    times = []
+    for _ in range(repeats):
+        start = time.process_time()
+        function()
+        times.append(time.process_time() - start)
+    return min(times)
+
+
+def main():
+    sys.setrecursionlimit(10000)
+    print("{0:>8} {1:<10} {2:<20} {3:>8} {4:>10}".format("Points", "Model", "Method", "Kept", "µs/point"))
+    for count in COUNTS:
+        columnar = make_segment(count)
+        waypoints = columnar.to_segment()
+        operations = [
+            ('waypoints', 'loop', waypoints, lambda segment: loop_simplify(segment)),
+            ('waypoints', DOUGLAS_PEUCKER, waypoints, lambda segment: simplify_segment(segment, TOLERANCE)),
+            ('waypoints', VISVALINGAM_WHYATT, waypoints,
+             lambda segment: simplify_segment(segment, TOLERANCE, VISVALINGAM_WHYATT)),
+            ('columnar', DOUGLAS_PEUCKER, columnar, lambda segment: simplify_segment(segment, TOLERANCE)),
+            ('columnar', VISVALINGAM_WHYATT, columnar,
+             lambda segment: simplify_segment(segment, TOLERANCE, VISVALINGAM_WHYATT)),
+        ]
+        for model, method, segment, operation in operations:
+            if method == 'loop' and count > 100000:
+                continue
+            kept = len(operation(segment).points)
+            seconds = best_time(lambda: operation(segment), 1 if count > 100000 else REPEATS)
+            print("{0:>8} {1:<10} {2:<20} {3:>8} {4:>10.2f}".format(count, model, method, kept,
+                                                                   seconds / count * 1e6))
+
+
+if __name__ == '__main__':
+    main()
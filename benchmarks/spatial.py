@@ -0,0 +1,106 @@
+"""Compare the time to find points by place with a scan and with a SpatialIndex.
+
+Generates columnar segments of random walks of track points, scattered
+over Europe, then reports the time to build a SpatialIndex over them, and
+the time per query to find the points in a small bounding box, within 10
+metres of a place, and the ten nearest points: with a linear scan over the
+Waypoints, as before trailer.analysis.spatial, and with the index. Times
+are the best of several repetitions of CPU time. Run from the root of a
+checkout:
+
+    PYTHONPATH=. python benchmarks/spatial.py
+"""
+import math
+import time
+
+import numpy
+
+from trailer.analysis.geodesy import EARTH_RADIUS
+from trailer.analysis.spatial import SpatialIndex
+from trailer.model.columnar import ColumnarSegment
+from trailer.model.gpx_model import GpxModel
+from trailer.model.track import Track
+from trailer.model.waypoint import FloatWaypoint
+
+COUNTS = (10000, 100000, 1000000)
+
+SEGMENT_SIZE = 10000
+
+QUERIES = 20
+
+REPEATS = 3
+
+
+def make_model(count):
+    random = numpy.random.default_rng(1)
+    segments = []
+    for start in range(0, count, SEGMENT_SIZE):
+        size = min(SEGMENT_SIZE, count - start)
+        steps = random.normal(scale=1e-5, size=(2, size))
+        latitudes = random.uniform(40, 60) + numpy.cumsum(steps[0])
+        longitudes = random.uniform(-10, 20) + numpy.cumsum(steps[1])
+        segments.append(ColumnarSegment({'latitude': latitudes, 'longitude': longitudes},
+                                        waypoint_type=FloatWaypoint))
+    return GpxModel("benchmark", tracks=[Track(segments=segments)])
+
+
+def haversine(latitude0, longitude0, latitude1, longitude1):
+    phi0, phi1 = math.radians(latitude0), math.radians(latitude1)
+    a = (math.sin((phi1 - phi0) / 2) ** 2
+         + math.cos(phi0) * math.cos(phi1) * math.sin(math.radians(longitude1 - longitude0) / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def scan_box(points, south, west, north, east):
+    return [point for point in points
+            if south <= point.latitude <= north and west <= point.longitude <= east]
+
+
+def scan_radius(points, latitude, longitude, radius):
+    return [point for point in points
+            if haversine(latitude, longitude, point.latitude, point.longitude) <= radius]
+
+
+def scan_nearest(points, latitude, longitude, count=10):
+    return sorted(points, key=lambda point: haversine(latitude, longitude, point.latitude, point.longitude))[:count]
+
+
+def best_time(function, repeats=REPEATS):
+    times = []
+    for _ in range(repeats):
+        start = time.process_time()
+        function()
+        times.append(time.process_time() - start)
+    return min(times)
+
+
+def main():
+    print("{0:>8} {1:<8} {2:>12} {3:>12}".format("Points", "Query", "Scan µs", "Index µs"))
+    for count in COUNTS:
+        gpx_model = make_model(count)
+        seconds = best_time(lambda: SpatialIndex.from_models(gpx_model))
+        print("{0:>8} {1:<8} {2:>12} {3:>12.0f}".format(count, "build", "–", seconds * 1e6))
+        index = SpatialIndex.from_models(gpx_model)
+        points = [point for segment in gpx_model.tracks[0].segments for point in segment.points]
+        random = numpy.random.default_rng(2)
+        places = [(index.latitudes[position], index.longitudes[position])
+                  for position in random.integers(0, count, QUERIES).tolist()]
+        queries = [
+            ('box', lambda latitude, longitude: scan_box(points, latitude - 0.0001, longitude - 0.0001,
+                                                         latitude + 0.0001, longitude + 0.0001),
+             lambda latitude, longitude: index.within_box(latitude - 0.0001, longitude - 0.0001,
+                                                          latitude + 0.0001, longitude + 0.0001)),
+            ('radius', lambda latitude, longitude: scan_radius(points, latitude, longitude, 10.0),
+             lambda latitude, longitude: index.within_radius(latitude, longitude, 10.0)),
+            ('nearest', lambda latitude, longitude: scan_nearest(points, latitude, longitude),
+             lambda latitude, longitude: index.nearest(latitude, longitude, 10)),
+        ]
+        for name, scan, search in queries:
+            scan_seconds = best_time(lambda: [scan(*place) for place in places[:2]], 1) / 2
+            search_seconds = best_time(lambda: [search(*place) for place in places]) / QUERIES
+            print("{0:>8} {1:<8} {2:>12.0f} {3:>12.0f}".format(count, name, scan_seconds * 1e6,
+                                                               search_seconds * 1e6))
+
+
+if __name__ == '__main__':
+    main()
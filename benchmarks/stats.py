@@ -0,0 +1,95 @@
+"""Compare the time to compute track statistics with loops and with arrays.
+
+Generates a document of typical track points, then reports the time per
+point to compute its distance, elevation gain and loss, duration, moving
+time and speeds: with a loop over the Waypoints of the segment, as before
+trailer.analysis.stats, and with segment_statistics() from models with
+Decimal and float numbers and with columnar segments. The statistics cache
+is cleared before each repetition. Times are the best of several
+repetitions of CPU time. Run from the root of a checkout:
+
+    PYTHONPATH=. python benchmarks/stats.py
+"""
+from io import BytesIO
+import math
+import time
+
+from trailer.analysis.geodesy import EARTH_RADIUS
+from trailer.analysis.stats import clear_statistics, segment_statistics
+from trailer.readers.options import ReaderOptions
+from trailer.readers.parser import read_gpx
+
+from json_encoder import make_document
+
+COUNT = 100000
+
+REPEATS = 5
+
+
+def loop_statistics(segment, elevation_threshold=3.0, moving_speed=0.5):
+    """The distance, climbing and moving time of a segment, a point at a time."""
+    distance = moving_time = max_speed = 0.0
+    gain = loss = 0.0
+    previous = None
+    reference = None
+    for point in segment.points:
+        if reference is None:
+            reference = point.elevation
+        elif point.elevation is not None:
+            change = point.elevation - reference
+            if abs(change) >= elevation_threshold:
+                if change > 0:
+                    gain += float(change)
+                else:
+                    loss -= float(change)
+                reference = point.elevation
+        if previous is not None:
+            phi1 = math.radians(previous.latitude)
+            phi2 = math.radians(point.latitude)
+            a = (math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2)
+                 * math.sin(math.radians(point.longitude - previous.longitude) / 2) ** 2)
+            step = 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+            distance += step
+            seconds = (point.time - previous.time).total_seconds()
+            if seconds > 0:
+                speed = step / seconds
+                max_speed = max(max_speed, speed)
+                if speed >= moving_speed:
+                    moving_time += seconds
+        previous = point
+    return distance, gain, loss, moving_time, max_speed
+
+
+def best_time(function):
+    times = []
+    for _ in range(REPEATS):
+        start = time.process_time()
+        function()
+        times.append(time.process_time() - start)
+    return min(times)
+
+
+def cached_statistics(segment):
+    clear_statistics(segment)
+    segment_statistics(segment)
+
+
+def main():
+    xml = make_document(COUNT)
+    models = (
+        ('decimal', ReaderOptions(numeric='decimal')),
+        ('float', ReaderOptions(numeric='float')),
+        ('columnar', ReaderOptions(numeric='float', columnar=True)),
+    )
+    print("{0:<10} {1:<10} {2:>10}".format("Model", "Method", "µs/point"))
+    for model_name, options in models:
+        segment = read_gpx(BytesIO(xml), options=options).tracks[0].segments[0]
+        operations = [('arrays', lambda: cached_statistics(segment))]
+        if model_name != 'columnar':
+            operations.insert(0, ('loop', lambda: loop_statistics(segment)))
+        for name, operation in operations:
+            print("{0:<10} {1:<10} {2:>10.2f}".format(model_name, name, best_time(operation) / COUNT * 1e6))
+
+
+if __name__ == '__main__':
+    main()
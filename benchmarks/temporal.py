@@ -0,0 +1,93 @@
+"""Compare the time to replay a track by scanning its times and with a TimeIndex.
+
+Generates a segment of track points a second apart, then reports the time
+to build a TimeIndex over it, and the time per query to select the points
+within a one minute window, and to find the position at a time: by
+scanning the Waypoints and comparing their datetimes, as before
+trailer.analysis.temporal, and with the index, for segments of Waypoints
+and columnar segments. Times are the best of several repetitions of CPU
+time. Run from the root of a checkout:
+
+    PYTHONPATH=. python benchmarks/temporal.py
+"""
+from datetime import datetime, timedelta, timezone
+import time
+
+import numpy
+
+from trailer.analysis.temporal import TimeIndex
+from trailer.model.columnar import ColumnarSegment
+from trailer.model.segment import Segment
+from trailer.model.waypoint import FloatWaypoint
+
+COUNTS = (10000, 100000, 1000000)
+
+QUERIES = 20
+
+REPEATS = 3
+
+START = datetime(2016, 6, 1, tzinfo=timezone.utc)
+
+WINDOW = timedelta(minutes=1)
+
+
+def make_segment(count):
+    random = numpy.random.default_rng(1)
+    steps = random.normal(scale=1e-5, size=(2, count))
+    times = numpy.datetime64('2016-06-01T00:00:00', 'us') + numpy.arange(count) * numpy.timedelta64(1, 's')
+    return ColumnarSegment({'latitude': 50.0 + numpy.cumsum(steps[0]), 'longitude': numpy.cumsum(steps[1]),
+                            'time': times, 'time_offset': numpy.zeros(count, dtype=numpy.int32)},
+                           waypoint_type=FloatWaypoint)
+
+
+def scan_window(segment, start, end):
+    return Segment([point for point in segment.points if start <= point.time <= end], segment.extensions)
+
+
+def scan_position(segment, at):
+    previous = None
+    for point in segment.points:
+        if point.time >= at:
+            if previous is None or point.time == at:
+                return point.latitude, point.longitude
+            fraction = (at - previous.time) / (point.time - previous.time)
+            return (previous.latitude + fraction * (point.latitude - previous.latitude),
+                    previous.longitude + fraction * (point.longitude - previous.longitude))
+        previous = point
+    return None
+
+
+def best_time(function, repeats=REPEATS):
+    times = []
+    for _ in range(repeats):
+        start = time.process_time()
+        function()
+        times.append(time.process_time() - start)
+    return min(times)
+
+
+def main():
+    print("{0:>8} {1:<10} {2:<9} {3:>12} {4:>12}".format("Points", "Model", "Query", "Scan µs", "Index µs"))
+    for count in COUNTS:
+        columnar = make_segment(count)
+        random = numpy.random.default_rng(2)
+        starts = [START + timedelta(seconds=offset) for offset in random.uniform(0, count - 60, QUERIES).tolist()]
+        for model, segment in (('waypoints', columnar.to_segment()), ('columnar', columnar)):
+            seconds = best_time(lambda: TimeIndex.from_segment(segment))
+            print("{0:>8} {1:<10} {2:<9} {3:>12} {4:>12.0f}".format(count, model, "build", "–", seconds * 1e6))
+            index = TimeIndex.from_segment(segment)
+            queries = [
+                ('window', lambda start: scan_window(segment, start, start + WINDOW),
+                 lambda start: index.segment_window(segment, start, start + WINDOW)),
+                ('position', lambda start: scan_position(segment, start + timedelta(seconds=0.5)),
+                 lambda start: index.position_at(start + timedelta(seconds=0.5))),
+            ]
+            for name, scan, search in queries:
+                scan_seconds = best_time(lambda: [scan(start) for start in starts[:2]], 1) / 2
+                search_seconds = best_time(lambda: [search(start) for start in starts]) / QUERIES
+                print("{0:>8} {1:<10} {2:<9} {3:>12.0f} {4:>12.0f}".format(count, model, name, scan_seconds * 1e6,
+                                                                          search_seconds * 1e6))
+
+
+if __name__ == '__main__':
+    main()
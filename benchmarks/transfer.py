@@ -0,0 +1,40 @@
+"""Measure the cost of transferring parsed track points between processes.
+
+read_gpx_many() pickles each GpxModel in a worker process and unpickles it
+in the calling process. This measures the size and time of a pickle round
+trip for a segment of typical track points. Run from the root of a checkout,
+so that revisions can be compared:
+
+    PYTHONPATH=. python benchmarks/transfer.py
+"""
+import pickle
+import time
+
+from trailer.model.segment import Segment
+from trailer.model.waypoint import Waypoint
+
+COUNT = 20000
+
+
+def make_segment(count=COUNT):
+    return Segment([Waypoint('50.{0:07d}'.format(i), '0.{0:07d}'.format(i),
+                             elevation='{0}.5'.format(i % 1000),
+                             time='2012-11-26T19:{0:02d}:{1:02d}Z'.format(i // 60 % 60, i % 60),
+                             hdop='1.5', num_satellites=7)
+                    for i in range(count)])
+
+
+def main():
+    segment = make_segment()
+    start = time.perf_counter()
+    data = pickle.dumps(segment, pickle.HIGHEST_PROTOCOL)
+    dumped = time.perf_counter()
+    pickle.loads(data)
+    loaded = time.perf_counter()
+    print("{0:<22} {1:>10.0f}".format("Bytes/point", len(data) / COUNT))
+    print("{0:<22} {1:>10.1f}".format("Dump µs/point", (dumped - start) / COUNT * 1e6))
+    print("{0:<22} {1:>10.1f}".format("Load µs/point", (loaded - dumped) / COUNT * 1e6))
+
+
+if __name__ == '__main__':
+    main()
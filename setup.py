@@ -1,10 +1,12 @@
 import os
+import re
 
 from setuptools import setup, find_packages
 
-version = "0.6"
-
 here = os.path.abspath(os.path.dirname(__file__))
+
+with open(os.path.join(here, 'trailer', '__init__.py')) as init:
+    version = re.search(r"^__version__ = '([^']+)'", init.read(), re.MULTILINE).group(1)
 README = open(os.path.join(here, 'README.md')).read()
 CHANGES = open(os.path.join(here, 'CHANGES.txt')).read()
 
@@ -13,6 +15,10 @@ requires = [
     'python-dateutil'
     ]
 
+extras = {
+    'columnar': ['numpy'],
+    }
+
 setup(
     name = "trailer",
     packages = find_packages(),
@@ -26,11 +32,17 @@ setup(
     license="MIT License",
     include_package_data=True,
     install_requires=requires,
+    extras_require=extras,
     zip_safe=False,
+    python_requires='>=3.7',
     classifiers = [
         "Development Status :: 4 - Beta",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.3",
+        "Programming Language :: Python :: 3.7",
+        "Programming Language :: Python :: 3.8",
+        "Programming Language :: Python :: 3.9",
+        "Programming Language :: Python :: 3.10",
+        "Programming Language :: Python :: 3.11",
         "Environment :: Other Environment",
         "Intended Audience :: Developers",
         "License :: OSI Approved :: MIT License",
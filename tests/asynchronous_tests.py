@@ -0,0 +1,81 @@
+import asyncio
+from io import BytesIO
+import unittest
+
+from trailer.readers.asynchronous import (read_gpx_async, iter_gpx_events_async, iter_trackpoints_async,
+                                          _document_parser)
+from trailer.readers.stream import iter_gpx_events
+
+__author__ = 'rjs'
+
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <metadata><name>Eleven</name></metadata>
+  <wpt lat="5" lon="6"><name>W</name></wpt>
+  <trk>
+    <name>A</name>
+    <trkseg><trkpt lat="1.0" lon="2.0"/></trkseg>
+    <trkseg><trkpt lat="1.1" lon="2.1"/><trkpt lat="1.2" lon="2.2"/></trkseg>
+  </trk>
+</gpx>'''
+
+
+def stream_reader(data):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+async def byte_chunks(data, size=16):
+    for start in range(0, len(data), size):
+        await asyncio.sleep(0)
+        yield data[start:start + size]
+
+
+class AsynchronousReaderTests(unittest.TestCase):
+
+    def test_read_gpx_async(self):
+        async def read():
+            return await read_gpx_async(stream_reader(GPX_1_1), chunk_size=32)
+        gpx = asyncio.run(read())
+        self.assertEqual(gpx.metadata.name, 'Eleven')
+        self.assertEqual(gpx.waypoints[0].name, 'W')
+        self.assertEqual(len(gpx.tracks[0].segments[1].points), 2)
+
+    def test_document_parser_records_no_events(self):
+        parser = _document_parser()
+        for start in range(0, len(GPX_1_1), 16):
+            parser.feed(GPX_1_1[start:start + 16])
+            self.assertEqual(list(parser.read_events()), [])
+        self.assertEqual(parser.close().get('creator'), 'unittests')
+
+    def test_events_match_iter_gpx_events(self):
+        async def collect():
+            return [event async for event, value in iter_gpx_events_async(byte_chunks(GPX_1_1))]
+        expected = [event for event, value in iter_gpx_events(BytesIO(GPX_1_1))]
+        self.assertEqual(asyncio.run(collect()), expected)
+
+    def test_trackpoints(self):
+        async def collect():
+            return [(point.segment_index, point.waypoint.longitude)
+                    async for point in iter_trackpoints_async(stream_reader(GPX_1_1), chunk_size=8)]
+        self.assertEqual([(index, str(longitude)) for index, longitude in asyncio.run(collect())],
+                         [(0, '2.0'), (1, '2.1'), (1, '2.2')])
+
+    def test_not_gpx(self):
+        async def collect():
+            return [item async for item in iter_gpx_events_async(stream_reader(b'<foo xmlns="http://www.topografix.com/GPX/1/1"/>'))]
+        with self.assertRaises(ValueError):
+            asyncio.run(collect())
+
+    def test_cancel(self):
+        async def cancel():
+            reader = asyncio.StreamReader()
+            reader.feed_data(GPX_1_1[:100])
+            task = asyncio.ensure_future(read_gpx_async(reader))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        asyncio.run(cancel())
@@ -0,0 +1,194 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from io import BytesIO
+import unittest
+
+from lxml import etree
+
+from trailer.model.bounds import Bounds
+from trailer.model.columnar import ColumnarSegment
+from trailer.model.copyright import Copyright
+from trailer.model.gpx_model import GpxModel
+from trailer.model.link import Link
+from trailer.model.metadata import Metadata
+from trailer.model.person import Person
+from trailer.model.route import Route
+from trailer.model.segment import Segment
+from trailer.model.track import Track
+from trailer.model.waypoint import Waypoint, FloatWaypoint
+from trailer.model.year import Year
+from trailer.readers.binary.reader import parse_binary, read_binary
+from trailer.readers.options import ReaderOptions
+from trailer.readers.parser import read_gpx
+from trailer.writers.binary.writer import render_binary, write_binary
+
+__author__ = 'rjs'
+
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <metadata>
+    <name>Walk</name>
+    <author><name>A. Walker</name><link href="http://example.com"><text>Home</text></link></author>
+    <copyright author="A. Walker"><year>2012+01:00</year><license>http://example.com/license</license></copyright>
+    <time>2012-11-26T19:55:00Z</time>
+    <bounds minlat="50.0" minlon="0.0" maxlat="50.1" maxlon="0.10"/>
+  </metadata>
+  <wpt lat="50.05" lon="0.05"><name>Cafe</name><sym>Restaurant</sym></wpt>
+  <rte><name>Route</name><number>3</number><rtept lat="50.0" lon="0.0"/><rtept lat="50.1" lon="0.1"/></rte>
+  <trk>
+    <name>Track</name>
+    <trkseg>
+      <trkpt lat="50.0000000" lon="0.0000000"><ele>100.50</ele><time>2012-11-26T19:55:00Z</time><sat>7</sat></trkpt>
+      <trkpt lat="50.0000859" lon="-0.0000001"><ele>99.9</ele><time>2012-11-26T19:55:01Z</time><fix>3d</fix></trkpt>
+      <trkpt lat="-50.0001" lon="179.5"><time>2012-11-26T19:55:02Z</time><hdop>1.2</hdop></trkpt>
+    </trkseg>
+    <trkseg/>
+  </trk>
+</gpx>'''
+
+
+def round_trip(gpx, options=None):
+    return parse_binary(render_binary(gpx), options)
+
+
+def fields(point):
+    return tuple(getattr(point, slot[1:]) for slot in Waypoint.__slots__)
+
+
+class BinaryTests(unittest.TestCase):
+
+    def test_parsed_document_round_trips(self):
+        gpx = read_gpx(BytesIO(GPX_1_1))
+        result = round_trip(gpx)
+
+        self.assertEqual(result.creator, 'unittests')
+        self.assertEqual(result.metadata.name, 'Walk')
+        self.assertEqual(result.metadata.author.link.text, 'Home')
+        self.assertEqual(result.metadata.copyright.year.year, 2012)
+        self.assertEqual(result.metadata.copyright.year.tzinfo.utcoffset(None), timedelta(hours=1))
+        self.assertEqual(result.metadata.time, gpx.metadata.time)
+        self.assertEqual(str(result.metadata.bounds.maximum_longitude), '0.10')
+        self.assertEqual(result.waypoints[0].symbol, 'Restaurant')
+        self.assertEqual(result.routes[0].number, 3)
+        self.assertEqual(len(result.routes[0].points), 2)
+        self.assertEqual(result.tracks[0].name, 'Track')
+        self.assertEqual(len(result.tracks[0].segments[1].points), 0)
+
+        points = result.tracks[0].segments[0].points
+        for expected, actual in zip(gpx.tracks[0].segments[0].points, points):
+            self.assertEqual(fields(actual), fields(expected))
+        # The digits of the Decimals are preserved exactly.
+        self.assertEqual([str(point.elevation) for point in points], ['100.50', '99.9', 'None'])
+        self.assertEqual(str(points[1].longitude), '-1E-7')
+        self.assertIs(points[0].time.tzinfo, timezone.utc)
+
+    def test_float_waypoints_round_trip(self):
+        gpx = read_gpx(BytesIO(GPX_1_1), options=ReaderOptions(numeric='float'))
+        points = round_trip(gpx).tracks[0].segments[0].points
+        self.assertIsInstance(points[0], FloatWaypoint)
+        self.assertEqual([point.latitude for point in points], [50.0, 50.0000859, -50.0001])
+
+    def test_options_change_representation(self):
+        gpx = read_gpx(BytesIO(GPX_1_1))
+        result = round_trip(gpx, ReaderOptions(numeric='float', lazy=True))
+        point = result.tracks[0].segments[0].points[1]
+        self.assertIsInstance(point, FloatWaypoint)
+        self.assertEqual(point.longitude, -1e-7)
+        self.assertIsInstance(result.metadata.bounds.minimum_latitude, float)
+
+    def test_columnar(self):
+        gpx = read_gpx(BytesIO(GPX_1_1))
+        segment = round_trip(gpx, ReaderOptions(columnar=True)).tracks[0].segments[0]
+        self.assertEqual(list(segment.column('latitude')), [50.0, 50.0000859, -50.0001])
+        self.assertEqual(list(segment.present('elevation')), [True, True, False])
+        self.assertEqual(segment.points[1].fix, gpx.tracks[0].segments[0].points[1].fix)
+        self.assertEqual(segment.points[2].time, gpx.tracks[0].segments[0].points[2].time)
+
+    def test_columnar_decimal_digits(self):
+        points = [Waypoint('45.123456789012345678', '1.10', elevation='45'), Waypoint('-0.0050', '1E+2')]
+        gpx = GpxModel('test', tracks=[Track(segments=[Segment(points)])])
+        segment = round_trip(gpx, ReaderOptions(columnar=True)).tracks[0].segments[0]
+        self.assertEqual([(str(point.latitude), str(point.longitude), str(point.elevation))
+                          for point in segment.points],
+                         [('45.123456789012345678', '1.10', '45'), ('-0.0050', '1E+2', 'None')])
+
+    def test_columnar_segments_written_from_columns(self):
+        points = [Waypoint('45.123456789012345678', '1.10', elevation='-0.0', name='A', num_satellites=3),
+                  Waypoint('-0.0050', '1E+2', elevation='1E-7', time='2012-11-26T19:55:00-05:30', fix='3d'),
+                  Waypoint('0.0000001', '179.99', time='2012-11-26T19:55:01', extensions=[{'a': 1}])]
+        for numeric in ('decimal', 'float'):
+            gpx = read_gpx(BytesIO(GPX_1_1), options=ReaderOptions(numeric=numeric))
+            columnar = read_gpx(BytesIO(GPX_1_1), options=ReaderOptions(numeric=numeric, columnar=True))
+            self.assertEqual(render_binary(columnar), render_binary(gpx))
+        segment = ColumnarSegment.from_points(points)
+        self.assertEqual(render_binary(GpxModel('test', tracks=[Track(segments=[segment])])),
+                         render_binary(GpxModel('test', tracks=[Track(segments=[Segment(points)])])))
+
+    def test_times(self):
+        naive = datetime(2012, 11, 26, 19, 55, 0, 250000)
+        offset = datetime(2012, 11, 26, 19, 55, tzinfo=timezone(timedelta(hours=-5, minutes=-30)))
+        odd = datetime(2012, 11, 26, 19, 55, tzinfo=timezone(timedelta(seconds=90)))
+        for times in ([naive, naive + timedelta(seconds=1)],
+                      [offset, offset + timedelta(seconds=1)],
+                      [naive, offset, None],
+                      [odd, offset]):
+            points = [Waypoint(0, 0, time=time) for time in times]
+            result = round_trip(GpxModel('test', waypoints=points))
+            self.assertEqual([point.time for point in result.waypoints], times)
+            self.assertEqual([point.time.utcoffset() if point.time else None for point in result.waypoints],
+                             [time.utcoffset() if time else None for time in times])
+
+    def test_unusual_numbers(self):
+        values = [Decimal('NaN'), Decimal('-0.0'), Decimal('1E+3'), Decimal('123456789012345678901234567890.1')]
+        points = [Waypoint(0, 0, elevation=value) for value in values]
+        result = round_trip(GpxModel('test', waypoints=points))
+        self.assertEqual([str(point.elevation) for point in result.waypoints], [str(value) for value in values])
+
+        points = [FloatWaypoint(0, 0, elevation=value) for value in (float('inf'), 1e300, 0.1)]
+        result = round_trip(GpxModel('test', waypoints=points))
+        self.assertEqual([point.elevation for point in result.waypoints], [float('inf'), 1e300, 0.1])
+
+    def test_extensions_and_links(self):
+        element = etree.fromstring('<x:speed xmlns:x="http://example.com/x">12</x:speed>')
+        extensions = [element, {'a': [1, 2.5, None, True]}, Decimal('1.50'), 'text']
+        link = Link('http://example.com', 'Example', 'text/html')
+        point = Waypoint(0, 0, links=[link], extensions=extensions)
+        gpx = GpxModel('test',
+                       metadata=Metadata(copyright=Copyright('Me', Year(2001)),
+                                         bounds=Bounds(0, 0, 1, 1)),
+                       tracks=[Track(links=[link], segments=[Segment([point], extensions=['s'])])],
+                       routes=[Route(points=[Waypoint(1, 1)])],
+                       extensions=[{'key': 'value'}])
+        result = round_trip(gpx)
+
+        point = result.tracks[0].segments[0].points[0]
+        self.assertEqual(point.links[0].mime, 'text/html')
+        self.assertEqual(etree.tostring(point.extensions[0]), etree.tostring(element))
+        self.assertEqual(point.extensions[1:], extensions[1:])
+        self.assertEqual(str(point.extensions[2]), '1.50')
+        self.assertEqual(result.tracks[0].links[0].href, 'http://example.com')
+        self.assertEqual(result.tracks[0].segments[0].extensions, ['s'])
+        self.assertEqual(result.extensions, [{'key': 'value'}])
+        self.assertIsNone(result.metadata.copyright.year.tzinfo)
+        self.assertEqual(result.routes[0].points[0].latitude, 1)
+
+    def test_unsupported_extension(self):
+        gpx = GpxModel('test', extensions=[object()])
+        with self.assertRaises(TypeError):
+            render_binary(gpx)
+
+    def test_file(self):
+        gpx = GpxModel('test', metadata=Metadata(author=Person('Me')))
+        stream = BytesIO()
+        write_binary(gpx, stream)
+        stream.seek(0)
+        self.assertEqual(read_binary(stream).metadata.author.name, 'Me')
+
+    def test_invalid_data(self):
+        data = render_binary(read_gpx(BytesIO(GPX_1_1)))
+        with self.assertRaises(ValueError):
+            parse_binary(b'<gpx/>')
+        with self.assertRaises(ValueError):
+            parse_binary(data[:4] + b'\x7f' + data[5:])
+        with self.assertRaises(ValueError):
+            parse_binary(data[:len(data) // 2])
@@ -0,0 +1,29 @@
+from decimal import Decimal
+import unittest
+
+from trailer.model.bounds import Bounds, FloatBounds
+
+__author__ = 'rjs'
+
+
+class BoundsTests(unittest.TestCase):
+
+    def test_create(self):
+        bounds = Bounds('50.0', '0.0', '50.1', '0.10')
+        self.assertEqual(bounds.minimum_latitude, Decimal('50.0'))
+        self.assertEqual(str(bounds.maximum_longitude), '0.10')
+        self.assertIsInstance(FloatBounds('50.0', '0.0', '50.1', '0.10').minimum_latitude, float)
+
+    def test_minimum_longitude_wraps(self):
+        bounds = Bounds(0, 180, 1, 179)
+        self.assertEqual(bounds.minimum_longitude, -180)
+
+    def test_messages_include_values(self):
+        with self.assertRaisesRegex(ValueError, r'^Minimum latitude 91 '):
+            Bounds(91, 0, 1, 1)
+        with self.assertRaisesRegex(ValueError, r'^Minimum longitude -181 '):
+            Bounds(0, -181, 1, 1)
+        with self.assertRaisesRegex(ValueError, r'^Maximum latitude -91 '):
+            Bounds(0, 0, -91, 1)
+        with self.assertRaisesRegex(ValueError, r'^Maximum longitude 200 '):
+            Bounds(0, 0, 1, 200)
@@ -0,0 +1,88 @@
+from io import BytesIO
+import os
+import shutil
+import tempfile
+import unittest
+
+from trailer.model.waypoint import Waypoint
+from trailer.readers.cache import ParseCache, ENTRY_SUFFIX
+from trailer.readers.options import ReaderOptions
+
+__author__ = 'rjs'
+
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <trk><name>{0}</name><trkseg><trkpt lat="1.0" lon="2.0"><ele>3.5</ele></trkpt></trkseg></trk>
+</gpx>'''
+
+
+def document(name):
+    return BytesIO(GPX_1_1.replace(b'{0}', name.encode('ascii')))
+
+
+class ParseCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_hit_and_miss(self):
+        cache = ParseCache(self.directory)
+        first = cache.read_gpx(document('A'))
+        second = cache.read_gpx(document('A'))
+        self.assertEqual(second.tracks[0].name, 'A')
+        self.assertEqual(second.tracks[0].segments[0].points[0].elevation,
+                         first.tracks[0].segments[0].points[0].elevation)
+        cache.read_gpx(document('B'))
+        self.assertEqual(cache.statistics(), (1, 2, 2, 0))
+        self.assertEqual(cache.reset_statistics().hits, 1)
+        self.assertEqual(cache.statistics().hits, 0)
+
+    def test_options_are_part_of_key(self):
+        cache = ParseCache(self.directory)
+        cache.read_gpx(document('A'))
+        gpx = cache.read_gpx(document('A'), options=ReaderOptions(numeric='float'))
+        self.assertIsInstance(gpx.tracks[0].segments[0].points[0].elevation, float)
+        self.assertEqual(cache.statistics().misses, 2)
+
+    def test_lazy_reads_are_eager(self):
+        cache = ParseCache(self.directory)
+        missed = cache.read_gpx(document('A'), options=ReaderOptions(lazy=True))
+        hit = cache.read_gpx(document('A'))
+        for gpx in (missed, hit):
+            self.assertIs(type(gpx.tracks[0].segments[0].points[0]), Waypoint)
+        self.assertEqual(cache.statistics(), (1, 1, 1, 0))
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+    def test_eviction(self):
+        cache = ParseCache(self.directory, max_size=1)
+        cache.read_gpx(document('A'))
+        cache.read_gpx(document('B'))
+        self.assertEqual(cache.statistics().evictions, 2)
+        self.assertEqual(cache.size(), 0)
+
+    def test_corrupt_entry_is_replaced(self):
+        cache = ParseCache(self.directory)
+        cache.read_gpx(document('A'))
+        for name in os.listdir(self.directory):
+            with open(os.path.join(self.directory, name), 'wb') as entry:
+                entry.write(b'junk')
+        self.assertEqual(cache.read_gpx(document('A')).tracks[0].name, 'A')
+        self.assertEqual(cache.statistics().misses, 2)
+
+    def test_unwritable_document_is_not_stored(self):
+        cache = ParseCache(self.directory)
+        xml = BytesIO(GPX_1_1.replace(b'<ele>3.5</ele>', b'<sat>100000000000000000000</sat>'))
+        gpx = cache.read_gpx(xml)
+        self.assertEqual(gpx.tracks[0].segments[0].points[0].num_satellites, 100000000000000000000)
+        self.assertEqual(cache.statistics().stores, 0)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_other_versions_removed(self):
+        stale = os.path.join(self.directory, 'v0.0-0123' + ENTRY_SUFFIX)
+        with open(stale, 'wb') as entry:
+            entry.write(b'junk')
+        ParseCache(self.directory)
+        self.assertFalse(os.path.exists(stale))
@@ -0,0 +1,107 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from io import BytesIO
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from trailer.model.waypoint import Waypoint
+from trailer.readers.parser import read_gpx
+
+__author__ = 'rjs'
+
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <trk><trkseg>
+    <trkpt lat="1.0" lon="2.0"><ele>10.5</ele><time>2012-11-26T19:55:57Z</time></trkpt>
+    <trkpt lat="1.1" lon="2.1"><time>2012-11-26T20:55:58+01:00</time><name>B</name></trkpt>
+    <trkpt lat="1.2" lon="2.2"><ele>12</ele><sat>5</sat></trkpt>
+  </trkseg></trk>
+</gpx>'''
+
+PRECISE_GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <trk><trkseg>
+    <trkpt lat="45.123456789012345678" lon="1.10"><ele>45</ele></trkpt>
+    <trkpt lat="-0.0050" lon="1E+2"><ele>12.0</ele></trkpt>
+    <trkpt lat="0" lon="-0.0"/>
+  </trkseg></trk>
+</gpx>'''
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class ColumnarSegmentTests(unittest.TestCase):
+
+    def setUp(self):
+        from trailer.readers.options import ReaderOptions
+        gpx = read_gpx(BytesIO(GPX_1_1), options=ReaderOptions(columnar=True))
+        self.segment = gpx.tracks[0].segments[0]
+
+    def test_columns(self):
+        self.assertEqual(len(self.segment), 3)
+        numpy.testing.assert_array_equal(self.segment.column('latitude'), [1.0, 1.1, 1.2])
+        numpy.testing.assert_array_equal(self.segment.present('elevation'), [True, False, True])
+        self.assertTrue(numpy.isnan(self.segment.column('elevation')[1]))
+        self.assertEqual(self.segment.column('time')[1], numpy.datetime64('2012-11-26T19:55:58'))
+        self.assertFalse(self.segment.present('hdop').any())
+
+    def test_points(self):
+        points = self.segment.points
+        self.assertEqual(len(points), 3)
+        self.assertEqual(points[0].elevation, Decimal('10.5'))
+        self.assertEqual(points[0].time, datetime(2012, 11, 26, 19, 55, 57, tzinfo=timezone.utc))
+        self.assertEqual(points[1].time.isoformat(), '2012-11-26T20:55:58+01:00')
+        self.assertEqual(points[1].name, 'B')
+        self.assertIsNone(points[-1].time)
+        self.assertEqual(points[-1].num_satellites, 5)
+
+    def test_round_trip(self):
+        from trailer.model.columnar import ColumnarSegment
+        segment = ColumnarSegment.from_points([Waypoint('45.5', '-1.25', elevation='3')])
+        self.assertEqual(segment.points[0].longitude, Decimal('-1.25'))
+
+    def test_out_of_range(self):
+        from trailer.model.columnar import ColumnarSegment
+        with self.assertRaises(ValueError):
+            ColumnarSegment.from_fields([('91', '0', {})])
+
+    def test_concatenate(self):
+        from trailer.model.columnar import ColumnarSegment
+        first = ColumnarSegment.from_points([Waypoint('45.5', '-1.25', elevation='3', name='A')])
+        segment = ColumnarSegment.concatenate([first, self.segment])
+        self.assertEqual(len(segment), 4)
+        numpy.testing.assert_array_equal(segment.present('elevation'), [True, True, False, True])
+        self.assertEqual(segment.points[0].name, 'A')
+        self.assertEqual(segment.points[2].name, 'B')
+        self.assertEqual(segment.points[2].time.isoformat(), '2012-11-26T20:55:58+01:00')
+
+    def test_slice(self):
+        segment = self.segment.slice(1, None)
+        self.assertEqual(len(segment), 2)
+        self.assertTrue(numpy.shares_memory(segment.column('latitude'), self.segment.column('latitude')))
+        numpy.testing.assert_array_equal(segment.present('elevation'), [False, True])
+        self.assertEqual(segment.points[0].name, 'B')
+        self.assertEqual(segment.points[0].time.isoformat(), '2012-11-26T20:55:58+01:00')
+        self.assertEqual(len(self.segment.slice(2, 1)), 0)
+
+    def test_decimal_digits_round_trip(self):
+        from trailer.model.columnar import ColumnarSegment
+        from trailer.readers.options import ReaderOptions
+        from trailer.writers.gpx.writer import write_gpx
+        gpx = read_gpx(BytesIO(PRECISE_GPX_1_1), options=ReaderOptions(columnar=True))
+        segment = gpx.tracks[0].segments[0]
+        expected = [('45.123456789012345678', '1.10', '45'), ('-0.0050', '1E+2', '12.0'), ('0', '-0.0', 'None')]
+        for selected in (segment, segment.slice(0, 3), segment.take([0, 1, 2]),
+                         ColumnarSegment.concatenate([segment])):
+            self.assertEqual([(str(point.latitude), str(point.longitude), str(point.elevation))
+                              for point in selected.points], expected)
+
+        # The GPX written is the same as from Waypoints read from the document.
+        columnar_destination = BytesIO()
+        write_gpx(gpx, columnar_destination)
+        destination = BytesIO()
+        write_gpx(read_gpx(BytesIO(PRECISE_GPX_1_1)), destination)
+        self.assertEqual(columnar_destination.getvalue(), destination.getvalue())
@@ -0,0 +1,126 @@
+from datetime import datetime
+from io import BytesIO, StringIO
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+
+from trailer.readers.options import ReaderOptions
+from trailer.readers.parser import read_gpx
+from trailer.readers.stream import iter_trackpoints
+from trailer.writers.columnar.writer import (COLUMNS, iter_model_batches, pyarrow, write_arrow,
+                                             write_arrow_trackpoints, write_csv, write_csv_trackpoints)
+
+__author__ = 'rjs'
+
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <wpt lat="50.05" lon="0.05"><name>Cafe</name></wpt>
+  <trk>
+    <name>Morning "run"</name>
+    <trkseg>
+      <trkpt lat="50.0000000" lon="0.1000000"><ele>100.50</ele><time>2012-11-26T19:55:00Z</time><sat>7</sat></trkpt>
+      <trkpt lat="50.0000100" lon="0.1000100"><time>2012-11-26T19:55:01+01:00</time><fix>3d</fix></trkpt>
+    </trkseg>
+    <trkseg>
+      <trkpt lat="50.0000200" lon="0.1000200"><ele>100.70</ele><time>2012-11-26T19:55:02</time></trkpt>
+    </trkseg>
+  </trk>
+  <trk><trkseg><trkpt lat="51" lon="1"><name>Caf\xc3\xa9</name></trkpt></trkseg></trk>
+</gpx>'''
+
+OPTIONS = (None, ReaderOptions(numeric='float'), ReaderOptions(lazy=True), ReaderOptions(columnar=True))
+
+
+class ColumnarCsvTests(unittest.TestCase):
+
+    def test_default_columns(self):
+        stream = StringIO()
+        write_csv(read_gpx(BytesIO(GPX_1_1)), stream)
+        self.assertEqual(stream.getvalue(),
+                         'track_idx,segment_idx,point_idx,lat,lon,ele,time,time_offset,sat,hdop\n'
+                         '0,0,0,50.0,0.1,100.5,2012-11-26T19:55:00,0,7,\n'
+                         '0,0,1,50.00001,0.10001,,2012-11-26T18:55:01,60,,\n'
+                         '0,1,0,50.00002,0.10002,100.7,2012-11-26T19:55:02,,,\n'
+                         '1,0,0,51.0,1.0,,,,,\n')
+
+    def test_text_columns(self):
+        stream = StringIO()
+        write_csv(read_gpx(BytesIO(GPX_1_1)), stream, columns=('track_name', 'name', 'fix'))
+        rows = list(csv.reader(StringIO(stream.getvalue())))
+        self.assertEqual(rows, [['track_name', 'name', 'fix'],
+                                ['Morning "run"', '', ''],
+                                ['Morning "run"', '', '3d'],
+                                ['Morning "run"', '', ''],
+                                ['', 'Caf\xe9', '']])
+        with self.assertRaises(ValueError):
+            write_csv(read_gpx(BytesIO(GPX_1_1)), StringIO(), columns=('lat', 'latitude'))
+        with self.assertRaises(ValueError):
+            write_csv(read_gpx(BytesIO(GPX_1_1)), StringIO(), columns=())
+
+    def test_representations_write_alike(self):
+        expected = StringIO()
+        write_csv(read_gpx(BytesIO(GPX_1_1)), expected, columns=tuple(COLUMNS))
+        for options in OPTIONS:
+            for batch_size in (1, 2, 10):
+                stream = StringIO()
+                write_csv(read_gpx(BytesIO(GPX_1_1), options=options), stream, columns=tuple(COLUMNS),
+                          batch_size=batch_size)
+                self.assertEqual(stream.getvalue(), expected.getvalue())
+
+    def test_streaming_reader(self):
+        expected = StringIO()
+        write_csv(read_gpx(BytesIO(GPX_1_1)), expected, columns=tuple(COLUMNS))
+        stream = StringIO()
+        write_csv_trackpoints(iter_trackpoints(BytesIO(GPX_1_1)), stream, columns=tuple(COLUMNS), batch_size=3)
+        self.assertEqual(stream.getvalue(), expected.getvalue())
+
+    def test_batches(self):
+        gpx = read_gpx(BytesIO(GPX_1_1), options=ReaderOptions(columnar=True))
+        batches = list(iter_model_batches(gpx, columns=('segment_idx', 'lat', 'time'), batch_size=2))
+        self.assertEqual(batches, [
+            {'segment_idx': [0, 0], 'lat': [50.0, 50.00001],
+             'time': [datetime(2012, 11, 26, 19, 55), datetime(2012, 11, 26, 18, 55, 1)]},
+            {'segment_idx': [1, 0], 'lat': [50.00002, 51.0], 'time': [datetime(2012, 11, 26, 19, 55, 2), None]},
+        ])
+
+    def test_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'walk.csv')
+            write_csv_trackpoints(iter_trackpoints(BytesIO(GPX_1_1)), path)
+            with open(path, encoding='utf-8', newline='') as file:
+                self.assertEqual(len(list(csv.reader(file))), 5)
+        finally:
+            shutil.rmtree(directory)
+
+
+@unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+class ColumnarArrowTests(unittest.TestCase):
+
+    def test_arrow(self):
+        stream = BytesIO()
+        write_arrow(read_gpx(BytesIO(GPX_1_1)), stream, columns=tuple(COLUMNS))
+        table = pyarrow.ipc.open_file(pyarrow.py_buffer(stream.getvalue())).read_all()
+        self.assertEqual(table.num_rows, 4)
+        self.assertEqual(table.column('lat').to_pylist(), [50.0, 50.00001, 50.00002, 51.0])
+        self.assertEqual(table.column('time_offset').to_pylist(), [0, 60, None, None])
+        self.assertEqual(table.column('name').to_pylist(), [None, None, None, 'Caf\xe9'])
+        self.assertEqual(str(table.schema.field('time').type), 'timestamp[us, tz=UTC]')
+
+    def test_representations_write_alike(self):
+        expected = BytesIO()
+        write_arrow_trackpoints(iter_trackpoints(BytesIO(GPX_1_1)), expected, batch_size=2)
+        for options in OPTIONS:
+            stream = BytesIO()
+            write_arrow(read_gpx(BytesIO(GPX_1_1), options=options), stream, batch_size=2)
+            self.assertEqual(stream.getvalue(), expected.getvalue())
+
+
+class ColumnarArrowMissingTests(unittest.TestCase):
+
+    @unittest.skipIf(pyarrow is not None, "pyarrow is installed")
+    def test_requires_pyarrow(self):
+        with self.assertRaises(ImportError):
+            write_arrow(read_gpx(BytesIO(GPX_1_1)), BytesIO())
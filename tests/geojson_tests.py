@@ -0,0 +1,105 @@
+from io import BytesIO, StringIO
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from trailer.model.track import Track
+from trailer.model.waypoint import Waypoint
+from trailer.readers.options import ReaderOptions
+from trailer.readers.parser import read_gpx
+from trailer.readers.stream import iter_gpx_events
+from trailer.writers.geojson.writer import GpxGeoJsonWriter, render_geojson, write_geojson, write_geojson_events
+
+__author__ = 'rjs'
+
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <metadata><name>Walk</name></metadata>
+  <wpt lat="50.05" lon="0.05"><ele>12.5</ele><time>2012-11-26T19:55:00Z</time><name>Cafe</name></wpt>
+  <rte><name>Route</name><number>3</number><rtept lat="50.0" lon="0.0"/><rtept lat="50.1" lon="0.1"/></rte>
+  <trk>
+    <name>Track</name>
+    <trkseg>
+      <trkpt lat="50.1234567" lon="0.7654321"><ele>100.50</ele></trkpt>
+      <trkpt lat="50.1234568" lon="0.7654322"><ele>100.75</ele></trkpt>
+    </trkseg>
+    <trkseg/>
+    <trkseg>
+      <trkpt lat="51.0" lon="1.0"><ele>90</ele></trkpt>
+      <trkpt lat="51.5" lon="1.5"/>
+    </trkseg>
+  </trk>
+</gpx>'''
+
+
+class GeoJsonTests(unittest.TestCase):
+
+    def test_features(self):
+        data = json.loads(render_geojson(read_gpx(BytesIO(GPX_1_1))))
+        self.assertEqual(data['type'], 'FeatureCollection')
+        waypoint, route, track = data['features']
+
+        self.assertEqual(waypoint['geometry'], {'type': 'Point', 'coordinates': [0.05, 50.05, 12.5]})
+        self.assertEqual(waypoint['properties'], {'name': 'Cafe', 'time': '2012-11-26T19:55:00+00:00'})
+
+        self.assertEqual(route['geometry'], {'type': 'LineString', 'coordinates': [[0.0, 50.0], [0.1, 50.1]]})
+        self.assertEqual(route['properties'], {'name': 'Route', 'number': 3})
+
+        self.assertEqual(track['properties'], {'name': 'Track'})
+        self.assertEqual(track['geometry']['type'], 'MultiLineString')
+        # The empty segment is omitted, and only points with an elevation have one.
+        self.assertEqual(track['geometry']['coordinates'],
+                         [[[0.7654321, 50.1234567, 100.5], [0.7654322, 50.1234568, 100.75]],
+                          [[1.0, 51.0, 90.0], [1.5, 51.5]]])
+
+    def test_precision(self):
+        data = json.loads(render_geojson(read_gpx(BytesIO(GPX_1_1)), precision=5))
+        self.assertEqual(data['features'][0]['geometry']['coordinates'], [0.05, 50.05, 12.5])
+        self.assertEqual(data['features'][2]['geometry']['coordinates'][0],
+                         [[0.76543, 50.12346, 100.5], [0.76543, 50.12346, 100.75]])
+
+    def test_representations_render_alike(self):
+        expected = render_geojson(read_gpx(BytesIO(GPX_1_1)), precision=6)
+        for options in (ReaderOptions(numeric='float'), ReaderOptions(lazy=True), ReaderOptions(columnar=True)):
+            gpx = read_gpx(BytesIO(GPX_1_1), options=options)
+            self.assertEqual(render_geojson(gpx, precision=6), expected)
+
+    def test_events(self):
+        expected = render_geojson(read_gpx(BytesIO(GPX_1_1)))
+        stream = StringIO()
+        write_geojson_events(iter_gpx_events(BytesIO(GPX_1_1)), stream)
+        self.assertEqual(stream.getvalue(), expected)
+
+    def test_chunks(self):
+        expected = render_geojson(read_gpx(BytesIO(GPX_1_1)))
+        gpx = read_gpx(BytesIO(GPX_1_1))
+        stream = StringIO()
+        with GpxGeoJsonWriter(stream, chunk_size=1) as writer:
+            writer.write_waypoint(gpx.waypoints[0])
+            writer.write_route(gpx.routes[0])
+            with writer.track(gpx.tracks[0]):
+                for segment in gpx.tracks[0].segments:
+                    with writer.segment():
+                        for point in segment.points:
+                            writer.write_trackpoint(point)
+        self.assertEqual(stream.getvalue(), expected)
+
+    def test_nesting(self):
+        with GpxGeoJsonWriter(StringIO()) as writer:
+            with self.assertRaises(ValueError):
+                writer.write_trackpoint(Waypoint(1, 2))
+            with writer.track(Track()):
+                with self.assertRaises(ValueError):
+                    writer.write_waypoint(Waypoint(1, 2))
+
+    def test_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'walk.geojson')
+            write_geojson(read_gpx(BytesIO(GPX_1_1)), path)
+            with open(path, encoding='utf-8') as file:
+                self.assertEqual(len(json.load(file)['features']), 3)
+        finally:
+            shutil.rmtree(directory)
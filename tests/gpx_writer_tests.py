@@ -0,0 +1,176 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import gzip
+from io import BytesIO
+import os
+import shutil
+import tempfile
+import unittest
+
+from lxml import etree
+
+from trailer.model.gpx_model import GpxModel
+from trailer.model.link import Link
+from trailer.model.segment import Segment
+from trailer.model.track import Track
+from trailer.model.waypoint import Waypoint, FloatWaypoint
+from trailer.readers.options import ReaderOptions
+from trailer.readers.parser import read_gpx
+from trailer.readers.stream import iter_gpx_events
+from trailer.writers.gpx.writer import GpxWriter, format_number, write_gpx, write_gpx_events, write_gpx_track
+
+__author__ = 'rjs'
+
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" xmlns:x="http://example.com/x" version="1.1" creator="unittests">
+  <metadata>
+    <name>Walk</name>
+    <author><name>A. Walker</name><link href="http://example.com"><text>Home</text></link></author>
+    <copyright author="A. Walker"><year>2012+01:00</year><license>http://example.com/license</license></copyright>
+    <time>2012-11-26T19:55:00Z</time>
+    <keywords>walk</keywords>
+    <bounds minlat="50.0" minlon="0.0" maxlat="50.1" maxlon="0.10"/>
+  </metadata>
+  <wpt lat="50.05" lon="0.05"><name>Cafe</name><link href="http://cafe.example.com"/><sym>Restaurant</sym>
+    <extensions><x:rating>4</x:rating></extensions></wpt>
+  <rte><name>Route</name><number>3</number><rtept lat="50.0" lon="0.0"/><rtept lat="50.1" lon="0.1"/></rte>
+  <trk>
+    <name>Track</name>
+    <type>Walking</type>
+    <trkseg>
+      <trkpt lat="50.0000000" lon="0.0000000"><ele>100.50</ele><time>2012-11-26T19:55:00Z</time><sat>7</sat></trkpt>
+      <trkpt lat="50.0000859" lon="-0.0000001"><ele>99.9</ele><time>2012-11-26T19:55:01+01:00</time><fix>3d</fix></trkpt>
+      <trkpt lat="-50.0001" lon="179.5"><time>2012-11-26T19:55:02Z</time><hdop>1.2</hdop><dgpsid>12</dgpsid></trkpt>
+    </trkseg>
+    <trkseg/>
+  </trk>
+</gpx>'''
+
+
+def fields(point):
+    values = tuple(getattr(point, slot[1:]) for slot in Waypoint.__slots__ if slot not in ('_links', '_extensions'))
+    return values + tuple(link.href for link in point.links)
+
+
+def render(function, *args, **kwargs):
+    stream = BytesIO()
+    function(*args, destination=stream, **kwargs)
+    return stream.getvalue()
+
+
+def assert_same_model(test, expected, actual):
+    test.assertEqual(actual.creator, expected.creator)
+    test.assertEqual(actual.metadata.name, expected.metadata.name)
+    test.assertEqual(actual.metadata.author.link.text, expected.metadata.author.link.text)
+    test.assertEqual(actual.metadata.copyright.year.year, expected.metadata.copyright.year.year)
+    test.assertEqual(actual.metadata.copyright.year.tzinfo.utcoffset(None),
+                     expected.metadata.copyright.year.tzinfo.utcoffset(None))
+    test.assertEqual(actual.metadata.copyright.license, expected.metadata.copyright.license)
+    test.assertEqual(actual.metadata.time, expected.metadata.time)
+    test.assertEqual(actual.metadata.keywords, expected.metadata.keywords)
+    test.assertEqual(str(actual.metadata.bounds.maximum_longitude), str(expected.metadata.bounds.maximum_longitude))
+    test.assertEqual(fields(actual.waypoints[0]), fields(expected.waypoints[0]))
+    test.assertEqual([etree.tostring(e) for e in actual.waypoints[0].extensions],
+                     [etree.tostring(e) for e in expected.waypoints[0].extensions])
+    test.assertEqual(actual.routes[0].number, expected.routes[0].number)
+    test.assertEqual([fields(p) for p in actual.routes[0].points], [fields(p) for p in expected.routes[0].points])
+    test.assertEqual(actual.tracks[0].name, expected.tracks[0].name)
+    test.assertEqual(actual.tracks[0].classification, expected.tracks[0].classification)
+    test.assertEqual(len(actual.tracks[0].segments), len(expected.tracks[0].segments))
+    for expected_segment, actual_segment in zip(expected.tracks[0].segments, actual.tracks[0].segments):
+        test.assertEqual([fields(p) for p in actual_segment.points], [fields(p) for p in expected_segment.points])
+        test.assertEqual([str(p.latitude) for p in actual_segment.points],
+                         [str(p.latitude) for p in expected_segment.points])
+
+
+class GpxWriterTests(unittest.TestCase):
+
+    def test_model_round_trips(self):
+        gpx = read_gpx(BytesIO(GPX_1_1))
+        data = render(write_gpx, gpx)
+        assert_same_model(self, gpx, read_gpx(BytesIO(data)))
+        # The namespace is declared once, on the root element.
+        self.assertEqual(data.count(b'xmlns="http://www.topografix.com/GPX/1/1"'), 1)
+        # Decimals keep their digits.
+        self.assertIn(b'<trkpt lat="50.0000000" lon="0.0000000"><ele>100.50</ele>', data)
+        self.assertIn(b'<time>2012-11-26T19:55:00Z</time>', data)
+        self.assertIn(b'<time>2012-11-26T19:55:01+01:00</time>', data)
+
+    def test_events_round_trip(self):
+        gpx = read_gpx(BytesIO(GPX_1_1))
+        data = render(write_gpx_events, iter_gpx_events(BytesIO(GPX_1_1)), creator='unittests')
+        self.assertEqual(data, render(write_gpx, gpx))
+
+    def test_float_waypoints(self):
+        gpx = read_gpx(BytesIO(GPX_1_1), options=ReaderOptions(numeric='float'))
+        result = read_gpx(BytesIO(render(write_gpx, gpx)), options=ReaderOptions(numeric='float'))
+        self.assertEqual([p.longitude for p in result.tracks[0].segments[0].points], [0.0, -1e-7, 179.5])
+
+    def test_format_number(self):
+        self.assertEqual(format_number(Decimal('1.50')), '1.50')
+        self.assertEqual(format_number(Decimal('1E+3')), '1000')
+        self.assertEqual(format_number(0.1), '0.1')
+        self.assertEqual(format_number(5.3e-06), '0.0000053')
+        self.assertEqual(format_number(1e22), '10000000000000000000000')
+        self.assertEqual(format_number(7), '7')
+
+    def test_track_from_points(self):
+        offset = timezone(timedelta(hours=-5))
+        points = (FloatWaypoint(50 + i / 1000, 0.5, elevation=i, time=datetime(2012, 1, 1, 10, 0, i, tzinfo=offset))
+                  for i in range(10))
+        track = Track(name='Stream', links=[Link('http://example.com', mime='text/html')])
+        data = render(write_gpx_track, points, creator='unittests', track=track)
+        result = read_gpx(BytesIO(data), options=ReaderOptions(numeric='float'))
+        self.assertEqual(result.tracks[0].name, 'Stream')
+        self.assertEqual(result.tracks[0].links[0].mime, 'text/html')
+        result_points = result.tracks[0].segments[0].points
+        self.assertEqual([p.latitude for p in result_points], [50 + i / 1000 for i in range(10)])
+        self.assertEqual(result_points[9].time, datetime(2012, 1, 1, 10, 0, 9, tzinfo=offset))
+
+    def test_incremental_writing(self):
+        stream = BytesIO()
+        with GpxWriter(stream, 'unittests') as writer:
+            writer.write_waypoint(Waypoint(1, 2, name='Start'))
+            with writer.track():
+                with writer.segment():
+                    writer.write_trackpoint(Waypoint(1, 2))
+                with writer.segment(extensions=[etree.fromstring('<x xmlns="http://example.com/x"/>')]):
+                    writer.write_trackpoints([Waypoint(3, 4), Waypoint(5, 6)])
+            writer.write_track(Track(segments=[Segment([Waypoint(7, 8)])]))
+        result = read_gpx(BytesIO(stream.getvalue()))
+        self.assertEqual(result.waypoints[0].name, 'Start')
+        self.assertEqual([len(s.points) for s in result.tracks[0].segments], [1, 2])
+        self.assertIn(b'<extensions><x xmlns="http://example.com/x"/></extensions></trkseg>', stream.getvalue())
+        self.assertEqual(result.tracks[1].segments[0].points[0].longitude, 8)
+
+    def test_elements_out_of_order(self):
+        with GpxWriter(BytesIO(), 'unittests') as writer:
+            writer.write_track(Track())
+            with self.assertRaises(ValueError):
+                writer.write_waypoint(Waypoint(1, 2))
+            with self.assertRaises(ValueError):
+                writer.write_trackpoint(Waypoint(1, 2))
+            with writer.track():
+                with self.assertRaises(ValueError):
+                    writer.write_route(None)
+                with self.assertRaises(ValueError):
+                    writer.write_trackpoint(Waypoint(1, 2))
+
+    def test_unsupported_extension(self):
+        gpx = GpxModel('test', waypoints=[Waypoint(1, 2, extensions=[{'key': 'value'}])])
+        with self.assertRaises(TypeError):
+            render(write_gpx, gpx)
+
+    def test_compressed_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            gpx = read_gpx(BytesIO(GPX_1_1))
+            path = os.path.join(directory, 'walk.gpx.gz')
+            write_gpx(gpx, path)
+            with gzip.open(path) as compressed:
+                assert_same_model(self, gpx, read_gpx(compressed))
+            stream = BytesIO()
+            write_gpx(gpx, stream, compress=True)
+            self.assertEqual(gzip.decompress(stream.getvalue()), render(write_gpx, gpx))
+        finally:
+            shutil.rmtree(directory)
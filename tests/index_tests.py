@@ -0,0 +1,96 @@
+from decimal import Decimal
+import gc
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+
+from lxml import etree
+
+from trailer.readers.index import GpxIndex
+
+__author__ = 'rjs'
+
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <metadata><name>Eleven</name></metadata>
+  <wpt lat="5" lon="6"><name>W1</name></wpt>
+  <!-- <wpt lat="7" lon="8"/> -->
+  <wpt lat="7" lon="8"/>
+  <rte><name>R</name><rtept lat="3" lon="4"/></rte>
+  <trk>
+    <name>A</name>
+    <trkseg><trkpt lat="1.0" lon="2.0"/></trkseg>
+    <trkseg/>
+    <trkseg><trkpt lat="1.1" lon="2.1"/><trkpt lat="1.2" lon="2.2"/></trkseg>
+  </trk>
+  <trk><name>B</name></trk>
+</gpx>'''
+
+
+class GpxIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'test.gpx')
+        with open(self.path, 'wb') as f:
+            f.write(GPX_1_1)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_counts(self):
+        with GpxIndex.build(self.path) as index:
+            self.assertEqual(index.waypoint_count, 2)
+            self.assertEqual(index.route_count, 1)
+            self.assertEqual(index.track_count, 2)
+            self.assertEqual(index.segment_count(0), 3)
+            self.assertEqual(index.segment_count(1), 0)
+
+    def test_parse_items(self):
+        with GpxIndex.build(self.path) as index:
+            self.assertEqual(index.parse_waypoint(0).name, 'W1')
+            self.assertEqual(index.parse_waypoint(1).latitude, Decimal('7'))
+            self.assertEqual(index.parse_route(0).name, 'R')
+            track = index.parse_track(0)
+            self.assertEqual(track.name, 'A')
+            self.assertEqual(len(track.segments), 3)
+            self.assertEqual(index.parse_track(1).name, 'B')
+            segment = index.parse_segment(0, 2)
+            self.assertEqual([point.longitude for point in segment.points], [Decimal('2.1'), Decimal('2.2')])
+            self.assertEqual(len(index.parse_segment(0, 1).points), 0)
+
+    def test_save_and_load(self):
+        GpxIndex.open(self.path).close()
+        self.assertTrue(os.path.exists(self.path + '.index'))
+        with GpxIndex.load(self.path) as index:
+            self.assertEqual(index.parse_segment(0, 0).points[0].latitude, Decimal('1.0'))
+
+    def test_stale_index(self):
+        GpxIndex.open(self.path).close()
+        with open(self.path, 'ab') as f:
+            f.write(b'\n')
+        with self.assertRaises(ValueError):
+            GpxIndex.load(self.path)
+        with GpxIndex.open(self.path) as index:
+            self.assertEqual(index.track_count, 2)
+
+    def test_not_gpx(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'<foo/>')
+        with self.assertRaises(ValueError):
+            GpxIndex.build(self.path)
+
+    def test_unparseable_header_closes_file(self):
+        GpxIndex.open(self.path).close()
+        with open(self.path + '.index') as index_file:
+            offsets = json.load(index_file)
+        offsets['header_end'] = 5
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', ResourceWarning)
+            with self.assertRaises(etree.XMLSyntaxError):
+                GpxIndex(self.path, offsets)
+            gc.collect()
+        self.assertEqual([warning for warning in caught if issubclass(warning.category, ResourceWarning)], [])
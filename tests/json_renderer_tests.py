@@ -0,0 +1,82 @@
+from decimal import Decimal
+from io import BytesIO
+import json
+import unittest
+
+from trailer.model.gpx_model import GpxModel
+from trailer.model.waypoint import Waypoint, FloatWaypoint
+from trailer.readers.options import ReaderOptions
+from trailer.readers.parser import read_gpx
+from trailer.writers.json.renderer import GpxJsonEncoder
+
+__author__ = 'rjs'
+
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <metadata>
+    <name>Walk</name>
+    <author><name>A. Walker</name><link href="http://example.com"><text>Home</text></link></author>
+    <copyright author="A. Walker"><year>2012+01:00</year></copyright>
+    <time>2012-11-26T19:55:00Z</time>
+    <bounds minlat="50.0" minlon="0.0" maxlat="50.1" maxlon="0.10"/>
+  </metadata>
+  <wpt lat="50.05" lon="0.05"><name>Cafe</name><link href="http://cafe.example.com"/><sym>Restaurant</sym></wpt>
+  <rte><name>Route</name><number>3</number><rtept lat="50.0" lon="0.0"/></rte>
+  <trk>
+    <name>Track</name>
+    <trkseg>
+      <trkpt lat="50.0000000" lon="0.1000000"><ele>100.50</ele><time>2012-11-26T19:55:00.5+01:00</time><fix>3d</fix><sat>7</sat></trkpt>
+    </trkseg>
+    <trkseg/>
+  </trk>
+</gpx>'''
+
+# The output of the encoder before field tables and cached dispatch.
+EXPECTED_JSON = (
+    '{"creator": "unittests", "metadata": {"name": "Walk", "author": {"name": "A. Walker", '
+    '"link": {"href": "http://example.com", "text": "Home"}}, "copyright": {"author": "A. Walker", '
+    '"year": "2012+0100"}, "time": "2012-11-26T19:55:00+00:00", "bounds": {"minLat": 50.0, '
+    '"minLon": 0.0, "maxLat": 50.1, "maxLon": 0.1}}, "waypoints": [{"lat": 50.05, "lon": 0.05, '
+    '"name": "Cafe", "links": [{"href": "http://cafe.example.com"}], "symbol": "Restaurant"}], '
+    '"routes": [{"name": "Route", "number": 3, "points": [{"lat": 50.0, "lon": 0.0}]}], '
+    '"tracks": [{"name": "Track", "segments": [{"points": [{"lat": 50.0, "lon": 0.1, "ele": 100.5, '
+    '"time": "2012-11-26T19:55:00.500000+01:00", "fix": "3d", "numSatellites": 7}]}, {}]}]}'
+)
+
+
+class GpxJsonEncoderTests(unittest.TestCase):
+
+    def test_output(self):
+        gpx = read_gpx(BytesIO(GPX_1_1))
+        self.assertEqual(json.dumps(gpx, cls=GpxJsonEncoder), EXPECTED_JSON)
+
+    def test_indented_output(self):
+        gpx = read_gpx(BytesIO(GPX_1_1))
+        expected = json.dumps(json.loads(EXPECTED_JSON), indent=4)
+        self.assertEqual(json.dumps(gpx, cls=GpxJsonEncoder, indent=4), expected)
+
+    def test_representations_render_alike(self):
+        for options in (ReaderOptions(numeric='float'), ReaderOptions(lazy=True), ReaderOptions(columnar=True)):
+            gpx = read_gpx(BytesIO(GPX_1_1), options=options)
+            self.assertEqual(json.dumps(gpx, cls=GpxJsonEncoder), EXPECTED_JSON)
+
+    def test_numbers(self):
+        points = [Waypoint(0, 0, elevation=Decimal('1E+3')), FloatWaypoint(0, 0, elevation=1e-7),
+                  Waypoint(0, 0, elevation=Decimal('NaN'))]
+        data = json.dumps(GpxModel('test', waypoints=points), cls=GpxJsonEncoder)
+        self.assertEqual(data.count('"ele"'), 3)
+        self.assertIn('"ele": 1000.0', data)
+        self.assertIn('"ele": 1e-07', data)
+        self.assertIn('"ele": NaN', data)
+
+    def test_subclass_visitors(self):
+
+        class CoordinatesEncoder(GpxJsonEncoder):
+
+            def visit_Waypoint(self, waypoint, *args, **kwargs):
+                return [self.visit(waypoint.longitude), self.visit(waypoint.latitude)]
+
+        gpx = read_gpx(BytesIO(GPX_1_1))
+        data = json.loads(json.dumps(gpx, cls=CoordinatesEncoder))
+        self.assertEqual(data['tracks'][0]['segments'][0]['points'], [[0.1, 50.0]])
+        self.assertEqual(data['routes'][0]['points'], [[0.0, 50.0]])
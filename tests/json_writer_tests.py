@@ -0,0 +1,108 @@
+from io import BytesIO, StringIO
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from trailer.model.track import Track
+from trailer.model.waypoint import Waypoint
+from trailer.readers.options import ReaderOptions
+from trailer.readers.parser import read_gpx
+from trailer.readers.stream import iter_gpx_events
+from trailer.writers.json.renderer import GpxJsonEncoder
+from trailer.writers.json.writer import JsonWriter, write_json, write_json_events, write_json_track
+
+__author__ = 'rjs'
+
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <metadata><name>Walk</name><time>2012-11-26T19:55:00Z</time></metadata>
+  <wpt lat="50.05" lon="0.05"><name>Cafe</name></wpt>
+  <wpt lat="50.06" lon="0.06"><name>Pub</name></wpt>
+  <rte><name>Route</name><rtept lat="50.0" lon="0.0"/></rte>
+  <trk>
+    <name>Track</name>
+    <trkseg>
+      <trkpt lat="50.0000000" lon="0.1000000"><ele>100.50</ele><time>2012-11-26T19:55:00Z</time></trkpt>
+      <trkpt lat="50.0000100" lon="0.1000100"><ele>100.60</ele><time>2012-11-26T19:55:01Z</time></trkpt>
+      <trkpt lat="50.0000200" lon="0.1000200"><ele>100.70</ele><time>2012-11-26T19:55:02Z</time></trkpt>
+    </trkseg>
+    <trkseg/>
+  </trk>
+  <trk><trkseg><trkpt lat="51" lon="1"/></trkseg></trk>
+  <trk/>
+</gpx>'''
+
+FORMATS = ({}, {'indent': 4}, {'indent': '\t', 'separators': (', ', ': ')}, {'separators': (',', ':')})
+
+
+def render(function, *args, **kwargs):
+    stream = StringIO()
+    function(*args, destination=stream, **kwargs)
+    return stream.getvalue()
+
+
+class JsonWriterTests(unittest.TestCase):
+
+    def test_same_as_encoder(self):
+        gpx = read_gpx(BytesIO(GPX_1_1))
+        for kwargs in FORMATS:
+            self.assertEqual(render(write_json, gpx, **kwargs), json.dumps(gpx, cls=GpxJsonEncoder, **kwargs))
+
+    def test_events(self):
+        gpx = read_gpx(BytesIO(GPX_1_1))
+        for kwargs in FORMATS:
+            self.assertEqual(render(write_json_events, iter_gpx_events(BytesIO(GPX_1_1)), creator='unittests',
+                                    **kwargs),
+                             json.dumps(gpx, cls=GpxJsonEncoder, **kwargs))
+
+    def test_chunks(self):
+        gpx = read_gpx(BytesIO(GPX_1_1), options=ReaderOptions(numeric='float'))
+        for kwargs in FORMATS:
+            for chunk_size in (1, 2):
+                stream = StringIO()
+                with JsonWriter(stream, gpx.creator, chunk_size=chunk_size, **kwargs) as writer:
+                    writer.write_metadata(gpx.metadata)
+                    for waypoint in gpx.waypoints:
+                        writer.write_waypoint(waypoint)
+                    writer.write_route(gpx.routes[0])
+                    with writer.track(gpx.tracks[0]):
+                        with writer.segment():
+                            for point in gpx.tracks[0].segments[0].points:
+                                writer.write_trackpoint(point)
+                        with writer.segment():
+                            pass
+                    writer.write_track(gpx.tracks[1])
+                    writer.write_track(gpx.tracks[2])
+                self.assertEqual(stream.getvalue(), json.dumps(gpx, cls=GpxJsonEncoder, **kwargs))
+
+    def test_track_from_points(self):
+        points = (Waypoint(50 + i, 1) for i in range(5))
+        data = json.loads(render(write_json_track, points, creator='unittests', track=Track(name='Stream'),
+                                 indent=2))
+        self.assertEqual(data['tracks'][0]['name'], 'Stream')
+        self.assertEqual([point['lat'] for point in data['tracks'][0]['segments'][0]['points']],
+                         [50, 51, 52, 53, 54])
+
+    def test_members_out_of_order(self):
+        with JsonWriter(StringIO(), 'unittests') as writer:
+            writer.write_track(Track())
+            with self.assertRaises(ValueError):
+                writer.write_waypoint(Waypoint(1, 2))
+            with self.assertRaises(ValueError):
+                writer.write_trackpoint(Waypoint(1, 2))
+            with writer.track():
+                with self.assertRaises(ValueError):
+                    writer.write_metadata(None)
+
+    def test_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            gpx = read_gpx(BytesIO(GPX_1_1))
+            path = os.path.join(directory, 'walk.json')
+            write_json(gpx, path, indent=4)
+            with open(path, encoding='utf-8') as file:
+                self.assertEqual(file.read(), json.dumps(gpx, cls=GpxJsonEncoder, indent=4))
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,139 @@
+from io import BytesIO
+import unittest
+
+import numpy
+
+from trailer.analysis.geodesy import project
+from trailer.analysis.lod import ZOOM_TOLERANCES, LevelOfDetail
+from trailer.analysis.simplify import douglas_peucker_mask, douglas_peucker_significance, simplify_segment
+from trailer.model.columnar import ColumnarSegment
+from trailer.model.track import Track
+from trailer.readers.options import ReaderOptions
+from trailer.readers.parser import read_gpx
+
+__author__ = 'rjs'
+
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <trk>
+    <name>Track</name>
+    <trkseg>
+      <trkpt lat="50.0" lon="0.000"><ele>1</ele></trkpt>
+      <trkpt lat="50.0" lon="0.001"><ele>2</ele></trkpt>
+      <trkpt lat="50.0" lon="0.002"><ele>3</ele></trkpt>
+      <trkpt lat="50.0001" lon="0.003"><ele>4</ele><name>Summit</name></trkpt>
+      <trkpt lat="50.0" lon="0.004"><ele>5</ele></trkpt>
+      <trkpt lat="50.00001" lon="0.005"><ele>6</ele></trkpt>
+      <trkpt lat="50.0" lon="0.006"><ele>7</ele></trkpt>
+    </trkseg>
+    <trkseg/>
+    <trkseg>
+      <trkpt lat="51.0" lon="1.0"/>
+      <trkpt lat="51.001" lon="1.0"/>
+    </trkseg>
+  </trk>
+</gpx>'''
+
+TOLERANCES = (20.0, 8.0, 0.5)
+
+
+def random_walk(count, seed=1):
+    random = numpy.random.default_rng(seed)
+    return (50 + numpy.cumsum(random.normal(scale=1e-5, size=count)),
+            numpy.cumsum(random.normal(scale=1e-5, size=count)))
+
+
+class SignificanceTests(unittest.TestCase):
+
+    def test_matches_douglas_peucker(self):
+        x, y = project(*random_walk(5000))
+        significance = douglas_peucker_significance(x, y)
+        self.assertEqual(significance[0], numpy.inf)
+        self.assertEqual(significance[-1], numpy.inf)
+        for tolerance in (0.0, 0.1, 1.0, 5.0, 50.0):
+            numpy.testing.assert_array_equal(significance > tolerance, douglas_peucker_mask(x, y, tolerance))
+
+    def test_minimum(self):
+        x, y = project(*random_walk(2000))
+        significance = douglas_peucker_significance(x, y, minimum=2.0)
+        self.assertTrue(((significance == 0) | (significance > 2.0)).all())
+        for tolerance in (2.0, 5.0):
+            numpy.testing.assert_array_equal(significance > tolerance, douglas_peucker_mask(x, y, tolerance))
+
+    def test_straight_line(self):
+        x = numpy.arange(100000.0)
+        significance = douglas_peucker_significance(x, numpy.zeros(len(x)))
+        # Rounding leaves a few points a hair's breadth from the line.
+        self.assertLess(significance[1:-1].max(), 1e-9)
+
+
+class LevelOfDetailTests(unittest.TestCase):
+
+    def test_levels(self):
+        track = read_gpx(BytesIO(GPX_1_1)).tracks[0]
+        detail = LevelOfDetail.from_track(track, TOLERANCES)
+        self.assertEqual(detail.segment_lengths, (7, 0, 2))
+        self.assertEqual(len(detail), 3)
+        self.assertEqual([[indices.tolist() for indices in detail.indices(level)] for level in range(3)],
+                         [[[0, 6], [], [0, 1]], [[0, 3, 6], [], [0, 1]], [[0, 2, 3, 4, 5, 6], [], [0, 1]]])
+        self.assertEqual([detail.point_count(level) for level in range(3)], [4, 5, 8])
+        self.assertEqual(detail.level_for_count(5), 1)
+        self.assertEqual(detail.level_for_count(100), 2)
+        self.assertIsNone(detail.level_for_count(3))
+        self.assertIs(detail.indices(1), detail.indices(-2))
+
+    def test_simplify(self):
+        for options in (None, ReaderOptions(columnar=True)):
+            track = read_gpx(BytesIO(GPX_1_1), options=options).tracks[0]
+            detail = LevelOfDetail.from_track(track, TOLERANCES)
+            simplified = detail.simplify(track, 1)
+            self.assertEqual(simplified.name, 'Track')
+            self.assertIs(type(simplified.segments[0]), type(track.segments[0]))
+            points = list(simplified.segments[0].points)
+            self.assertEqual([point.elevation for point in points], [1, 4, 7])
+            self.assertEqual(points[1].name, 'Summit')
+            with self.assertRaises(ValueError):
+                detail.simplify(Track(segments=track.segments[:1]), 1)
+
+    def test_matches_simplification(self):
+        latitudes, longitudes = random_walk(20000, seed=2)
+        segment = ColumnarSegment({'latitude': latitudes, 'longitude': longitudes})
+        detail = LevelOfDetail.from_track(Track(segments=[segment]))
+        for level in (10, 15, 18, 20):
+            expected = simplify_segment(segment, ZOOM_TOLERANCES[level])
+            simplified = detail.simplify(Track(segments=[segment]), level).segments[0]
+            numpy.testing.assert_array_equal(simplified.column('latitude'), expected.column('latitude'))
+
+    def test_bytes(self):
+        track = read_gpx(BytesIO(GPX_1_1)).tracks[0]
+        detail = LevelOfDetail.from_track(track)
+        loaded = LevelOfDetail.from_bytes(detail.to_bytes())
+        self.assertEqual(loaded.tolerances, ZOOM_TOLERANCES)
+        self.assertEqual(loaded.segment_lengths, detail.segment_lengths)
+        numpy.testing.assert_array_equal(loaded.significance, detail.significance)
+        numpy.testing.assert_array_equal(loaded.ranking, detail.ranking)
+        self.assertEqual([loaded.point_count(level) for level in range(len(loaded))],
+                         [detail.point_count(level) for level in range(len(detail))])
+        with self.assertRaises(ValueError):
+            LevelOfDetail.from_bytes(b'TRLX' + detail.to_bytes()[4:])
+        with self.assertRaises(ValueError):
+            LevelOfDetail.from_bytes(detail.to_bytes()[:-1])
+
+    def test_levels_from_ranking(self):
+        track = read_gpx(BytesIO(GPX_1_1)).tracks[0]
+        detail = LevelOfDetail.from_track(track, TOLERANCES)
+        self.assertEqual(detail.ranking.tolist()[:5], [0, 6, 7, 8, 3])
+        # The levels are taken from the ranking and counts alone, not from
+        # the significance.
+        ranked = LevelOfDetail(numpy.zeros(9), detail.segment_lengths, TOLERANCES, detail.ranking, [4, 5, 8])
+        for level in range(3):
+            self.assertEqual([indices.tolist() for indices in ranked.indices(level)],
+                             [indices.tolist() for indices in detail.indices(level)])
+        with self.assertRaises(ValueError):
+            LevelOfDetail(numpy.zeros(9), detail.segment_lengths, TOLERANCES, detail.ranking, [4, 5])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            LevelOfDetail([numpy.inf, numpy.inf], [2], tolerances=(1.0, 2.0))
+        with self.assertRaises(ValueError):
+            LevelOfDetail([numpy.inf, numpy.inf], [3])
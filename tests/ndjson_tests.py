@@ -0,0 +1,109 @@
+from decimal import Decimal
+from io import BytesIO, StringIO
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from trailer.model.gpx_model import GpxModel
+from trailer.model.link import Link
+from trailer.model.segment import Segment
+from trailer.model.track import Track
+from trailer.model.waypoint import Waypoint
+from trailer.readers.options import ReaderOptions
+from trailer.readers.parser import read_gpx
+from trailer.readers.stream import iter_trackpoints
+from trailer.writers.ndjson.writer import FIELDS, write_ndjson, write_ndjson_trackpoints
+
+__author__ = 'rjs'
+
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <wpt lat="50.05" lon="0.05"><name>Cafe</name></wpt>
+  <trk>
+    <name>Morning "run"</name>
+    <trkseg>
+      <trkpt lat="50.0000000" lon="0.1000000"><ele>100.50</ele><time>2012-11-26T19:55:00Z</time><sat>7</sat></trkpt>
+      <trkpt lat="50.0000100" lon="0.1000100"><time>2012-11-26T19:55:01+01:00</time><fix>3d</fix></trkpt>
+    </trkseg>
+    <trkseg>
+      <trkpt lat="50.0000200" lon="0.1000200"><ele>100.70</ele></trkpt>
+    </trkseg>
+  </trk>
+  <trk><trkseg><trkpt lat="51" lon="1"><name>Caf\xc3\xa9</name></trkpt></trkseg></trk>
+</gpx>'''
+
+
+def records(text):
+    lines = text.split('\n')
+    assert lines[-1] == ''
+    return [json.loads(line) for line in lines[:-1]]
+
+
+class NdjsonTests(unittest.TestCase):
+
+    def test_default_fields(self):
+        stream = StringIO()
+        write_ndjson(read_gpx(BytesIO(GPX_1_1)), stream)
+        self.assertEqual(records(stream.getvalue()), [
+            {'track': 0, 'segment': 0, 'point': 0, 'trackName': 'Morning "run"',
+             'lat': 50.0, 'lon': 0.1, 'ele': 100.5, 'time': '2012-11-26T19:55:00+00:00'},
+            {'track': 0, 'segment': 0, 'point': 1, 'trackName': 'Morning "run"',
+             'lat': 50.00001, 'lon': 0.10001, 'ele': None, 'time': '2012-11-26T19:55:01+01:00'},
+            {'track': 0, 'segment': 1, 'point': 0, 'trackName': 'Morning "run"',
+             'lat': 50.00002, 'lon': 0.10002, 'ele': 100.7, 'time': None},
+            {'track': 1, 'segment': 0, 'point': 0, 'trackName': None,
+             'lat': 51.0, 'lon': 1.0, 'ele': None, 'time': None},
+        ])
+
+    def test_lines_match_json_module(self):
+        gpx = read_gpx(BytesIO(GPX_1_1))
+        stream = StringIO()
+        write_ndjson(gpx, stream, fields=tuple(FIELDS))
+        for line, record in zip(stream.getvalue().split('\n'), records(stream.getvalue())):
+            self.assertEqual(line, json.dumps(record, separators=(',', ':')))
+        self.assertIn('"name":"Caf\\u00e9"', stream.getvalue())
+        self.assertIn('"fix":"3d"', stream.getvalue())
+        self.assertIn('"numSatellites":7', stream.getvalue())
+
+    def test_selected_fields(self):
+        stream = StringIO()
+        write_ndjson(read_gpx(BytesIO(GPX_1_1)), stream, fields=('time', 'lat'))
+        self.assertEqual(stream.getvalue().split('\n')[0], '{"time":"2012-11-26T19:55:00+00:00","lat":50.0}')
+        with self.assertRaises(ValueError):
+            write_ndjson(read_gpx(BytesIO(GPX_1_1)), StringIO(), fields=('lat', 'latitude'))
+        with self.assertRaises(ValueError):
+            write_ndjson(read_gpx(BytesIO(GPX_1_1)), StringIO(), fields=())
+
+    def test_streaming_reader(self):
+        for options in (None, ReaderOptions(numeric='float')):
+            expected = StringIO()
+            write_ndjson(read_gpx(BytesIO(GPX_1_1), options=options), expected, fields=tuple(FIELDS))
+            stream = StringIO()
+            write_ndjson_trackpoints(iter_trackpoints(BytesIO(GPX_1_1), options=options), stream,
+                                     fields=tuple(FIELDS), chunk_size=2)
+            self.assertEqual(stream.getvalue(), expected.getvalue())
+
+    def test_values(self):
+        point = Waypoint(0, 0, elevation=Decimal('NaN'), links=[Link('http://example.com')])
+        gpx = GpxModel('test', tracks=[Track(segments=[Segment([point])])])
+        stream = StringIO()
+        write_ndjson(gpx, stream, fields=('ele', 'links', 'extensions'))
+        self.assertEqual(stream.getvalue(), '{"ele":NaN,"links":[{"href":"http://example.com"}],"extensions":null}\n')
+
+    def test_point_without_links(self):
+        gpx = GpxModel('test', tracks=[Track(segments=[Segment([Waypoint(0, 0)])])])
+        stream = StringIO()
+        write_ndjson(gpx, stream, fields=('links', 'extensions'))
+        self.assertEqual(stream.getvalue(), '{"links":null,"extensions":null}\n')
+
+    def test_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'walk.ndjson')
+            write_ndjson_trackpoints(iter_trackpoints(BytesIO(GPX_1_1)), path)
+            with open(path, encoding='utf-8') as file:
+                self.assertEqual(len(records(file.read())), 4)
+        finally:
+            shutil.rmtree(directory)
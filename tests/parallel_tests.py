@@ -0,0 +1,101 @@
+from decimal import Decimal
+import os
+import shutil
+import tempfile
+import unittest
+
+from trailer.readers.parallel import read_gpx_many, iter_gpx_many, read_gpx_parallel
+from trailer.readers.parser import read_gpx
+
+__author__ = 'rjs'
+
+GPX_1_1 = '''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <trk><name>{0}</name><trkseg><trkpt lat="1.0" lon="2.0"><ele>{0}</ele></trkpt></trkseg></trk>
+</gpx>'''
+
+LARGE_GPX_1_1 = b'''<?xml version="1.0" encoding="UTF-8"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <trk><name>A</name>
+    <trkseg>
+      <trkpt lat="1.0" lon="2.0"><ele>1</ele></trkpt>
+      <!-- <trkpt lat="9" lon="9"/> -->
+      <trkpt lat="1.1" lon="2.1"><name>a &gt; b</name></trkpt>
+      <trkpt lat="1.2" lon="2.2"/>
+    </trkseg>
+    <trkseg/>
+    <trkseg> </trkseg>
+  </trk>
+  <trk><name>B</name>
+    <trkseg><trkpt lat="3.0" lon="4.0"/><trkpt lat="3.1" lon="4.1"/></trkseg>
+  </trk>
+</gpx>'''
+
+
+class ReadGpxManyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.paths = []
+        for i in range(6):
+            path = os.path.join(self.directory, '{0}.gpx'.format(i))
+            with open(path, 'w') as f:
+                f.write(GPX_1_1.format(i) if i != 3 else '<gpx')
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_ordered_processes(self):
+        results = read_gpx_many(self.paths, workers=2, capture_errors=True)
+        self.assertEqual([result.index for result in results], list(range(6)))
+        self.assertEqual(results[5].path, self.paths[5])
+        self.assertEqual(results[5].gpx.tracks[0].name, '5')
+        self.assertEqual(results[5].gpx.tracks[0].segments[0].points[0].elevation, 5)
+        self.assertIsNone(results[5].error)
+        self.assertIsNone(results[3].gpx)
+        self.assertIsInstance(results[3].error, ValueError)
+
+    def test_as_completed_threads(self):
+        results = list(iter_gpx_many(self.paths, workers=2, executor='thread',
+                                     ordered=False, capture_errors=True))
+        self.assertEqual(sorted(result.index for result in results), list(range(6)))
+        for result in results:
+            if result.error is None:
+                self.assertEqual(result.gpx.tracks[0].name, str(result.index))
+
+    def test_errors_propagate(self):
+        with self.assertRaises(ValueError):
+            read_gpx_many(self.paths, executor='thread')
+
+    def test_unknown_executor(self):
+        with self.assertRaises(ValueError):
+            read_gpx_many(self.paths, executor='cluster')
+
+
+class ReadGpxParallelTests(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.gpx')
+        with os.fdopen(handle, 'wb') as f:
+            f.write(LARGE_GPX_1_1)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_matches_read_gpx(self):
+        expected = read_gpx(self.path)
+        gpx = read_gpx_parallel(self.path, workers=2, executor='thread', chunk_size=1)
+        self.assertEqual([len(track.segments) for track in gpx.tracks], [3, 1])
+        for expected_track, track in zip(expected.tracks, gpx.tracks):
+            self.assertEqual(track.name, expected_track.name)
+            for expected_segment, segment in zip(expected_track.segments, track.segments):
+                self.assertEqual([(point.latitude, point.longitude, point.elevation, point.name)
+                                  for point in segment.points],
+                                 [(point.latitude, point.longitude, point.elevation, point.name)
+                                  for point in expected_segment.points])
+
+    def test_processes(self):
+        gpx = read_gpx_parallel(self.path, workers=2, chunk_size=1)
+        self.assertEqual(len(gpx.tracks[0].segments[0].points), 3)
+        self.assertEqual(gpx.tracks[1].segments[0].points[1].latitude, Decimal('3.1'))
@@ -0,0 +1,53 @@
+from decimal import Decimal
+from io import BytesIO
+import unittest
+
+from trailer.readers.parser import read_gpx
+
+__author__ = 'rjs'
+
+GPX_1_0 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/0" version="1.0" creator="unittests">
+  <name>Ten</name>
+  <url>http://example.com/</url>
+  <wpt lat="1.5" lon="2.5"><course>45.5</course><speed>3.2</speed><name>P</name></wpt>
+  <trk><name>T</name><cmt>Comment</cmt><trkseg><trkpt lat="1" lon="2"/></trkseg></trk>
+</gpx>'''
+
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <metadata><name>Eleven</name><link href="http://example.com/"/></metadata>
+  <wpt lat="1.5" lon="2.5">
+    <ele>12.5</ele><name>First</name><name>Second</name>
+    <link href="http://a/"/><link href="http://b/"/>
+    <sat>7</sat><hdop>1.2</hdop>
+  </wpt>
+  <trk><name>T</name><cmt>Comment</cmt><number>2</number><trkseg><trkpt lat="1" lon="2"/></trkseg></trk>
+</gpx>'''
+
+
+class ParserTests(unittest.TestCase):
+
+    def test_gpx_1_0(self):
+        gpx = read_gpx(BytesIO(GPX_1_0))
+        self.assertEqual(gpx.metadata.name, 'Ten')
+        self.assertEqual(gpx.metadata.links[0].href, 'http://example.com/')
+        waypoint = gpx.waypoints[0]
+        self.assertEqual(waypoint.course, Decimal('45.5'))
+        self.assertEqual(waypoint.speed, Decimal('3.2'))
+        self.assertEqual(gpx.tracks[0].comment, 'Comment')
+        self.assertEqual(len(gpx.tracks[0].segments[0].points), 1)
+
+    def test_gpx_1_1(self):
+        gpx = read_gpx(BytesIO(GPX_1_1))
+        self.assertEqual(gpx.metadata.name, 'Eleven')
+        waypoint = gpx.waypoints[0]
+        self.assertEqual(waypoint.elevation, Decimal('12.5'))
+        self.assertEqual(waypoint.name, 'First')
+        self.assertEqual([link.href for link in waypoint.links], ['http://a/', 'http://b/'])
+        self.assertEqual(waypoint.num_satellites, 7)
+        self.assertEqual(waypoint.hdop, Decimal('1.2'))
+        track = gpx.tracks[0]
+        self.assertEqual(track.comment, 'Comment')
+        self.assertEqual(track.number, 2)
+        self.assertEqual(len(track.segments[0].points), 1)
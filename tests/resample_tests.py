@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+import unittest
+
+import numpy
+
+from trailer.analysis.arrays import segment_arrays
+from trailer.analysis.geodesy import haversine, step_distances
+from trailer.analysis.resample import (GREAT_CIRCLE, resample_segment_by_distance, resample_segment_by_time,
+                                       resample_track_by_distance, resample_track_by_time)
+from trailer.analysis.temporal import STRICT
+from trailer.model.columnar import ColumnarSegment
+from trailer.model.segment import Segment
+from trailer.model.waypoint import Waypoint
+from trailer.readers.options import ReaderOptions
+from trailer.readers.parser import read_gpx
+
+__author__ = 'rjs'
+
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <trk>
+    <name>Ride</name>
+    <trkseg>
+      <trkpt lat="50.0" lon="0.0"><ele>10</ele><time>2016-06-01T11:00:00+01:00</time><name>A</name></trkpt>
+      <trkpt lat="50.0" lon="0.001"><ele>20</ele><time>2016-06-01T11:00:04+01:00</time></trkpt>
+      <trkpt lat="50.0" lon="0.003"><time>2016-06-01T11:00:06.5+01:00</time></trkpt>
+    </trkseg>
+    <trkseg>
+      <trkpt lat="51.0" lon="179.9995"><time>2016-06-01T10:01:00</time></trkpt>
+      <trkpt lat="51.0" lon="-179.9995"><time>2016-06-01T10:01:02</time></trkpt>
+    </trkseg>
+  </trk>
+</gpx>'''
+
+START = datetime(2016, 6, 1, 10, 0, tzinfo=timezone.utc)
+
+
+def seconds(offset):
+    return (START + timedelta(seconds=offset)).timestamp()
+
+
+class ResampleByTimeTests(unittest.TestCase):
+
+    def setUp(self):
+        self.track = read_gpx(BytesIO(GPX_1_1)).tracks[0]
+        self.columnar_track = read_gpx(BytesIO(GPX_1_1), options=ReaderOptions(columnar=True)).tracks[0]
+
+    def test_samples(self):
+        for track in (self.track, self.columnar_track):
+            segment = resample_segment_by_time(track.segments[0], 1.0)
+            self.assertIsInstance(segment, ColumnarSegment)
+            self.assertEqual(len(segment), 7)
+            arrays = segment_arrays(segment)
+            numpy.testing.assert_allclose(arrays.time, [seconds(offset) for offset in range(7)])
+            numpy.testing.assert_allclose(arrays.longitude, [0.0, 0.00025, 0.0005, 0.00075, 0.001, 0.0018, 0.0026])
+            numpy.testing.assert_allclose(arrays.elevation[:5], [10.0, 12.5, 15.0, 17.5, 20.0])
+            self.assertTrue(numpy.isnan(arrays.elevation[5:]).all())
+
+    def test_waypoints(self):
+        point = resample_segment_by_time(self.track.segments[0], 1.0).points[1]
+        self.assertEqual(point.time, START + timedelta(seconds=1))
+        self.assertEqual(point.time.isoformat(), '2016-06-01T11:00:01+01:00')
+        self.assertIsNone(point.name)
+        self.assertIsInstance(point, Waypoint)
+
+    def test_start(self):
+        segment = resample_segment_by_time(self.track.segments[0], 2.0, start=START - timedelta(seconds=1))
+        numpy.testing.assert_allclose(segment_arrays(segment).time, [seconds(1), seconds(3), seconds(5)])
+        segment = resample_segment_by_time(self.track.segments[0], 2.0, start=seconds(100))
+        numpy.testing.assert_allclose(segment_arrays(segment).time, [seconds(0), seconds(2), seconds(4),
+                                                                     seconds(6)])
+
+    def test_naive_times(self):
+        segment = resample_segment_by_time(self.track.segments[1], 0.5)
+        self.assertEqual(len(segment), 5)
+        self.assertEqual(segment.points[1].time, datetime(2016, 6, 1, 10, 1, 0, 500000))
+        numpy.testing.assert_allclose(segment.column('longitude'), [179.9995, 179.99975, -180.0, -179.99975,
+                                                                    -179.9995])
+
+    def test_track(self):
+        track = resample_track_by_time(self.columnar_track, 2.0)
+        self.assertEqual(track.name, 'Ride')
+        self.assertEqual([len(segment) for segment in track.segments], [4, 2])
+
+    def test_non_monotonic(self):
+        points = [Waypoint(50.0, 0.0, time=START), Waypoint(50.0, 0.002, time=START + timedelta(seconds=2)),
+                  Waypoint(50.0, 0.001, time=START + timedelta(seconds=1))]
+        segment = resample_segment_by_time(Segment(points), 0.5)
+        numpy.testing.assert_allclose(segment.column('longitude'), [0.0, 0.0005, 0.001, 0.0015, 0.002])
+        with self.assertRaises(ValueError):
+            resample_segment_by_time(Segment(points), 0.5, order=STRICT)
+
+    def test_untimed(self):
+        segment = resample_segment_by_time(Segment([Waypoint(50.0, 0.0)]), 1.0)
+        self.assertEqual(len(segment), 0)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            resample_segment_by_time(self.track.segments[0], 0)
+        with self.assertRaises(ValueError):
+            resample_segment_by_time(self.track.segments[0], 1.0, method='cubic')
+
+
+class ResampleByDistanceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.track = read_gpx(BytesIO(GPX_1_1)).tracks[0]
+
+    def test_spacing(self):
+        segment = resample_segment_by_distance(self.track.segments[0], 10.0)
+        arrays = segment_arrays(segment)
+        length = step_distances(*segment_arrays(self.track.segments[0])[:2]).sum()
+        self.assertEqual(len(segment), int(length // 10) + 1)
+        numpy.testing.assert_allclose(step_distances(arrays.latitude, arrays.longitude), 10.0, rtol=1e-6)
+        self.assertEqual(arrays.longitude[0], 0.0)
+        self.assertEqual(segment.points[0].time.isoformat(), '2016-06-01T11:00:00+01:00')
+
+    def test_times(self):
+        segment = resample_segment_by_distance(self.track.segments[0], 10.0)
+        times = segment_arrays(segment).time
+        self.assertTrue((numpy.diff(times) > 0).all())
+        self.assertLessEqual(times[-1], seconds(6.5))
+
+    def test_great_circle(self):
+        points = [Waypoint(0.0, 0.0), Waypoint(60.0, 90.0)]
+        segment = resample_segment_by_distance(Segment(points), 100000.0, method=GREAT_CIRCLE)
+        arrays = segment_arrays(segment)
+        numpy.testing.assert_allclose(step_distances(arrays.latitude, arrays.longitude), 100000.0, rtol=1e-9)
+        linear = segment_arrays(resample_segment_by_distance(Segment(points), 100000.0))
+        self.assertGreater(haversine(arrays.latitude[50], arrays.longitude[50],
+                                     linear.latitude[50], linear.longitude[50]), 10000.0)
+
+    def test_track(self):
+        track = resample_track_by_distance(self.track, 5.0)
+        self.assertEqual(len(track.segments), 2)
+        self.assertFalse(track.segments[1].present('elevation').any())
+
+    def test_empty(self):
+        segment = resample_segment_by_distance(Segment([]), 5.0)
+        self.assertEqual(len(segment), 0)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            resample_segment_by_distance(self.track.segments[0], -1.0)
@@ -0,0 +1,111 @@
+from io import BytesIO
+import sys
+import unittest
+
+import numpy
+
+from trailer.analysis.geodesy import project
+from trailer.analysis.simplify import (DOUGLAS_PEUCKER, VISVALINGAM_WHYATT, douglas_peucker_mask,
+                                       simplification_mask, simplify_route, simplify_segment, simplify_track,
+                                       visvalingam_whyatt_mask)
+from trailer.model.columnar import ColumnarSegment
+from trailer.model.segment import Segment
+from trailer.model.waypoint import Waypoint
+from trailer.readers.options import ReaderOptions
+from trailer.readers.parser import read_gpx
+
+__author__ = 'rjs'
+
+# A track along a parallel, with a detour of about 11 m north at the fourth
+# point and of about 1 m at the sixth, and a named point.
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <rte>
+    <name>Route</name>
+    <rtept lat="50.0" lon="0.000"/><rtept lat="50.0" lon="0.001"/><rtept lat="50.0001" lon="0.002"/>
+    <rtept lat="50.0" lon="0.003"/>
+  </rte>
+  <trk>
+    <name>Track</name>
+    <trkseg>
+      <trkpt lat="50.0" lon="0.000"><ele>1</ele></trkpt>
+      <trkpt lat="50.0" lon="0.001"><ele>2</ele></trkpt>
+      <trkpt lat="50.0" lon="0.002"><ele>3</ele></trkpt>
+      <trkpt lat="50.0001" lon="0.003"><ele>4</ele><name>Summit</name></trkpt>
+      <trkpt lat="50.0" lon="0.004"><ele>5</ele></trkpt>
+      <trkpt lat="50.00001" lon="0.005"><ele>6</ele></trkpt>
+      <trkpt lat="50.0" lon="0.006"><ele>7</ele></trkpt>
+    </trkseg>
+    <trkseg/>
+  </trk>
+</gpx>'''
+
+
+class SimplifyTests(unittest.TestCase):
+
+    def test_douglas_peucker(self):
+        segment = read_gpx(BytesIO(GPX_1_1)).tracks[0].segments[0]
+        self.assertEqual(simplification_mask(segment, 8).tolist(), [True, False, False, True, False, False, True])
+        self.assertEqual(simplification_mask(segment, 0.5).tolist(), [True, False, True, True, True, True, True])
+        self.assertEqual(simplification_mask(segment, 20).tolist(), [True, False, False, False, False, False, True])
+
+    def test_visvalingam_whyatt(self):
+        segment = read_gpx(BytesIO(GPX_1_1)).tracks[0].segments[0]
+        # The triangles at the detour have areas of about 800 square metres.
+        self.assertEqual(simplification_mask(segment, 20, VISVALINGAM_WHYATT).tolist(),
+                         [True, False, True, True, True, False, True])
+        self.assertEqual(simplification_mask(segment, 30, VISVALINGAM_WHYATT).tolist(),
+                         [True, False, False, True, False, False, True])
+
+    def test_segments(self):
+        for options in (None, ReaderOptions(columnar=True)):
+            track = read_gpx(BytesIO(GPX_1_1), options=options).tracks[0]
+            simplified = simplify_segment(track.segments[0], 8)
+            self.assertIs(type(simplified), type(track.segments[0]))
+            points = list(simplified.points)
+            self.assertEqual([point.elevation for point in points], [1, 4, 7])
+            self.assertEqual(points[1].name, 'Summit')
+
+            simplified_track = simplify_track(track, 30, VISVALINGAM_WHYATT)
+            self.assertEqual(simplified_track.name, 'Track')
+            self.assertEqual([len(segment.points) for segment in simplified_track.segments], [3, 0])
+
+    def test_route(self):
+        route = read_gpx(BytesIO(GPX_1_1)).routes[0]
+        simplified = simplify_route(route, 8)
+        self.assertEqual(simplified.name, 'Route')
+        self.assertEqual(simplified.points, [route.points[0], route.points[2], route.points[3]])
+
+    def test_errors(self):
+        segment = Segment([Waypoint(0, 0)])
+        with self.assertRaises(ValueError):
+            simplification_mask(segment, -1)
+        with self.assertRaises(ValueError):
+            simplification_mask(segment, 1, 'radial')
+
+    def test_short(self):
+        for method in (DOUGLAS_PEUCKER, VISVALINGAM_WHYATT):
+            self.assertEqual(simplification_mask(Segment(), 1, method).tolist(), [])
+            self.assertEqual(simplification_mask(Segment([Waypoint(0, 0)]), 1, method).tolist(), [True])
+            self.assertEqual(simplification_mask(Segment([Waypoint(0, 0), Waypoint(0, 0)]), 1, method).tolist(),
+                             [True, True])
+
+    def test_loop(self):
+        # A closed loop, whose ends coincide.
+        x = numpy.array([0.0, 10.0, 10.0, 0.0, 0.0])
+        y = numpy.array([0.0, 0.0, 10.0, 10.0, 0.0])
+        self.assertEqual(douglas_peucker_mask(x, y, 1).tolist(), [True, True, True, True, True])
+        self.assertEqual(douglas_peucker_mask(x, y, 12).tolist(), [True, False, True, False, True])
+
+    def test_large_segment(self):
+        count = 4 * sys.getrecursionlimit()
+        angles = numpy.linspace(0, 20 * numpy.pi, count)
+        latitudes = 50 + 0.001 * angles * numpy.sin(angles)
+        longitudes = 0.001 * angles * numpy.cos(angles)
+        segment = ColumnarSegment({'latitude': latitudes, 'longitude': longitudes})
+        x, y = project(latitudes, longitudes)
+        for method, mask_function, limit in ((DOUGLAS_PEUCKER, douglas_peucker_mask, 5.0),
+                                             (VISVALINGAM_WHYATT, visvalingam_whyatt_mask, 25.0)):
+            simplified = simplify_segment(segment, 5.0, method)
+            self.assertLess(len(simplified), count * 2 // 3)
+            self.assertEqual(len(simplified), mask_function(x, y, limit).sum())
@@ -0,0 +1,153 @@
+from io import BytesIO
+import unittest
+
+import numpy
+
+from trailer.analysis.geodesy import haversine
+from trailer.analysis.spatial import NODE_SIZE, ROUTE_POINT, TRACK_POINT, WAYPOINT, PointReference, SpatialIndex
+from trailer.model.columnar import ColumnarSegment
+from trailer.readers.options import ReaderOptions
+from trailer.readers.parser import read_gpx
+
+__author__ = 'rjs'
+
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <wpt lat="51.5" lon="-0.1"><name>London</name></wpt>
+  <wpt lat="48.85" lon="2.35"><name>Paris</name></wpt>
+  <rte>
+    <rtept lat="51.0" lon="1.0"/>
+    <rtept lat="50.9" lon="1.8"/>
+  </rte>
+  <trk>
+    <trkseg>
+      <trkpt lat="51.50" lon="-0.12"/>
+      <trkpt lat="51.51" lon="-0.13"/>
+    </trkseg>
+    <trkseg>
+      <trkpt lat="48.86" lon="2.34"><name>Louvre</name></trkpt>
+    </trkseg>
+  </trk>
+</gpx>'''
+
+
+def scattered_points(count, seed=1):
+    """Points spread over the globe, and a cluster around the antimeridian."""
+    random = numpy.random.default_rng(seed)
+    half = count // 2
+    latitudes = numpy.concatenate((random.uniform(-89, 89, half), random.normal(60, 0.01, count - half)))
+    longitudes = numpy.concatenate((random.uniform(-180, 180, half), random.normal(179.99, 0.02, count - half)))
+    return latitudes, (longitudes + 180) % 360 - 180
+
+
+class SpatialIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.latitudes, self.longitudes = scattered_points(5000)
+        self.index = SpatialIndex(self.latitudes, self.longitudes)
+
+    def test_length(self):
+        self.assertEqual(len(self.index), 5000)
+
+    def test_within_box_matches_scan(self):
+        random = numpy.random.default_rng(2)
+        for _ in range(20):
+            south, north = sorted(random.uniform(-90, 90, 2))
+            west, east = sorted(random.uniform(-180, 180, 2))
+            expected = numpy.flatnonzero((self.latitudes >= south) & (self.latitudes <= north)
+                                         & (self.longitudes >= west) & (self.longitudes <= east))
+            numpy.testing.assert_array_equal(self.index.within_box(south, west, north, east), expected)
+
+    def test_within_box_across_antimeridian(self):
+        expected = numpy.flatnonzero((self.latitudes >= 59) & (self.latitudes <= 61)
+                                     & ((self.longitudes >= 179.98) | (self.longitudes <= -179.99)))
+        self.assertGreater(len(expected), 0)
+        numpy.testing.assert_array_equal(self.index.within_box(59, 179.98, 61, -179.99), expected)
+
+    def test_within_radius_matches_scan(self):
+        for latitude, longitude, radius in ((60.0, 179.99, 1000.0), (60.0, -179.995, 500.0),
+                                            (0.0, 0.0, 2000000.0), (89.5, 10.0, 300000.0)):
+            distances = haversine(latitude, longitude, self.latitudes, self.longitudes)
+            expected = numpy.flatnonzero(distances <= radius)
+            positions, found = self.index.within_radius(latitude, longitude, radius)
+            numpy.testing.assert_array_equal(numpy.sort(positions), expected)
+            numpy.testing.assert_allclose(found, distances[positions])
+            self.assertTrue((numpy.diff(found) >= 0).all())
+
+    def test_nearest_matches_scan(self):
+        for latitude, longitude in ((60.0, 179.99), (60.0, -179.99), (-45.0, 100.0), (90.0, 0.0)):
+            distances = haversine(latitude, longitude, self.latitudes, self.longitudes)
+            expected = numpy.argsort(distances, kind='stable')[:7]
+            positions, found = self.index.nearest(latitude, longitude, 7)
+            numpy.testing.assert_array_equal(positions, expected)
+            numpy.testing.assert_allclose(found, distances[expected])
+
+    def test_nearest_more_than_all(self):
+        index = SpatialIndex([1.0, 2.0, 3.0], [0.0, 0.0, 0.0])
+        positions, distances = index.nearest(2.9, 0.0, 10)
+        self.assertEqual(positions.tolist(), [2, 1, 0])
+        self.assertEqual(len(distances), 3)
+
+    def test_empty(self):
+        index = SpatialIndex([], [])
+        self.assertEqual(len(index.within_box(-90, -180, 90, 180)), 0)
+        self.assertEqual(len(index.within_radius(0.0, 0.0, 1e7)[0]), 0)
+        self.assertEqual(len(index.nearest(0.0, 0.0, 3)[0]), 0)
+
+    def test_one_level(self):
+        index = SpatialIndex(self.latitudes[:NODE_SIZE], self.longitudes[:NODE_SIZE])
+        self.assertEqual(index.within_box(-90, -180, 90, 180).tolist(), list(range(NODE_SIZE)))
+
+    def test_different_lengths(self):
+        with self.assertRaises(ValueError):
+            SpatialIndex([1.0, 2.0], [1.0])
+
+    def test_reference_without_models(self):
+        with self.assertRaises(ValueError):
+            self.index.reference(0)
+
+
+class ModelSpatialIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.model = read_gpx(BytesIO(GPX_1_1))
+        self.columnar_model = read_gpx(BytesIO(GPX_1_1), options=ReaderOptions(columnar=True))
+
+    def test_references(self):
+        index = SpatialIndex.from_models(self.model)
+        self.assertEqual(len(index), 7)
+        self.assertEqual(index.reference(0), PointReference(0, WAYPOINT, None, None, 0))
+        self.assertEqual(index.reference(3), PointReference(0, ROUTE_POINT, 0, None, 1))
+        self.assertEqual(index.reference(6), PointReference(0, TRACK_POINT, 0, 1, 0))
+
+    def test_points(self):
+        index = SpatialIndex.from_models(self.model)
+        positions, distances = index.nearest(48.86, 2.34, 2)
+        self.assertEqual([index.point(position).name for position in positions.tolist()], ['Louvre', 'Paris'])
+        self.assertEqual(distances[0], 0.0)
+
+    def test_columnar(self):
+        self.assertIsInstance(self.columnar_model.tracks[0].segments[0], ColumnarSegment)
+        index = SpatialIndex.from_models([self.model, self.columnar_model])
+        self.assertEqual(len(index), 14)
+        positions, _ = index.within_radius(51.5, -0.12, 2000)
+        references = sorted(index.reference(position) for position in positions.tolist())
+        self.assertEqual(references, [
+            PointReference(0, WAYPOINT, None, None, 0),
+            PointReference(0, TRACK_POINT, 0, 0, 0),
+            PointReference(0, TRACK_POINT, 0, 0, 1),
+            PointReference(1, WAYPOINT, None, None, 0),
+            PointReference(1, TRACK_POINT, 0, 0, 0),
+            PointReference(1, TRACK_POINT, 0, 0, 1),
+        ])
+        point = index.point(index.nearest(51.51, -0.13)[0][0])
+        self.assertEqual((float(point.latitude), float(point.longitude)), (51.51, -0.13))
+
+    def test_selected_kinds(self):
+        index = SpatialIndex.from_models(self.model, waypoints=False, routes=False)
+        self.assertEqual(len(index), 3)
+        self.assertEqual({index.reference(position).kind for position in range(3)}, {TRACK_POINT})
+
+    def test_no_models(self):
+        index = SpatialIndex.from_models([])
+        self.assertEqual(len(index), 0)
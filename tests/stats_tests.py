@@ -0,0 +1,153 @@
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+import math
+import unittest
+
+import numpy
+
+from trailer.analysis.arrays import segment_arrays
+from trailer.analysis.geodesy import EARTH_RADIUS, cumulative_distances, haversine
+from trailer.analysis.stats import (EMPTY_STATISTICS, clear_statistics, elevation_changes, model_statistics,
+                                    segment_statistics, track_statistics)
+from trailer.model.columnar import ColumnarSegment
+from trailer.model.gpx_model import GpxModel
+from trailer.model.segment import Segment
+from trailer.model.track import Track
+from trailer.model.waypoint import Waypoint
+from trailer.readers.options import ReaderOptions
+from trailer.readers.parser import read_gpx
+
+__author__ = 'rjs'
+
+# One thousandth of a degree of latitude.
+STEP = 2 * math.pi * EARTH_RADIUS / 360000
+
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <trk>
+    <trkseg>
+      <trkpt lat="50.000" lon="0.0"><ele>100.0</ele><time>2012-11-26T10:00:00Z</time></trkpt>
+      <trkpt lat="50.001" lon="0.0"><ele>101.0</ele><time>2012-11-26T10:00:10Z</time></trkpt>
+      <trkpt lat="50.002" lon="0.0"><ele>99.5</ele><time>2012-11-26T10:00:20Z</time></trkpt>
+      <trkpt lat="50.002" lon="0.0"><ele>104.0</ele><time>2012-11-26T10:01:20Z</time></trkpt>
+      <trkpt lat="50.003" lon="0.0"><ele>110.0</ele><time>2012-11-26T11:01:25+01:00</time></trkpt>
+      <trkpt lat="50.004" lon="0.0"><ele>102.0</ele></trkpt>
+    </trkseg>
+    <trkseg>
+      <trkpt lat="51.000" lon="1.0"><time>2012-11-26T12:00:00</time></trkpt>
+      <trkpt lat="51.000" lon="1.001"><time>2012-11-26T12:00:05</time></trkpt>
+    </trkseg>
+  </trk>
+  <trk><trkseg/></trk>
+</gpx>'''
+
+
+class GeodesyTests(unittest.TestCase):
+
+    def test_haversine(self):
+        self.assertAlmostEqual(haversine(0.0, 0.0, 1.0, 0.0), 1000 * STEP, places=6)
+        self.assertAlmostEqual(haversine(60.0, 0.0, 60.0, 1.0), 500 * STEP, delta=1.0)
+        self.assertEqual(haversine(50.0, 1.0, 50.0, 1.0), 0.0)
+        self.assertAlmostEqual(haversine(0.0, 0.0, 0.0, 180.0), math.pi * EARTH_RADIUS, places=3)
+
+    def test_cumulative_distances(self):
+        numpy.testing.assert_allclose(cumulative_distances([0.0, 0.001, 0.003], [0.0, 0.0, 0.0]),
+                                      [0.0, STEP, 3 * STEP])
+        self.assertEqual(len(cumulative_distances([], [])), 0)
+        self.assertEqual(cumulative_distances([1.0], [2.0]).tolist(), [0.0])
+
+
+class StatisticsTests(unittest.TestCase):
+
+    def test_segment(self):
+        segment = read_gpx(BytesIO(GPX_1_1)).tracks[0].segments[0]
+        statistics = segment_statistics(segment)
+        self.assertEqual(statistics.point_count, 6)
+        self.assertAlmostEqual(statistics.distance, 4 * STEP, places=6)
+        # The rise to 101 is within the threshold, so the climb counts from 99.5 to 110.
+        self.assertAlmostEqual(statistics.elevation_gain, 10.5)
+        self.assertAlmostEqual(statistics.elevation_loss, 8.0)
+        self.assertEqual(statistics.duration, 85.0)
+        # The minute spent stationary is not moving time.
+        self.assertEqual(statistics.moving_time, 25.0)
+        self.assertAlmostEqual(statistics.max_speed, STEP / 5, places=6)
+        self.assertAlmostEqual(statistics.average_speed, 4 * STEP / 25)
+
+    def test_thresholds(self):
+        segment = read_gpx(BytesIO(GPX_1_1)).tracks[0].segments[0]
+        statistics = segment_statistics(segment, elevation_threshold=0, moving_speed=0)
+        self.assertAlmostEqual(statistics.elevation_gain, 11.5)
+        self.assertAlmostEqual(statistics.elevation_loss, 9.5)
+        self.assertEqual(statistics.moving_time, 85.0)
+
+    def test_track_and_model(self):
+        gpx = read_gpx(BytesIO(GPX_1_1))
+        first = segment_statistics(gpx.tracks[0].segments[0])
+        second = segment_statistics(gpx.tracks[0].segments[1])
+        self.assertIsNone(second.elevation_gain)
+        self.assertEqual(second.duration, 5.0)
+
+        statistics = track_statistics(gpx.tracks[0])
+        self.assertEqual(statistics.point_count, 8)
+        self.assertAlmostEqual(statistics.distance, first.distance + second.distance)
+        self.assertEqual(statistics.elevation_gain, first.elevation_gain)
+        self.assertEqual(statistics.duration, 90.0)
+        self.assertEqual(statistics.moving_time, 30.0)
+        self.assertEqual(statistics.max_speed, first.max_speed)
+        self.assertEqual(model_statistics(gpx), statistics)
+        self.assertEqual(track_statistics(gpx.tracks[1]), EMPTY_STATISTICS)
+
+    def test_representations_agree(self):
+        expected = model_statistics(read_gpx(BytesIO(GPX_1_1)))
+        for options in (ReaderOptions(numeric='float'), ReaderOptions(lazy=True), ReaderOptions(columnar=True)):
+            statistics = model_statistics(read_gpx(BytesIO(GPX_1_1), options=options))
+            for name, value in expected._asdict().items():
+                if isinstance(value, float):
+                    self.assertAlmostEqual(getattr(statistics, name), value, places=6, msg=name)
+                else:
+                    self.assertEqual(getattr(statistics, name), value, name)
+
+    def test_arrays(self):
+        points = [Waypoint(1, 2, elevation=3, time=datetime(1970, 1, 1, 1, tzinfo=timezone(timedelta(hours=1)))),
+                  Waypoint(4, 5, time=datetime(1970, 1, 1, 0, 1)),
+                  Waypoint(6, 7)]
+        for segment in (Segment(points), ColumnarSegment.from_points(points)):
+            arrays = segment_arrays(segment)
+            self.assertEqual(arrays.latitude.tolist(), [1.0, 4.0, 6.0])
+            self.assertEqual(arrays.longitude.tolist(), [2.0, 5.0, 7.0])
+            numpy.testing.assert_equal(arrays.elevation, [3.0, numpy.nan, numpy.nan])
+            numpy.testing.assert_equal(arrays.time, [0.0, 60.0, numpy.nan])
+
+    def test_cache(self):
+        points = [Waypoint(0, 0, time=datetime(2012, 1, 1)), Waypoint(0.001, 0, time=datetime(2012, 1, 1, 0, 0, 10))]
+        segment = Segment(points)
+        statistics = segment_statistics(segment)
+        self.assertIs(segment_statistics(segment), statistics)
+        self.assertIsNot(segment_statistics(segment, moving_speed=0), statistics)
+
+        segment.points.append(Waypoint(0.002, 0, time=datetime(2012, 1, 1, 0, 0, 20)))
+        self.assertAlmostEqual(segment_statistics(segment).distance, 2 * STEP, places=6)
+
+        segment.points[2] = Waypoint(0.003, 0, time=datetime(2012, 1, 1, 0, 0, 20))
+        self.assertAlmostEqual(segment_statistics(segment).distance, 2 * STEP, places=6)
+        clear_statistics(segment)
+        self.assertAlmostEqual(segment_statistics(segment).distance, 3 * STEP, places=6)
+
+    def test_non_monotonic_times(self):
+        start = datetime(2012, 1, 1)
+        points = [Waypoint(0.001 * index, 0, time=start + timedelta(seconds=offset))
+                  for index, offset in enumerate([0, 10, 5, 30])]
+        statistics = segment_statistics(Segment(points))
+        self.assertEqual(statistics.duration, 30.0)
+        self.assertEqual(statistics.moving_time, 30.0)
+        self.assertAlmostEqual(statistics.max_speed, STEP / 10, places=6)
+
+    def test_empty(self):
+        self.assertEqual(segment_statistics(Segment()), EMPTY_STATISTICS)
+        self.assertEqual(model_statistics(GpxModel('test', tracks=[Track()])), EMPTY_STATISTICS)
+
+    def test_elevation_changes(self):
+        self.assertEqual(elevation_changes(numpy.array([0.0, 1.0, 2.0, 3.0, 4.0]), 3), (4.0, 0.0))
+        self.assertEqual(elevation_changes(numpy.array([0.0, 2.0, 0.0, 2.0, 0.0]), 3), (0.0, 0.0))
+        self.assertEqual(elevation_changes(numpy.array([5.0, numpy.nan, 0.0, 10.0, 10.0, 6.0]), 3), (10.0, 9.0))
+        self.assertEqual(elevation_changes(numpy.array([numpy.nan]), 3), (None, None))
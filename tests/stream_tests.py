@@ -0,0 +1,62 @@
+from io import BytesIO
+import unittest
+
+from trailer.readers.stream import iter_gpx_events, iter_trackpoints
+
+__author__ = 'rjs'
+
+GPX_1_0 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/0" version="1.0" creator="unittests">
+  <name>Ten</name>
+  <wpt lat="1.5" lon="2.5"><name>P</name></wpt>
+  <trk>
+    <name>T</name>
+    <trkseg>
+      <trkpt lat="1.0" lon="2.0"><ele>10</ele></trkpt>
+      <trkpt lat="1.1" lon="2.1"><ele>11</ele></trkpt>
+    </trkseg>
+  </trk>
+</gpx>'''
+
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <metadata><name>Eleven</name></metadata>
+  <rte><name>R</name><rtept lat="3" lon="4"/></rte>
+  <trk>
+    <name>A</name>
+    <trkseg><trkpt lat="1.0" lon="2.0"/></trkseg>
+    <trkseg><trkpt lat="1.1" lon="2.1"/><trkpt lat="1.2" lon="2.2"/></trkseg>
+  </trk>
+  <trk><name>B</name></trk>
+</gpx>'''
+
+
+class StreamTests(unittest.TestCase):
+
+    def test_gpx_1_0_events(self):
+        events = list(iter_gpx_events(BytesIO(GPX_1_0)))
+        self.assertEqual([event for event, value in events],
+                         ['metadata', 'waypoint', 'track_start', 'segment_start',
+                          'trackpoint', 'trackpoint', 'segment_end', 'track_end'])
+        self.assertEqual(events[0][1].name, 'Ten')
+        self.assertEqual(events[1][1].name, 'P')
+        self.assertEqual(events[2][1].track.name, 'T')
+
+    def test_gpx_1_1_trackpoints(self):
+        points = list(iter_trackpoints(BytesIO(GPX_1_1)))
+        self.assertEqual([(p.track_index, p.segment_index, p.point_index) for p in points],
+                         [(0, 0, 0), (0, 1, 0), (0, 1, 1)])
+        self.assertEqual(points[2].track.name, 'A')
+        self.assertEqual(str(points[2].waypoint.latitude), '1.2')
+
+    def test_gpx_1_1_track_without_segments(self):
+        events = [(event, value) for event, value in iter_gpx_events(BytesIO(GPX_1_1))
+                  if event in ('metadata', 'route', 'track_start')]
+        self.assertEqual(events[0][1].name, 'Eleven')
+        self.assertEqual(events[1][1].name, 'R')
+        self.assertEqual([value.track.name for event, value in events[2:]], ['A', 'B'])
+        self.assertEqual(len(events[3][1].track.segments), 0)
+
+    def test_not_gpx(self):
+        with self.assertRaises(ValueError):
+            list(iter_gpx_events(BytesIO(b'<foo/>')))
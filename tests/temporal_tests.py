@@ -0,0 +1,169 @@
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+import unittest
+
+import numpy
+
+from trailer.analysis.temporal import DROP, SORT, STRICT, TimeIndex
+from trailer.model.columnar import ColumnarSegment
+from trailer.readers.options import ReaderOptions
+from trailer.readers.parser import read_gpx
+
+__author__ = 'rjs'
+
+GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <trk>
+    <name>Replay</name>
+    <trkseg>
+      <trkpt lat="50.0" lon="0.0"><ele>10</ele><time>2016-06-01T10:00:00Z</time></trkpt>
+      <trkpt lat="50.1" lon="0.0"><ele>20</ele><time>2016-06-01T10:00:10Z</time></trkpt>
+      <trkpt lat="50.2" lon="0.2"><time>2016-06-01T10:00:20Z</time></trkpt>
+      <trkpt lat="50.3" lon="0.2"><ele>30</ele><time>2016-06-01T11:00:30+01:00</time><name>C</name></trkpt>
+    </trkseg>
+    <trkseg>
+      <trkpt lat="51.0" lon="179.9"><ele>0</ele><time>2016-06-01T10:01:00Z</time></trkpt>
+      <trkpt lat="51.0" lon="-179.9"><ele>10</ele><time>2016-06-01T10:01:10Z</time></trkpt>
+    </trkseg>
+  </trk>
+</gpx>'''
+
+# A logger which jumped back in time for one point, and lost the time of
+# another.
+BAD_GPX_1_1 = b'''<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="unittests">
+  <trk>
+    <trkseg>
+      <trkpt lat="50.0" lon="0.0"><time>2016-06-01T10:00:00Z</time></trkpt>
+      <trkpt lat="50.1" lon="0.0"><time>2016-06-01T10:00:10Z</time></trkpt>
+      <trkpt lat="50.2" lon="0.0"><time>2016-06-01T10:00:05Z</time></trkpt>
+      <trkpt lat="50.3" lon="0.0"/>
+      <trkpt lat="50.4" lon="0.0"><time>2016-06-01T10:00:20Z</time></trkpt>
+    </trkseg>
+  </trk>
+</gpx>'''
+
+START = datetime(2016, 6, 1, 10, 0, tzinfo=timezone.utc)
+
+
+def seconds(offset):
+    return (START + timedelta(seconds=offset)).timestamp()
+
+
+def latitudes(segment):
+    return [float(point.latitude) for point in segment.points]
+
+
+class TimeIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.track = read_gpx(BytesIO(GPX_1_1)).tracks[0]
+        self.columnar_track = read_gpx(BytesIO(GPX_1_1), options=ReaderOptions(columnar=True)).tracks[0]
+
+    def test_times(self):
+        index = TimeIndex.from_track(self.track)
+        self.assertEqual(len(index), 6)
+        self.assertTrue(index.monotonic)
+        self.assertEqual(index.start_time, seconds(0))
+        self.assertEqual(index.end_time, seconds(70))
+        numpy.testing.assert_array_equal(index.positions, numpy.arange(6))
+
+    def test_window(self):
+        index = TimeIndex.from_track(self.track)
+        self.assertEqual(index.window(START + timedelta(seconds=10), START + timedelta(seconds=30)).tolist(),
+                         [1, 2, 3])
+        self.assertEqual(index.window(seconds(5), seconds(9)).tolist(), [])
+        self.assertEqual(index.window(end=seconds(0)).tolist(), [0])
+        self.assertEqual(index.window(seconds(60)).tolist(), [4, 5])
+
+    def test_segment_window(self):
+        for track in (self.track, self.columnar_track):
+            segment = track.segments[0]
+            index = TimeIndex.from_segment(segment)
+            window = index.segment_window(segment, seconds(10), seconds(30))
+            self.assertIsInstance(window, type(segment))
+            self.assertEqual(latitudes(window), [50.1, 50.2, 50.3])
+            self.assertEqual(window.points[2].name, 'C')
+
+    def test_columnar_window_is_view(self):
+        segment = self.columnar_track.segments[0]
+        window = TimeIndex.from_segment(segment).segment_window(segment, seconds(10))
+        self.assertTrue(numpy.shares_memory(window.column('latitude'), segment.column('latitude')))
+
+    def test_track_window(self):
+        for track in (self.track, self.columnar_track):
+            window = TimeIndex.from_track(track).track_window(track, seconds(20), seconds(60))
+            self.assertEqual(window.name, 'Replay')
+            self.assertEqual([latitudes(segment) for segment in window.segments], [[50.2, 50.3], [51.0]])
+
+    def test_wrong_length(self):
+        index = TimeIndex.from_track(self.track)
+        with self.assertRaises(ValueError):
+            index.segment_window(self.track.segments[0])
+        with self.assertRaises(ValueError):
+            TimeIndex.from_segment(self.track.segments[1]).track_window(self.track)
+
+    def test_position_at(self):
+        index = TimeIndex.from_track(self.track)
+        latitude, longitude, elevation = index.position_at(START + timedelta(seconds=5))
+        self.assertAlmostEqual(latitude, 50.05)
+        self.assertAlmostEqual(longitude, 0.0)
+        self.assertAlmostEqual(elevation, 15.0)
+        self.assertEqual(index.position_at(seconds(10)), (50.1, 0.0, 20.0))
+        self.assertIsNone(index.position_at(seconds(15))[2])
+        self.assertIsNone(index.position_at(seconds(-1)))
+        self.assertIsNone(index.position_at(seconds(71)))
+
+    def test_interpolate_across_antimeridian(self):
+        index = TimeIndex.from_track(self.track)
+        arrays = index.interpolate(numpy.array([seconds(62.5), seconds(70)]))
+        numpy.testing.assert_allclose(arrays.longitude, [179.95, -179.9])
+        numpy.testing.assert_allclose(arrays.elevation, [2.5, 10.0])
+
+    def test_interpolate_datetime64(self):
+        index = TimeIndex.from_track(self.columnar_track)
+        times = numpy.array(['2016-06-01T10:00:05', '2016-06-01T10:00:25'], dtype='datetime64[s]')
+        numpy.testing.assert_allclose(index.interpolate(times).latitude, [50.05, 50.25])
+
+    def test_untimed(self):
+        segment = read_gpx(BytesIO(BAD_GPX_1_1)).tracks[0].segments[0]
+        index = TimeIndex.from_segment(segment, order=DROP)
+        self.assertEqual(index.window().tolist(), [0, 1, 4])
+        self.assertEqual(latitudes(index.segment_window(segment, seconds(10))), [50.1, 50.4])
+
+    def test_empty(self):
+        segment = read_gpx(BytesIO(BAD_GPX_1_1)).tracks[0].segments[0]
+        index = TimeIndex.from_segment(ColumnarSegment.from_points(segment.points[3:4]))
+        self.assertEqual(len(index), 0)
+        self.assertIsNone(index.start_time)
+        self.assertIsNone(index.position_at(seconds(0)))
+
+
+class NonMonotonicTests(unittest.TestCase):
+
+    def setUp(self):
+        self.segment = read_gpx(BytesIO(BAD_GPX_1_1)).tracks[0].segments[0]
+
+    def test_sort(self):
+        index = TimeIndex.from_segment(self.segment, order=SORT)
+        self.assertFalse(index.monotonic)
+        self.assertEqual(index.out_of_order.tolist(), [2])
+        self.assertEqual(index.positions.tolist(), [0, 2, 1, 4])
+        self.assertEqual(latitudes(index.segment_window(self.segment, seconds(0), seconds(10))), [50.0, 50.2, 50.1])
+        self.assertAlmostEqual(index.position_at(seconds(7.5))[0], 50.15)
+
+    def test_drop(self):
+        for segment in (self.segment, ColumnarSegment.from_points(self.segment.points)):
+            index = TimeIndex.from_segment(segment, order=DROP)
+            self.assertFalse(index.monotonic)
+            self.assertEqual(index.positions.tolist(), [0, 1, 4])
+            self.assertEqual(latitudes(index.segment_window(segment, seconds(0), seconds(10))), [50.0, 50.1])
+            self.assertAlmostEqual(index.position_at(seconds(15))[0], 50.25)
+
+    def test_strict(self):
+        with self.assertRaises(ValueError):
+            TimeIndex.from_segment(self.segment, order=STRICT)
+
+    def test_unknown_order(self):
+        with self.assertRaises(ValueError):
+            TimeIndex.from_segment(self.segment, order='reverse')
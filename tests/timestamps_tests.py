@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import unittest
+
+from trailer.model.timestamps import parse_datetime, fallback_count, reset_fallback_count
+
+__author__ = 'rjs'
+
+class TimestampTests(unittest.TestCase):
+
+    def setUp(self):
+        reset_fallback_count()
+
+    def test_utc(self):
+        dt = parse_datetime('2012-11-26T19:55:57Z')
+        self.assertEqual(dt, datetime(2012, 11, 26, 19, 55, 57, tzinfo=timezone.utc))
+        self.assertEqual(fallback_count(), 0)
+
+    def test_offset_and_fraction(self):
+        dt = parse_datetime('2012-11-26T20:55:57.25-01:30')
+        self.assertEqual(dt.microsecond, 250000)
+        self.assertEqual(dt.utcoffset(), timedelta(hours=-1, minutes=-30))
+        self.assertEqual(fallback_count(), 0)
+
+    def test_timezones_are_shared(self):
+        a = parse_datetime('2012-11-26T20:55:57+01:00')
+        b = parse_datetime('2013-01-01T00:00:00+01:00')
+        self.assertIs(a.tzinfo, b.tzinfo)
+
+    def test_naive(self):
+        dt = parse_datetime('2012-11-26T19:55:57.1234567')
+        self.assertIsNone(dt.tzinfo)
+        self.assertEqual(dt.microsecond, 123456)
+
+    def test_fallback(self):
+        dt = parse_datetime('26 Nov 2012 19:55')
+        self.assertEqual(dt, datetime(2012, 11, 26, 19, 55))
+        self.assertEqual(fallback_count(), 1)
+        self.assertEqual(reset_fallback_count(), 1)
+        self.assertEqual(fallback_count(), 0)
+
+    def test_fallback_count_is_thread_safe(self):
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(parse_datetime, ['26 Nov 2012 19:55'] * 400))
+        self.assertEqual(fallback_count(), 400)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            parse_datetime('not a time')
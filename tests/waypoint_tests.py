@@ -1,5 +1,7 @@
+from decimal import Decimal
+import pickle
 import unittest
-from trailer.model.waypoint import Waypoint
+from trailer.model.waypoint import Waypoint, LazyWaypoint, FloatWaypoint
 
 __author__ = 'rjs'
 
@@ -9,3 +11,60 @@ class WaypointTests(unittest.TestCase):
         wp = Waypoint(45.3524, 90.5652)
         self.assertEqual(wp.latitude, 45.3524)
         self.assertEqual(wp.longitude, 90.5652)
+
+    def test_pickle(self):
+        wp = Waypoint('45.3524', '90.5652', elevation='12.5', time='2012-11-26T19:55:57Z')
+        copy = pickle.loads(pickle.dumps(wp))
+        self.assertEqual(copy.latitude, Decimal('45.3524'))
+        self.assertEqual(copy.elevation, Decimal('12.5'))
+        self.assertEqual(copy.time, wp.time)
+        self.assertIsNone(copy.course)
+        self.assertEqual(copy.links, [])
+
+    def test_links_are_lists(self):
+        wp = Waypoint(45.3524, 90.5652)
+        self.assertEqual(wp.links, [])
+        self.assertEqual(wp.extensions, [])
+        wp.links.append('link')
+        self.assertEqual(wp.links, ['link'])
+        self.assertEqual(Waypoint(45.3524, 90.5652, links=('link',)).links, ['link'])
+
+
+class FloatWaypointTests(unittest.TestCase):
+
+    def test_fields_are_floats(self):
+        wp = FloatWaypoint('45.3524', '90.5652', elevation='12.5', num_satellites='7')
+        self.assertEqual(wp.latitude, 45.3524)
+        self.assertIsInstance(wp.elevation, float)
+        self.assertEqual(wp.num_satellites, 7)
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            FloatWaypoint('95', '90.5652')
+
+
+class LazyWaypointTests(unittest.TestCase):
+
+    def test_fields_converted_on_access(self):
+        wp = LazyWaypoint('45.3524', '90.5652', elevation='12.5', num_satellites='7')
+        self.assertEqual(wp.latitude, Decimal('45.3524'))
+        self.assertEqual(wp.elevation, Decimal('12.5'))
+        self.assertEqual(wp.num_satellites, 7)
+        self.assertIsNone(wp.magvar)
+        self.assertEqual(wp.links, [])
+
+    def test_converted_value_is_cached(self):
+        wp = LazyWaypoint('45.3524', '90.5652', elevation='12.5')
+        self.assertIs(wp.elevation, wp.elevation)
+
+    def test_validation_deferred(self):
+        wp = LazyWaypoint('95', '90.5652')
+        self.assertEqual(wp.longitude, Decimal('90.5652'))
+        with self.assertRaises(ValueError):
+            wp.latitude
+        with self.assertRaises(ValueError):
+            wp.latitude
+
+    def test_unexpected_argument(self):
+        with self.assertRaises(TypeError):
+            LazyWaypoint('45', '90', altitude='12')
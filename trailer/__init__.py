@@ -1 +1,3 @@
 __author__ = 'rjs'
+
+__version__ = '0.6'
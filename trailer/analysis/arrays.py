@@ -0,0 +1,98 @@
+"""The coordinates and times of the points of a segment as NumPy arrays.
+
+The analyses in this package work on float64 arrays rather than on Waypoint
+objects. segment_arrays() takes the arrays straight from the columns of a
+ColumnarSegment, and otherwise gathers them from the points of any Segment,
+Route or sequence of Waypoints in a single pass per field.
+
+This module requires NumPy.
+"""
+from collections import namedtuple
+from datetime import datetime
+from operator import attrgetter
+
+import numpy
+
+from trailer.model.columnar import ColumnarSegment
+
+__author__ = 'rjs'
+
+# float64 arrays of equal length. Elevations and times are NaN for points
+# without a value. Times are in seconds since the epoch, in UTC for points
+# with an aware time and in local time for points with a naive time, as
+# in ColumnarSegment.
+PointArrays = namedtuple('PointArrays', ['latitude', 'longitude', 'elevation', 'time'])
+
+_EPOCH = datetime(1970, 1, 1)
+
+_NAN = float('nan')
+
+_get_latitude = attrgetter('latitude')
+_get_longitude = attrgetter('longitude')
+_get_elevation = attrgetter('elevation')
+_get_time = attrgetter('time')
+
+
+def segment_arrays(segment):
+    """The coordinates and times of the points of a segment.
+
+    Args:
+        segment: A Segment, ColumnarSegment or Route, or a sequence of
+            Waypoints.
+
+    Returns:
+        A PointArrays.
+    """
+    if isinstance(segment, ColumnarSegment):
+        return _columnar_arrays(segment)
+    points = getattr(segment, 'points', segment)
+    count = len(points)
+    latitudes, longitudes = segment_coordinates(points)
+    # Decimals are converted with their __float__, and None to NaN.
+    return PointArrays(
+        latitudes,
+        longitudes,
+        numpy.array(list(map(_get_elevation, points)), dtype=numpy.float64),
+        numpy.fromiter((_NAN if time is None else epoch_seconds(time) for time in map(_get_time, points)),
+                       dtype=numpy.float64, count=count))
+
+
+def segment_coordinates(segment):
+    """The latitudes and longitudes of the points of a segment.
+
+    Args:
+        segment: A Segment, ColumnarSegment or Route, or a sequence of
+            Waypoints.
+
+    Returns:
+        A pair of float64 arrays of latitudes and longitudes in degrees.
+    """
+    if isinstance(segment, ColumnarSegment):
+        return (segment.column('latitude').astype(numpy.float64),
+                segment.column('longitude').astype(numpy.float64))
+    points = getattr(segment, 'points', segment)
+    count = len(points)
+    return (numpy.fromiter(map(_get_latitude, points), dtype=numpy.float64, count=count),
+            numpy.fromiter(map(_get_longitude, points), dtype=numpy.float64, count=count))
+
+
+def epoch_seconds(time):
+    """The seconds since the epoch of a datetime, as in PointArrays.
+
+    Aware times are measured from the epoch in UTC, and naive times from the
+    epoch in their own local time.
+    """
+    if time.tzinfo is not None:
+        return time.timestamp()
+    return (time - _EPOCH).total_seconds()
+
+
+def _columnar_arrays(segment):
+    times = segment.column('time').astype(numpy.int64) / 1e6
+    times[~segment.present('time')] = numpy.nan
+    elevations = segment.column('elevation').astype(numpy.float64)
+    if not segment.present('elevation').all():
+        elevations = numpy.where(segment.present('elevation'), elevations, numpy.nan)
+    latitudes, longitudes = segment_coordinates(segment)
+    return PointArrays(latitudes, longitudes, elevations, times)
+
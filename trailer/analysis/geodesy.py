@@ -0,0 +1,123 @@
+"""Vectorised distances and bearings on a spherical Earth.
+
+All functions accept scalars or NumPy arrays of latitudes and longitudes in
+degrees, and return distances in metres. The Earth is treated as a sphere
+with the mean radius of the WGS 84 ellipsoid, so distances are within about
+0.5% of the geodesic distance.
+
+This module requires NumPy.
+"""
+import numpy
+
+__author__ = 'rjs'
+
+EARTH_RADIUS = 6371008.8
+
+
+def haversine(latitude1, longitude1, latitude2, longitude2):
+    """The great-circle distance between points, in metres.
+
+    Args:
+        latitude1, longitude1: The first points, in degrees.
+
+        latitude2, longitude2: The second points, in degrees, which are
+            broadcast against the first points.
+
+    Returns:
+        A float64 array, or a float for scalar arguments.
+    """
+    phi1 = numpy.radians(latitude1)
+    phi2 = numpy.radians(latitude2)
+    sin_half_dphi = numpy.sin((phi2 - phi1) / 2)
+    sin_half_dlambda = numpy.sin(numpy.radians(numpy.subtract(longitude2, longitude1)) / 2)
+    a = sin_half_dphi * sin_half_dphi + numpy.cos(phi1) * numpy.cos(phi2) * sin_half_dlambda * sin_half_dlambda
+    return 2 * EARTH_RADIUS * numpy.arcsin(numpy.sqrt(numpy.minimum(a, 1.0)))
+
+
+def step_distances(latitudes, longitudes):
+    """The great-circle distances between consecutive points, in metres.
+
+    Args:
+        latitudes, longitudes: Arrays of the same length n, in degrees.
+
+    Returns:
+        A float64 array of length n - 1, or of length zero if there are fewer
+        than two points.
+    """
+    latitudes = numpy.asarray(latitudes, dtype=numpy.float64)
+    longitudes = numpy.asarray(longitudes, dtype=numpy.float64)
+    if len(latitudes) < 2:
+        return numpy.zeros(0)
+    return haversine(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:])
+
+
+def cumulative_distances(latitudes, longitudes):
+    """The great-circle distance along a line of points to each point, in metres.
+
+    Args:
+        latitudes, longitudes: Arrays of the same length n, in degrees.
+
+    Returns:
+        A float64 array of length n, starting at zero.
+    """
+    steps = step_distances(latitudes, longitudes)
+    distances = numpy.zeros(len(steps) + 1 if len(latitudes) else 0)
+    numpy.cumsum(steps, out=distances[1:])
+    return distances
+
+
+def project(latitudes, longitudes):
+    """Project points onto a plane, in metres, for measuring small distances.
+
+    The projection is equirectangular, with true scale at the mean latitude
+    of the points, which is accurate to within a fraction of a percent over
+    the extent of a typical track. Longitudes are unwrapped, so lines
+    crossing the antimeridian remain continuous.
+
+    Args:
+        latitudes, longitudes: Arrays of the same length, in degrees.
+
+    Returns:
+        A pair of float64 arrays of the x (east) and y (north) coordinates
+        in metres.
+    """
+    phi = numpy.radians(numpy.asarray(latitudes, dtype=numpy.float64))
+    lam = numpy.radians(numpy.asarray(longitudes, dtype=numpy.float64))
+    if not len(phi):
+        return phi, lam
+    lam = numpy.unwrap(lam)
+    return EARTH_RADIUS * numpy.cos(phi.mean()) * lam, EARTH_RADIUS * phi
+
+
+def intermediate_points(latitude1, longitude1, latitude2, longitude2, fraction):
+    """Points a fraction of the way along the great circles between points.
+
+    Args:
+        latitude1, longitude1: The first points, in degrees.
+
+        latitude2, longitude2: The second points, in degrees.
+
+        fraction: The fraction of the distance from the first point to the
+            second, from zero to one.
+
+    Returns:
+        A pair of float64 arrays of the latitudes and longitudes of the
+        intermediate points, in degrees. Between antipodal points the great
+        circle is undefined, and the points are arbitrary.
+    """
+    phi1 = numpy.radians(latitude1)
+    phi2 = numpy.radians(latitude2)
+    lam1 = numpy.radians(longitude1)
+    lam2 = numpy.radians(longitude2)
+    angle = haversine(latitude1, longitude1, latitude2, longitude2) / EARTH_RADIUS
+    sin_angle = numpy.sin(angle)
+    # Between coincident or very close points, the weights tend to those of
+    # linear interpolation.
+    close = sin_angle < 1e-12
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        a = numpy.where(close, 1 - fraction, numpy.sin((1 - fraction) * angle) / sin_angle)
+        b = numpy.where(close, fraction, numpy.sin(fraction * angle) / sin_angle)
+    x = a * numpy.cos(phi1) * numpy.cos(lam1) + b * numpy.cos(phi2) * numpy.cos(lam2)
+    y = a * numpy.cos(phi1) * numpy.sin(lam1) + b * numpy.cos(phi2) * numpy.sin(lam2)
+    z = a * numpy.sin(phi1) + b * numpy.sin(phi2)
+    return numpy.degrees(numpy.arctan2(z, numpy.hypot(x, y))), numpy.degrees(numpy.arctan2(y, x))
@@ -0,0 +1,265 @@
+"""Precomputed levels of detail of tracks, for drawing maps at any scale.
+
+A LevelOfDetail is computed once for a track, from the significance of
+each of its points to Douglas-Peucker simplification: the greatest
+tolerance in metres at which the point would be kept. Each level is a
+tolerance, by default the size of a pixel of a web map at one of its zoom
+levels, and holds the points more significant than that tolerance. The
+levels are nested, each containing the points of all the coarser levels.
+
+The points are ranked once, in decreasing order of significance, and the
+number of points above each tolerance is counted, so the points of a
+level with k points are the first k of the ranking, found in O(k log k)
+time by sorting them back into track order. The indices of a level are
+kept once used. to_bytes() and from_bytes() store a LevelOfDetail,
+including its ranking, alongside the model of the track from which it was
+computed.
+
+This module requires NumPy.
+"""
+import struct
+
+import numpy
+
+from trailer.analysis.arrays import segment_coordinates
+from trailer.analysis.geodesy import project
+from trailer.analysis.simplify import douglas_peucker_significance
+from trailer.model.columnar import ColumnarSegment
+from trailer.model.segment import Segment
+from trailer.model.track import Track
+
+__author__ = 'rjs'
+
+# The size in metres, at the equator, of a pixel of a web map with tiles of
+# 256 pixels, at each zoom level from 0 to 20.
+ZOOM_TOLERANCES = tuple(40075016.68557849 / 256 / 2 ** zoom for zoom in range(21))
+
+MAGIC = b'TRLD'
+
+FORMAT_VERSION = 2
+
+_HEADER = struct.Struct('<4sBIQ')
+
+
+class LevelOfDetail:
+    """Nested simplifications of a track, at a series of decreasing tolerances.
+
+    Args:
+        significance: A float64 array of the significance of every point of
+            the track, in metres, the points of each segment following those
+            of the previous segment.
+
+        segment_lengths: The number of points in each segment of the track.
+
+        tolerances: The tolerance of each level in metres, in decreasing
+            order, so that each level has at least the points of the level
+            before.
+
+        ranking: An optional array of the positions of the points in
+            decreasing order of significance, as stored by to_bytes(). If
+            None, (the default) it is computed from the significance.
+
+        point_counts: An optional array of the number of points at each
+            level, as stored by to_bytes(). Required with ranking.
+
+    Raises:
+        ValueError: The tolerances are not decreasing, the segment lengths
+            do not add up to the number of points, or the ranking or point
+            counts are the wrong length.
+    """
+
+    def __init__(self, significance, segment_lengths, tolerances=ZOOM_TOLERANCES, ranking=None,
+                 point_counts=None):
+        tolerances = tuple(float(tolerance) for tolerance in tolerances)
+        if any(finer >= coarser for coarser, finer in zip(tolerances, tolerances[1:])):
+            raise ValueError("Level of detail tolerances must be decreasing")
+        self._significance = numpy.array(significance, dtype=numpy.float64)
+        self._significance.flags.writeable = False
+        self._segment_lengths = tuple(int(length) for length in segment_lengths)
+        if sum(self._segment_lengths) != len(self._significance):
+            raise ValueError("Segment lengths {0} do not add up to the {1} points".format(
+                sum(self._segment_lengths), len(self._significance)))
+        self._offsets = numpy.concatenate(([0], numpy.cumsum(self._segment_lengths, dtype=numpy.int64)))
+        self._tolerances = tolerances
+        self._levels = {}
+        if ranking is None:
+            # A stable sort keeps points of equal significance in track order.
+            ranking = numpy.argsort(-self._significance, kind='stable')
+            point_counts = numpy.searchsorted(-self._significance[ranking], [-tolerance for tolerance in tolerances],
+                                              side='left')
+        self._ranking = numpy.array(ranking, dtype=numpy.int64)
+        self._counts = numpy.array(point_counts, dtype=numpy.int64)
+        if len(self._ranking) != len(self._significance) or len(self._counts) != len(tolerances):
+            raise ValueError("Level of detail ranking of {0} points and {1} point counts do not match {2} points "
+                             "and {3} levels".format(len(self._ranking), len(self._counts), len(self._significance),
+                                                     len(tolerances)))
+        self._ranking.flags.writeable = False
+        self._counts.flags.writeable = False
+
+    @classmethod
+    def from_track(cls, track, tolerances=ZOOM_TOLERANCES):
+        """Compute the levels of detail of a track.
+
+        Args:
+            track: A Track, whose segments may be Segments or ColumnarSegments.
+
+            tolerances: The tolerance of each level in metres, in decreasing
+                order.
+        """
+        minimum = min(tolerances) if tolerances else 0.0
+        significances = [douglas_peucker_significance(*project(*segment_coordinates(segment)), minimum=minimum)
+                         for segment in track.segments]
+        significance = numpy.concatenate(significances) if significances else numpy.zeros(0)
+        return cls(significance, [len(item) for item in significances], tolerances)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Load a LevelOfDetail stored with to_bytes().
+
+        Raises:
+            ValueError: The data is not a stored LevelOfDetail of this version.
+        """
+        data = memoryview(data)
+        if len(data) < _HEADER.size:
+            raise ValueError("Level of detail data is truncated")
+        magic, version, level_count, segment_count = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not level of detail data")
+        if version != FORMAT_VERSION:
+            raise ValueError("Unsupported level of detail format version {0}".format(version))
+        position = _HEADER.size
+        tolerances = numpy.frombuffer(data, '<f8', level_count, position)
+        position += 8 * level_count
+        segment_lengths = numpy.frombuffer(data, '<u8', segment_count, position)
+        position += 8 * segment_count
+        point_count = int(segment_lengths.sum())
+        if len(data) != position + 16 * point_count + 8 * level_count:
+            raise ValueError("Level of detail data has the wrong length")
+        significance = numpy.frombuffer(data, '<f8', point_count, position)
+        position += 8 * point_count
+        ranking = numpy.frombuffer(data, '<u8', point_count, position)
+        position += 8 * point_count
+        point_counts = numpy.frombuffer(data, '<u8', level_count, position)
+        return cls(significance, segment_lengths.tolist(), tolerances.tolist(), ranking, point_counts)
+
+    def to_bytes(self):
+        """Store the levels of detail compactly, for loading with from_bytes().
+
+        The layout is MAGIC, a byte FORMAT_VERSION, a uint32 count of levels
+        and a uint64 count of segments, then the tolerances as float64s, the
+        segment lengths as uint64s, the significance of every point as
+        float64s, the ranking as uint64s and the number of points at each
+        level as uint64s, all little-endian.
+        """
+        return b''.join((
+            _HEADER.pack(MAGIC, FORMAT_VERSION, len(self._tolerances), len(self._segment_lengths)),
+            numpy.array(self._tolerances, dtype='<f8').tobytes(),
+            numpy.array(self._segment_lengths, dtype='<u8').tobytes(),
+            self._significance.astype('<f8', copy=False).tobytes(),
+            self._ranking.astype('<u8').tobytes(),
+            self._counts.astype('<u8').tobytes(),
+        ))
+
+    @property
+    def tolerances(self):
+        """The tolerance of each level in metres, in decreasing order."""
+        return self._tolerances
+
+    @property
+    def significance(self):
+        """A read-only array of the significance of every point in metres.
+
+        Points less significant than the smallest tolerance have a
+        significance of zero.
+        """
+        return self._significance
+
+    @property
+    def ranking(self):
+        """A read-only array of the positions of all the points, in decreasing order of significance.
+
+        Positions count the points of all segments together, as for
+        significance. The points of a level are the first point_count(level)
+        in the ranking.
+        """
+        return self._ranking
+
+    @property
+    def segment_lengths(self):
+        """The number of points in each segment of the track."""
+        return self._segment_lengths
+
+    def __len__(self):
+        return len(self._tolerances)
+
+    def point_count(self, level):
+        """The number of points at a level, in all segments."""
+        return int(self._counts[level])
+
+    def level_for_count(self, count):
+        """The finest level with at most a number of points.
+
+        Args:
+            count: The greatest number of points wanted.
+
+        Returns:
+            The index of a level, or None if even the coarsest level, which
+            has the first and last point of every segment, has more points.
+        """
+        levels = numpy.flatnonzero(self._counts <= count)
+        return int(levels[-1]) if len(levels) else None
+
+    def indices(self, level):
+        """The indices of the points at a level.
+
+        Args:
+            level: The index of a level in tolerances.
+
+        Returns:
+            A list of read-only int64 arrays, one for each segment, of the
+            indices of its points at the level, in order.
+        """
+        level = range(len(self._tolerances))[level]
+        indices = self._levels.get(level)
+        if indices is None:
+            positions = numpy.sort(self._ranking[:self._counts[level]])
+            bounds = numpy.searchsorted(positions, self._offsets).tolist()
+            indices = []
+            for offset, first, last in zip(self._offsets[:-1].tolist(), bounds[:-1], bounds[1:]):
+                selected = positions[first:last] - offset
+                selected.flags.writeable = False
+                indices.append(selected)
+            self._levels[level] = indices
+        return indices
+
+    def simplify(self, track, level):
+        """Select the points of a track at a level.
+
+        Args:
+            track: The Track from which this LevelOfDetail was computed, or
+                one with the same number of points in each segment, such as
+                one read from the same document.
+
+            level: The index of a level in tolerances.
+
+        Returns:
+            A new Track, with the same name and other fields, whose segments
+            contain the points at the level.
+
+        Raises:
+            ValueError: The segments of the track are not the lengths of
+                those from which this LevelOfDetail was computed.
+        """
+        lengths = tuple(len(segment.points) for segment in track.segments)
+        if lengths != self._segment_lengths:
+            raise ValueError("Track has segments of {0} points, but the level of detail has {1}".format(
+                list(lengths), list(self._segment_lengths)))
+        segments = []
+        for segment, indices in zip(track.segments, self.indices(level)):
+            if isinstance(segment, ColumnarSegment):
+                segments.append(segment.take(indices))
+            else:
+                points = segment.points
+                segments.append(Segment([points[index] for index in indices.tolist()], segment.extensions))
+        return Track(track.name, track.comment, track.description, track.source, track.links, track.number,
+                     track.classification, track.extensions, segments)
@@ -0,0 +1,234 @@
+"""Resampling of tracks at uniform intervals of time or distance.
+
+A segment is resampled by interpolating its latitudes, longitudes,
+elevations and times at evenly spaced times, or at evenly spaced distances
+along it, between the points either side of each sample. Positions are
+interpolated linearly in latitude and longitude (LINEAR), taking the
+shorter way around in longitude, or along the great circle between the
+points (GREAT_CIRCLE), which matters only for points far apart.
+
+The work is done with array operations on the arrays of segment_arrays(),
+and the result is a ColumnarSegment built straight from the interpolated
+arrays, so no Waypoints are created, even for segments of Waypoints.
+Resampled points have no names or other sparse fields, and each takes
+the offset from UTC of the time of the point before it.
+
+This module requires NumPy.
+"""
+from datetime import datetime
+
+import numpy
+
+from trailer.analysis.arrays import PointArrays, epoch_seconds, segment_arrays
+from trailer.analysis.geodesy import cumulative_distances, intermediate_points
+from trailer.analysis.temporal import SORT, TimeIndex
+from trailer.model.columnar import NAIVE, ColumnarSegment
+from trailer.model.track import Track
+from trailer.model.waypoint import Waypoint
+
+__author__ = 'rjs'
+
+LINEAR = 'linear'
+
+GREAT_CIRCLE = 'great-circle'
+
+METHODS = (LINEAR, GREAT_CIRCLE)
+
+
+def resample_segment_by_time(segment, interval, method=LINEAR, start=None, order=SORT):
+    """Resample a segment at a uniform interval of time.
+
+    Points without a time are ignored.
+
+    Args:
+        segment: A Segment or ColumnarSegment.
+
+        interval: The interval between samples in seconds.
+
+        method: LINEAR or GREAT_CIRCLE.
+
+        start: The time of a sample, as a datetime or seconds, or None
+            (the default) for the time of the earliest point. Samples are
+            taken at whole intervals before and after it, so segments
+            resampled with the same start and interval have samples at the
+            same times.
+
+        order: How to handle times which go backwards, as for TimeIndex.
+
+    Returns:
+        A ColumnarSegment, with the same extensions, of samples from the
+        earliest to the latest time of the points.
+
+    Raises:
+        ValueError: The interval is not positive, the method is unknown, or
+            the order is STRICT and the times go backwards.
+    """
+    if not interval > 0:
+        raise ValueError("Resampling interval {0} must be positive".format(interval))
+    _check_method(method)
+    arrays = segment_arrays(segment)
+    index = TimeIndex(arrays, None, order)
+    if not len(index):
+        return _make_segment(segment, _take(arrays, []), numpy.zeros(0, dtype=numpy.int32))
+    if start is None:
+        first = index.start_time
+    else:
+        first = epoch_seconds(start) if isinstance(start, datetime) else float(start)
+    lowest = int(numpy.ceil((index.start_time - first) / interval))
+    highest = int(numpy.floor((index.end_time - first) / interval))
+    samples = first + numpy.arange(lowest, highest + 1) * interval
+    ordered = _take(arrays, index.positions)
+    resampled, before = _interpolate(ordered, index.times, samples, method)
+    resampled = resampled._replace(time=samples)
+    return _make_segment(segment, resampled, _time_offsets(segment)[index.positions[before]])
+
+
+def resample_segment_by_distance(segment, spacing, method=LINEAR):
+    """Resample a segment at a uniform distance along it.
+
+    Distances are measured along the great circles between consecutive
+    points. Times are interpolated between the points either side of each
+    sample, and are absent where either has no time.
+
+    Args:
+        segment: A Segment or ColumnarSegment.
+
+        spacing: The distance between samples in metres.
+
+        method: LINEAR or GREAT_CIRCLE.
+
+    Returns:
+        A ColumnarSegment, with the same extensions, of samples from the
+        first point, at every multiple of the spacing up to the length of
+        the segment.
+
+    Raises:
+        ValueError: The spacing is not positive, or the method is unknown.
+    """
+    if not spacing > 0:
+        raise ValueError("Resampling spacing {0} must be positive".format(spacing))
+    _check_method(method)
+    arrays = segment_arrays(segment)
+    distances = cumulative_distances(arrays.latitude, arrays.longitude)
+    if not len(distances):
+        return _make_segment(segment, arrays, numpy.zeros(0, dtype=numpy.int32))
+    samples = numpy.arange(int(numpy.floor(distances[-1] / spacing)) + 1) * spacing
+    resampled, before = _interpolate(arrays, distances, samples, method)
+    return _make_segment(segment, resampled, _time_offsets(segment)[before])
+
+
+def resample_track_by_time(track, interval, method=LINEAR, start=None, order=SORT):
+    """Resample each segment of a track at a uniform interval of time.
+
+    Args:
+        track: A Track.
+
+        interval, method, start, order: As for resample_segment_by_time().
+            With the default start, each segment starts at its earliest time.
+
+    Returns:
+        A new Track, with the same name and other fields, containing the
+        resampled segments.
+    """
+    return _make_track(track, [resample_segment_by_time(segment, interval, method, start, order)
+                               for segment in track.segments])
+
+
+def resample_track_by_distance(track, spacing, method=LINEAR):
+    """Resample each segment of a track at a uniform distance along it.
+
+    Args:
+        track: A Track.
+
+        spacing, method: As for resample_segment_by_distance().
+
+    Returns:
+        A new Track, with the same name and other fields, containing the
+        resampled segments.
+    """
+    return _make_track(track, [resample_segment_by_distance(segment, spacing, method)
+                               for segment in track.segments])
+
+
+def _check_method(method):
+    if method not in METHODS:
+        raise ValueError("Unknown interpolation method {0!r}".format(method))
+
+
+def _interpolate(arrays, keys, samples, method):
+    """Interpolate the arrays, whose points have increasing keys, at samples within the keys.
+
+    Returns:
+        A pair of a PointArrays of the values at the samples, and an array of
+        the index of the point before each.
+    """
+    count = len(keys)
+    after = numpy.clip(numpy.searchsorted(keys, samples, side='right'), 1, max(count - 1, 1))
+    before = after - 1
+    if count == 1:
+        after = before
+    step = keys[after] - keys[before]
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        fraction = numpy.where(step > 0, (samples - keys[before]) / step, 0.0)
+
+    if method == GREAT_CIRCLE:
+        latitudes, longitudes = intermediate_points(arrays.latitude[before], arrays.longitude[before],
+                                                    arrays.latitude[after], arrays.longitude[after], fraction)
+    else:
+        latitudes = _between(arrays.latitude[before], arrays.latitude[after], fraction)
+        longitude_steps = (arrays.longitude[after] - arrays.longitude[before] + 180) % 360 - 180
+        longitudes = arrays.longitude[before] + fraction * longitude_steps
+    longitudes = (longitudes + 180) % 360 - 180
+    return PointArrays(latitudes, longitudes,
+                       _between(arrays.elevation[before], arrays.elevation[after], fraction),
+                       _between(arrays.time[before], arrays.time[after], fraction)), before
+
+
+def _between(first, second, fraction):
+    """Interpolate linearly, taking the first values exactly where the fraction is zero."""
+    return numpy.where(fraction == 0, first, first + fraction * (second - first))
+
+
+def _take(arrays, indices):
+    return PointArrays(*(values[indices] for values in arrays))
+
+
+def _time_offsets(segment):
+    """The offsets from UTC of the times of the points of a segment, as in ColumnarSegment.time_offsets()."""
+    if isinstance(segment, ColumnarSegment):
+        return segment.time_offsets()
+    points = segment.points
+    return numpy.fromiter((NAIVE if point.time is None or point.time.tzinfo is None
+                           else int(point.time.utcoffset().total_seconds()) // 60
+                           for point in points), dtype=numpy.int32, count=len(points))
+
+
+def _make_segment(segment, arrays, offsets):
+    """A ColumnarSegment of the values of arrays, with the extensions of segment."""
+    columns = {'latitude': arrays.latitude, 'longitude': arrays.longitude}
+    masks = {}
+    elevations = ~numpy.isnan(arrays.elevation)
+    if elevations.any():
+        columns['elevation'] = arrays.elevation
+        if not elevations.all():
+            masks['elevation'] = elevations
+    timed = ~numpy.isnan(arrays.time)
+    if timed.any():
+        microseconds = numpy.where(timed, numpy.round(arrays.time * 1e6), 0).astype(numpy.int64)
+        columns['time'] = microseconds.astype('datetime64[us]')
+        if not timed.all():
+            columns['time'][~timed] = numpy.datetime64('NaT')
+            masks['time'] = timed
+        offsets = numpy.where(timed, offsets, NAIVE).astype(numpy.int32)
+        if (offsets != NAIVE).any():
+            columns['time_offset'] = offsets
+    if isinstance(segment, ColumnarSegment):
+        waypoint_type = segment.waypoint_type
+    else:
+        waypoint_type = type(segment.points[0]) if len(segment.points) else Waypoint
+    return ColumnarSegment(columns, masks, None, segment.extensions, waypoint_type)
+
+
+def _make_track(track, segments):
+    return Track(track.name, track.comment, track.description, track.source, track.links, track.number,
+                 track.classification, track.extensions, segments)
@@ -0,0 +1,349 @@
+"""Simplification of tracks and routes by removing insignificant points.
+
+Two algorithms are offered, both of which keep the first and last points:
+
+    Douglas-Peucker keeps the point furthest from the line between the
+    points kept so far, until no remaining point is further than the
+    tolerance from the simplified line.
+
+    Visvalingam-Whyatt repeatedly removes the point which forms the triangle
+    of least area with its neighbours, until every remaining triangle has
+    an area of at least the square of the tolerance.
+
+Points are first projected onto a plane in metres with
+trailer.analysis.geodesy.project(), so tolerances are in metres whatever
+the latitude. Neither algorithm recurses: Douglas-Peucker keeps a stack of
+spans, each measured with array operations, and Visvalingam-Whyatt visits
+the points in order of the areas of their triangles, sorted in advance
+and kept up to date in a heap, so segments of millions of points can be
+simplified.
+
+The simplified segments of a ColumnarSegment are ColumnarSegments, selected
+from its columns without creating Waypoints. Other segments and routes are
+simplified to lists of the same Waypoint objects.
+
+This module requires NumPy.
+"""
+from heapq import heappop, heappush
+
+import numpy
+
+from trailer.analysis.arrays import segment_coordinates
+from trailer.analysis.geodesy import project
+from trailer.model.columnar import ColumnarSegment
+from trailer.model.route import Route
+from trailer.model.segment import Segment
+from trailer.model.track import Track
+
+__author__ = 'rjs'
+
+DOUGLAS_PEUCKER = 'douglas-peucker'
+
+VISVALINGAM_WHYATT = 'visvalingam-whyatt'
+
+METHODS = (DOUGLAS_PEUCKER, VISVALINGAM_WHYATT)
+
+
+def simplify_segment(segment, tolerance, method=DOUGLAS_PEUCKER):
+    """Simplify a track segment.
+
+    Args:
+        segment: A Segment or ColumnarSegment.
+
+        tolerance: The tolerance in metres.
+
+        method: DOUGLAS_PEUCKER or VISVALINGAM_WHYATT.
+
+    Returns:
+        A new segment of the same class, with the same extensions, containing
+        the points which are kept.
+
+    Raises:
+        ValueError: The tolerance is negative or the method is unknown.
+    """
+    mask = simplification_mask(segment, tolerance, method)
+    if isinstance(segment, ColumnarSegment):
+        return segment.take(mask)
+    return Segment(_select(segment.points, mask), segment.extensions)
+
+
+def simplify_track(track, tolerance, method=DOUGLAS_PEUCKER):
+    """Simplify each segment of a track.
+
+    Args:
+        track: A Track.
+
+        tolerance: The tolerance in metres.
+
+        method: DOUGLAS_PEUCKER or VISVALINGAM_WHYATT.
+
+    Returns:
+        A new Track, with the same name and other fields, containing the
+        simplified segments.
+
+    Raises:
+        ValueError: The tolerance is negative or the method is unknown.
+    """
+    return Track(track.name, track.comment, track.description, track.source, track.links, track.number,
+                 track.classification, track.extensions,
+                 [simplify_segment(segment, tolerance, method) for segment in track.segments])
+
+
+def simplify_route(route, tolerance, method=DOUGLAS_PEUCKER):
+    """Simplify a route.
+
+    Args:
+        route: A Route.
+
+        tolerance: The tolerance in metres.
+
+        method: DOUGLAS_PEUCKER or VISVALINGAM_WHYATT.
+
+    Returns:
+        A new Route, with the same name and other fields, containing the
+        points which are kept.
+
+    Raises:
+        ValueError: The tolerance is negative or the method is unknown.
+    """
+    mask = simplification_mask(route, tolerance, method)
+    return Route(route.name, route.comment, route.description, route.source, route.links, route.number,
+                 route.classification, route.extensions, _select(route.points, mask))
+
+
+def simplification_mask(points, tolerance, method=DOUGLAS_PEUCKER):
+    """Determine which points are kept by simplification.
+
+    Args:
+        points: A Segment, ColumnarSegment or Route, or a sequence of
+            Waypoints.
+
+        tolerance: The tolerance in metres.
+
+        method: DOUGLAS_PEUCKER or VISVALINGAM_WHYATT.
+
+    Returns:
+        A boolean array which is True for the points which are kept.
+
+    Raises:
+        ValueError: The tolerance is negative or the method is unknown.
+    """
+    if method not in METHODS:
+        raise ValueError("Unknown simplification method {0!r}".format(method))
+    if tolerance < 0:
+        raise ValueError("Simplification tolerance {0} cannot be negative".format(tolerance))
+    x, y = project(*segment_coordinates(points))
+    if method == DOUGLAS_PEUCKER:
+        return douglas_peucker_mask(x, y, tolerance)
+    return visvalingam_whyatt_mask(x, y, tolerance * tolerance)
+
+
+def douglas_peucker_mask(x, y, tolerance):
+    """Simplify a line in the plane with the Douglas-Peucker algorithm.
+
+    Args:
+        x, y: Arrays of the same length of the coordinates of the points.
+
+        tolerance: The greatest distance of a removed point from the
+            simplified line.
+
+    Returns:
+        A boolean array which is True for the points which are kept.
+    """
+    count = len(x)
+    keep = numpy.zeros(count, dtype=bool)
+    if not count:
+        return keep
+    keep[0] = keep[-1] = True
+    spans = [(0, count - 1)]
+    while spans:
+        start, end = spans.pop()
+        if end - start < 2:
+            continue
+        distances = _distances_to_line(x[start + 1:end], y[start + 1:end], x[start], y[start], x[end], y[end])
+        furthest = int(distances.argmax())
+        if distances[furthest] > tolerance:
+            furthest += start + 1
+            keep[furthest] = True
+            spans.append((start, furthest))
+            spans.append((furthest, end))
+    return keep
+
+
+def douglas_peucker_significance(x, y, minimum=0.0):
+    """The significance of each point of a line in the plane to Douglas-Peucker.
+
+    The significance of a point is the greatest tolerance at which
+    Douglas-Peucker keeps it, so that douglas_peucker_mask(x, y, tolerance)
+    is the same as douglas_peucker_significance(x, y, minimum) > tolerance,
+    for any tolerance of at least the minimum. The first and last points
+    have infinite significance.
+
+    The line is divided one level of spans at a time: the distances of the
+    points of every span from their chords are measured together with
+    array operations, and the furthest point of each span divides it.
+    Spans whose points are all within the minimum of the chord are not
+    divided further, which bounds the work on nearly straight lines.
+
+    Args:
+        x, y: Arrays of the same length of the coordinates of the points.
+
+        minimum: The significance below which points are given a
+            significance of zero.
+
+    Returns:
+        A float64 array of the significance of each point.
+    """
+    count = len(x)
+    significance = numpy.zeros(count)
+    if not count:
+        return significance
+    significance[[0, -1]] = numpy.inf
+    dividers = numpy.array([0, count - 1])
+    divided = numpy.zeros(count, dtype=bool)
+    divided[[0, -1]] = True
+    while True:
+        starts = dividers[:-1]
+        ends = dividers[1:]
+        # Only the spans created by the last level of division are visited.
+        active = divided[starts] | divided[ends]
+        active &= ends - starts > 1
+        if not active.any():
+            break
+        starts = starts[active]
+        ends = ends[active]
+        # The indices of the points within each span, concatenated, and the
+        # span containing each.
+        lengths = ends - starts - 1
+        offsets = numpy.concatenate(([0], numpy.cumsum(lengths)[:-1]))
+        spans = numpy.repeat(numpy.arange(len(starts)), lengths)
+        indices = numpy.arange(len(spans)) - offsets[spans] + starts[spans] + 1
+
+        distances = _distances_to_chords(x[indices], y[indices], x[starts[spans]], y[starts[spans]],
+                                         x[ends[spans]], y[ends[spans]])
+        greatest = numpy.maximum.reduceat(distances, offsets)
+        # The first point of each span at its greatest distance.
+        furthest = numpy.flatnonzero(distances == greatest[spans])
+        furthest = furthest[numpy.concatenate(([True], spans[furthest][1:] != spans[furthest][:-1]))]
+        # Spans whose points are all within the minimum are finished.
+        significant = greatest > minimum
+        chosen = indices[furthest[significant]]
+        # A point cannot be more significant than the ends of its span.
+        significance[chosen] = numpy.minimum(greatest[significant],
+                                             numpy.minimum(significance[starts[significant]],
+                                                           significance[ends[significant]]))
+        divided[dividers] = False
+        divided[chosen] = True
+        dividers = numpy.sort(numpy.concatenate((dividers, chosen)))
+    return significance
+
+
+def visvalingam_whyatt_mask(x, y, area):
+    """Simplify a line in the plane with the Visvalingam-Whyatt algorithm.
+
+    The effective area of a point is the area of the triangle it forms with
+    its neighbours when it is removed, or the effective area of the point
+    removed before it if that is larger, so that removing points never
+    brings back a less significant one.
+
+    Args:
+        x, y: Arrays of the same length of the coordinates of the points.
+
+        area: The least effective area of the points which are kept.
+
+    Returns:
+        A boolean array which is True for the points which are kept.
+    """
+    count = len(x)
+    if count < 3:
+        return numpy.ones(count, dtype=bool)
+    areas = _triangle_areas(x[:-2], y[:-2], x[1:-1], y[1:-1], x[2:], y[2:])
+    xs = x.tolist()
+    ys = y.tolist()
+    previous = list(range(-1, count - 1))
+    following = list(range(1, count + 1))
+    # The current area of each point which may yet be removed. Points are
+    # removed in order of area, then of index, taken from a list of areas
+    # sorted in advance with NumPy and from a heap of the areas updated
+    # since, which is much cheaper than a heap of every area. Entries of
+    # either are stale if they differ from the current area. Points with an
+    # area of at least the limit can only be removed once a neighbour is, so
+    # are not queued until then.
+    current = [None] + areas.tolist() + [None]
+    below = numpy.flatnonzero(areas < area)
+    order = below[numpy.argsort(areas[below], kind='stable')]
+    sorted_areas = areas[order].tolist()
+    sorted_indices = (order + 1).tolist()
+    sorted_count = len(sorted_indices)
+    position = 0
+    heap = []
+    removed = bytearray(count)
+    while True:
+        if heap and (position == sorted_count
+                     or heap[0][0] < sorted_areas[position]
+                     or heap[0][0] == sorted_areas[position] and heap[0][1] < sorted_indices[position]):
+            removed_area, index = heappop(heap)
+        elif position < sorted_count:
+            removed_area = sorted_areas[position]
+            index = sorted_indices[position]
+            position += 1
+        else:
+            break
+        if current[index] != removed_area:
+            continue
+        current[index] = None
+        removed[index] = 1
+        before = previous[index]
+        after = following[index]
+        following[before] = after
+        previous[after] = before
+
+        if current[before] is not None:
+            left = previous[before]
+            neighbour_area = abs((xs[before] - xs[left]) * (ys[after] - ys[left])
+                                 - (xs[after] - xs[left]) * (ys[before] - ys[left])) / 2
+            if neighbour_area < removed_area:
+                neighbour_area = removed_area
+            current[before] = neighbour_area
+            if neighbour_area < area:
+                heappush(heap, (neighbour_area, before))
+        if current[after] is not None:
+            right = following[after]
+            neighbour_area = abs((xs[after] - xs[before]) * (ys[right] - ys[before])
+                                 - (xs[right] - xs[before]) * (ys[after] - ys[before])) / 2
+            if neighbour_area < removed_area:
+                neighbour_area = removed_area
+            current[after] = neighbour_area
+            if neighbour_area < area:
+                heappush(heap, (neighbour_area, after))
+    return numpy.frombuffer(removed, dtype=bool) == 0
+
+
+def _distances_to_line(x, y, x0, y0, x1, y1):
+    """The distances of points from the line segment between (x0, y0) and (x1, y1)."""
+    dx = x1 - x0
+    dy = y1 - y0
+    length_squared = dx * dx + dy * dy
+    if length_squared == 0:
+        return numpy.hypot(x - x0, y - y0)
+    t = numpy.clip(((x - x0) * dx + (y - y0) * dy) / length_squared, 0, 1)
+    return numpy.hypot(x - (x0 + t * dx), y - (y0 + t * dy))
+
+
+def _distances_to_chords(x, y, x0, y0, x1, y1):
+    """The distances of points from the line segments between corresponding (x0, y0) and (x1, y1)."""
+    dx = x1 - x0
+    dy = y1 - y0
+    length_squared = dx * dx + dy * dy
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        t = numpy.clip(((x - x0) * dx + (y - y0) * dy) / length_squared, 0, 1)
+    t[length_squared == 0] = 0
+    return numpy.hypot(x - (x0 + t * dx), y - (y0 + t * dy))
+
+
+def _triangle_areas(x0, y0, x1, y1, x2, y2):
+    return numpy.abs((x1 - x0) * (y2 - y0) - (x2 - x0) * (y1 - y0)) / 2
+
+
+def _select(points, mask):
+    return [point for point, kept in zip(points, mask.tolist()) if kept]
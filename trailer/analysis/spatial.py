@@ -0,0 +1,374 @@
+"""A spatial index of the points of GpxModels, for finding points by place.
+
+A SpatialIndex is a packed R-tree, bulk-built by Sort-Tile-Recursive from
+arrays of latitudes and longitudes: the points are sorted into vertical
+slices by longitude, and each slice by latitude, then grouped into leaves
+of NODE_SIZE points, and the nodes of each level are grouped the same way
+into the nodes of the next, up to a root level of at most NODE_SIZE nodes.
+Each level is stored as arrays of the bounding boxes and child ranges of
+its nodes, so a query visits the tree a level at a time, testing all the
+candidate nodes of each level with array operations.
+
+An index can be built over the waypoints, route points and track points
+of one or more GpxModels, taking the coordinates of columnar segments
+straight from their columns, or over any arrays of coordinates. Queries
+return the positions of the matching points in the index, which
+reference() and point() relate back to the models.
+
+Distances are great-circle distances in metres on a spherical Earth, as
+trailer.analysis.geodesy.haversine(). Bounding boxes may cross the
+antimeridian.
+
+This module requires NumPy.
+"""
+from collections import namedtuple
+from heapq import heappop, heappush
+
+import numpy
+
+from trailer.analysis.arrays import segment_coordinates
+from trailer.analysis.geodesy import EARTH_RADIUS, haversine
+
+__author__ = 'rjs'
+
+NODE_SIZE = 16
+
+# Kinds of point
+WAYPOINT = 0
+ROUTE_POINT = 1
+TRACK_POINT = 2
+
+# The position of a point within a collection of models. The feature is the
+# index of the route or track, and the segment the index of the segment
+# within the track; either is None where it does not apply.
+PointReference = namedtuple('PointReference', ['model_index', 'kind', 'feature_index', 'segment_index',
+                                               'point_index'])
+
+# The arrays of one level of the tree: the bounding box of each node, and
+# the range of its children in the level below, or of its points.
+_Level = namedtuple('_Level', ['min_latitude', 'min_longitude', 'max_latitude', 'max_longitude',
+                               'start', 'end'])
+
+
+class SpatialIndex:
+    """An immutable index of points for bounding box, radius and nearest queries.
+
+    Args:
+        latitudes, longitudes: Arrays of the same length of the coordinates
+            of the points in degrees. The positions of the points in these
+            arrays are the positions returned by queries.
+
+    Raises:
+        ValueError: The arrays have different lengths.
+    """
+
+    def __init__(self, latitudes, longitudes):
+        latitudes = numpy.asarray(latitudes, dtype=numpy.float64)
+        longitudes = numpy.asarray(longitudes, dtype=numpy.float64)
+        if latitudes.shape != longitudes.shape or latitudes.ndim != 1:
+            raise ValueError("Latitude and longitude arrays have different shapes")
+        self._latitudes = latitudes
+        self._longitudes = longitudes
+        self._models = None
+        self._references = None
+
+        # The points in the order of the leaves, and their positions in the
+        # arrays given.
+        self._order = _sort_tile_recursive(latitudes, longitudes, NODE_SIZE)
+        self._sorted_latitudes = latitudes[self._order]
+        self._sorted_longitudes = longitudes[self._order]
+
+        # The levels of the tree, from the leaves to the root.
+        self._levels = []
+        starts = numpy.arange(0, len(latitudes), NODE_SIZE)
+        ends = numpy.minimum(starts + NODE_SIZE, len(latitudes))
+        level = _make_level(self._sorted_latitudes, self._sorted_longitudes, self._sorted_latitudes,
+                            self._sorted_longitudes, starts, ends)
+        self._levels.append(level)
+        while len(level.start) > NODE_SIZE:
+            centre_latitudes = (level.min_latitude + level.max_latitude) / 2
+            centre_longitudes = (level.min_longitude + level.max_longitude) / 2
+            order = _sort_tile_recursive(centre_latitudes, centre_longitudes, NODE_SIZE)
+            level = _Level(*(values[order] for values in level))
+            self._levels[-1] = level
+            starts = numpy.arange(0, len(level.start), NODE_SIZE)
+            ends = numpy.minimum(starts + NODE_SIZE, len(level.start))
+            level = _make_level(level.min_latitude, level.min_longitude, level.max_latitude,
+                                level.max_longitude, starts, ends)
+            self._levels.append(level)
+
+    @classmethod
+    def from_models(cls, gpx_models, waypoints=True, routes=True, tracks=True):
+        """Build an index of the points of a collection of GpxModels.
+
+        Args:
+            gpx_models: A GpxModel, or an iterable series of GpxModels.
+
+            waypoints: Whether to include the waypoints of each model.
+
+            routes: Whether to include the points of the routes.
+
+            tracks: Whether to include the points of the track segments.
+
+        Returns:
+            A SpatialIndex whose reference() and point() methods relate
+            positions in the index to the models.
+        """
+        gpx_models = [gpx_models] if hasattr(gpx_models, 'tracks') else list(gpx_models)
+        latitudes = []
+        longitudes = []
+        references = []
+
+        def add(model_index, kind, feature_index, segment_index, points):
+            point_latitudes, point_longitudes = segment_coordinates(points)
+            count = len(point_latitudes)
+            if count:
+                latitudes.append(point_latitudes)
+                longitudes.append(point_longitudes)
+                reference = numpy.empty((count, 5), dtype=numpy.int64)
+                reference[:, :4] = (model_index, kind, feature_index, segment_index)
+                reference[:, 4] = numpy.arange(count)
+                references.append(reference)
+
+        for model_index, gpx_model in enumerate(gpx_models):
+            if waypoints:
+                add(model_index, WAYPOINT, -1, -1, gpx_model.waypoints)
+            if routes:
+                for route_index, route in enumerate(gpx_model.routes):
+                    add(model_index, ROUTE_POINT, route_index, -1, route.points)
+            if tracks:
+                for track_index, track in enumerate(gpx_model.tracks):
+                    for segment_index, segment in enumerate(track.segments):
+                        add(model_index, TRACK_POINT, track_index, segment_index, segment)
+
+        if references:
+            latitudes = numpy.concatenate(latitudes)
+            longitudes = numpy.concatenate(longitudes)
+            references = numpy.concatenate(references)
+        else:
+            latitudes = longitudes = numpy.zeros(0)
+            references = numpy.zeros((0, 5), dtype=numpy.int64)
+        index = cls(latitudes, longitudes)
+        index._models = gpx_models
+        index._references = references
+        return index
+
+    def __len__(self):
+        return len(self._latitudes)
+
+    @property
+    def latitudes(self):
+        """The latitudes of the points, by position."""
+        return self._latitudes
+
+    @property
+    def longitudes(self):
+        """The longitudes of the points, by position."""
+        return self._longitudes
+
+    def reference(self, position):
+        """The place in the models of the point at a position.
+
+        Raises:
+            ValueError: The index was not built with from_models().
+        """
+        if self._references is None:
+            raise ValueError("The spatial index was not built from models")
+        model_index, kind, feature_index, segment_index, point_index = self._references[position].tolist()
+        return PointReference(model_index, kind,
+                              None if feature_index < 0 else feature_index,
+                              None if segment_index < 0 else segment_index,
+                              point_index)
+
+    def point(self, position):
+        """The Waypoint at a position.
+
+        Raises:
+            ValueError: The index was not built with from_models().
+        """
+        reference = self.reference(position)
+        gpx_model = self._models[reference.model_index]
+        if reference.kind == WAYPOINT:
+            return gpx_model.waypoints[reference.point_index]
+        if reference.kind == ROUTE_POINT:
+            return gpx_model.routes[reference.feature_index].points[reference.point_index]
+        track = gpx_model.tracks[reference.feature_index]
+        return track.segments[reference.segment_index].points[reference.point_index]
+
+    def within_box(self, min_latitude, min_longitude, max_latitude, max_longitude):
+        """Find the points within a bounding box, including its edges.
+
+        Args:
+            min_latitude, min_longitude: The south west corner of the box.
+
+            max_latitude, max_longitude: The north east corner of the box.
+                If max_longitude is less than min_longitude, the box
+                crosses the antimeridian.
+
+        Returns:
+            An array of the positions of the points, in increasing order.
+        """
+        boxes = _split_box(min_latitude, min_longitude, max_latitude, max_longitude)
+
+        def in_boxes(lat_min, lon_min, lat_max, lon_max):
+            result = numpy.zeros(len(lat_min), dtype=bool)
+            for box_lat_min, box_lon_min, box_lat_max, box_lon_max in boxes:
+                result |= ((lat_min <= box_lat_max) & (lat_max >= box_lat_min)
+                           & (lon_min <= box_lon_max) & (lon_max >= box_lon_min))
+            return result
+
+        candidates = self._search(in_boxes)
+        latitudes = self._sorted_latitudes[candidates]
+        longitudes = self._sorted_longitudes[candidates]
+        selected = candidates[in_boxes(latitudes, longitudes, latitudes, longitudes)]
+        return numpy.sort(self._order[selected])
+
+    def within_radius(self, latitude, longitude, radius):
+        """Find the points within a distance of a place.
+
+        Args:
+            latitude, longitude: The place in degrees.
+
+            radius: The distance in metres.
+
+        Returns:
+            A pair of arrays of the positions of the points and of their
+            distances, in order of increasing distance.
+        """
+        def near(lat_min, lon_min, lat_max, lon_max):
+            return _distance_bound(latitude, longitude, lat_min, lon_min, lat_max, lon_max) <= radius
+
+        candidates = self._search(near)
+        distances = haversine(latitude, longitude, self._sorted_latitudes[candidates],
+                              self._sorted_longitudes[candidates])
+        within = distances <= radius
+        candidates = candidates[within]
+        distances = distances[within]
+        order = numpy.lexsort((self._order[candidates], distances))
+        return self._order[candidates[order]], distances[order]
+
+    def nearest(self, latitude, longitude, count=1):
+        """Find the points nearest to a place.
+
+        Nodes are visited in order of their least possible distance from the
+        place, until the nearest points found are nearer than any remaining
+        node.
+
+        Args:
+            latitude, longitude: The place in degrees.
+
+            count: The number of points to find.
+
+        Returns:
+            A pair of arrays of the positions of the points and of their
+            distances, in order of increasing distance, with fewer than count
+            points only if there are fewer in the index.
+        """
+        if count <= 0 or not len(self):
+            return numpy.zeros(0, dtype=numpy.intp), numpy.zeros(0)
+        # Entries are (bound, level number, node index), where level number
+        # -1 denotes the points of a leaf.
+        top = len(self._levels) - 1
+        root = self._levels[top]
+        bounds = _distance_bound(latitude, longitude, root.min_latitude, root.min_longitude,
+                                 root.max_latitude, root.max_longitude)
+        queue = [(bound, top, node) for node, bound in enumerate(bounds.tolist())]
+        queue.sort()
+        found_positions = numpy.zeros(0, dtype=numpy.intp)
+        found_distances = numpy.zeros(0)
+        while queue:
+            bound, level_number, node = heappop(queue)
+            if len(found_distances) == count and bound > found_distances[-1]:
+                break
+            level = self._levels[level_number]
+            start = level.start[node]
+            end = level.end[node]
+            if level_number == 0:
+                distances = haversine(latitude, longitude, self._sorted_latitudes[start:end],
+                                      self._sorted_longitudes[start:end])
+                positions = numpy.concatenate((found_positions, self._order[start:end]))
+                distances = numpy.concatenate((found_distances, distances))
+                order = numpy.lexsort((positions, distances))[:count]
+                found_positions = positions[order]
+                found_distances = distances[order]
+            else:
+                below = self._levels[level_number - 1]
+                bounds = _distance_bound(latitude, longitude, below.min_latitude[start:end],
+                                         below.min_longitude[start:end], below.max_latitude[start:end],
+                                         below.max_longitude[start:end])
+                for child, child_bound in zip(range(start, end), bounds.tolist()):
+                    heappush(queue, (child_bound, level_number - 1, child))
+        return found_positions, found_distances
+
+    def _search(self, predicate):
+        """The positions in the sorted points of the points of leaves satisfying predicate."""
+        if not len(self):
+            return numpy.zeros(0, dtype=numpy.intp)
+        top = self._levels[-1]
+        nodes = numpy.arange(len(top.start))
+        for level_number in range(len(self._levels) - 1, -1, -1):
+            level = self._levels[level_number]
+            nodes = nodes[predicate(level.min_latitude[nodes], level.min_longitude[nodes],
+                                    level.max_latitude[nodes], level.max_longitude[nodes])]
+            nodes = _expand_ranges(level.start[nodes], level.end[nodes])
+        return nodes
+
+
+def _sort_tile_recursive(latitudes, longitudes, node_size):
+    """The order of points which groups them into compact nodes of node_size."""
+    count = len(latitudes)
+    node_count = -(-count // node_size)
+    slice_count = max(1, int(numpy.ceil(numpy.sqrt(node_count))))
+    slice_size = slice_count * node_size
+    by_longitude = numpy.argsort(longitudes, kind='stable')
+    slices = numpy.arange(count) // slice_size
+    return by_longitude[numpy.lexsort((latitudes[by_longitude], slices))]
+
+
+def _make_level(min_latitudes, min_longitudes, max_latitudes, max_longitudes, starts, ends):
+    """A level of nodes, each bounding the consecutive children from start to end."""
+    if not len(starts):
+        empty = numpy.zeros(0)
+        return _Level(empty, empty, empty, empty, starts, ends)
+    return _Level(numpy.minimum.reduceat(min_latitudes, starts),
+                  numpy.minimum.reduceat(min_longitudes, starts),
+                  numpy.maximum.reduceat(max_latitudes, starts),
+                  numpy.maximum.reduceat(max_longitudes, starts),
+                  starts, ends)
+
+
+def _expand_ranges(starts, ends):
+    """The concatenation of the ranges from each start to each end."""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if not total:
+        return numpy.zeros(0, dtype=numpy.intp)
+    offsets = numpy.cumsum(lengths) - lengths
+    return numpy.arange(total) - numpy.repeat(offsets - starts, lengths)
+
+
+def _split_box(min_latitude, min_longitude, max_latitude, max_longitude):
+    if min_longitude <= max_longitude:
+        return [(min_latitude, min_longitude, max_latitude, max_longitude)]
+    return [(min_latitude, min_longitude, max_latitude, 180.0),
+            (min_latitude, -180.0, max_latitude, max_longitude)]
+
+
+def _distance_bound(latitude, longitude, min_latitudes, min_longitudes, max_latitudes, max_longitudes):
+    """A lower bound of the distance in metres from a place to any point in each box.
+
+    The distance is at least the difference in latitude to the box. If the
+    place is outside the range of longitudes of the box, it is also at least
+    the distance to the nearer meridian bounding that range, or to the
+    nearer pole if that meridian is more than a quarter turn away.
+    """
+    latitude_gaps = numpy.maximum(numpy.maximum(min_latitudes - latitude, latitude - max_latitudes), 0)
+    west_gaps = (min_longitudes - longitude) % 360
+    east_gaps = (longitude - max_longitudes) % 360
+    outside = (longitude < min_longitudes) | (longitude > max_longitudes)
+    longitude_gaps = numpy.radians(numpy.where(outside, numpy.minimum(west_gaps, east_gaps), 0))
+    phi = numpy.radians(latitude)
+    meridian = numpy.where(longitude_gaps < numpy.pi / 2,
+                           numpy.arcsin(numpy.clip(numpy.cos(phi) * numpy.sin(longitude_gaps), 0, 1)),
+                           numpy.pi / 2 - abs(phi))
+    return EARTH_RADIUS * numpy.maximum(numpy.radians(latitude_gaps), meridian)
@@ -0,0 +1,266 @@
+"""Summary statistics of tracks: distance, climbing, speeds and times.
+
+The statistics of each segment are computed from float64 arrays of its
+coordinates, elevations and times, as given by segment_arrays(), with
+great-circle distances between consecutive points on a spherical Earth.
+Tracks and models are summarised by combining the statistics of their
+segments, so the gaps between segments contribute no distance or time.
+
+Statistics are cached for each segment and pair of thresholds, so asking
+again, or summarising the track or model containing a segment, does not
+recompute them. A cached result is discarded when the number of points in
+the segment changes; after modifying the points of a segment in any other
+way, call clear_statistics().
+
+Distances are in metres, times in seconds and speeds in metres per second.
+
+This module requires NumPy.
+"""
+from collections import namedtuple
+from weakref import WeakKeyDictionary
+
+import numpy
+
+from trailer.analysis.arrays import segment_arrays
+from trailer.analysis.geodesy import step_distances
+
+__author__ = 'rjs'
+
+# Changes in elevation smaller than this, in metres, are treated as noise.
+ELEVATION_THRESHOLD = 3.0
+
+# Intervals between points with a lower speed than this, in metres per
+# second, are treated as stationary.
+MOVING_SPEED = 0.5
+
+# The statistics of a segment, track or model.
+#
+#     point_count: The number of points.
+#     distance: The great-circle distance between consecutive points.
+#     elevation_gain, elevation_loss: The total ascent and descent, ignoring
+#         changes of less than the elevation threshold, or None if no point
+#         has an elevation.
+#     duration: The time from the earliest to the latest point with a time,
+#         or None if no point has a time.
+#     moving_time: The total time of the intervals between consecutive timed
+#         points at no less than the moving speed, or None if no point has a
+#         time. Intervals run from the latest time of the points before, so
+#         times which go backwards are not counted twice.
+#     max_speed: The greatest speed between consecutive timed points, or
+#         None if there are no such intervals.
+#     average_speed: The distance divided by the moving time, or None if the
+#         moving time is zero or None.
+Statistics = namedtuple('Statistics', ['point_count', 'distance', 'elevation_gain', 'elevation_loss',
+                                       'duration', 'moving_time', 'max_speed', 'average_speed'])
+
+EMPTY_STATISTICS = Statistics(0, 0.0, None, None, None, None, None, None)
+
+# Maps each segment to a pair of its number of points when the statistics
+# were computed, and a dictionary from thresholds to Statistics.
+_cache = WeakKeyDictionary()
+
+
+def segment_statistics(segment, elevation_threshold=ELEVATION_THRESHOLD, moving_speed=MOVING_SPEED):
+    """The statistics of a segment, computed once for each pair of thresholds.
+
+    Args:
+        segment: A Segment or ColumnarSegment.
+
+        elevation_threshold: The smallest change of elevation, in metres,
+            counted towards the elevation gain and loss.
+
+        moving_speed: The lowest speed, in metres per second, at which an
+            interval between points counts towards the moving time.
+
+    Returns:
+        A Statistics.
+    """
+    count = len(segment.points)
+    entry = _cache.get(segment)
+    if entry is None or entry[0] != count:
+        entry = (count, {})
+        _cache[segment] = entry
+    key = (elevation_threshold, moving_speed)
+    statistics = entry[1].get(key)
+    if statistics is None:
+        statistics = compute_statistics(segment_arrays(segment), elevation_threshold, moving_speed)
+        entry[1][key] = statistics
+    return statistics
+
+
+def track_statistics(track, elevation_threshold=ELEVATION_THRESHOLD, moving_speed=MOVING_SPEED):
+    """The combined statistics of the segments of a track.
+
+    Args:
+        track: A Track.
+
+        elevation_threshold: As for segment_statistics().
+
+        moving_speed: As for segment_statistics().
+
+    Returns:
+        A Statistics.
+    """
+    return combine_statistics(segment_statistics(segment, elevation_threshold, moving_speed)
+                              for segment in track.segments)
+
+
+def model_statistics(gpx_model, elevation_threshold=ELEVATION_THRESHOLD, moving_speed=MOVING_SPEED):
+    """The combined statistics of all the track segments of a GpxModel.
+
+    Args:
+        gpx_model: A GpxModel.
+
+        elevation_threshold: As for segment_statistics().
+
+        moving_speed: As for segment_statistics().
+
+    Returns:
+        A Statistics.
+    """
+    return combine_statistics(segment_statistics(segment, elevation_threshold, moving_speed)
+                              for track in gpx_model.tracks
+                              for segment in track.segments)
+
+
+def clear_statistics(segment):
+    """Discard any cached statistics of a segment."""
+    _cache.pop(segment, None)
+
+
+def combine_statistics(statistics):
+    """Combine the statistics of separate segments.
+
+    Args:
+        statistics: An iterable series of Statistics.
+
+    Returns:
+        A Statistics in which the counts, distances and times are the totals,
+        and the maximum speed the greatest, of the given Statistics.
+    """
+    statistics = list(statistics)
+    if not statistics:
+        return EMPTY_STATISTICS
+    distance = sum(item.distance for item in statistics)
+    moving_time = _total(item.moving_time for item in statistics)
+    max_speeds = [item.max_speed for item in statistics if item.max_speed is not None]
+    return Statistics(
+        point_count=sum(item.point_count for item in statistics),
+        distance=distance,
+        elevation_gain=_total(item.elevation_gain for item in statistics),
+        elevation_loss=_total(item.elevation_loss for item in statistics),
+        duration=_total(item.duration for item in statistics),
+        moving_time=moving_time,
+        max_speed=max(max_speeds) if max_speeds else None,
+        average_speed=distance / moving_time if moving_time else None)
+
+
+def compute_statistics(arrays, elevation_threshold=ELEVATION_THRESHOLD, moving_speed=MOVING_SPEED):
+    """Compute the statistics of a line of points, without caching.
+
+    Args:
+        arrays: A PointArrays.
+
+        elevation_threshold: As for segment_statistics().
+
+        moving_speed: As for segment_statistics().
+
+    Returns:
+        A Statistics.
+    """
+    steps = step_distances(arrays.latitude, arrays.longitude)
+    distance = float(steps.sum())
+    elevation_gain, elevation_loss = elevation_changes(arrays.elevation, elevation_threshold)
+
+    timed = ~numpy.isnan(arrays.time)
+    if not timed.any():
+        return Statistics(len(arrays.latitude), distance, elevation_gain, elevation_loss, None, None, None, None)
+    times = arrays.time[timed]
+    duration = float(times.max() - times.min())
+
+    # Intervals between consecutive timed points, skipping untimed points.
+    # Each is measured from the latest time so far, so that time which goes
+    # backwards and then forwards again is not counted twice, and the
+    # moving time never exceeds the duration.
+    cumulative = numpy.concatenate(([0.0], numpy.cumsum(steps)))[timed]
+    interval_distances = numpy.diff(cumulative)
+    intervals = times[1:] - numpy.maximum.accumulate(times)[:-1]
+    forward = intervals > 0
+    speeds = interval_distances[forward] / intervals[forward]
+    moving_time = float(intervals[forward][speeds >= moving_speed].sum())
+    return Statistics(
+        point_count=len(arrays.latitude),
+        distance=distance,
+        elevation_gain=elevation_gain,
+        elevation_loss=elevation_loss,
+        duration=duration,
+        moving_time=moving_time,
+        max_speed=float(speeds.max()) if len(speeds) else None,
+        average_speed=distance / moving_time if moving_time else None)
+
+
+def elevation_changes(elevations, threshold=ELEVATION_THRESHOLD):
+    """The total ascent and descent of a series of elevations, ignoring noise.
+
+    A change of direction is recognised only once the elevation has moved at
+    least threshold metres back from the preceding peak or trough, so that
+    fluctuations smaller than the threshold are not counted, while a steady
+    climb in small steps is counted in full.
+
+    Args:
+        elevations: A float64 array of elevations, with NaN for points
+            without an elevation, which are skipped.
+
+        threshold: The smallest change of direction recognised, in metres.
+
+    Returns:
+        A pair of the ascent and descent in metres, which are None if there
+        are no elevations.
+    """
+    elevations = elevations[~numpy.isnan(elevations)]
+    if not len(elevations):
+        return None, None
+
+    # Only the peaks and troughs matter, which leaves far fewer values to
+    # visit in order, so first discard repeated values and the interior
+    # points of each monotonic run.
+    steps = numpy.diff(elevations)
+    elevations = elevations[numpy.concatenate(([True], steps != 0))]
+    steps = numpy.diff(elevations)
+    turning = numpy.concatenate(([True], steps[:-1] * steps[1:] < 0, [True])) if len(steps) else [True]
+    extremes = elevations[turning].tolist()
+
+    gain = loss = 0.0
+    low = high = extremes[0]
+    rising = None
+    pivot = extreme = None
+    for elevation in extremes:
+        if rising is None:
+            low = min(low, elevation)
+            high = max(high, elevation)
+            if elevation - low >= threshold:
+                rising, pivot, extreme = True, low, elevation
+            elif high - elevation >= threshold:
+                rising, pivot, extreme = False, high, elevation
+        elif rising:
+            if elevation > extreme:
+                extreme = elevation
+            elif extreme - elevation >= threshold:
+                gain += extreme - pivot
+                rising, pivot, extreme = False, extreme, elevation
+        else:
+            if elevation < extreme:
+                extreme = elevation
+            elif elevation - extreme >= threshold:
+                loss += pivot - extreme
+                rising, pivot, extreme = True, extreme, elevation
+    if rising:
+        gain += extreme - pivot
+    elif rising is False:
+        loss += pivot - extreme
+    return gain, loss
+
+
+def _total(values):
+    values = [value for value in values if value is not None]
+    return sum(values) if values else None
@@ -0,0 +1,325 @@
+"""An index of the times of the points of a track, for replaying it.
+
+A TimeIndex holds the times of the timed points of a segment or track as a
+sorted float64 array of seconds since the epoch, as in PointArrays, with
+the position of each point in the order of the track, so that the points
+within a window of time are found by binary search in O(log n) time, and
+the position of the track at any time is interpolated between the points
+either side of it.
+
+Loggers sometimes record times which go backwards. The index detects them,
+and either sorts the points by time (SORT, the default), leaves out the
+points whose times are earlier than that of a point before them (DROP), or
+refuses to index the track (STRICT).
+
+When the points in a window are consecutive points of a ColumnarSegment,
+as they always are for a track whose times increase and which has a time
+for every point, the segment of the window is a view of the columns of the
+original, created without copying.
+
+Query times may be datetimes or seconds since the epoch. Aware datetimes
+are compared in UTC, and naive ones in their own local time, so a track
+should not mix the two.
+
+This module requires NumPy.
+"""
+from datetime import datetime
+
+import numpy
+
+from trailer.analysis.arrays import PointArrays, epoch_seconds, segment_arrays
+from trailer.model.columnar import ColumnarSegment
+from trailer.model.segment import Segment
+from trailer.model.track import Track
+
+__author__ = 'rjs'
+
+# Ways of handling times which go backwards
+SORT = 'sort'
+DROP = 'drop'
+STRICT = 'strict'
+
+ORDERS = (SORT, DROP, STRICT)
+
+
+class TimeIndex:
+    """The times of the points of a track, sorted for searching.
+
+    Most clients will use from_segment() or from_track().
+
+    Args:
+        arrays: A PointArrays of the points of all the segments, the points
+            of each segment following those of the previous segment.
+
+        segment_lengths: The number of points in each segment, or None for a
+            single segment.
+
+        order: SORT, DROP or STRICT.
+
+    Raises:
+        ValueError: The order is unknown, the segment lengths do not add up
+            to the number of points, or the order is STRICT and the times go
+            backwards.
+    """
+
+    def __init__(self, arrays, segment_lengths=None, order=SORT):
+        if order not in ORDERS:
+            raise ValueError("Unknown time order {0!r}".format(order))
+        count = len(arrays.time)
+        self._segment_lengths = (count,) if segment_lengths is None else tuple(
+            int(length) for length in segment_lengths)
+        if sum(self._segment_lengths) != count:
+            raise ValueError("Segment lengths {0} do not add up to the {1} points".format(
+                sum(self._segment_lengths), count))
+        self._offsets = numpy.concatenate(([0], numpy.cumsum(self._segment_lengths, dtype=numpy.int64)))
+        self._arrays = arrays
+
+        timed = numpy.flatnonzero(~numpy.isnan(arrays.time))
+        times = arrays.time[timed]
+        # A point is out of order if its time is earlier than that of any
+        # timed point before it.
+        latest = numpy.maximum.accumulate(times)
+        backwards = numpy.concatenate(([False], times[1:] < latest[:-1])) if len(times) else numpy.zeros(0, bool)
+        self._out_of_order = timed[backwards]
+        if len(self._out_of_order) and order == STRICT:
+            raise ValueError("The time of point {0} is earlier than that of a point before it".format(
+                int(self._out_of_order[0])))
+        if order == DROP:
+            timed = timed[~backwards]
+            times = times[~backwards]
+        elif len(self._out_of_order):
+            by_time = numpy.argsort(times, kind='stable')
+            timed = timed[by_time]
+            times = times[by_time]
+        self._times = times
+        self._positions = timed
+        self._times.flags.writeable = False
+        self._positions.flags.writeable = False
+        self._increasing = order == DROP or not len(self._out_of_order)
+
+    @classmethod
+    def from_segment(cls, segment, order=SORT):
+        """Index the times of the points of a segment.
+
+        Args:
+            segment: A Segment or ColumnarSegment.
+
+            order: SORT, DROP or STRICT.
+        """
+        return cls(segment_arrays(segment), None, order)
+
+    @classmethod
+    def from_track(cls, track, order=SORT):
+        """Index the times of the points of all the segments of a track.
+
+        Args:
+            track: A Track.
+
+            order: SORT, DROP or STRICT.
+        """
+        arrays = [segment_arrays(segment) for segment in track.segments]
+        if not arrays:
+            empty = numpy.zeros(0)
+            return cls(PointArrays(empty, empty, empty, empty), (), order)
+        return cls(PointArrays(*(numpy.concatenate(values) for values in zip(*arrays))),
+                   [len(item.time) for item in arrays], order)
+
+    def __len__(self):
+        return len(self._times)
+
+    @property
+    def times(self):
+        """A read-only array of the times of the indexed points in seconds, in increasing order."""
+        return self._times
+
+    @property
+    def positions(self):
+        """A read-only array of the positions in the track of the indexed points, in order of time.
+
+        Positions count the points of all segments together, the first point
+        of each segment following the last of the previous segment.
+        """
+        return self._positions
+
+    @property
+    def monotonic(self):
+        """Whether the times of the timed points never go backwards."""
+        return not len(self._out_of_order)
+
+    @property
+    def out_of_order(self):
+        """The positions of the points whose times are earlier than that of a point before them."""
+        return self._out_of_order
+
+    @property
+    def start_time(self):
+        """The earliest indexed time in seconds, or None if no point has a time."""
+        return float(self._times[0]) if len(self._times) else None
+
+    @property
+    def end_time(self):
+        """The latest indexed time in seconds, or None if no point has a time."""
+        return float(self._times[-1]) if len(self._times) else None
+
+    def window(self, start=None, end=None):
+        """The positions of the indexed points with times from start to end inclusive.
+
+        Args:
+            start, end: The bounds of the window as datetimes or seconds, or
+                None for no bound.
+
+        Returns:
+            A read-only array of positions in order of time, which is a view
+            of the positions of the index.
+        """
+        first, last = self._bounds(start, end)
+        return self._positions[first:last]
+
+    def segment_window(self, segment, start=None, end=None):
+        """The points of a segment with times from start to end inclusive.
+
+        Args:
+            segment: The segment from which this index was built, or one with
+                the same number of points.
+
+            start, end: The bounds of the window as datetimes or seconds, or
+                None for no bound.
+
+        Returns:
+            A new segment of the same class, with the same extensions,
+            containing the points in order of time.
+
+        Raises:
+            ValueError: The segment is not the length of the one from which
+                this index was built.
+        """
+        if (len(segment.points),) != self._segment_lengths:
+            raise ValueError("Segment has {0} points, but the time index has {1}".format(
+                len(segment.points), list(self._segment_lengths)))
+        return self._select(segment, self.window(start, end))
+
+    def track_window(self, track, start=None, end=None):
+        """The points of a track with times from start to end inclusive.
+
+        Args:
+            track: The track from which this index was built, or one with the
+                same number of points in each segment.
+
+            start, end: The bounds of the window as datetimes or seconds, or
+                None for no bound.
+
+        Returns:
+            A new Track, with the same name and other fields, containing a
+            segment for each segment with points in the window.
+
+        Raises:
+            ValueError: The segments of the track are not the lengths of
+                those from which this index was built.
+        """
+        lengths = tuple(len(segment.points) for segment in track.segments)
+        if lengths != self._segment_lengths:
+            raise ValueError("Track has segments of {0} points, but the time index has {1}".format(
+                list(lengths), list(self._segment_lengths)))
+        positions = self.window(start, end)
+        segment_indices = numpy.searchsorted(self._offsets, positions, side='right') - 1
+        segments = []
+        for segment_index in numpy.unique(segment_indices).tolist():
+            selected = positions[segment_indices == segment_index] - self._offsets[segment_index]
+            segments.append(self._select(track.segments[segment_index], selected))
+        return Track(track.name, track.comment, track.description, track.source, track.links, track.number,
+                     track.classification, track.extensions, segments)
+
+    def interpolate(self, times):
+        """The positions of the track at a series of times.
+
+        Latitudes, longitudes and elevations are interpolated linearly in
+        time between the indexed points either side of each time, taking
+        the shorter way around in longitude.
+
+        Args:
+            times: An array of seconds, or a sequence of datetimes.
+
+        Returns:
+            A PointArrays of the interpolated values at the given times,
+            which are NaN for times outside the indexed times, and for
+            elevations where either point has none.
+        """
+        times = _seconds_array(times)
+        count = len(self._times)
+        if not count:
+            nan = numpy.full(len(times), numpy.nan)
+            return PointArrays(nan, nan.copy(), nan.copy(), times)
+        after = numpy.clip(numpy.searchsorted(self._times, times, side='right'), 1, max(count - 1, 1))
+        before = after - 1
+        if count == 1:
+            after = before
+        interval = self._times[after] - self._times[before]
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            fraction = numpy.where(interval > 0, (times - self._times[before]) / interval, 0.0)
+        outside = (times < self._times[0]) | (times > self._times[-1]) | numpy.isnan(times)
+        fraction[outside] = numpy.nan
+
+        first = self._positions[before]
+        second = self._positions[after]
+        latitudes = _interpolate(self._arrays.latitude[first], self._arrays.latitude[second], fraction)
+        longitude_steps = (self._arrays.longitude[second] - self._arrays.longitude[first] + 180) % 360 - 180
+        longitudes = (self._arrays.longitude[first] + fraction * longitude_steps + 180) % 360 - 180
+        elevations = _interpolate(self._arrays.elevation[first], self._arrays.elevation[second], fraction)
+        return PointArrays(latitudes, longitudes, elevations, times)
+
+    def position_at(self, time):
+        """The position of the track at a time.
+
+        Args:
+            time: A datetime or seconds.
+
+        Returns:
+            A tuple of the interpolated latitude, longitude and elevation,
+            with an elevation of None if it is unknown, or None if the time is
+            outside the indexed times.
+        """
+        arrays = self.interpolate([time])
+        latitude = float(arrays.latitude[0])
+        if numpy.isnan(latitude):
+            return None
+        elevation = float(arrays.elevation[0])
+        return latitude, float(arrays.longitude[0]), None if numpy.isnan(elevation) else elevation
+
+    def _bounds(self, start, end):
+        first = 0 if start is None else int(numpy.searchsorted(self._times, _seconds(start), side='left'))
+        last = len(self._times) if end is None else int(numpy.searchsorted(self._times, _seconds(end),
+                                                                           side='right'))
+        return first, max(first, last)
+
+    def _select(self, segment, indices):
+        """The points of a segment at indices, as a view if they are consecutive."""
+        consecutive = self._increasing and (not len(indices) or indices[-1] - indices[0] + 1 == len(indices))
+        if consecutive:
+            start = int(indices[0]) if len(indices) else 0
+            stop = start + len(indices)
+            if isinstance(segment, ColumnarSegment):
+                return segment.slice(start, stop)
+            return Segment(segment.points[start:stop], segment.extensions)
+        if isinstance(segment, ColumnarSegment):
+            return segment.take(indices)
+        points = segment.points
+        return Segment([points[index] for index in indices.tolist()], segment.extensions)
+
+
+def _interpolate(first, second, fraction):
+    """Interpolate linearly, taking the first values exactly where the fraction is zero."""
+    return numpy.where(fraction == 0, first, first + fraction * (second - first))
+
+
+def _seconds(time):
+    if isinstance(time, datetime):
+        return epoch_seconds(time)
+    return float(time)
+
+
+def _seconds_array(times):
+    if isinstance(times, numpy.ndarray):
+        if numpy.issubdtype(times.dtype, numpy.datetime64):
+            return times.astype('datetime64[us]').astype(numpy.int64) / 1e6
+        return times.astype(numpy.float64)
+    return numpy.fromiter(map(_seconds, times), dtype=numpy.float64)
@@ -1,33 +1,41 @@
 from decimal import Decimal
 
 class Bounds:
+    """The extent of the points in a GPX file, with Decimal coordinates."""
+
+    __slots__ = ('_minimum_latitude', '_minimum_longitude',
+                 '_maximum_latitude', '_maximum_longitude')
+
+    number = Decimal
 
     def __init__(self, minimum_latitude, minimum_longitude,
                        maximum_latitude, maximum_longitude):
 
-        self._minimum_latitude = Decimal(minimum_latitude)
+        number = self.number
+
+        self._minimum_latitude = number(minimum_latitude)
         if not -90 <= self._minimum_latitude <= +90:
-            raise ValueError("Minimum latitude {0} not in range -90 <= latitude <= +90")
+            raise ValueError("Minimum latitude {0} not in range -90 <= latitude <= +90".format(self._minimum_latitude))
 
-        self._minimum_longitude = Decimal(minimum_longitude)
+        self._minimum_longitude = number(minimum_longitude)
 
-        if self._minimum_latitude == 180:
-            self._minimum_latitude = Decimal(-180)
+        if self._minimum_longitude == 180:
+            self._minimum_longitude = number(-180)
 
         if not -180 <= self._minimum_longitude < +180:
-            raise ValueError("Minimum longitude {0} not in range -180 <= longitude < +180")
+            raise ValueError("Minimum longitude {0} not in range -180 <= longitude < +180".format(self._minimum_longitude))
 
-        self._maximum_latitude = Decimal(maximum_latitude)
+        self._maximum_latitude = number(maximum_latitude)
         if not -90 <= self._maximum_latitude <= +90:
-            raise ValueError("Maximum latitude {0} not in range -90 <= latitude <= +90")
+            raise ValueError("Maximum latitude {0} not in range -90 <= latitude <= +90".format(self._maximum_latitude))
 
-        self._maximum_longitude = Decimal(maximum_longitude)
+        self._maximum_longitude = number(maximum_longitude)
 
         if self._maximum_longitude == 180:
-            self._maximum_longitude = Decimal(-180)
+            self._maximum_longitude = number(-180)
 
         if not -180 <= self._maximum_longitude < +180:
-            raise ValueError("Maximum longitude {0} not in range -180 <= longitude < +180")
+            raise ValueError("Maximum longitude {0} not in range -180 <= longitude < +180".format(self._maximum_longitude))
 
         if not self._minimum_latitude <= self._maximum_latitude:
             raise ValueError("Minimum latitude {0} is greater than maximum_latitude {1}".format(self._minimum_latitude, self._maximum_latitude))
@@ -50,3 +58,11 @@ class Bounds:
     @property
     def maximum_longitude(self):
         return self._maximum_longitude
+
+
+class FloatBounds(Bounds):
+    """Bounds with float coordinates."""
+
+    __slots__ = ()
+
+    number = float
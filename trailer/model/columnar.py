@@ -0,0 +1,624 @@
+"""A column-oriented representation of track segments.
+
+A ColumnarSegment holds the values of its points in contiguous NumPy arrays,
+one per field, rather than as a list of Waypoint objects. The numeric fields
+and times are stored densely, with a boolean mask recording which points have
+a value; the rarely used text fields, links and extensions are stored
+sparsely by point index. Waypoints are materialised on demand when the
+points are accessed individually.
+
+When the Waypoints have Decimal numbers, the exponent of each decimal value
+is kept alongside its float, so the Decimals materialised have the digits
+originally read, including trailing zeros. The few values with more
+significant digits than a float can hold are kept exactly.
+
+This module requires NumPy.
+"""
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import numpy
+
+from trailer.model.fieldtools import make_list, make_time
+from trailer.model.fix import Fix
+from trailer.model.segment import Segment
+from trailer.model.timestamps import fixed_timezone
+from trailer.model.waypoint import Waypoint
+
+__author__ = 'rjs'
+
+FLOAT_COLUMNS = ('latitude', 'longitude', 'elevation', 'magvar', 'geoid_height',
+                 'hdop', 'vdop', 'pdop', 'seconds_since_dgps_update', 'speed',
+                 'course')
+
+INTEGER_COLUMNS = ('num_satellites', 'dgps_station_type')
+
+TIME_COLUMN = 'time'
+
+COLUMNS = FLOAT_COLUMNS + INTEGER_COLUMNS + (TIME_COLUMN,)
+
+SPARSE_FIELDS = ('name', 'comment', 'description', 'source', 'links', 'symbol',
+                 'classification', 'fix', 'extensions')
+
+# Lower and upper limits, and whether the upper limit is inclusive, matching
+# the checks in Waypoint.
+COLUMN_RANGES = {
+    'latitude': (-90, 90, True),
+    'longitude': (-180, 180, False),
+    'magvar': (0, 360, False),
+    'num_satellites': (0, numpy.inf, False),
+    'dgps_station_type': (0, 1023, True),
+    'course': (0, 360, False),
+}
+
+LIST_FIELDS = ('links', 'extensions')
+
+SPARSE_CONVERSIONS = {
+    'links': list,
+    'extensions': list,
+    'fix': Fix,
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+UTC_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+# Absent time offsets, which indicate naive times, are stored as this value.
+NAIVE = numpy.iinfo(numpy.int32).min
+
+# Decimal exponents are stored as this value for points whose Decimal is
+# not rebuilt from its float, because it is absent or held exactly.
+NO_EXPONENT = numpy.iinfo(numpy.int8).min
+
+# The most significant digits of a decimal number which always survive
+# conversion to a float and back through its shortest repr.
+FLOAT_DIGITS = 15
+
+
+class ColumnarSegment(Segment):
+    """An ordered list of track points stored as columns.
+
+    A ColumnarSegment can be used anywhere a Segment can, but its points
+    sequence is read-only and creates a new Waypoint each time a point is
+    accessed. Bulk access to the values should use column() and present().
+    """
+
+    def __init__(self, columns, masks=None, sparse=None, extensions=None,
+                 waypoint_type=Waypoint, decimals=None):
+        """Initialise a ColumnarSegment from arrays.
+
+        Most clients will use ColumnarSegmentBuilder, from_points() or a
+        reader rather than calling this directly.
+
+        Args:
+            columns: A dictionary mapping names from COLUMNS to one-dimensional
+                arrays of equal length. 'latitude' and 'longitude' are
+                required. Times are numpy.datetime64 values in UTC, or in
+                local time for naive times, accompanied by an optional
+                'time_offset' column of int32 offsets from UTC in minutes,
+                in which NAIVE marks a naive time.
+
+            masks: An optional dictionary mapping column names to boolean
+                arrays which are True where the point has a value. Columns
+                without a mask have a value for every point.
+
+            sparse: An optional dictionary mapping names from SPARSE_FIELDS
+                to dictionaries from point index to value.
+
+            extensions: The extensions of the segment itself.
+
+            waypoint_type: The class of the Waypoints materialised from the
+                columns, such as Waypoint or FloatWaypoint.
+
+            decimals: An optional dictionary mapping names from FLOAT_COLUMNS
+                to pairs of an int8 array of the exponent of the decimal value
+                of each point, or NO_EXPONENT, and a dictionary from point
+                index to the exact Decimal of values with more significant
+                digits than a float holds, as made by decimal_digits(). The
+                Decimals of the materialised Waypoints then have the digits
+                originally read, including trailing zeros.
+        """
+        self._columns = dict(columns)
+        self._masks = dict(masks) if masks is not None else {}
+        self._sparse = dict(sparse) if sparse is not None else {}
+        self._decimals = dict(decimals) if decimals is not None else {}
+        self._extensions = make_list(extensions)
+        self._length = len(self._columns['latitude'])
+        if len(self._columns['longitude']) != self._length:
+            raise ValueError("Latitude and longitude columns have different lengths")
+        self._waypoint_type = waypoint_type
+        self._points = ColumnarPoints(self)
+
+    @classmethod
+    def from_points(cls, points, extensions=None, waypoint_type=Waypoint):
+        """Create a ColumnarSegment from an iterable series of Waypoints."""
+        builder = ColumnarSegmentBuilder()
+        for point in points:
+            builder.append_waypoint(point)
+        return builder.build(extensions, waypoint_type)
+
+    @classmethod
+    def from_fields(cls, point_fields, extensions=None, waypoint_type=Waypoint):
+        """Create a ColumnarSegment from point values without creating Waypoints.
+
+        Args:
+            point_fields: An iterable series of (latitude, longitude, fields)
+                triples, where fields is a dictionary of other Waypoint
+                keyword arguments. Values may be text.
+
+            extensions: The extensions of the segment itself.
+
+            waypoint_type: The class of the Waypoints materialised from the
+                columns.
+        """
+        builder = ColumnarSegmentBuilder()
+        for latitude, longitude, fields in point_fields:
+            builder.append(latitude, longitude, **fields)
+        return builder.build(extensions, waypoint_type)
+
+    @classmethod
+    def concatenate(cls, segments, extensions=None, waypoint_type=None):
+        """Create a ColumnarSegment from the points of several, in order.
+
+        Args:
+            segments: An iterable series of ColumnarSegments.
+
+            extensions: The extensions of the new segment. The extensions of
+                the concatenated segments are not included.
+
+            waypoint_type: The class of the Waypoints materialised from the
+                columns. If None, (the default) the waypoint type of the
+                first segment is used.
+        """
+        segments = list(segments)
+        if waypoint_type is None:
+            waypoint_type = segments[0].waypoint_type if segments else Waypoint
+        if not segments:
+            return ColumnarSegmentBuilder().build(extensions, waypoint_type)
+
+        columns = {}
+        masks = {}
+        for name in COLUMNS:
+            if not any(name in segment._columns for segment in segments):
+                continue
+            columns[name] = numpy.concatenate([segment.column(name) for segment in segments])
+            mask = numpy.concatenate([segment.present(name) for segment in segments])
+            if not mask.all():
+                masks[name] = mask
+
+        if any('time_offset' in segment._columns for segment in segments):
+            columns['time_offset'] = numpy.concatenate([
+                segment._columns.get('time_offset', numpy.full(len(segment), NAIVE, dtype=numpy.int32))
+                for segment in segments])
+
+        sparse = {}
+        start = 0
+        for segment in segments:
+            for name, values in segment._sparse.items():
+                field = sparse.setdefault(name, {})
+                for index, value in values.items():
+                    field[start + index] = value
+            start += len(segment)
+
+        decimals = {}
+        for name in FLOAT_COLUMNS:
+            if not any(name in segment._decimals for segment in segments):
+                continue
+            exponents = []
+            exact = {}
+            start = 0
+            for segment in segments:
+                segment_exponents, segment_exact = segment._decimals.get(name, (None, {}))
+                if segment_exponents is None:
+                    segment_exponents = numpy.full(len(segment), NO_EXPONENT, dtype=numpy.int8)
+                exponents.append(segment_exponents)
+                for index, value in segment_exact.items():
+                    exact[start + index] = value
+                start += len(segment)
+            decimals[name] = (numpy.concatenate(exponents), exact)
+
+        return cls(columns, masks, sparse, extensions, waypoint_type, decimals)
+
+    @property
+    def points(self):
+        """A read-only sequence of Waypoints, created on demand."""
+        return self._points
+
+    def __len__(self):
+        return self._length
+
+    def column_names(self):
+        """The names of the columns for which at least one point has a value."""
+        return [name for name in COLUMNS if name in self._columns]
+
+    def column(self, name):
+        """The values of a field for all points as a NumPy array.
+
+        Floating point columns contain NaN, integer columns zero, and the
+        time column NaT, for points without a value.
+
+        Args:
+            name: One of the names in COLUMNS.
+        """
+        try:
+            return self._columns[name]
+        except KeyError:
+            if name not in COLUMNS:
+                raise ValueError("No column named {0!r}".format(name))
+            return _empty_column(name, self._length)
+
+    def present(self, name):
+        """A boolean array which is True for points which have a value for a field.
+
+        Args:
+            name: One of the names in COLUMNS.
+        """
+        if name not in self._columns:
+            if name not in COLUMNS:
+                raise ValueError("No column named {0!r}".format(name))
+            return numpy.zeros(self._length, dtype=bool)
+        mask = self._masks.get(name)
+        return mask if mask is not None else numpy.ones(self._length, dtype=bool)
+
+    def masked(self, name):
+        """The values of a field as a NumPy masked array."""
+        return numpy.ma.MaskedArray(self.column(name), mask=~self.present(name))
+
+    def time_offsets(self):
+        """The offsets from UTC of the times of all points, as an int32 array of minutes.
+
+        NAIVE marks points with a naive time, or without a time.
+        """
+        offsets = self._columns.get('time_offset')
+        if offsets is None:
+            return numpy.full(self._length, NAIVE, dtype=numpy.int32)
+        return offsets
+
+    def sparse(self, name):
+        """The values of a sparse field, as a read-only dictionary from point index to value.
+
+        Args:
+            name: One of the names in SPARSE_FIELDS.
+        """
+        if name not in SPARSE_FIELDS:
+            raise ValueError("No sparse field named {0!r}".format(name))
+        return self._sparse.get(name, {})
+
+    def digits(self, name):
+        """The digits of the Decimals of a field which its floats do not keep.
+
+        Args:
+            name: One of the names in FLOAT_COLUMNS.
+
+        Returns:
+            A pair of an int8 array of exponents and a dictionary of exact
+            Decimals, as made by decimal_digits(), or None if they were not
+            recorded, when the Decimals are those of the shortest reprs of
+            the floats.
+        """
+        if name not in FLOAT_COLUMNS:
+            raise ValueError("No float column named {0!r}".format(name))
+        return self._decimals.get(name)
+
+    def take(self, indices, extensions=None):
+        """Create a ColumnarSegment from a selection of the points, without creating Waypoints.
+
+        Args:
+            indices: An array of point indices, or a boolean array which is
+                True for the points to select.
+
+            extensions: The extensions of the new segment. If None, (the
+                default) those of this segment are used.
+        """
+        indices = numpy.asarray(indices)
+        if indices.dtype == bool:
+            indices = numpy.flatnonzero(indices)
+        indices = indices.astype(numpy.intp, copy=False)
+        columns = {name: values[indices] for name, values in self._columns.items()}
+        masks = {}
+        for name, mask in self._masks.items():
+            mask = mask[indices]
+            if not mask.all():
+                masks[name] = mask
+        sparse = {}
+        decimals = {}
+        if self._sparse or any(exact for _, exact in self._decimals.values()):
+            positions = {index: position for position, index in enumerate(indices.tolist())}
+            for name, values in self._sparse.items():
+                selected = {positions[index]: value for index, value in values.items() if index in positions}
+                if selected:
+                    sparse[name] = selected
+            for name, (exponents, exact) in self._decimals.items():
+                decimals[name] = (exponents[indices], {positions[index]: value for index, value in exact.items()
+                                                       if index in positions})
+        else:
+            decimals = {name: (exponents[indices], {}) for name, (exponents, _) in self._decimals.items()}
+        return ColumnarSegment(columns, masks, sparse,
+                               self._extensions if extensions is None else extensions,
+                               self._waypoint_type, decimals)
+
+    def slice(self, start, stop, extensions=None):
+        """Create a ColumnarSegment of a range of the points, without copying the columns.
+
+        The columns of the new segment are views of those of this segment,
+        so the cost does not depend on the number of points in the range.
+
+        Args:
+            start, stop: The range of point indices, as for slicing a list.
+
+            extensions: The extensions of the new segment. If None, (the
+                default) those of this segment are used.
+        """
+        start, stop, _ = slice(start, stop).indices(self._length)
+        stop = max(start, stop)
+        columns = {name: values[start:stop] for name, values in self._columns.items()}
+        masks = {name: mask[start:stop] for name, mask in self._masks.items()}
+        sparse = {}
+        for name, values in self._sparse.items():
+            selected = {index - start: value for index, value in values.items() if start <= index < stop}
+            if selected:
+                sparse[name] = selected
+        decimals = {name: (exponents[start:stop],
+                           {index - start: value for index, value in exact.items() if start <= index < stop})
+                    for name, (exponents, exact) in self._decimals.items()}
+        return ColumnarSegment(columns, masks, sparse,
+                               self._extensions if extensions is None else extensions,
+                               self._waypoint_type, decimals)
+
+    def to_segment(self):
+        """Create an equivalent Segment with a list of Waypoints."""
+        return Segment(list(self._points), self._extensions)
+
+    @property
+    def waypoint_type(self):
+        """The class of the Waypoints in the points sequence."""
+        return self._waypoint_type
+
+    def _waypoint(self, index):
+        fields = {}
+        for name, values in self._columns.items():
+            if name == 'time_offset':
+                continue
+            mask = self._masks.get(name)
+            if mask is not None and not mask[index]:
+                continue
+            fields[name] = values[index]
+
+        # Decimals are rebuilt from the shortest repr of each float, with the
+        # exponent originally read, so they have the digits originally read,
+        # unless there were too many for a float, when they are held exactly.
+        number = self._waypoint_type.number
+        for name in FLOAT_COLUMNS:
+            if name not in fields:
+                continue
+            if number is float:
+                fields[name] = float(fields[name])
+                continue
+            text = repr(float(fields[name]))
+            digits = self._decimals.get(name)
+            if digits is not None:
+                exponents, exact = digits
+                exponent = int(exponents[index])
+                if exponent != NO_EXPONENT:
+                    fields[name] = number(Decimal(text).quantize(Decimal((0, (1,), exponent))))
+                    continue
+                if index in exact:
+                    fields[name] = number(exact[index])
+                    continue
+            fields[name] = number(text)
+        for name in INTEGER_COLUMNS:
+            if name in fields:
+                fields[name] = int(fields[name])
+        if TIME_COLUMN in fields:
+            fields[TIME_COLUMN] = self._time(index)
+
+        for name, values in self._sparse.items():
+            value = values.get(index)
+            if value is not None:
+                fields[name] = value
+
+        return self._waypoint_type(**fields)
+
+    def _time(self, index):
+        microseconds = int(self._columns[TIME_COLUMN][index].astype(numpy.int64))
+        offsets = self._columns.get('time_offset')
+        offset = int(offsets[index]) if offsets is not None else NAIVE
+        if offset == NAIVE:
+            return EPOCH + microseconds * ONE_MICROSECOND
+        return (UTC_EPOCH + microseconds * ONE_MICROSECOND).astimezone(fixed_timezone(offset))
+
+
+class ColumnarPoints(Sequence):
+    """A read-only sequence view of the points of a ColumnarSegment."""
+
+    def __init__(self, segment):
+        self._segment = segment
+
+    def __len__(self):
+        return len(self._segment)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._segment._waypoint(i) for i in range(*index.indices(len(self)))]
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("Point index out of range")
+        return self._segment._waypoint(index)
+
+    def __iter__(self):
+        waypoint = self._segment._waypoint
+        for index in range(len(self)):
+            yield waypoint(index)
+
+
+class ColumnarSegmentBuilder:
+    """Accumulates point values and builds a ColumnarSegment.
+
+    Values may be supplied as text, as read from a GPX document, or as the
+    types used by Waypoint.
+    """
+
+    def __init__(self):
+        self._rows = []
+
+    def __len__(self):
+        return len(self._rows)
+
+    def append(self, latitude, longitude, **fields):
+        """Add a point.
+
+        Args:
+            latitude: The latitude of the point.
+            longitude: The longitude of the point.
+            **fields: Any of the other keyword arguments accepted by Waypoint.
+        """
+        self._rows.append((latitude, longitude, fields))
+
+    def append_waypoint(self, waypoint):
+        """Add a point from a Waypoint."""
+        fields = {name: getattr(waypoint, name) for name in COLUMNS[2:] + SPARSE_FIELDS}
+        self.append(waypoint.latitude, waypoint.longitude, **fields)
+
+    def build(self, extensions=None, waypoint_type=Waypoint):
+        """Create a ColumnarSegment from the points added so far.
+
+        Args:
+            extensions: The extensions of the segment itself.
+
+            waypoint_type: The class of the Waypoints materialised from the
+                columns.
+
+        Raises:
+            ValueError: A value is out of range or could not be converted.
+        """
+        rows = self._rows
+        columns = {
+            'latitude': numpy.array([float(row[0]) for row in rows], dtype=numpy.float64),
+            'longitude': numpy.array([float(row[1]) for row in rows], dtype=numpy.float64),
+        }
+        masks = {}
+
+        for name in FLOAT_COLUMNS[2:] + INTEGER_COLUMNS:
+            values = [row[2].get(name) for row in rows]
+            mask = numpy.fromiter((value is not None for value in values), dtype=bool, count=len(values))
+            if not mask.any():
+                continue
+            if name in INTEGER_COLUMNS:
+                columns[name] = numpy.array([int(value) if value is not None else 0 for value in values],
+                                            dtype=numpy.int32)
+            else:
+                columns[name] = numpy.array([float(value) if value is not None else numpy.nan for value in values],
+                                            dtype=numpy.float64)
+            if not mask.all():
+                masks[name] = mask
+
+        self._build_times(rows, columns, masks)
+
+        for name, (lower, upper, inclusive) in COLUMN_RANGES.items():
+            if name in columns:
+                values = columns[name][masks[name]] if name in masks else columns[name]
+                below_upper = values <= upper if inclusive else values < upper
+                if not numpy.all((lower <= values) & below_upper):
+                    raise ValueError("{0} values not in range {1} <= {0} {2} {3}".format(
+                                     name, lower, '<=' if inclusive else '<', upper))
+
+        decimals = {}
+        if waypoint_type.number is not float:
+            decimals['latitude'] = decimal_digits([row[0] for row in rows])
+            decimals['longitude'] = decimal_digits([row[1] for row in rows])
+            for name in FLOAT_COLUMNS[2:]:
+                if name in columns:
+                    decimals[name] = decimal_digits([row[2].get(name) for row in rows])
+
+        sparse = {}
+        for name in SPARSE_FIELDS:
+            convert = SPARSE_CONVERSIONS.get(name, str)
+            is_list = name in LIST_FIELDS
+            values = {}
+            for index, row in enumerate(rows):
+                value = row[2].get(name)
+                # Empty lists of links or extensions are not worth storing.
+                if value is None or (is_list and not value):
+                    continue
+                values[index] = convert(value)
+            if values:
+                sparse[name] = values
+
+        return ColumnarSegment(columns, masks, sparse, extensions, waypoint_type, decimals)
+
+    @staticmethod
+    def _build_times(rows, columns, masks):
+        times = [row[2].get(TIME_COLUMN) for row in rows]
+        mask = numpy.fromiter((time is not None for time in times), dtype=bool, count=len(times))
+        if not mask.any():
+            return
+
+        microseconds = numpy.zeros(len(times), dtype=numpy.int64)
+        offsets = numpy.full(len(times), NAIVE, dtype=numpy.int32)
+        for index, time in enumerate(times):
+            if time is None:
+                continue
+            time = make_time(time)
+            offset = time.utcoffset()
+            if offset is None:
+                microseconds[index] = (time - EPOCH) // ONE_MICROSECOND
+            else:
+                microseconds[index] = (time - UTC_EPOCH) // ONE_MICROSECOND
+                offsets[index] = offset // timedelta(minutes=1)
+
+        columns[TIME_COLUMN] = microseconds.view('datetime64[us]')
+        columns[TIME_COLUMN][~mask] = numpy.datetime64('NaT')
+        if not (offsets == NAIVE).all():
+            columns['time_offset'] = offsets
+        if not mask.all():
+            masks[TIME_COLUMN] = mask
+
+
+def decimal_digits(values):
+    """Record the digits of decimal values which their floats do not keep.
+
+    Args:
+        values: A sequence of numbers, as text or Decimals, or None for points
+            without a value.
+
+    Returns:
+        A pair of an int8 array of the exponent of each value, or NO_EXPONENT
+        for absent values and for values with more than FLOAT_DIGITS
+        significant digits, and a dictionary from index to the Decimal of
+        each of the latter.
+    """
+    exponents = numpy.full(len(values), NO_EXPONENT, dtype=numpy.int8)
+    exact = {}
+    for index, value in enumerate(values):
+        if value is None or value.__class__ is float:
+            continue
+        if isinstance(value, str):
+            # Plain decimal text, as almost all GPX numbers are, is measured
+            # without the expense of a Decimal.
+            whole, _, fraction = value.strip().lstrip('+-').partition('.')
+            digits = whole + fraction
+            if digits.isdigit() and digits.isascii() and len(fraction) < 128 \
+                    and len(digits.lstrip('0')) <= FLOAT_DIGITS:
+                exponents[index] = -len(fraction)
+                continue
+        if not isinstance(value, Decimal):
+            value = Decimal(value.strip() if isinstance(value, str) else value)
+        _, digits, exponent = value.as_tuple()
+        if len(digits) <= FLOAT_DIGITS and isinstance(exponent, int) and NO_EXPONENT < exponent <= 127:
+            exponents[index] = exponent
+        else:
+            exact[index] = value
+    return exponents, exact
+
+
+def _empty_column(name, length):
+    if name == TIME_COLUMN:
+        return numpy.full(length, numpy.datetime64('NaT'), dtype='datetime64[us]')
+    if name in INTEGER_COLUMNS:
+        return numpy.zeros(length, dtype=numpy.int32)
+    return numpy.full(length, numpy.nan, dtype=numpy.float64)
@@ -3,6 +3,8 @@ from trailer.model.year import Year
 
 class Copyright:
 
+    __slots__ = ('_author', '_year', '_license')
+
     def __init__(self, author, year=None, license=None):
         self._author = str(author)
         self._year = nullable(Year)(year)
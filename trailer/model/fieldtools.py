@@ -1,5 +1,5 @@
 from datetime import datetime
-import dateutil.parser
+from trailer.model.timestamps import parse_datetime
 
 def make(t):
     return lambda items: t(items) if items is not None else t()
@@ -8,7 +8,7 @@ make_list = make(list)
 
 
 def make_time(time):
-    return time if isinstance(time, datetime) else dateutil.parser.parse(time)
+    return time if isinstance(time, datetime) else parse_datetime(time)
 
 
 
@@ -2,6 +2,8 @@ __author__ = 'rjs'
 
 class Fix:
 
+    __slots__ = ('_value',)
+
     PERMITTED = frozenset(('2d', '3d', 'dgps', 'pps'))
 
     def __init__(self, value):
@@ -2,6 +2,9 @@ from trailer.model.fieldtools import make_list
 
 class GpxModel:
 
+    __slots__ = ('_creator', '_metadata', '_waypoints', '_routes', '_tracks',
+                 '_extensions')
+
     def __init__(self, creator, metadata=None, waypoints=None, routes=None,
                  tracks=None, extensions=None):
         self._creator = creator
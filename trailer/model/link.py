@@ -4,6 +4,8 @@ class Link:
     """A link to an external resource (Web page, digital photo, video clip,
     etc) with additional information."""
 
+    __slots__ = ('_href', '_text', '_mime')
+
     def __init__(self, href, text=None, mime=None):
         self._href = str(href)
         self._text = nullable(str)(text)
@@ -9,6 +9,8 @@ class Metadata:
     GPX files allows others to search for and use your GPS data.
     """
 
+    __slots__ = ('_name', '_description', '_author', '_copyright', '_links',
+                 '_time', '_keywords', '_bounds', '_extensions')
 
     def __init__(self, name=None, description=None, author=None,
                  copyright=None, links=None, time=None, keywords=None,
@@ -2,6 +2,8 @@ from trailer.model.fieldtools import nullable
 
 class Person:
 
+    __slots__ = ('_name', '_email', '_link')
+
     def __init__(self, name=None, email=None, link=None):
 
         self._name = nullable(str)(name)
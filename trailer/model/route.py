@@ -2,6 +2,9 @@ from trailer.model.fieldtools import make, nullable, make_list
 
 class Route:
 
+    __slots__ = ('_name', '_comment', '_description', '_source', '_links',
+                 '_number', '_classification', '_extensions', '_points')
+
     def __init__(self, name=None, comment=None, description=None, source=None,
                  links=None, number=None, classification=None,
                  extensions=None, points=None):
@@ -10,6 +10,9 @@ class Segment:
     was lost, or the GPS receiver was turned off, start a new Track Segment
     for each continuous span of track data.
     """
+
+    __slots__ = ('_points', '_extensions', '__weakref__')
+
     def __init__(self, points=None, extensions=None):
         self._points = make_list(points)
         self._extensions = make_list(extensions)
@@ -0,0 +1,108 @@
+"""Parsing of xsd:dateTime timestamps.
+
+GPX timestamps are xsd:dateTime values, which are a small, regular subset of
+ISO 8601. Parsing them with a dedicated regular expression is many times
+faster than the general purpose dateutil parser. Any text which does not
+conform is passed on to dateutil, and the number of times that happens is
+counted so the fallback rate can be monitored.
+"""
+from datetime import datetime, timedelta, timezone
+import re
+from threading import Lock
+
+import dateutil.parser
+
+__author__ = 'rjs'
+
+XSD_DATETIME_REGEX = re.compile(
+    r'\s*(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d+))?'
+    r'(?:(Z)|([+-])(\d\d):(\d\d))?\s*\Z')
+
+_timezones = {0: timezone.utc}
+
+# Documents may be parsed in several threads at once.
+_fallback_lock = Lock()
+
+_fallback_count = 0
+
+
+def parse_datetime(text):
+    """Parse an xsd:dateTime string into a datetime.
+
+    Timestamps with a 'Z' suffix or a numeric offset produce aware datetimes
+    with a shared timezone instance for each distinct offset. Timestamps
+    without a timezone produce naive datetimes. Fractional seconds beyond
+    microsecond precision are truncated.
+
+    Args:
+        text: A string such as '2012-11-26T19:55:57Z',
+            '2012-11-26T20:55:57.250+01:00' or '2012-11-26T19:55:57'.
+
+    Returns:
+        A datetime.
+
+    Raises:
+        ValueError: The text could not be parsed as a date and time by either
+            this parser or dateutil.
+    """
+    match = XSD_DATETIME_REGEX.match(text)
+    if match is None:
+        return _fallback_parse(text)
+
+    (year, month, day, hour, minute, second, fraction,
+     utc, sign, offset_hours, offset_minutes) = match.groups()
+
+    microsecond = int(fraction[:6].ljust(6, '0')) if fraction else 0
+
+    try:
+        if utc is not None:
+            tzinfo = timezone.utc
+        elif sign is not None:
+            offset = int(offset_hours) * 60 + int(offset_minutes)
+            tzinfo = fixed_timezone(-offset if sign == '-' else offset)
+        else:
+            tzinfo = None
+        return datetime(int(year), int(month), int(day), int(hour),
+                        int(minute), int(second), microsecond, tzinfo)
+    except ValueError:
+        # For example, the xsd:dateTime 24:00:00 end-of-day form, a leap
+        # second or an out-of-range offset.
+        return _fallback_parse(text)
+
+
+def fallback_count():
+    """The number of timestamps passed to dateutil by parse_datetime()."""
+    return _fallback_count
+
+
+def reset_fallback_count():
+    """Reset the count of timestamps passed to dateutil to zero.
+
+    Returns:
+        The count before it was reset.
+    """
+    global _fallback_count
+    with _fallback_lock:
+        count = _fallback_count
+        _fallback_count = 0
+    return count
+
+
+def fixed_timezone(offset_minutes):
+    """A shared timezone instance for a fixed offset from UTC.
+
+    Args:
+        offset_minutes: The offset from UTC in minutes, east positive.
+    """
+    try:
+        return _timezones[offset_minutes]
+    except KeyError:
+        tzinfo = timezone(timedelta(minutes=offset_minutes))
+        return _timezones.setdefault(offset_minutes, tzinfo)
+
+
+def _fallback_parse(text):
+    global _fallback_count
+    with _fallback_lock:
+        _fallback_count += 1
+    return dateutil.parser.parse(text)
@@ -1,8 +1,113 @@
 from decimal import Decimal
+from operator import attrgetter
 from trailer.model.fix import Fix
 from trailer.model.fieldtools import nullable, make_list, make_time
 
+
+def field_conversions(number):
+    """Build the conversion applied to each Waypoint constructor argument.
+
+    Args:
+        number: The type used to represent non-integral numbers, such as
+            Decimal or float.
+
+    Returns:
+        A dictionary mapping argument names to conversion functions which
+        also validate the range of the value.
+    """
+    nullable_number = nullable(number)
+
+    def make_latitude(value):
+        latitude = number(value)
+        if not -90 <= latitude <= +90:
+            raise ValueError("Latitude {0} not in range -90 <= latitude <= +90".format(latitude))
+        return latitude
+
+    def make_longitude(value):
+        longitude = number(value)
+        if not -180 <= longitude < +180:
+            raise ValueError("Longitude {0} not in range -180 <= longitude < +180".format(longitude))
+        return longitude
+
+    def make_magvar(value):
+        magvar = nullable_number(value)
+        if magvar is not None:
+            if not 0 <= magvar < 360:
+                raise ValueError("Magnetic variation {0} not in range 0 <= magvar < 360".format(magvar))
+        return magvar
+
+    def make_course(value):
+        course = nullable_number(value)
+        if course is not None:
+            if not 0 <= course < 360:
+                raise ValueError("Course {0} not in range 0 <= course < 360".format(course))
+        return course
+
+    return {
+        'latitude': make_latitude,
+        'longitude': make_longitude,
+        'elevation': nullable_number,
+        'time': nullable(make_time),
+        'magvar': make_magvar,
+        'geoid_height': nullable_number,
+        'name': nullable(str),
+        'comment': nullable(str),
+        'description': nullable(str),
+        'source': nullable(str),
+        'links': make_list,
+        'symbol': nullable(str),
+        'classification': nullable(str),
+        'fix': nullable(Fix),
+        'num_satellites': make_num_satellites,
+        'hdop': nullable_number,
+        'vdop': nullable_number,
+        'pdop': nullable_number,
+        'seconds_since_dgps_update': nullable_number,
+        'dgps_station_type': make_dgps_station_type,
+        'speed': nullable_number,
+        'course': make_course,
+        'extensions': make_list,
+    }
+
+
+def make_num_satellites(value):
+    num_satellites = nullable(int)(value)
+    if num_satellites is not None:
+        if num_satellites < 0:
+            raise ValueError("Number of satellites {0} cannot be negative".format(num_satellites))
+    return num_satellites
+
+
+def make_dgps_station_type(value):
+    dgps_station_type = nullable(int)(value)
+    if dgps_station_type is not None:
+        if not 0 <= dgps_station_type <= 1023:
+            raise ValueError("DGPS station type {0} not in range 0 <= dgps_station_type <= 1023".format(dgps_station_type))
+    return dgps_station_type
+
+
+DECIMAL_CONVERSIONS = field_conversions(Decimal)
+
+FLOAT_CONVERSIONS = field_conversions(float)
+
+
 class Waypoint:
+    """A waypoint, route point or track point.
+
+    Non-integral numbers, such as the coordinates, are represented as
+    Decimals so that they round-trip exactly. See FloatWaypoint.
+    """
+
+    __slots__ = ('_latitude', '_longitude', '_elevation', '_time', '_magvar',
+                 '_geoid_height', '_name', '_comment', '_description',
+                 '_source', '_links', '_symbol', '_classification', '_fix',
+                 '_num_satellites', '_hdop', '_vdop', '_pdop',
+                 '_seconds_since_dgps_update', '_dgps_station_type', '_speed',
+                 '_course', '_extensions')
+
+    number = Decimal
+
+    _conversions = DECIMAL_CONVERSIONS
 
     def __init__(self, latitude, longitude, elevation=None, time=None,
                  magvar=None, geoid_height=None, name=None, comment=None,
@@ -12,57 +117,94 @@ class Waypoint:
                  seconds_since_dgps_update=None, dgps_station_type=None,
                  speed=None, course=None,
                  extensions=None):
-
-        self._latitude = Decimal(latitude)
-        if not -90 <= self._latitude <= +90:
-            raise ValueError("Latitude {0} not in range -90 <= latitude <= +90")
-
-        self._longitude = Decimal(longitude)
-        if not -180 <= self._longitude < +180:
-            raise ValueError("Longitude {0} not in range -180 <= longitude < +180")
-
-        self._elevation = nullable(Decimal)(elevation)
-        self._time = nullable(make_time)(time)
-
-        self._magvar = nullable(Decimal)(magvar)
-        if self._magvar is not None:
-            if not 0 <= self._magvar < 360:
-                raise ValueError("Magnetic variation {0} not in range 0 <= magvar < 360")
-
-        self._geoid_height = nullable(Decimal)(geoid_height)
-        self._name = nullable(str)(name)
-        self._comment = nullable(str)(comment)
-        self._description = nullable(str)(description)
-        self._source = nullable(str)(source)
-        self._links = make_list(links)
-        self._symbol = nullable(str)(symbol)
-        self._classification = nullable(str)(classification)
-        self._fix = nullable(Fix)(fix)
-
-        self._num_satellites = nullable(int)(num_satellites)
-        if self._num_satellites is not None:
-            if self._num_satellites < 0:
-                raise ValueError("Number of satellites {0} cannot be negative")
-
-        self._hdop = nullable(Decimal)(hdop)
-        self._vdop = nullable(Decimal)(vdop)
-        self._pdop = nullable(Decimal)(pdop)
-
-        self._seconds_since_dgps_update = nullable(Decimal)(seconds_since_dgps_update)
-
-        self._dgps_station_type = nullable(int)(dgps_station_type)
-        if self._dgps_station_type is not None:
-            if not 0 <= self._dgps_station_type <= 1023:
-                raise ValueError("DGPS station type {0} not in range 0 <= dgps_station_type <= 1023")
-
-        self._speed = nullable(Decimal)(speed)
-
-        self._course = nullable(Decimal)(course)
-        if self._course is not None:
-            if not 0 <= self._course < 360:
-                raise ValueError("Course {0} not in range 0 <= course < 360")
-
-        self._extensions = make_list(extensions)
+        convert = self._conversions
+        self._latitude = convert['latitude'](latitude)
+        self._longitude = convert['longitude'](longitude)
+        self._elevation = convert['elevation'](elevation)
+        self._time = convert['time'](time)
+        self._magvar = convert['magvar'](magvar)
+        self._geoid_height = convert['geoid_height'](geoid_height)
+        self._name = convert['name'](name)
+        self._comment = convert['comment'](comment)
+        self._description = convert['description'](description)
+        self._source = convert['source'](source)
+        self._links = convert['links'](links) if links else None
+        self._symbol = convert['symbol'](symbol)
+        self._classification = convert['classification'](classification)
+        self._fix = convert['fix'](fix)
+        self._num_satellites = convert['num_satellites'](num_satellites)
+        self._hdop = convert['hdop'](hdop)
+        self._vdop = convert['vdop'](vdop)
+        self._pdop = convert['pdop'](pdop)
+        self._seconds_since_dgps_update = convert['seconds_since_dgps_update'](seconds_since_dgps_update)
+        self._dgps_station_type = convert['dgps_station_type'](dgps_station_type)
+        self._speed = convert['speed'](speed)
+        self._course = convert['course'](course)
+        self._extensions = convert['extensions'](extensions) if extensions else None
+
+    @classmethod
+    def restore(cls, latitude, longitude, elevation=None, time=None,
+                magvar=None, geoid_height=None, name=None, comment=None,
+                description=None, source=None, links=None, symbol=None,
+                classification=None, fix=None, num_satellites=None,
+                hdop=None, vdop=None, pdop=None,
+                seconds_since_dgps_update=None, dgps_station_type=None,
+                speed=None, course=None, extensions=None):
+        """Create a waypoint from field values without converting or validating them.
+
+        For use by deserialisers, which hold values already converted by a
+        Waypoint of the same class, in Waypoint.__slots__ order. Absent
+        values are None, including links and extensions when there are none.
+        """
+        waypoint = cls.__new__(cls)
+        waypoint._latitude = latitude
+        waypoint._longitude = longitude
+        waypoint._elevation = elevation
+        waypoint._time = time
+        waypoint._magvar = magvar
+        waypoint._geoid_height = geoid_height
+        waypoint._name = name
+        waypoint._comment = comment
+        waypoint._description = description
+        waypoint._source = source
+        waypoint._links = links
+        waypoint._symbol = symbol
+        waypoint._classification = classification
+        waypoint._fix = fix
+        waypoint._num_satellites = num_satellites
+        waypoint._hdop = hdop
+        waypoint._vdop = vdop
+        waypoint._pdop = pdop
+        waypoint._seconds_since_dgps_update = seconds_since_dgps_update
+        waypoint._dgps_station_type = dgps_station_type
+        waypoint._speed = speed
+        waypoint._course = course
+        waypoint._extensions = extensions
+        return waypoint
+
+    def __getstate__(self):
+        # A compact state for pickling, such as when transferring parsed
+        # documents between processes: the field values in slot order,
+        # without trailing empty values, and with Decimals as strings, which
+        # pickle in a fraction of the space and time.
+        state = list(_get_slots(self))
+        for index in _NUMBER_INDICES:
+            value = state[index]
+            if value.__class__ is Decimal:
+                state[index] = str(value)
+        while state[-1] is None or state[-1] == []:
+            del state[-1]
+        return tuple(state)
+
+    def __setstate__(self, state):
+        state = list(state)
+        state.extend(_STATE_DEFAULTS[len(state):])
+        for index in _NUMBER_INDICES:
+            value = state[index]
+            if value.__class__ is str:
+                state[index] = Decimal(value)
+        for slot, value in zip(Waypoint.__slots__, state):
+            setattr(self, slot, value)
 
     @property
     def latitude(self):
@@ -106,6 +248,10 @@ class Waypoint:
 
     @property
     def links(self):
+        # Most waypoints have no links or extensions, so their lists are
+        # only created when first asked for.
+        if self._links is None:
+            self._links = []
         return self._links
 
     @property
@@ -154,4 +300,90 @@ class Waypoint:
 
     @property
     def extensions(self):
-        return self._extensions
\ No newline at end of file
+        if self._extensions is None:
+            self._extensions = []
+        return self._extensions
+
+
+_get_slots = attrgetter(*Waypoint.__slots__)
+
+_NUMBER_INDICES = tuple(index for index, slot in enumerate(Waypoint.__slots__)
+                        if slot in ('_latitude', '_longitude', '_elevation', '_magvar',
+                                    '_geoid_height', '_hdop', '_vdop', '_pdop',
+                                    '_seconds_since_dgps_update', '_speed', '_course'))
+
+_STATE_DEFAULTS = (None,) * len(Waypoint.__slots__)
+
+
+class FloatWaypoint(Waypoint):
+    """A Waypoint which represents non-integral numbers as floats.
+
+    Floats are faster to create and to compute with than Decimals, at the
+    expense of exact decimal round-tripping.
+    """
+
+    __slots__ = ()
+
+    number = float
+
+    _conversions = FLOAT_CONVERSIONS
+
+
+class LazyWaypoint(Waypoint):
+    """A Waypoint which converts and validates each field when first accessed.
+
+    The constructor accepts the same arguments as Waypoint, typically as
+    text straight from a parser, but merely stores them. The cost of
+    converting a field, and any ValueError from validating it, is deferred
+    until the corresponding property is first read. The converted value is
+    then cached.
+    """
+
+    def __init__(self, latitude, longitude, **fields):
+        unknown = fields.keys() - self._conversions.keys()
+        if unknown:
+            raise TypeError("Unexpected Waypoint arguments {0}".format(', '.join(sorted(unknown))))
+        fields['latitude'] = latitude
+        fields['longitude'] = longitude
+        self._raw = fields
+
+    def __getstate__(self):
+        return self.__dict__
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+
+class LazyFloatWaypoint(LazyWaypoint):
+    """A LazyWaypoint which represents non-integral numbers as floats."""
+
+    number = float
+
+    _conversions = FLOAT_CONVERSIONS
+
+
+class LazyField:
+    """A descriptor which converts a LazyWaypoint field when first accessed.
+
+    This is a non-data descriptor, so once the converted value has been
+    stored in the instance dictionary under the same name, subsequent
+    lookups find it there without calling the descriptor again.
+    """
+
+    def __init__(self, name, convert):
+        self._name = name
+        self._convert = convert
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        raw = instance._raw
+        value = self._convert(raw.get(self._name))
+        instance.__dict__[self._name] = value
+        raw.pop(self._name, None)
+        return value
+
+
+for _lazy_type in (LazyWaypoint, LazyFloatWaypoint):
+    for _name, _convert in _lazy_type._conversions.items():
+        setattr(_lazy_type, _name, LazyField(_name, _convert))
@@ -2,6 +2,8 @@
 
 class Year:
 
+    __slots__ = ('_year', '_tzinfo')
+
     def __init__(self, year, tzinfo=None):
         if tzinfo is None:
             if isinstance(year, Year):
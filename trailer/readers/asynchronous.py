@@ -0,0 +1,185 @@
+"""Readers for use with asyncio, which parse GPX as it arrives from a stream.
+
+Bytes are read from an asynchronous stream in chunks and fed to an lxml
+XMLPullParser. Parsing a chunk, and converting the elements it completes
+into model objects, is CPU bound, so it is handed off to a thread rather
+than blocking the event loop. An lxml parser and the tree it builds must
+stay in the thread in which they were created, so each stream is parsed in
+a thread of its own.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from lxml import etree
+
+from trailer.readers.parser import parse_gpx
+from trailer.readers.stream import GpxStreamHandler, STREAMED_EVENTS, STREAMED_TAGS
+
+__author__ = 'rjs'
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def read_gpx_async(stream, gpxns=None, options=None, chunk_size=CHUNK_SIZE):
+    """Parse GPX from an asynchronous stream into a GpxModel.
+
+    The document is parsed as it arrives, so that by the time the stream
+    ends, only the conversion of the parsed elements into the model remains.
+
+    Args:
+        stream: Either an object with a coroutine read(n) method returning
+            bytes, and an empty bytes object at the end of the stream, such
+            as an asyncio.StreamReader, or an asynchronous iterable of bytes.
+
+        gpxns: The XML namespace for GPX in Clarke notation (i.e. delimited
+             by curly braces). If None, (the default) the namespace used in
+             the document will be determined automatically.
+
+        options: An optional ReaderOptions controlling the representation of
+             the model.
+
+        chunk_size: The maximum number of bytes read from a stream with a
+            read() method at a time.
+
+    Returns:
+        A GpxModel representing the data from the stream.
+
+    Raises:
+        ValueError: The data could not be parsed as GPX.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='read_gpx_async')
+    try:
+        parser = await loop.run_in_executor(executor, _document_parser)
+        async for chunk in _read_chunks(stream, chunk_size):
+            await loop.run_in_executor(executor, parser.feed, chunk)
+
+        def finish():
+            return parse_gpx(parser.close(), gpxns, options)
+
+        return await loop.run_in_executor(executor, finish)
+    finally:
+        # Waiting for the thread to exit would block the event loop, if the
+        # task was cancelled while a chunk was being parsed.
+        executor.shutdown(wait=False)
+
+
+async def iter_gpx_events_async(stream, gpxns=None, options=None, chunk_size=CHUNK_SIZE):
+    """Incrementally parse GPX from an asynchronous stream, yielding model objects.
+
+    This is the asynchronous counterpart of stream.iter_gpx_events(), and
+    yields the same events. Events are yielded as soon as the chunk of the
+    stream which completes the corresponding element has been parsed, so
+    that a consumer can process points before the stream has ended.
+
+    Args:
+        stream: Either an object with a coroutine read(n) method, or an
+            asynchronous iterable of bytes, as for read_gpx_async().
+
+        gpxns: The XML namespace for GPX in Clarke notation (i.e. delimited
+             by curly braces). If None, (the default) the namespace used in
+             the document will be determined automatically.
+
+        options: An optional ReaderOptions controlling the representation of
+             the model objects.
+
+        chunk_size: The maximum number of bytes read from a stream with a
+            read() method at a time.
+
+    Yields:
+        (event, value) pairs in document order, as for iter_gpx_events().
+
+    Raises:
+        ValueError: The data could not be parsed as GPX.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='iter_gpx_events_async')
+    try:
+        feeder = await loop.run_in_executor(executor, EventFeeder, gpxns, options)
+        async for chunk in _read_chunks(stream, chunk_size):
+            for item in await loop.run_in_executor(executor, feeder.feed, chunk):
+                yield item
+        for item in await loop.run_in_executor(executor, feeder.close):
+            yield item
+    finally:
+        # As for read_gpx_async(), without blocking the event loop.
+        executor.shutdown(wait=False)
+
+
+async def iter_trackpoints_async(stream, gpxns=None, options=None, chunk_size=CHUNK_SIZE):
+    """Incrementally parse GPX from an asynchronous stream, yielding only the track points.
+
+    The arguments are the same as for iter_gpx_events_async().
+
+    Yields:
+        A TrackPoint for each <trkpt> element, in document order.
+    """
+    async for event, value in iter_gpx_events_async(stream, gpxns, options, chunk_size):
+        if event == 'trackpoint':
+            yield value
+
+
+class EventFeeder:
+    """Feeds bytes to an XMLPullParser and converts the results into model events.
+
+    The feeder does no I/O, so it can be used from any concurrency framework
+    which supplies data in chunks, but must be created and used in a single
+    thread.
+    """
+
+    def __init__(self, gpxns=None, options=None):
+        self._parser = etree.XMLPullParser(events=STREAMED_EVENTS, tag=STREAMED_TAGS)
+        self._handler = GpxStreamHandler(gpxns, options)
+
+    def feed(self, data):
+        """Parse a chunk of the document.
+
+        Returns:
+            A list of the (event, value) pairs for the elements completed by
+            the chunk, as for iter_gpx_events().
+        """
+        self._parser.feed(data)
+        return self._read_events()
+
+    def close(self):
+        """Finish parsing the document.
+
+        Returns:
+            A list of any remaining (event, value) pairs.
+
+        Raises:
+            ValueError: No <gpx> root element was seen.
+        """
+        self._parser.close()
+        events = self._read_events()
+        self._handler.close()
+        return events
+
+    def _read_events(self):
+        events = []
+        handle = self._handler.handle
+        for event, element in self._parser.read_events():
+            events.extend(handle(event, element))
+        return events
+
+
+def _document_parser():
+    """An XMLPullParser which builds a tree, without recording events.
+
+    The tree is only used once the document is complete, so events, which
+    would hold a proxy for every element until the parser is closed, are
+    not needed.
+    """
+    return etree.XMLPullParser(events=())
+
+
+async def _read_chunks(stream, chunk_size):
+    if hasattr(stream, 'read'):
+        while True:
+            chunk = await stream.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        async for chunk in stream:
+            yield chunk
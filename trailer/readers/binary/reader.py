@@ -0,0 +1,597 @@
+"""Read GpxModels written in the trailer binary format.
+
+The points of each point list are decoded column by column, with the
+per-value work done by C-level map() calls over whole columns, and the
+Waypoints are then created directly from the decoded values without
+converting or validating them again. See trailer.writers.binary.format for
+a description of the format.
+"""
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from decimal import Context, Decimal, localcontext
+from itertools import accumulate, compress, islice, repeat
+import gc
+from operator import add, mul, truediv
+import os
+import sys
+
+from lxml import etree
+
+from trailer.model.copyright import Copyright
+from trailer.model.fix import Fix
+from trailer.model.gpx_model import GpxModel
+from trailer.model.link import Link
+from trailer.model.metadata import Metadata
+from trailer.model.person import Person
+from trailer.model.route import Route
+from trailer.model.segment import Segment
+from trailer.model.timestamps import fixed_timezone
+from trailer.model.track import Track
+from trailer.model.year import Year
+from trailer.readers.options import BOUNDS_TYPES, WAYPOINT_TYPES
+from trailer.writers.binary.format import (
+    END_OF_COLUMNS, EPOCH, EXPONENT_UNIFORM, FLOAT64,
+    FORMAT_VERSION, INTEGER, INTEGER_TYPECODES, MAGIC, MICROSECONDS,
+    NAIVE_OFFSET, NUMBER, NUMBER_TEXT, NUMERIC_FLOAT, OFFSETS_NAIVE,
+    OFFSETS_PER_VALUE, OFFSETS_UNIFORM, OFFSETS_UTC, ONE_MICROSECOND,
+    POINT_FIELDS, SCALED, SOME_PRESENT, TEXT, TIME, TIME_TEXT, UTC_EPOCH,
+    VALUE_DATETIME, VALUE_DECIMAL, VALUE_DICT, VALUE_ELEMENT, VALUE_FALSE,
+    VALUE_FLOAT, VALUE_INTEGER, VALUE_LINK, VALUE_LIST, VALUE_NONE,
+    VALUE_STRING, VALUE_TRUE)
+
+__author__ = 'rjs'
+
+# Rescaling the coefficients of Decimals is exact with at least the precision
+# used by the writer, whatever the context of the caller.
+DECIMAL_CONTEXT = Context(prec=28)
+
+_POINT_FIELD_COUNT = len(POINT_FIELDS)
+
+_FIX_INDEX = [name for name, _ in POINT_FIELDS].index('fix')
+
+# Powers of ten which are exactly representable as floats.
+_FLOAT_POWERS = {exponent: 10.0 ** abs(exponent) for exponent in range(-22, 23)}
+
+_MAXIMUM_FLOAT_COEFFICIENT = 2 ** 53
+
+_REPEAT_SAMPLE_SIZE = 256
+
+
+def read_binary(source, options=None):
+    """Read a GpxModel written in the trailer binary format.
+
+    Args:
+        source: A filename or a file-like-object opened in binary mode.
+
+        options: An optional ReaderOptions controlling the representation of
+            the model. If None, (the default) numbers are represented as they
+            were when the model was written, as Decimals or as floats. Lazy
+            waypoints are never created, since the values are already
+            converted.
+
+    Returns:
+        A GpxModel.
+
+    Raises:
+        ValueError: The data is not in a supported version of the format.
+    """
+    if isinstance(source, (str, bytes, os.PathLike)):
+        with open(source, 'rb') as f:
+            data = f.read()
+    else:
+        data = source.read()
+    return parse_binary(data, options)
+
+
+def parse_binary(data, options=None):
+    """Parse bytes in the trailer binary format into a GpxModel.
+
+    Args:
+        data: A bytes-like object.
+
+        options: As for read_binary().
+
+    Returns:
+        A GpxModel.
+
+    Raises:
+        ValueError: The data is not in a supported version of the format.
+    """
+    return BinaryReader(data, options).read_model()
+
+
+class BinaryReader:
+    """Decodes a model from the bytes of the binary format.
+
+    Args:
+        data: A bytes-like object.
+
+        options: As for read_binary().
+
+    Raises:
+        ValueError: The data is not in a supported version of the format.
+    """
+
+    def __init__(self, data, options=None):
+        self._data = memoryview(data).cast('B')
+        if bytes(self._data[:len(MAGIC)]) != MAGIC:
+            raise ValueError("Not in the trailer binary format")
+        version = self._data[len(MAGIC)]
+        if version != FORMAT_VERSION:
+            raise ValueError("Unsupported binary format version {0}".format(version))
+        self._position = len(MAGIC) + 1
+        self._options = options
+        self._strings = [None]
+        for _ in range(self.read_uvarint()):
+            length = self.read_uvarint()
+            start = self._position
+            self._position += length
+            self._strings.append(str(self._data[start:self._position], 'utf-8'))
+
+    def read_model(self):
+        with localcontext(DECIMAL_CONTEXT), _collection_paused():
+            try:
+                creator = self.read_string()
+                metadata = self.read_metadata() if self._read_byte() else None
+                waypoints = self.read_points()
+                routes = [self.read_route() for _ in range(self.read_uvarint())]
+                tracks = [self.read_track() for _ in range(self.read_uvarint())]
+                extensions = self.read_value()
+            except IndexError:
+                raise ValueError("Truncated trailer binary data")
+        return GpxModel(creator, metadata, waypoints, routes, tracks, extensions)
+
+    def read_metadata(self):
+        name = self.read_string()
+        description = self.read_string()
+        author = self.read_person() if self._read_byte() else None
+        copyright = self.read_copyright() if self._read_byte() else None
+        links = self.read_links()
+        time = self.read_value()
+        keywords = self.read_string()
+        bounds = None
+        if self._read_byte():
+            values = [self.read_value() for _ in range(4)]
+            if self._options is not None:
+                bounds = self._options.make_bounds(*values)
+            else:
+                bounds = BOUNDS_TYPES['float' if values[0].__class__ is float else 'decimal'](*values)
+        extensions = self.read_value()
+        return Metadata(name, description, author, copyright, links, time,
+                        keywords, bounds, extensions)
+
+    def read_person(self):
+        name = self.read_string()
+        email = self.read_string()
+        link = self.read_link() if self._read_byte() else None
+        return Person(name, email, link)
+
+    def read_copyright(self):
+        author = self.read_string()
+        start_of_year = self.read_value()
+        year = Year(start_of_year.year, start_of_year.tzinfo) if start_of_year is not None else None
+        license = self.read_string()
+        return Copyright(author, year, license)
+
+    def read_link(self):
+        href = self.read_string()
+        text = self.read_string()
+        mime = self.read_string()
+        return Link(href, text, mime)
+
+    def read_links(self):
+        return [self.read_link() for _ in range(self.read_uvarint())]
+
+    def read_route(self):
+        fields = self._read_item()
+        return Route(*fields, points=self.read_points())
+
+    def read_track(self):
+        fields = self._read_item()
+        segments = []
+        for _ in range(self.read_uvarint()):
+            extensions = self.read_value()
+            segments.append(self.read_segment(extensions))
+        return Track(*fields, segments=segments)
+
+    def _read_item(self):
+        return (self.read_string(), self.read_string(), self.read_string(),
+                self.read_string(), self.read_links(), self.read_value(),
+                self.read_string(), self.read_value())
+
+    def read_segment(self, extensions):
+        if self._options is not None and self._options.columnar:
+            waypoint_type = self._options.waypoint_type
+            count, columns = self._read_point_columns(waypoint_type.number)
+            return _columnar_segment(count, columns, extensions, waypoint_type)
+        return Segment(self.read_points(), extensions)
+
+    def read_points(self):
+        """Read a point list into a list of Waypoints."""
+        data = self._data
+        count = self.read_uvarint()
+        if self._options is not None:
+            numeric = self._options.numeric
+        else:
+            numeric = 'float' if data[self._position] == NUMERIC_FLOAT else 'decimal'
+        # The values are already converted, so there is nothing to defer.
+        waypoint_type = WAYPOINT_TYPES[numeric, False]
+        count, columns = self._read_point_columns(waypoint_type.number, count)
+        if count == 0:
+            return []
+
+        # Trailing absent fields are left to the defaults of restore().
+        fields = []
+        for index, (name, kind) in enumerate(POINT_FIELDS[:max(columns) + 1]):
+            column = columns.get(index)
+            if column is None:
+                fields.append(repeat(None, count))
+                continue
+            present, values = column
+            if kind is TIME:
+                values = _times(values)
+            elif kind is TEXT and index == _FIX_INDEX:
+                values = list(map(Fix, values))
+            if present is not None:
+                values = _expand(present, values, None)
+            fields.append(values)
+        return list(map(waypoint_type.restore, *fields))
+
+    def _read_point_columns(self, number, count=None):
+        """Decode the columns of a point list.
+
+        Args:
+            number: The type of the decoded numbers, Decimal or float.
+
+            count: The point count, if it has already been read.
+
+        Returns:
+            The point count, and a dictionary mapping the indexes in
+            POINT_FIELDS of the columns present to pairs of a presence mask,
+            which is None if all points have a value, and a list of the
+            values present. Times are (microseconds, offsets) pairs rather
+            than datetimes, as described by _read_times().
+        """
+        if count is None:
+            count = self.read_uvarint()
+        self._position += 1     # The numeric representation written
+        columns = {}
+        while True:
+            index = self._read_byte()
+            if index == END_OF_COLUMNS:
+                return count, columns
+            if index >= _POINT_FIELD_COUNT:
+                raise ValueError("Unknown point field {0}".format(index))
+
+            if self._read_byte() == SOME_PRESENT:
+                present = self._read_bytes(count)
+                values_count = present.count(1)
+            else:
+                present = None
+                values_count = count
+
+            kind = POINT_FIELDS[index][1]
+            if kind is NUMBER:
+                values = self._read_numbers(values_count, number)
+            elif kind is TIME:
+                values = self._read_times(values_count)
+            elif kind is INTEGER:
+                values = self._read_integers(values_count).tolist()
+            elif kind is TEXT:
+                values = [self.read_string() for _ in range(values_count)]
+            else:
+                values = [self.read_value() for _ in range(values_count)]
+            columns[index] = (present, values)
+
+    def _read_numbers(self, count, number):
+        encoding = self._read_byte()
+        if encoding == SCALED:
+            if self._read_byte() == EXPONENT_UNIFORM:
+                exponents = None
+                exponent = self.read_svarint()
+            else:
+                exponents = self._read_array('b', count)
+            coefficients = list(accumulate(self._read_integers(count)))
+            if number is float:
+                return _scaled_floats(coefficients, exponents, exponent if exponents is None else None)
+            if exponents is None:
+                scale = _decimal_scale(exponent)
+                shared = _distinct_if_repeated(coefficients)
+                if shared is not None:
+                    # Decimals are immutable, so points with the same value
+                    # can share a single instance.
+                    decimals = {coefficient: Decimal(coefficient) * scale for coefficient in shared}
+                    return list(map(decimals.__getitem__, coefficients))
+                return list(map(mul, map(Decimal, coefficients), repeat(scale, count)))
+            scales = {exponent: _decimal_scale(exponent) for exponent in set(exponents)}
+            keys = list(zip(coefficients, exponents))
+            shared = _distinct_if_repeated(keys)
+            if shared is not None:
+                decimals = {key: Decimal(key[0]) * scales[key[1]] for key in shared}
+                return list(map(decimals.__getitem__, keys))
+            return list(map(mul, map(Decimal, coefficients), map(scales.__getitem__, exponents)))
+        if encoding == FLOAT64:
+            values = self._read_array('d', count).tolist()
+            return values if number is float else [number(repr(value)) for value in values]
+        if encoding == NUMBER_TEXT:
+            return [number(self.read_string()) for _ in range(count)]
+        raise ValueError("Unknown number encoding {0}".format(encoding))
+
+    def _read_times(self, count):
+        """Read a time column.
+
+        Returns:
+            Either a pair of an array of the differences between successive
+            times in microseconds, starting from the epoch in UTC or for
+            naive times in local time, and a single offset from UTC
+            in minutes which applies to all the times, or a list of offsets
+            with NAIVE_OFFSET marking naive times; or, for times written as
+            text, a list of datetimes.
+        """
+        encoding = self._read_byte()
+        if encoding == MICROSECONDS:
+            offsets_encoding = self._read_byte()
+            if offsets_encoding == OFFSETS_UTC:
+                offsets = 0
+            elif offsets_encoding == OFFSETS_NAIVE:
+                offsets = NAIVE_OFFSET
+            elif offsets_encoding == OFFSETS_UNIFORM:
+                offsets = self.read_svarint()
+            elif offsets_encoding == OFFSETS_PER_VALUE:
+                offsets = self._read_array('h', count).tolist()
+            else:
+                raise ValueError("Unknown time offset encoding {0}".format(offsets_encoding))
+            return self._read_integers(count), offsets
+        if encoding == TIME_TEXT:
+            return [datetime.fromisoformat(self.read_string()) for _ in range(count)]
+        raise ValueError("Unknown time encoding {0}".format(encoding))
+
+    def _read_integers(self, count):
+        width = self._read_byte()
+        try:
+            typecode = INTEGER_TYPECODES[width]
+        except KeyError:
+            raise ValueError("Unknown integer width {0}".format(width))
+        return self._read_array(typecode, count)
+
+    def _read_array(self, typecode, count):
+        values = array(typecode)
+        end = self._position + count * values.itemsize
+        if end > len(self._data):
+            raise IndexError("Array extends beyond the end of the data")
+        values.frombytes(self._data[self._position:end])
+        self._position = end
+        if sys.byteorder != 'little':
+            values.byteswap()
+        return values
+
+    def read_value(self):
+        tag = self._read_byte()
+        if tag == VALUE_NONE:
+            return None
+        if tag == VALUE_TRUE:
+            return True
+        if tag == VALUE_FALSE:
+            return False
+        if tag == VALUE_INTEGER:
+            return self.read_svarint()
+        if tag == VALUE_FLOAT:
+            return self._read_array('d', 1)[0]
+        if tag == VALUE_STRING:
+            return self.read_string()
+        if tag == VALUE_DECIMAL:
+            return Decimal(self.read_string())
+        if tag == VALUE_DATETIME:
+            return datetime.fromisoformat(self.read_string())
+        if tag == VALUE_LIST:
+            return [self.read_value() for _ in range(self.read_uvarint())]
+        if tag == VALUE_DICT:
+            items = {}
+            for _ in range(self.read_uvarint()):
+                key = self.read_value()
+                items[key] = self.read_value()
+            return items
+        if tag == VALUE_ELEMENT:
+            return etree.fromstring(self.read_string())
+        if tag == VALUE_LINK:
+            return self.read_link()
+        raise ValueError("Unknown value tag {0}".format(tag))
+
+    def read_string(self):
+        return self._strings[self.read_uvarint()]
+
+    def read_uvarint(self):
+        data = self._data
+        position = self._position
+        result = 0
+        shift = 0
+        while True:
+            byte = data[position]
+            position += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                self._position = position
+                return result
+            shift += 7
+
+    def read_svarint(self):
+        value = self.read_uvarint()
+        return -((value + 1) >> 1) if value & 1 else value >> 1
+
+    def _read_byte(self):
+        byte = self._data[self._position]
+        self._position += 1
+        return byte
+
+    def _read_bytes(self, count):
+        start = self._position
+        self._position += count
+        if self._position > len(self._data):
+            raise IndexError("Bytes extend beyond the end of the data")
+        return bytes(self._data[start:self._position])
+
+
+@contextmanager
+def _collection_paused():
+    """Pause the cyclic garbage collector.
+
+    Decoding creates a great many objects and no garbage cycles, so the
+    collections which the allocations would otherwise trigger repeatedly
+    traverse the growing model and find nothing to free.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _decimal_scale(exponent):
+    return Decimal((0, (1,), exponent))
+
+
+def _scaled_floats(coefficients, exponents, exponent):
+    """Convert coefficients and decimal exponents to the nearest floats.
+
+    Dividing or multiplying an exactly representable coefficient by an
+    exactly representable power of ten is correctly rounded, so gives the
+    same float as converting the equivalent decimal text.
+    """
+    if coefficients and max(coefficients) < _MAXIMUM_FLOAT_COEFFICIENT \
+            and min(coefficients) > -_MAXIMUM_FLOAT_COEFFICIENT:
+        if exponents is None and exponent in _FLOAT_POWERS:
+            operator = truediv if exponent < 0 else mul
+            return list(map(operator, coefficients, repeat(_FLOAT_POWERS[exponent], len(coefficients))))
+        if exponents is not None and all(exponent in _FLOAT_POWERS for exponent in set(exponents)):
+            return [coefficient / _FLOAT_POWERS[exponent] if exponent < 0
+                    else coefficient * _FLOAT_POWERS[exponent]
+                    for coefficient, exponent in zip(coefficients, exponents)]
+    if exponents is None:
+        exponents = repeat(exponent)
+    return [float(Decimal(coefficient).scaleb(exponent))
+            for coefficient, exponent in zip(coefficients, exponents)]
+
+
+def _expand(present, values, absent):
+    """Spread the values of the points which have one over all the points."""
+    expanded = [absent] * len(present)
+    for index, value in zip(compress(range(len(present)), present), values):
+        expanded[index] = value
+    return expanded
+
+
+def _times(column):
+    """Convert a time column read by _read_times() into datetimes."""
+    if isinstance(column, list):
+        return column
+    deltas, offsets = column
+    count = len(deltas)
+    # Successive times are usually a whole number of seconds apart, so
+    # there are few distinct durations to create, and each time is the sum
+    # of the previous time and a duration.
+    shared = _distinct_if_repeated(deltas)
+    if shared is not None:
+        durations = {delta: delta * ONE_MICROSECOND for delta in shared}
+        durations = map(durations.__getitem__, deltas)
+    else:
+        durations = map(mul, deltas, repeat(ONE_MICROSECOND, count))
+    if isinstance(offsets, int):
+        start = EPOCH if offsets == NAIVE_OFFSET else UTC_EPOCH
+        times = islice(accumulate(durations, add, initial=start), 1, None)
+        if offsets in (0, NAIVE_OFFSET):
+            return list(times)
+        return list(map(datetime.astimezone, times, repeat(fixed_timezone(offsets), count)))
+    return [time if offset == NAIVE_OFFSET
+            else time.replace(tzinfo=timezone.utc).astimezone(fixed_timezone(offset))
+            for time, offset in zip(islice(accumulate(durations, add, initial=EPOCH), 1, None), offsets)]
+
+
+def _distinct_if_repeated(values):
+    """The distinct values, if there are at most half as many as values, or None."""
+    # A sample avoids building a large set of mostly distinct values.
+    sample = values[:_REPEAT_SAMPLE_SIZE]
+    if len(set(sample)) * 2 > len(sample):
+        return None
+    distinct = set(values)
+    return distinct if len(distinct) * 2 <= len(values) else None
+
+
+def _time_fields(column):
+    """Microseconds and offsets from a time column read by _read_times()."""
+    if not isinstance(column, list):
+        deltas, offsets = column
+        return list(accumulate(deltas)), offsets
+    microseconds = []
+    offsets = []
+    for time in column:
+        offset = time.utcoffset()
+        if offset is None:
+            microseconds.append((time - EPOCH) // ONE_MICROSECOND)
+            offsets.append(NAIVE_OFFSET)
+        else:
+            microseconds.append((time - UTC_EPOCH) // ONE_MICROSECOND)
+            offsets.append(offset // timedelta(minutes=1))
+    return microseconds, offsets
+
+
+def _columnar_segment(count, columns, extensions, waypoint_type):
+    """Build a ColumnarSegment from decoded columns, keeping the digits of Decimals."""
+    import numpy
+    from trailer.model.columnar import (ColumnarSegment, FLOAT_COLUMNS, INTEGER_COLUMNS,
+                                        NAIVE, NO_EXPONENT, TIME_COLUMN, decimal_digits)
+
+    arrays = {}
+    masks = {}
+    sparse = {}
+    decimals = {}
+    for index, (present, values) in columns.items():
+        name, kind = POINT_FIELDS[index]
+        mask = numpy.frombuffer(present, dtype=bool) if present is not None else None
+        if kind is TIME:
+            microseconds, offsets = _time_fields(values)
+            column = numpy.full(count, numpy.datetime64('NaT'), dtype='datetime64[us]')
+            time_offsets = numpy.full(count, NAIVE, dtype=numpy.int32)
+            if isinstance(offsets, list):
+                offsets = numpy.array(offsets, dtype=numpy.int32)
+                offsets[offsets == NAIVE_OFFSET] = NAIVE
+            elif offsets == NAIVE_OFFSET:
+                offsets = NAIVE
+            selected = mask if mask is not None else slice(None)
+            column[selected] = numpy.array(microseconds, dtype=numpy.int64).view('datetime64[us]')
+            time_offsets[selected] = offsets
+            arrays[TIME_COLUMN] = column
+            if not (time_offsets == NAIVE).all():
+                arrays['time_offset'] = time_offsets
+        elif name in FLOAT_COLUMNS or name in INTEGER_COLUMNS:
+            if name in INTEGER_COLUMNS:
+                column = numpy.zeros(count, dtype=numpy.int32)
+            else:
+                column = numpy.full(count, numpy.nan, dtype=numpy.float64)
+            selected = mask if mask is not None else slice(None)
+            column[selected] = values
+            arrays[name] = column
+            if name in FLOAT_COLUMNS and waypoint_type.number is not float:
+                exponents, exact = decimal_digits(values)
+                if mask is not None:
+                    indexes = numpy.flatnonzero(mask)
+                    all_exponents = numpy.full(count, NO_EXPONENT, dtype=numpy.int8)
+                    all_exponents[indexes] = exponents
+                    exponents = all_exponents
+                    exact = {int(indexes[index]): value for index, value in exact.items()}
+                decimals[name] = (exponents, exact)
+        else:
+            if name == 'fix':
+                values = list(map(Fix, values))
+            indexes = compress(range(count), present) if present is not None else range(count)
+            sparse[name] = dict(zip(indexes, values))
+            continue
+        if mask is not None:
+            masks[name] = mask
+
+    if 'latitude' not in arrays:
+        # An empty segment.
+        arrays['latitude'] = arrays['longitude'] = numpy.empty(0, dtype=numpy.float64)
+    return ColumnarSegment(arrays, masks, sparse, extensions, waypoint_type, decimals)
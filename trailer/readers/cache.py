@@ -0,0 +1,216 @@
+"""A persistent cache of parsed GPX documents.
+
+Reading the same document repeatedly pays the full cost of parsing the XML
+and converting the text into Decimals and datetimes each time. A ParseCache
+stores each GpxModel it reads in a directory in a form which loads many
+times faster, keyed by a hash of the content of the document, so that
+reading an unchanged document again is cheap wherever it is read from.
+
+Entries are stored in the trailer binary format, and are also keyed by the
+version of trailer and of the binary format and by the ReaderOptions, so
+they never outlive the code which created them. Entries made by other
+versions are removed when a cache is opened, and the least recently used
+entries are removed when the total size of the cache exceeds its limit.
+"""
+from collections import namedtuple
+import hashlib
+from io import BytesIO
+import os
+
+import trailer
+from trailer.readers.binary.reader import read_binary
+from trailer.readers.options import DEFAULT_OPTIONS, ReaderOptions
+from trailer.readers.parser import read_gpx
+from trailer.writers.binary.format import FORMAT_VERSION
+from trailer.writers.binary.writer import write_binary
+
+__author__ = 'rjs'
+
+CacheStatistics = namedtuple('CacheStatistics', ['hits', 'misses', 'stores', 'evictions'])
+
+ENTRY_SUFFIX = '.gpxcache'
+
+DEFAULT_MAX_SIZE = 1 << 30
+
+
+class ParseCache:
+    """A directory of parsed GpxModels with a size limit and LRU eviction.
+
+    Several processes may share a cache directory. Entries are written
+    atomically, and an entry which cannot be loaded is treated as a miss and
+    replaced.
+
+    Args:
+        directory: The directory in which to store entries, which is created
+            if it does not exist.
+
+        max_size: The maximum total size of the entries in bytes.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self._directory = directory
+        self._max_size = max_size
+        self._prefix = 'v{0}-f{1}-'.format(trailer.__version__, FORMAT_VERSION)
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+        self._size = None
+        os.makedirs(directory, exist_ok=True)
+        self._remove_other_versions()
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    def read_gpx(self, xml, gpxns=None, options=None):
+        """Read a GPX document into a GpxModel, via the cache.
+
+        Args:
+            xml: A filename or a file-like-object opened in binary mode. The
+                whole document is read in order to compute its hash.
+
+            gpxns: As for trailer.readers.parser.read_gpx().
+
+            options: As for trailer.readers.parser.read_gpx(), except that
+                waypoints are never lazy, since every value is converted to
+                store the model in the cache.
+
+        Returns:
+            A GpxModel representing the data from the supplied xml.
+
+        Raises:
+            ValueError: The supplied XML could not be parsed as GPX.
+        """
+        options = options if options is not None else DEFAULT_OPTIONS
+        if options.lazy:
+            # Eager and lazy reads share an entry, and return the same model.
+            options = ReaderOptions(options.columnar, False, options.numeric)
+        if isinstance(xml, (str, bytes, os.PathLike)):
+            with open(xml, 'rb') as f:
+                data = f.read()
+        else:
+            data = xml.read()
+
+        path = self._entry_path(data, gpxns, options)
+        gpx = self._load(path, options)
+        if gpx is not None:
+            self._hits += 1
+            return gpx
+
+        self._misses += 1
+        gpx = read_gpx(BytesIO(data), gpxns, options)
+        self._store(path, gpx)
+        return gpx
+
+    def statistics(self):
+        """The numbers of hits, misses, stores and evictions so far.
+
+        Returns:
+            A CacheStatistics.
+        """
+        return CacheStatistics(self._hits, self._misses, self._stores, self._evictions)
+
+    def reset_statistics(self):
+        """Reset the statistics to zero.
+
+        Returns:
+            The CacheStatistics before they were reset.
+        """
+        statistics = self.statistics()
+        self._hits = self._misses = self._stores = self._evictions = 0
+        return statistics
+
+    def size(self):
+        """The total size of the entries in bytes."""
+        return sum(size for _, size, _ in self._entries())
+
+    def clear(self):
+        """Remove all entries."""
+        for path, _, _ in self._entries():
+            _remove(path)
+        self._size = 0
+
+    def _entry_path(self, data, gpxns, options):
+        key = hashlib.sha256(data)
+        key.update(repr((gpxns, options)).encode('utf-8'))
+        return os.path.join(self._directory, self._prefix + key.hexdigest() + ENTRY_SUFFIX)
+
+    def _load(self, path, options):
+        try:
+            gpx = read_binary(path, options)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # A truncated or otherwise corrupt entry.
+            _remove(path)
+            return None
+        try:
+            # Record the use for LRU eviction.
+            os.utime(path)
+        except OSError:
+            pass
+        return gpx
+
+    def _store(self, path, gpx):
+        temporary_path = '{0}.{1}.tmp'.format(path, os.getpid())
+        try:
+            write_binary(gpx, temporary_path)
+            os.replace(temporary_path, path)
+            size = os.path.getsize(path)
+        except Exception:
+            # Failing to cache a document, whether for want of disk space or
+            # because the binary format cannot represent one of its values,
+            # must not fail the read.
+            _remove(temporary_path)
+            return
+        self._stores += 1
+        # The total is tracked approximately between scans of the directory,
+        # since other processes may share it.
+        self._size = self.size() if self._size is None else self._size + size
+        if self._size > self._max_size:
+            self._evict()
+
+    def _entries(self):
+        """(path, size, last use time) triples for the entries of this version."""
+        entries = []
+        with os.scandir(self._directory) as directory_entries:
+            for directory_entry in directory_entries:
+                name = directory_entry.name
+                if name.startswith(self._prefix) and name.endswith(ENTRY_SUFFIX):
+                    try:
+                        stat = directory_entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((directory_entry.path, stat.st_size, stat.st_mtime_ns))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self._max_size:
+                break
+            if _remove(path):
+                self._evictions += 1
+            total -= size
+        self._size = total
+
+    def _remove_other_versions(self):
+        with os.scandir(self._directory) as directory_entries:
+            for directory_entry in directory_entries:
+                name = directory_entry.name
+                if name.endswith(ENTRY_SUFFIX) and not name.startswith(self._prefix):
+                    _remove(directory_entry.path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    return True
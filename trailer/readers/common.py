@@ -1,12 +1,120 @@
+from functools import lru_cache
+import re
+
 __author__ = 'rjs'
 
+# Matches the remainder of a tag, allowing for '>' in attribute values.
+TAG_END_REGEX = re.compile(rb'(?:[^>"\']+|"[^"]*"|\'[^\']*\')*>')
+
+# Matches the start of documents in encodings in which tags cannot be found
+# by matching bytes.
+WIDE_ENCODING_REGEX = re.compile(rb'\A(?:\xfe\xff|\xff\xfe|\x00|<\x00|<\?xml[^>]*encoding\s*=\s*["\']UTF-?(?:16|32))',
+                                 re.IGNORECASE)
+
 def optional_text(parent, tag):
     element = parent.find(tag)
     return element.text if element is not None else None
 
 
+@lru_cache(maxsize=None)
+def namespace_table(gpxns, fields):
+    """Build a lookup table from namespaced tags to field names.
+
+    Args:
+        gpxns: The XML namespace for GPX in Clarke notation (i.e. delimited
+             by curly braces).
+
+        fields: A tuple of (tag, field_name) pairs, where the tags are
+            unqualified.
+
+    Returns:
+        A dictionary mapping each namespaced tag to its field name. Tables
+        are cached, so they are built only once per namespace.
+    """
+    return {gpxns+tag: field_name for tag, field_name in fields}
+
+
+def scan_children(parent, text_table, element_table=None):
+    """Collect the children of an element in a single pass.
+
+    This is equivalent to calling optional_text() for each entry in
+    text_table and findall() for each entry in element_table, but visits
+    each child element only once.
+
+    Args:
+        parent: The element whose children are to be collected.
+
+        text_table: A dictionary mapping namespaced tags to field names, for
+            children whose text is to be collected. Only the first child with
+            each tag is used.
+
+        element_table: An optional dictionary mapping namespaced tags to
+            field names, for children which are to be collected as elements.
+
+    Returns:
+        A 2-tuple of dictionaries. The first maps field names to text, the
+        second maps field names to lists of child elements. Fields with no
+        corresponding children are absent.
+    """
+    texts = {}
+    elements = {}
+    for child in parent:
+        tag = child.tag
+        field_name = text_table.get(tag)
+        if field_name is not None:
+            if field_name not in texts:
+                texts[field_name] = child.text
+        elif element_table is not None:
+            field_name = element_table.get(tag)
+            if field_name is not None:
+                elements.setdefault(field_name, []).append(child)
+    return texts, elements
+
+
+def first_element(elements, field_name):
+    """The first element collected for a field by scan_children(), or None."""
+    matches = elements.get(field_name)
+    return matches[0] if matches else None
+
+
 def determine_gpx_namespace(gpx_element):
     gpxns = '{' + gpx_element.nsmap.get(None, '') + '}'
     if not gpxns.startswith('{http://www.topografix.com/GPX'):
         raise ValueError("Unrecognised GPX namespace '{0}'".format(gpxns))
-    return gpxns
\ No newline at end of file
+    return gpxns
+
+
+@lru_cache(maxsize=None)
+def boundary_tag_regex(local_names):
+    """Build a regular expression which finds tags in the bytes of a document.
+
+    Matching bytes is much faster than parsing, and is used to locate the
+    byte ranges of elements so they can be parsed separately. Comments, CDATA
+    sections and processing instructions are also matched, so that tags
+    within them, which are just text, can be skipped.
+
+    Args:
+        local_names: A tuple of the unqualified names of the elements, as
+            bytes.
+
+    Returns:
+        A compiled regular expression. For a start or end tag of one of the
+        elements, group 1 is the slash of an end tag or empty, group 2 the
+        qualified name and group 3 the local name; the match ends before any
+        attributes. For other markup, all the groups are None. Expressions
+        are cached, so they are built only once per set of names.
+    """
+    names = b'|'.join(re.escape(name) for name in local_names)
+    return re.compile(rb'<!--.*?-->|<!\[CDATA\[.*?\]\]>|<\?.*?\?>'
+                      rb'|<(/?)((?:[\w.-]+:)?(' + names + rb'))(?=[\s/>])', re.DOTALL)
+
+
+def find_tag_end(data, position):
+    """Find the end of the tag which continues at a position in the bytes of a document.
+
+    Returns:
+        The position just after the closing '>', or None if the tag is not
+        terminated.
+    """
+    match = TAG_END_REGEX.match(data, position)
+    return match.end() if match is not None else None
@@ -1,19 +1,18 @@
 from lxml import etree
 
-from trailer.readers.common import optional_text, determine_gpx_namespace
+from trailer.readers.options import DEFAULT_OPTIONS
+from trailer.readers.common import (determine_gpx_namespace, namespace_table,
+                                    scan_children, first_element)
 
-from trailer.model.bounds import Bounds
 from trailer.model.fieldtools import nullable
 from trailer.model.gpx_model import GpxModel
 from trailer.model.link import Link
 from trailer.model.metadata import Metadata
 from trailer.model.person import Person
 from trailer.model.route import Route
-from trailer.model.segment import Segment
 from trailer.model.track import Track
-from trailer.model.waypoint import Waypoint
 
-def read_gpx(xml, gpxns=None):
+def read_gpx(xml, gpxns=None, options=None):
     """Parse a GPX file into a GpxModel.
 
     Args:
@@ -25,12 +24,16 @@ def read_gpx(xml, gpxns=None):
         gpxns: The XML namespace for GPX in Clarke notation (i.e. delimited
              by curly braces). If None, (the default) the namespace used in
              the document will be determined automatically.
+
+        options: An optional ReaderOptions controlling the representation of
+             the model. If None, (the default) the model is built from
+             Segments containing Waypoints.
     """
     tree = etree.parse(xml)
     gpx_element = tree.getroot()
-    return parse_gpx(gpx_element, gpxns=gpxns)
+    return parse_gpx(gpx_element, gpxns=gpxns, options=options)
 
-def parse_gpx(gpx_element, gpxns=None):
+def parse_gpx(gpx_element, gpxns=None, options=None):
     """Parse a GPX file into a GpxModel.
 
     Args:
@@ -39,6 +42,14 @@ def parse_gpx(gpx_element, gpxns=None):
              be a <gpx> element containing a version attribute. GPX versions
              1.0 is supported.
 
+        gpxns: The XML namespace for GPX in Clarke notation (i.e. delimited
+             by curly braces). If None, (the default) the namespace used in
+             the document will be determined automatically.
+
+        options: An optional ReaderOptions controlling the representation of
+             the model. If None, (the default) the model is built from
+             Segments containing Waypoints.
+
     Returns:
         A GpxModel representing the data from the supplies xml.
 
@@ -46,12 +57,11 @@ def parse_gpx(gpx_element, gpxns=None):
         ValueError: The supplied XML could not be parsed as GPX.
     """
     gpxns = gpxns if gpxns is not None else determine_gpx_namespace(gpx_element)
+    options = options if options is not None else DEFAULT_OPTIONS
 
     if gpx_element.tag != gpxns+'gpx':
         raise ValueError("No gpx root element")
 
-    get_text = lambda tag: optional_text(gpx_element, gpxns+tag)
-
     version = gpx_element.attrib['version']
 
     if not version.startswith('1.0'):
@@ -59,34 +69,16 @@ def parse_gpx(gpx_element, gpxns=None):
 
     creator = gpx_element.attrib['creator']
 
-    name = get_text('name')
-    description = get_text('desc')
-
-    author_name = get_text('author')
-    email = get_text('email')
-    author = Person(author_name, email)
-
-    url = get_text('url')
-    urlname = get_text('urlname')
-    links = make_links(url, urlname)
-
-    time = get_text('time')
-    keywords = get_text('keywords')
-
-    bounds_element = gpx_element.find(gpxns+'bounds')
-    bounds = nullable(parse_bounds)(bounds_element)
-
-    metadata = Metadata(name=name, description=description, author=author,
-               links=links, time=time, keywords=keywords, bounds=bounds)
+    metadata = parse_metadata(gpx_element, gpxns, options)
 
     waypoint_elements = gpx_element.findall(gpxns+'wpt')
-    waypoints = [parse_waypoint(waypoint_element, gpxns) for waypoint_element in waypoint_elements]
+    waypoints = [parse_waypoint(waypoint_element, gpxns, options) for waypoint_element in waypoint_elements]
 
     route_elements = gpx_element.findall(gpxns+'rte')
-    routes = [parse_route(route_element, gpxns) for route_element in route_elements]
+    routes = [parse_route(route_element, gpxns, options) for route_element in route_elements]
 
     track_elements = gpx_element.findall(gpxns+'trk')
-    tracks = [parse_track(track_element, gpxns) for track_element in track_elements]
+    tracks = [parse_track(track_element, gpxns, options) for track_element in track_elements]
 
     # TODO : Private elements
 
@@ -95,114 +87,192 @@ def parse_gpx(gpx_element, gpxns=None):
     return gpx_model
 
 
-def parse_bounds(bounds_element):
+METADATA_TEXT_FIELDS = (
+    ('name', 'name'),
+    ('desc', 'description'),
+    ('author', 'author'),
+    ('email', 'email'),
+    ('url', 'url'),
+    ('urlname', 'urlname'),
+    ('time', 'time'),
+    ('keywords', 'keywords'),
+)
+
+METADATA_ELEMENT_FIELDS = (
+    ('bounds', 'bounds'),
+)
+
+def parse_metadata(gpx_element, gpxns=None, options=None):
+    """Parse the descriptive elements of a GPX 1.0 document into Metadata.
+
+    GPX 1.0 has no <metadata> element; the name, author, time and so on are
+    direct children of the root <gpx> element.
+    """
+    gpxns = gpxns if gpxns is not None else determine_gpx_namespace(gpx_element)
+    options = options if options is not None else DEFAULT_OPTIONS
+
+    texts, elements = scan_children(gpx_element,
+                                    namespace_table(gpxns, METADATA_TEXT_FIELDS),
+                                    namespace_table(gpxns, METADATA_ELEMENT_FIELDS))
+
+    author_name = texts.pop('author', None)
+    email = texts.pop('email', None)
+    author = Person(author_name, email)
+
+    url = texts.pop('url', None)
+    urlname = texts.pop('urlname', None)
+    links = make_links(url, urlname)
+
+    bounds_element = first_element(elements, 'bounds')
+    bounds = nullable(parse_bounds)(bounds_element, options)
+
+    metadata = Metadata(author=author, links=links, bounds=bounds, **texts)
+    return metadata
+
+
+def parse_bounds(bounds_element, options=None):
+    options = options if options is not None else DEFAULT_OPTIONS
     minlat = bounds_element.attrib['minlat']
     minlon = bounds_element.attrib['minlon']
     maxlat = bounds_element.attrib['maxlat']
     maxlon = bounds_element.attrib['maxlon']
-    bounds = Bounds(minlat, minlon, maxlat, maxlon)
+    bounds = options.make_bounds(minlat, minlon, maxlat, maxlon)
     return bounds
 
 
-def parse_waypoint(waypoint_element, gpxns=None):
+WAYPOINT_TEXT_FIELDS = (
+    ('ele', 'elevation'),
+    ('course', 'course'),
+    ('speed', 'speed'),
+    ('time', 'time'),
+    ('magvar', 'magvar'),
+    ('geoidheight', 'geoid_height'),
+    ('name', 'name'),
+    ('cmt', 'comment'),
+    ('desc', 'description'),
+    ('src', 'source'),
+    ('url', 'url'),
+    ('urlname', 'urlname'),
+    ('sym', 'symbol'),
+    ('type', 'classification'),
+    ('fix', 'fix'),
+    ('sat', 'num_satellites'),
+    ('hdop', 'hdop'),
+    ('vdop', 'vdop'),
+    ('pdop', 'pdop'),
+    ('ageofdgpsdata', 'seconds_since_dgps_update'),
+    ('dgpsid', 'dgps_station_type'),
+)
+
+def parse_waypoint(waypoint_element, gpxns=None, options=None):
     gpxns = gpxns if gpxns is not None else determine_gpx_namespace(waypoint_element)
-    get_text = lambda tag: optional_text(waypoint_element, gpxns+tag)
+    options = options if options is not None else DEFAULT_OPTIONS
+    latitude, longitude, fields = parse_waypoint_fields(waypoint_element, gpxns)
+    return options.make_waypoint(latitude, longitude, fields)
 
-    longitude = waypoint_element.attrib['lon']
 
-    elevation = get_text('ele')
-    course = get_text('course')
-    speed = get_text('speed')
+def parse_waypoint_fields(waypoint_element, gpxns):
+    """Parse a waypoint element into the arguments for a Waypoint.
+
+    Returns:
+        A 3-tuple of the latitude, the longitude and a dictionary of the
+        other keyword arguments to Waypoint which are present in the element.
+    """
+    texts, elements = scan_children(waypoint_element,
+                                    namespace_table(gpxns, WAYPOINT_TEXT_FIELDS))
+
     latitude = waypoint_element.attrib['lat']
-    time = get_text('time')
-    magvar = get_text('magvar')
-    geoid_height = get_text('geoidheight')
-    name = get_text('name')
-    comment = get_text('cmt')
-    description = get_text('desc')
-    source = get_text('src')
-
-    url = get_text('url')
-    urlname = get_text('urlname')
-    links = make_links(url, urlname)
+    longitude = waypoint_element.attrib['lon']
 
-    symbol = get_text('sym')
-    classification = get_text('type')
-    fix = get_text('fix')
-    num_satellites = get_text('sat')
-    hdop = get_text('hdop')
-    vdop = get_text('vdop')
-    pdop = get_text('pdop')
-    seconds_since_dgps_update = get_text('ageofdgpsdata')
-    dgps_station_type = get_text('dgpsid')
+    url = texts.pop('url', None)
+    urlname = texts.pop('urlname', None)
+    links = make_links(url, urlname)
 
     # TODO: Private elements - consider passing private element parser in
     #       to cope with differences between waypoints, routes, etc.
 
-    waypoint = Waypoint(latitude, longitude, elevation, time, magvar,
-        geoid_height, name, comment, description, source,
-        links, symbol, classification, fix, num_satellites,
-        hdop, vdop, pdop, seconds_since_dgps_update,
-        dgps_station_type, course, speed)
+    texts['links'] = links
+    return latitude, longitude, texts
+
 
-    return waypoint
+ROUTE_TEXT_FIELDS = (
+    ('name', 'name'),
+    ('cmt', 'comment'),
+    ('desc', 'description'),
+    ('src', 'source'),
+    ('url', 'url'),
+    ('urlname', 'urlname'),
+    ('number', 'number'),
+)
 
+ROUTE_ELEMENT_FIELDS = (
+    ('rtept', 'points'),
+)
 
-def parse_route(route_element, gpxns=None):
+def parse_route(route_element, gpxns=None, options=None):
     gpxns = gpxns if gpxns is not None else determine_gpx_namespace(route_element)
-    get_text = lambda tag: optional_text(route_element, gpxns+tag)
+    options = options if options is not None else DEFAULT_OPTIONS
 
-    name = get_text('name')
-    comment = get_text('cmt')
-    description = get_text('desc')
-    source = get_text('src')
+    texts, elements = scan_children(route_element,
+                                    namespace_table(gpxns, ROUTE_TEXT_FIELDS),
+                                    namespace_table(gpxns, ROUTE_ELEMENT_FIELDS))
 
-    url = get_text('url')
-    urlname = get_text('urlname')
+    url = texts.pop('url', None)
+    urlname = texts.pop('urlname', None)
     links = make_links(url, urlname)
 
-    number = get_text('number')
+    routepoint_elements = elements.get('points', ())
+    routepoints = [parse_waypoint(routepoint_element, gpxns, options) for routepoint_element in routepoint_elements]
 
-    routepoint_elements = route_element.findall(gpxns+'rtept')
-    routepoints = [parse_waypoint(routepoint_element, gpxns) for routepoint_element in routepoint_elements]
-
-    route = Route(name=name, comment=comment, description=description,
-                  source=source, links=links, number=number, points=routepoints)
+    route = Route(links=links, points=routepoints, **texts)
 
     return route
 
 
-def parse_track(track_element, gpxns=None):
+TRACK_TEXT_FIELDS = ROUTE_TEXT_FIELDS
+
+TRACK_ELEMENT_FIELDS = (
+    ('trkseg', 'segments'),
+)
+
+def parse_track(track_element, gpxns=None, options=None):
     gpxns = gpxns if gpxns is not None else determine_gpx_namespace(track_element)
-    get_text = lambda tag: optional_text(track_element, gpxns+tag)
+    options = options if options is not None else DEFAULT_OPTIONS
 
-    name = get_text('name')
-    comment = get_text('comment')
-    description = get_text('desc')
-    source = get_text('src')
+    texts, elements = scan_children(track_element,
+                                    namespace_table(gpxns, TRACK_TEXT_FIELDS),
+                                    namespace_table(gpxns, TRACK_ELEMENT_FIELDS))
 
-    url = get_text('url')
-    urlname = get_text('urlname')
+    url = texts.pop('url', None)
+    urlname = texts.pop('urlname', None)
     links = make_links(url, urlname)
 
-    number = get_text('number')
-
     # TODO: Private elements
 
-    segment_elements = track_element.findall(gpxns+'trkseg')
-    segments = [parse_segment(segment_element, gpxns) for segment_element in segment_elements]
+    segment_elements = elements.get('segments', ())
+    segments = [parse_segment(segment_element, gpxns, options) for segment_element in segment_elements]
 
-    track = Track(name=name, comment=comment, description=description,
-                  source=source, links=links, number=number, segments=segments)
+    track = Track(links=links, segments=segments, **texts)
     return track
 
 
-def parse_segment(segment_element, gpxns=None):
+NO_TEXT_FIELDS = {}
+
+SEGMENT_ELEMENT_FIELDS = (
+    ('trkpt', 'points'),
+)
+
+def parse_segment(segment_element, gpxns=None, options=None):
     gpxns = gpxns if gpxns is not None else determine_gpx_namespace(segment_element)
-    trackpoint_elements = segment_element.findall(gpxns+'trkpt')
-    trackpoints = [parse_waypoint(trackpoint_element, gpxns) for trackpoint_element in trackpoint_elements]
+    options = options if options is not None else DEFAULT_OPTIONS
+
+    texts, elements = scan_children(segment_element, NO_TEXT_FIELDS,
+                                    namespace_table(gpxns, SEGMENT_ELEMENT_FIELDS))
+
+    trackpoint_elements = elements.get('points', ())
+    point_fields = (parse_waypoint_fields(trackpoint_element, gpxns) for trackpoint_element in trackpoint_elements)
 
-    segment = Segment(trackpoints)
+    segment = options.make_segment(point_fields)
     return segment
 
 
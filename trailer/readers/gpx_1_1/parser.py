@@ -4,7 +4,6 @@ import dateutil.parser
 
 from lxml import etree
 
-from trailer.model.bounds import Bounds
 from trailer.model.copyright import Copyright
 from trailer.model.fieldtools import nullable
 from trailer.model.gpx_model import GpxModel
@@ -12,14 +11,14 @@ from trailer.model.link import Link
 from trailer.model.metadata import Metadata
 from trailer.model.person import Person
 from trailer.model.route import Route
-from trailer.model.segment import Segment
 from trailer.model.track import Track
-from trailer.model.waypoint import Waypoint
 from trailer.model.year import Year
-from trailer.readers.common import optional_text, determine_gpx_namespace
+from trailer.readers.options import DEFAULT_OPTIONS
+from trailer.readers.common import (optional_text, determine_gpx_namespace,
+                                    namespace_table, scan_children, first_element)
 
 
-def read_gpx(xml, gpxns=None):
+def read_gpx(xml, gpxns=None, options=None):
     """Parse a GPX file into a GpxModel.
 
     Args:
@@ -61,10 +60,14 @@ def read_gpx(xml, gpxns=None):
         gpxns: The XML namespace for GPX in Clarke notation (i.e. delimited
              by curly braces). If None, (the default) the namespace used in
              the document will be determined automatically.
+
+        options: An optional ReaderOptions controlling the representation of
+             the model. If None, (the default) the model is built from
+             Segments containing Waypoints.
     """
     tree = etree.parse(xml)
     gpx_element = tree.getroot()
-    return parse_gpx(gpx_element, gpxns=gpxns)
+    return parse_gpx(gpx_element, gpxns=gpxns, options=options)
 
 def parse_gpx(gpx_element, gpx_extensions_parser=None,
                    metadata_extensions_parser=None,
@@ -72,7 +75,7 @@ def parse_gpx(gpx_element, gpx_extensions_parser=None,
                    route_extensions_parser=None,
                    track_extensions_parser=None,
                    segment_extensions_parser=None,
-                   gpxns=None):
+                   gpxns=None, options=None):
     """Parse a GPX file into a GpxModel.
 
     Args:
@@ -109,6 +112,13 @@ def parse_gpx(gpx_element, gpx_extensions_parser=None,
             objects representing the extensions. If not specified, extensions
             are ignored.
 
+        gpxns: The XML namespace for GPX in Clarke notation (i.e. delimited
+             by curly braces). If None, (the default) the namespace used in
+             the document will be determined automatically.
+
+        options: An optional ReaderOptions controlling the representation of
+             the model. If None, (the default) the model is built from
+             Segments containing Waypoints.
 
     Returns:
         A GpxModel representing the data from the supplies xml.
@@ -117,6 +127,7 @@ def parse_gpx(gpx_element, gpx_extensions_parser=None,
         ValueError: The supplied XML could not be parsed as GPX.
     """
     gpxns = gpxns if gpxns is not None else determine_gpx_namespace(gpx_element)
+    options = options if options is not None else DEFAULT_OPTIONS
 
     if gpx_element.tag != gpxns+'gpx':
         raise ValueError("No gpx root element")
@@ -128,16 +139,16 @@ def parse_gpx(gpx_element, gpx_extensions_parser=None,
         raise ValueError("Not a GPX 1.1 file")
 
     metadata_element = gpx_element.find(gpxns+'metadata')
-    metadata = nullable(parse_metadata)(metadata_element, gpxns)
+    metadata = nullable(parse_metadata)(metadata_element, gpxns, options)
 
     waypoint_elements = gpx_element.findall(gpxns+'wpt')
-    waypoints = [parse_waypoint(waypoint_element, gpxns) for waypoint_element in waypoint_elements]
+    waypoints = [parse_waypoint(waypoint_element, gpxns, options) for waypoint_element in waypoint_elements]
 
     route_elements = gpx_element.findall(gpxns+'rte')
-    routes = [parse_route(route_element, gpxns) for route_element in route_elements]
+    routes = [parse_route(route_element, gpxns, options) for route_element in route_elements]
 
     track_elements = gpx_element.findall(gpxns+'trk')
-    tracks = [parse_track(track_element, gpxns) for track_element in track_elements]
+    tracks = [parse_track(track_element, gpxns, options) for track_element in track_elements]
 
     extensions_element = gpx_element.find(gpxns+'extensions')
     extensions = nullable(parse_gpx_extensions)(extensions_element, gpxns)
@@ -148,34 +159,46 @@ def parse_gpx(gpx_element, gpx_extensions_parser=None,
     return gpx_model
 
 
-def parse_metadata(metadata_element, gpxns=None):
-    gpxns = gpxns if gpxns is not None else determine_gpx_namespace(metadata_element)
+METADATA_TEXT_FIELDS = (
+    ('name', 'name'),
+    ('desc', 'description'),
+    ('time', 'time'),
+    ('keywords', 'keywords'),
+)
 
-    get_text = lambda tag: optional_text(metadata_element, gpxns+tag)
+METADATA_ELEMENT_FIELDS = (
+    ('author', 'author'),
+    ('copyright', 'copyright'),
+    ('link', 'links'),
+    ('bounds', 'bounds'),
+    ('extensions', 'extensions'),
+)
 
-    name = get_text('name')
-    description = get_text('desc')
+def parse_metadata(metadata_element, gpxns=None, options=None):
+    gpxns = gpxns if gpxns is not None else determine_gpx_namespace(metadata_element)
+    options = options if options is not None else DEFAULT_OPTIONS
 
-    author_element = metadata_element.find(gpxns+'author')
+    texts, elements = scan_children(metadata_element,
+                                    namespace_table(gpxns, METADATA_TEXT_FIELDS),
+                                    namespace_table(gpxns, METADATA_ELEMENT_FIELDS))
+
+    author_element = first_element(elements, 'author')
     author = nullable(parse_person)(author_element, gpxns)
 
-    copyright_element = metadata_element.find(gpxns+'copyright')
+    copyright_element = first_element(elements, 'copyright')
     copyright = nullable(parse_copyright)(copyright_element, gpxns)
 
-    link_elements = metadata_element.findall(gpxns+'link')
+    link_elements = elements.get('links', ())
     links = [parse_link(link_element, gpxns) for link_element in link_elements]
 
-    time = get_text('time')
-    keywords = get_text('keywords')
-
-    bounds_element = metadata_element.find(gpxns+'bounds')
-    bounds = nullable(parse_bounds)(bounds_element)
+    bounds_element = first_element(elements, 'bounds')
+    bounds = nullable(parse_bounds)(bounds_element, options)
 
-    extensions_element = metadata_element.find(gpxns+'extensions')
+    extensions_element = first_element(elements, 'extensions')
     extensions = nullable(parse_metadata_extensions)(extensions_element, gpxns)
 
-    return Metadata(name, description, author, copyright, links, time,
-                    keywords, bounds, extensions)
+    return Metadata(author=author, copyright=copyright, links=links,
+                    bounds=bounds, extensions=extensions, **texts)
 
 
 def parse_person(person_element, gpxns=None):
@@ -235,54 +258,71 @@ def parse_year(year_element):
     return Year(dt.year, dt.tzinfo)
 
 
-def parse_bounds(bounds_element):
+def parse_bounds(bounds_element, options=None):
+    options = options if options is not None else DEFAULT_OPTIONS
     minlat = bounds_element.attrib['minlat']
     minlon = bounds_element.attrib['minlon']
     maxlat = bounds_element.attrib['maxlat']
     maxlon = bounds_element.attrib['maxlon']
-    bounds = Bounds(minlat, minlon, maxlat, maxlon)
+    bounds = options.make_bounds(minlat, minlon, maxlat, maxlon)
     return bounds
 
 
-def parse_waypoint(waypoint_element, gpxns=None):
+WAYPOINT_TEXT_FIELDS = (
+    ('ele', 'elevation'),
+    ('time', 'time'),
+    ('magvar', 'magvar'),
+    ('geoidheight', 'geoid_height'),
+    ('name', 'name'),
+    ('cmt', 'comment'),
+    ('desc', 'description'),
+    ('src', 'source'),
+    ('sym', 'symbol'),
+    ('type', 'classification'),
+    ('fix', 'fix'),
+    ('sat', 'num_satellites'),
+    ('hdop', 'hdop'),
+    ('vdop', 'vdop'),
+    ('pdop', 'pdop'),
+    ('ageofdgpsdata', 'seconds_since_dgps_update'),
+    ('dgpsid', 'dgps_station_type'),
+)
+
+WAYPOINT_ELEMENT_FIELDS = (
+    ('link', 'links'),
+    ('extensions', 'extensions'),
+)
+
+def parse_waypoint(waypoint_element, gpxns=None, options=None):
     gpxns = gpxns if gpxns is not None else determine_gpx_namespace(waypoint_element)
+    options = options if options is not None else DEFAULT_OPTIONS
+    latitude, longitude, fields = parse_waypoint_fields(waypoint_element, gpxns)
+    return options.make_waypoint(latitude, longitude, fields)
 
-    get_text = lambda tag: optional_text(waypoint_element, gpxns+tag)
+
+def parse_waypoint_fields(waypoint_element, gpxns):
+    """Parse a waypoint element into the arguments for a Waypoint.
+
+    Returns:
+        A 3-tuple of the latitude, the longitude and a dictionary of the
+        other keyword arguments to Waypoint which are present in the element.
+    """
+    texts, elements = scan_children(waypoint_element,
+                                    namespace_table(gpxns, WAYPOINT_TEXT_FIELDS),
+                                    namespace_table(gpxns, WAYPOINT_ELEMENT_FIELDS))
 
     latitude = waypoint_element.attrib['lat']
     longitude = waypoint_element.attrib['lon']
 
-    elevation = get_text('ele')
-    time = get_text('time')
-    magvar = get_text('magvar')
-    geoid_height = get_text('geoidheight')
-    name = get_text('name')
-    comment = get_text('cmt')
-    description = get_text('desc')
-    source = get_text('src')
-
-    link_elements = waypoint_element.findall(gpxns+'link')
+    link_elements = elements.get('links', ())
     links = [parse_link(link_element, gpxns) for link_element in link_elements]
 
-    symbol = get_text('sym')
-    classification = get_text('type')
-    fix = get_text('fix')
-    num_satellites = get_text('sat')
-    hdop = get_text('hdop')
-    vdop = get_text('vdop')
-    pdop = get_text('pdop')
-    seconds_since_dgps_update = get_text('ageofdgpsdata')
-    dgps_station_type = get_text('dgpsid')
-
-    extensions_element = waypoint_element.find(gpxns+'extensions')
+    extensions_element = first_element(elements, 'extensions')
     extensions = nullable(parse_waypoint_extensions)(extensions_element, gpxns)
 
-    waypoint = Waypoint(latitude, longitude, elevation, time, magvar,
-                        geoid_height, name, comment, description, source,
-                        links, symbol, classification, fix, num_satellites,
-                        hdop, vdop, pdop, seconds_since_dgps_update,
-                        dgps_station_type, extensions)
-    return waypoint
+    texts['links'] = links
+    texts['extensions'] = extensions
+    return latitude, longitude, texts
 
 
 def parse_link(link_element, gpxns=None):
@@ -298,70 +338,93 @@ def parse_link(link_element, gpxns=None):
     return link
 
 
-def parse_route(route_element, gpxns=None):
-    gpxns = gpxns if gpxns is not None else determine_gpx_namespace(route_element)
+ROUTE_TEXT_FIELDS = (
+    ('name', 'name'),
+    ('cmt', 'comment'),
+    ('desc', 'description'),
+    ('src', 'source'),
+    ('number', 'number'),
+    ('type', 'classification'),
+)
 
-    get_text = lambda tag: optional_text(route_element, gpxns+tag)
+ROUTE_ELEMENT_FIELDS = (
+    ('link', 'links'),
+    ('extensions', 'extensions'),
+    ('rtept', 'points'),
+)
 
-    name = get_text('name')
-    comment = get_text('cmt')
-    description = get_text('desc')
-    source = get_text('src')
+def parse_route(route_element, gpxns=None, options=None):
+    gpxns = gpxns if gpxns is not None else determine_gpx_namespace(route_element)
+    options = options if options is not None else DEFAULT_OPTIONS
 
-    link_elements = route_element.findall(gpxns+'link')
-    links = [parse_link(link_element, gpxns) for link_element in link_elements]
+    texts, elements = scan_children(route_element,
+                                    namespace_table(gpxns, ROUTE_TEXT_FIELDS),
+                                    namespace_table(gpxns, ROUTE_ELEMENT_FIELDS))
 
-    number = get_text('number')
-    classification = get_text('type')
+    link_elements = elements.get('links', ())
+    links = [parse_link(link_element, gpxns) for link_element in link_elements]
 
-    extensions_element = route_element.find(gpxns+'extensions')
+    extensions_element = first_element(elements, 'extensions')
     extensions = nullable(parse_route_extensions)(extensions_element, gpxns)
 
-    routepoint_elements = route_element.findall(gpxns+'rtept')
-    routepoints = [parse_waypoint(routepoint_element, gpxns) for routepoint_element in routepoint_elements]
+    routepoint_elements = elements.get('points', ())
+    routepoints = [parse_waypoint(routepoint_element, gpxns, options) for routepoint_element in routepoint_elements]
 
-    route = Route(name, comment, description, source, links, number, classification, extensions, routepoints)
+    route = Route(links=links, extensions=extensions, points=routepoints, **texts)
 
     return route
 
 
-def parse_track(track_element, gpxns=None):
-    gpxns = gpxns if gpxns is not None else determine_gpx_namespace(track_element)
+TRACK_TEXT_FIELDS = ROUTE_TEXT_FIELDS
 
-    get_text = lambda tag: optional_text(track_element, gpxns+tag)
+TRACK_ELEMENT_FIELDS = (
+    ('link', 'links'),
+    ('extensions', 'extensions'),
+    ('trkseg', 'segments'),
+)
 
-    name = get_text('name')
-    comment = get_text('comment')
-    description = get_text('desc')
-    source = get_text('src')
+def parse_track(track_element, gpxns=None, options=None):
+    gpxns = gpxns if gpxns is not None else determine_gpx_namespace(track_element)
+    options = options if options is not None else DEFAULT_OPTIONS
 
-    link_elements = track_element.findall(gpxns+'link')
-    links = [parse_link(link_element, gpxns) for link_element in link_elements]
+    texts, elements = scan_children(track_element,
+                                    namespace_table(gpxns, TRACK_TEXT_FIELDS),
+                                    namespace_table(gpxns, TRACK_ELEMENT_FIELDS))
 
-    number = get_text('number')
-    classification = get_text('type')
+    link_elements = elements.get('links', ())
+    links = [parse_link(link_element, gpxns) for link_element in link_elements]
 
-    segment_elements = track_element.findall(gpxns+'trkseg')
-    segments = [parse_segment(segment_element, gpxns) for segment_element in segment_elements]
+    segment_elements = elements.get('segments', ())
+    segments = [parse_segment(segment_element, gpxns, options) for segment_element in segment_elements]
 
-    extensions_element = track_element.find(gpxns+'extensions')
+    extensions_element = first_element(elements, 'extensions')
     extensions = nullable(parse_track_extensions)(extensions_element, gpxns)
 
-    track = Track(name, comment, description, source, links, number,
-                  classification, extensions, segments)
+    track = Track(links=links, extensions=extensions, segments=segments, **texts)
     return track
 
 
-def parse_segment(segment_element, gpxns=None):
+SEGMENT_ELEMENT_FIELDS = (
+    ('trkpt', 'points'),
+    ('extensions', 'extensions'),
+)
+
+NO_TEXT_FIELDS = {}
+
+def parse_segment(segment_element, gpxns=None, options=None):
     gpxns = gpxns if gpxns is not None else determine_gpx_namespace(segment_element)
+    options = options if options is not None else DEFAULT_OPTIONS
+
+    texts, elements = scan_children(segment_element, NO_TEXT_FIELDS,
+                                    namespace_table(gpxns, SEGMENT_ELEMENT_FIELDS))
 
-    trackpoint_elements = segment_element.findall(gpxns+'trkpt')
-    trackpoints = [parse_waypoint(trackpoint_element, gpxns) for trackpoint_element in trackpoint_elements]
+    trackpoint_elements = elements.get('points', ())
+    point_fields = (parse_waypoint_fields(trackpoint_element, gpxns) for trackpoint_element in trackpoint_elements)
 
-    extensions_element = segment_element.find(gpxns+'extensions')
+    extensions_element = first_element(elements, 'extensions')
     extensions = nullable(parse_segment_extensions)(extensions_element, gpxns)
 
-    segment = Segment(trackpoints, extensions)
+    segment = options.make_segment(point_fields, extensions)
     return segment
 
 
@@ -0,0 +1,379 @@
+"""Random access to the waypoints, routes and tracks of large GPX files.
+
+A GpxIndex records the byte offsets of each <wpt>, <rte>, <trk> and
+<trkseg> element of a file, found by matching bytes rather than by parsing
+the XML. Once a file has been indexed, any one of those items can be read
+by parsing only its own bytes, wrapped in the start and end tags of the
+<gpx> root element so that the document's namespace declarations apply.
+The file is memory-mapped, so only the pages holding the items actually
+read are brought into memory.
+
+Indexes can be saved alongside the file they describe and loaded again, so
+that a file need only be scanned once.
+"""
+import json
+import mmap
+import os
+
+from lxml import etree
+
+from trailer.readers.common import (WIDE_ENCODING_REGEX, boundary_tag_regex,
+                                    determine_gpx_namespace, find_tag_end)
+from trailer.readers.options import DEFAULT_OPTIONS
+from trailer.readers.stream import VERSION_PARSERS
+
+__author__ = 'rjs'
+
+INDEX_TAG_REGEX = boundary_tag_regex((b'gpx', b'wpt', b'rte', b'trk', b'trkseg'))
+
+# Appended to the filename of a GPX file to give the default index filename.
+INDEX_SUFFIX = '.index'
+
+# Incremented whenever the saved index format changes incompatibly.
+INDEX_FORMAT = 1
+
+ITEM_KEYS = {
+    b'wpt': 'waypoints',
+    b'rte': 'routes',
+    b'trk': 'tracks',
+}
+
+
+class GpxIndex:
+    """Byte offsets of the items in a GPX file, and a memory map of the file.
+
+    Most clients will create an index with build(), load() or open() rather
+    than calling the constructor directly. A GpxIndex holds the file open,
+    so should be closed after use, or used as a context manager.
+
+    Args:
+        path: The filename of the GPX file.
+
+        offsets: A dictionary of offsets, as created by build().
+
+        gpxns: The XML namespace for GPX in Clarke notation (i.e. delimited
+             by curly braces). If None, (the default) the namespace used in
+             the document will be determined automatically.
+
+        options: An optional ReaderOptions controlling the representation of
+             the model objects.
+
+    Raises:
+        ValueError: The file has changed since the offsets were recorded, or
+            is not a supported version of GPX.
+    """
+
+    def __init__(self, path, offsets, gpxns=None, options=None):
+        self._path = path
+        self._offsets = offsets
+        self._options = options if options is not None else DEFAULT_OPTIONS
+        self._data = None
+        self._file = open(path, 'rb')
+        try:
+            stat = os.fstat(self._file.fileno())
+            if stat.st_size != offsets['size'] or stat.st_mtime_ns != offsets['mtime_ns']:
+                raise ValueError("{0} has changed since it was indexed".format(path))
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            self._header = self._data[:offsets['header_end']]
+            prefix = offsets['prefix'].encode('utf-8')
+            self._footer = b'</' + prefix + b'gpx>'
+            self._track_footer = b'</' + prefix + b'trk>'
+
+            root = etree.fromstring(self._header + self._footer)
+            self._gpxns = gpxns if gpxns is not None else determine_gpx_namespace(root)
+            version = root.get('version')
+            if version not in VERSION_PARSERS:
+                raise ValueError("Cannot parse GPX version {0}".format(version))
+            self._parser = VERSION_PARSERS[version]
+        except BaseException:
+            self.close()
+            raise
+
+    @classmethod
+    def build(cls, path, gpxns=None, options=None):
+        """Index a GPX file by scanning its bytes.
+
+        Args:
+            path: The filename of the GPX file.
+
+            gpxns: As for the constructor.
+
+            options: As for the constructor.
+
+        Returns:
+            A GpxIndex.
+
+        Raises:
+            ValueError: The file could not be indexed, for example because it
+                is not well-formed, is encoded in UTF-16, or has a document
+                type declaration, which could define entities that change
+                the structure of the document.
+        """
+        with open(path, 'rb') as xml:
+            stat = os.fstat(xml.fileno())
+            if stat.st_size == 0:
+                raise ValueError("{0} is empty".format(path))
+            with mmap.mmap(xml.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                offsets = scan_offsets(data)
+        offsets['size'] = stat.st_size
+        offsets['mtime_ns'] = stat.st_mtime_ns
+        return cls(path, offsets, gpxns, options)
+
+    @classmethod
+    def load(cls, path, index_path=None, gpxns=None, options=None):
+        """Load an index previously saved with save().
+
+        Args:
+            path: The filename of the GPX file.
+
+            index_path: The filename of the saved index. If None, (the
+                default) the filename of the GPX file with INDEX_SUFFIX
+                appended.
+
+            gpxns: As for the constructor.
+
+            options: As for the constructor.
+
+        Returns:
+            A GpxIndex.
+
+        Raises:
+            OSError: The index could not be read.
+            ValueError: The index is not in a supported format, or the GPX
+                file has changed since it was indexed.
+        """
+        index_path = index_path if index_path is not None else path + INDEX_SUFFIX
+        with open(index_path, 'r', encoding='utf-8') as index_file:
+            offsets = json.load(index_file)
+        if offsets.get('format') != INDEX_FORMAT:
+            raise ValueError("Unsupported index format {0!r} in {1}".format(
+                             offsets.get('format'), index_path))
+        return cls(path, offsets, gpxns, options)
+
+    @classmethod
+    def open(cls, path, index_path=None, gpxns=None, options=None):
+        """Load the saved index of a GPX file, or build and save a new one.
+
+        A new index is built if there is no saved index or it is out of
+        date. Failure to save the new index is not an error, since the index
+        is still usable.
+
+        The arguments are the same as for load().
+
+        Returns:
+            A GpxIndex.
+
+        Raises:
+            ValueError: The file could not be indexed.
+        """
+        try:
+            return cls.load(path, index_path, gpxns, options)
+        except (OSError, ValueError):
+            pass
+        index = cls.build(path, gpxns, options)
+        try:
+            index.save(index_path)
+        except OSError:
+            pass
+        return index
+
+    def save(self, index_path=None):
+        """Save the index so that it can be loaded again with load().
+
+        Args:
+            index_path: The filename of the saved index. If None, (the
+                default) the filename of the GPX file with INDEX_SUFFIX
+                appended.
+        """
+        index_path = index_path if index_path is not None else self._path + INDEX_SUFFIX
+        temporary_path = index_path + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as index_file:
+            json.dump(dict(self._offsets, format=INDEX_FORMAT), index_file, separators=(',', ':'))
+        os.replace(temporary_path, index_path)
+
+    def close(self):
+        """Close the memory map and the file."""
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def waypoint_count(self):
+        return len(self._offsets['waypoints'])
+
+    @property
+    def route_count(self):
+        return len(self._offsets['routes'])
+
+    @property
+    def track_count(self):
+        return len(self._offsets['tracks'])
+
+    def segment_count(self, track_index):
+        """The number of segments in a track."""
+        return len(self._offsets['segments'][track_index])
+
+    def parse_waypoint(self, index):
+        """Parse a single <wpt> element into a Waypoint.
+
+        Args:
+            index: The index of the waypoint among the waypoints of the file.
+        """
+        start, end = self._offsets['waypoints'][index]
+        element = self._parse_fragment(self._data[start:end])
+        return self._parser.parse_waypoint(element, self._gpxns, self._options)
+
+    def parse_route(self, index):
+        """Parse a single <rte> element into a Route.
+
+        Args:
+            index: The index of the route among the routes of the file.
+        """
+        start, end = self._offsets['routes'][index]
+        element = self._parse_fragment(self._data[start:end])
+        return self._parser.parse_route(element, self._gpxns, self._options)
+
+    def parse_track(self, index):
+        """Parse a single <trk> element into a Track, including all its segments.
+
+        Args:
+            index: The index of the track among the tracks of the file.
+        """
+        start, _, end = self._offsets['tracks'][index]
+        element = self._parse_fragment(self._data[start:end])
+        return self._parser.parse_track(element, self._gpxns, self._options)
+
+    def parse_segment(self, track_index, segment_index):
+        """Parse a single <trkseg> element into a Segment.
+
+        Args:
+            track_index: The index of the track among the tracks of the file.
+
+            segment_index: The index of the segment among the segments of
+                the track.
+        """
+        track_start, track_tag_end, _ = self._offsets['tracks'][track_index]
+        start, end = self._offsets['segments'][track_index][segment_index]
+        element = self._parse_fragment(self._data[track_start:track_tag_end] +
+                                       self._data[start:end] + self._track_footer)
+        return self._parser.parse_segment(element[0], self._gpxns, self._options)
+
+    def _parse_fragment(self, fragment):
+        if self._data is None:
+            raise ValueError("GpxIndex is closed")
+        root = etree.fromstring(self._header + fragment + self._footer)
+        return root[0]
+
+
+def scan_offsets(data):
+    """Find the byte offsets of the items in the bytes of a GPX document.
+
+    Args:
+        data: The bytes of the document, or a buffer such as an mmap.
+
+    Returns:
+        A dictionary with the keys:
+
+            'header_end' - the offset of the end of the start tag of the root
+                           <gpx> element
+            'prefix'     - the namespace prefix of the GPX elements, including
+                           the colon, or an empty string
+            'waypoints'  - a list of [start, end] offsets of each <wpt>
+            'routes'     - a list of [start, end] offsets of each <rte>
+            'tracks'     - a list of [start, start tag end, end] offsets of
+                           each <trk>
+            'segments'   - a list for each track of the [start, end] offsets
+                           of each of its <trkseg> elements
+
+        Only elements which are children of the root, or for segments
+        children of a track, are included.
+
+    Raises:
+        ValueError: The document could not be indexed.
+    """
+    if WIDE_ENCODING_REGEX.match(data[:256]):
+        raise ValueError("Only documents in encodings compatible with ASCII can be indexed")
+
+    offsets = {'waypoints': [], 'routes': [], 'tracks': [], 'segments': []}
+    prefix = None
+    item = None       # The local name and offsets of the open wpt, rte or trk
+    segment = None    # The start offset of the open trkseg
+
+    for match in INDEX_TAG_REGEX.finditer(data):
+        name = match.group(2)
+        if name is None:
+            continue
+        is_end = bool(match.group(1))
+        local_name = match.group(3)
+
+        if prefix is None:
+            if is_end or local_name != b'gpx':
+                raise ValueError("No gpx root element")
+            if b'<!DOCTYPE' in data[:match.start()]:
+                raise ValueError("Documents with a document type declaration cannot be indexed")
+            offsets['header_end'] = _tag_end(data, match)
+            prefix = name[:-len(local_name)]
+            continue
+        if name[:-len(local_name)] != prefix:
+            continue
+
+        if local_name == b'trkseg':
+            if item is None or item[0] != b'trk':
+                continue
+            if is_end:
+                if segment is not None:
+                    offsets['segments'][-1].append([segment, _tag_end(data, match)])
+                    segment = None
+            else:
+                tag_end = _tag_end(data, match)
+                if data[tag_end - 2:tag_end] == b'/>':
+                    offsets['segments'][-1].append([match.start(), tag_end])
+                else:
+                    segment = match.start()
+        elif local_name in ITEM_KEYS:
+            if is_end:
+                if item is not None and item[0] == local_name:
+                    _, start, start_tag_end = item
+                    _append_item(offsets, local_name, start, start_tag_end, _tag_end(data, match))
+                    item = None
+            elif item is None:
+                tag_end = _tag_end(data, match)
+                if local_name == b'trk':
+                    offsets['segments'].append([])
+                if data[tag_end - 2:tag_end] == b'/>':
+                    _append_item(offsets, local_name, match.start(), tag_end, tag_end)
+                else:
+                    item = (local_name, match.start(), tag_end)
+
+    if prefix is None:
+        raise ValueError("No gpx root element")
+    if item is not None:
+        raise ValueError("Unterminated {0} element".format(item[0].decode('ascii')))
+    offsets['prefix'] = prefix.decode('utf-8')
+    return offsets
+
+
+def _tag_end(data, match):
+    tag_end = find_tag_end(data, match.end())
+    if tag_end is None:
+        raise ValueError("Unterminated tag at byte {0}".format(match.start()))
+    return tag_end
+
+
+def _append_item(offsets, local_name, start, start_tag_end, end):
+    if local_name == b'trk':
+        offsets['tracks'].append([start, start_tag_end, end])
+    else:
+        offsets[ITEM_KEYS[local_name]].append([start, end])
@@ -0,0 +1,130 @@
+from trailer.model.bounds import Bounds, FloatBounds
+from trailer.model.segment import Segment
+from trailer.model.waypoint import Waypoint, LazyWaypoint, FloatWaypoint, LazyFloatWaypoint
+
+try:
+    from trailer.model.columnar import ColumnarSegment
+except ImportError:
+    ColumnarSegment = None
+
+__author__ = 'rjs'
+
+NUMERIC_REPRESENTATIONS = ('decimal', 'float')
+
+WAYPOINT_TYPES = {
+    ('decimal', False): Waypoint,
+    ('decimal', True): LazyWaypoint,
+    ('float', False): FloatWaypoint,
+    ('float', True): LazyFloatWaypoint,
+}
+
+BOUNDS_TYPES = {
+    'decimal': Bounds,
+    'float': FloatBounds,
+}
+
+
+class ReaderOptions:
+    """Options controlling the representation of the model built by the readers.
+
+    The parse functions of the GPX 1.0 and 1.1 readers create waypoints and
+    segments through an instance of this class, so the choice of
+    representation is made in one place.
+
+    Args:
+        columnar: If True, track segments are read into ColumnarSegments,
+            which hold the values of their points in NumPy arrays, rather
+            than into Segments containing lists of Waypoints. Requires NumPy.
+
+        lazy: If True, waypoints are created as LazyWaypoints, which keep
+            the text read from the document and convert each field only when
+            it is first accessed. Validation errors are also deferred until
+            then.
+
+        numeric: Either 'decimal' (the default) to represent coordinates,
+            elevations, dilutions of precision and other non-integral
+            numbers as Decimals, which round-trip exactly, or 'float' to
+            represent them as floats, which are faster to create and to
+            compute with.
+    """
+
+    def __init__(self, columnar=False, lazy=False, numeric='decimal'):
+        if columnar and ColumnarSegment is None:
+            raise ImportError("Columnar segments require NumPy")
+        if numeric not in NUMERIC_REPRESENTATIONS:
+            raise ValueError("Numeric representation {0!r} not one of {1}".format(
+                             numeric, ', '.join(NUMERIC_REPRESENTATIONS)))
+        self._columnar = bool(columnar)
+        self._lazy = bool(lazy)
+        self._numeric = numeric
+        self._waypoint_type = WAYPOINT_TYPES[numeric, self._lazy]
+        self._bounds_type = BOUNDS_TYPES[numeric]
+
+    def __repr__(self):
+        return "{0}(columnar={1!r}, lazy={2!r}, numeric={3!r})".format(
+               type(self).__name__, self._columnar, self._lazy, self._numeric)
+
+    @property
+    def columnar(self):
+        return self._columnar
+
+    @property
+    def lazy(self):
+        return self._lazy
+
+    @property
+    def numeric(self):
+        return self._numeric
+
+    @property
+    def waypoint_type(self):
+        """The class of the waypoints created by make_waypoint()."""
+        return self._waypoint_type
+
+    def make_bounds(self, minimum_latitude, minimum_longitude,
+                    maximum_latitude, maximum_longitude):
+        """Create Bounds, usually from text."""
+        return self._bounds_type(minimum_latitude, minimum_longitude,
+                                 maximum_latitude, maximum_longitude)
+
+    def make_waypoint(self, latitude, longitude, fields):
+        """Create a waypoint.
+
+        Args:
+            latitude: The latitude, usually as text.
+            longitude: The longitude, usually as text.
+            fields: A dictionary of the other Waypoint keyword arguments.
+        """
+        return self._waypoint_type(latitude, longitude, **fields)
+
+    def make_segment(self, point_fields, extensions=None):
+        """Create a track segment.
+
+        Args:
+            point_fields: An iterable series of (latitude, longitude, fields)
+                triples, one for each point, with the same meaning as the
+                arguments to make_waypoint().
+
+            extensions: The extensions of the segment.
+        """
+        if self._columnar:
+            return ColumnarSegment.from_fields(point_fields, extensions, self._waypoint_type)
+        points = [self.make_waypoint(latitude, longitude, fields)
+                  for latitude, longitude, fields in point_fields]
+        return Segment(points, extensions)
+
+    def concatenate_segments(self, segments, extensions=None):
+        """Create a track segment from the points of several made by make_segment().
+
+        Args:
+            segments: An iterable series of segments.
+
+            extensions: The extensions of the new segment.
+        """
+        if self._columnar:
+            return ColumnarSegment.concatenate(segments, extensions, self._waypoint_type)
+        points = [point for segment in segments for point in segment.points]
+        return Segment(points, extensions)
+
+
+DEFAULT_OPTIONS = ReaderOptions()
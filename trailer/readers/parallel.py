@@ -0,0 +1,408 @@
+"""Parallel readers for reading GPX files using a pool of workers.
+
+Parsing is CPU bound, so by default each file is read in a separate process
+from a ProcessPoolExecutor and the resulting GpxModel is pickled back to the
+calling process. The model classes pickle to a compact state - Waypoints in
+particular are transferred as tuples of their field values rather than as
+dictionaries of attribute names and values - which halves the size of the
+data transferred and reduces the time taken to pickle it.
+
+read_gpx_many() reads each of many files in a worker. read_gpx_parallel()
+splits the track segments of a single large file into byte ranges which are
+parsed by separate workers.
+"""
+from collections import deque, namedtuple
+from concurrent.futures import (Executor, ProcessPoolExecutor, ThreadPoolExecutor,
+                                FIRST_COMPLETED, wait)
+import mmap
+import os
+
+from lxml import etree
+
+from trailer.readers.common import (WIDE_ENCODING_REGEX, boundary_tag_regex,
+                                    determine_gpx_namespace, find_tag_end)
+from trailer.readers.options import DEFAULT_OPTIONS
+from trailer.readers.parser import read_gpx, parse_gpx
+from trailer.readers.stream import VERSION_PARSERS
+
+__author__ = 'rjs'
+
+
+ReadResult = namedtuple('ReadResult', ['index', 'path', 'gpx', 'error'])
+
+SegmentLayout = namedtuple('SegmentLayout', ['root_header', 'root_footer', 'skeleton', 'segment_chunks'])
+
+EXECUTOR_TYPES = {
+    'process': ProcessPoolExecutor,
+    'thread': ThreadPoolExecutor,
+}
+
+# The number of files submitted to the pool for each worker, ahead of the
+# results being consumed, so that workers are not left idle but a long
+# series of paths is not submitted all at once.
+PENDING_PER_WORKER = 4
+
+# Track segments are split into byte ranges of at least this size.
+MINIMUM_CHUNK_SIZE = 1 << 20
+
+# The elements which delimit the parts of a document parsed separately by
+# read_gpx_parallel().
+BOUNDARY_TAG_REGEX = boundary_tag_regex((b'gpx', b'trk', b'trkseg', b'trkpt'))
+
+
+def read_gpx_many(paths, workers=None, executor='process', ordered=True,
+                  capture_errors=False, gpxns=None, options=None):
+    """Parse many GPX files in parallel.
+
+    Args:
+        paths: An iterable series of filenames of GPX files.
+
+        workers: The maximum number of worker processes or threads. If None,
+            (the default) the executor's default is used, which is usually
+            the number of processors.
+
+        executor: 'process' (the default) to parse in a pool of processes,
+            'thread' to parse in a pool of threads, or an existing
+            concurrent.futures.Executor, which is not shut down afterwards.
+
+        ordered: If True, (the default) the results are in the same order as
+            the paths. If False, they are in the order in which parsing
+            completed.
+
+        capture_errors: If False, (the default) the first exception raised
+            in reading a file is propagated and the remaining files are not
+            read. If True, the exception is returned in the error field of the
+            corresponding result, and the other files are read regardless.
+
+        gpxns: The XML namespace for GPX in Clarke notation, as for
+            read_gpx(), or None to determine the namespace of each document
+            automatically.
+
+        options: An optional ReaderOptions controlling the representation of
+            the models.
+
+    Returns:
+        A list of ReadResults, each of which has the index of the path in
+        paths, the path, and either the GpxModel read from it with an error
+        of None, or if reading failed and capture_errors is True, a GpxModel
+        of None and the exception.
+
+    Raises:
+        ValueError: If executor is not a recognised executor type, or a file
+            could not be parsed as GPX and capture_errors is False.
+    """
+    return list(iter_gpx_many(paths, workers, executor, ordered,
+                              capture_errors, gpxns, options))
+
+
+def iter_gpx_many(paths, workers=None, executor='process', ordered=True,
+                  capture_errors=False, gpxns=None, options=None):
+    """Parse many GPX files in parallel, yielding the results as they are ready.
+
+    The arguments are the same as for read_gpx_many(). The paths are consumed
+    and submitted to the pool only a few at a time ahead of the results, so
+    paths may be a long or unbounded iterator.
+
+    Yields:
+        ReadResults, as for read_gpx_many().
+
+    Raises:
+        ValueError: If executor is not a recognised executor type, or a file
+            could not be parsed as GPX and capture_errors is False.
+    """
+    pool = _make_pool(executor, workers)
+    jobs = enumerate(paths)
+    capacity = (workers or os.cpu_count() or 1) * PENDING_PER_WORKER
+    pending = deque() if ordered else {}
+
+    def submit():
+        while len(pending) < capacity:
+            try:
+                index, path = next(jobs)
+            except StopIteration:
+                return
+            future = pool.submit(_read_gpx, path, gpxns, options)
+            if ordered:
+                pending.append((future, index, path))
+            else:
+                pending[future] = (index, path)
+
+    try:
+        submit()
+        while pending:
+            if ordered:
+                future, index, path = pending.popleft()
+                submit()
+                yield _result(future, index, path, capture_errors)
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                completed = [(future,) + pending.pop(future) for future in done]
+                submit()
+                for future, index, path in completed:
+                    yield _result(future, index, path, capture_errors)
+    finally:
+        # The futures which have not started are cancelled one by one, since
+        # shutdown() only accepts cancel_futures from Python 3.9.
+        futures = [entry[0] for entry in pending] if ordered else list(pending)
+        for future in futures:
+            future.cancel()
+        if pool is not executor:
+            pool.shutdown(wait=True)
+
+
+def read_gpx_parallel(path, workers=None, executor='process', chunk_size=None,
+                      gpxns=None, options=None):
+    """Parse a single large GPX file, parsing its track points in parallel.
+
+    The file is scanned for the byte ranges of its <trkseg> elements, which
+    are divided at <trkpt> boundaries into chunks. Each chunk is parsed by a
+    worker as a small document consisting of the chunk wrapped in the start
+    tags of the enclosing <gpx>, <trk> and <trkseg> elements, so that the
+    namespace declarations of the original document apply. Meanwhile the
+    rest of the document, with the contents of those segments removed, is
+    parsed in the calling process, and the parsed segments are then put back
+    in document order.
+
+    Documents which are too small to divide, or which cannot safely be
+    divided by matching bytes - such as those in UTF-16 or with a document
+    type declaration, which may define entities - are read with read_gpx().
+
+    Args:
+        path: The filename of a GPX file.
+
+        workers: The maximum number of worker processes or threads. If None,
+            (the default) the executor's default is used, which is usually
+            the number of processors.
+
+        executor: 'process' (the default) to parse in a pool of processes,
+            'thread' to parse in a pool of threads, or an existing
+            concurrent.futures.Executor, which is not shut down afterwards.
+
+        chunk_size: The approximate number of bytes of track points parsed
+            by each task. If None, (the default) the file is divided into a
+            few chunks for each worker, but no smaller than
+            MINIMUM_CHUNK_SIZE.
+
+        gpxns: The XML namespace for GPX in Clarke notation, as for
+            read_gpx(), or None to determine the namespace automatically.
+
+        options: An optional ReaderOptions controlling the representation of
+            the model.
+
+    Returns:
+        A GpxModel representing the data in the file.
+
+    Raises:
+        ValueError: If executor is not a recognised executor type, or the
+            file could not be parsed as GPX.
+    """
+    options = options if options is not None else DEFAULT_OPTIONS
+    with open(path, 'rb') as xml:
+        size = os.fstat(xml.fileno()).st_size
+        if chunk_size is None:
+            chunk_size = max(MINIMUM_CHUNK_SIZE,
+                             size // ((workers or os.cpu_count() or 1) * PENDING_PER_WORKER))
+        layout = None
+        if size > chunk_size:
+            with mmap.mmap(xml.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                layout = _scan_segments(data, chunk_size)
+    if layout is None or sum(len(chunks) for chunks in layout.segment_chunks if chunks) < 2:
+        return read_gpx(path, gpxns, options)
+
+    root = etree.fromstring(layout.root_header + layout.root_footer)
+    gpxns = gpxns if gpxns is not None else determine_gpx_namespace(root)
+    version = root.get('version')
+    if version not in VERSION_PARSERS:
+        return read_gpx(path, gpxns, options)
+
+    pool = _make_pool(executor, workers)
+    futures = []
+    try:
+        segment_futures = []
+        for chunks in layout.segment_chunks:
+            if chunks is None:
+                segment_futures.append(None)
+                continue
+            segment_futures.append([pool.submit(_parse_segment_chunk, path, version, gpxns, options, *chunk)
+                                    for chunk in chunks])
+            futures.extend(segment_futures[-1])
+
+        try:
+            skeleton = etree.fromstring(layout.skeleton)
+        except etree.LxmlError as error:
+            raise ValueError("Could not parse {0} as XML: {1}".format(path, error)) from None
+        gpx = parse_gpx(skeleton, gpxns, options)
+        del skeleton
+
+        track_segments = [(track.segments, index) for track in gpx.tracks
+                          for index in range(len(track.segments))]
+        if len(track_segments) != len(segment_futures):
+            raise ValueError("Found {0} track segments in {1} but parsed {2}".format(
+                             len(segment_futures), path, len(track_segments)))
+
+        for (segments, index), chunk_futures in zip(track_segments, segment_futures):
+            if chunk_futures is None:
+                continue
+            parts = [future.result() for future in chunk_futures]
+            if len(parts) == 1:
+                segments[index] = parts[0]
+            else:
+                segments[index] = options.concatenate_segments(parts, parts[-1].extensions)
+        return gpx
+    finally:
+        for future in futures:
+            future.cancel()
+        if pool is not executor:
+            pool.shutdown(wait=True)
+
+
+def _scan_segments(data, chunk_size):
+    """Locate the track segments in a document and divide them into chunks.
+
+    Args:
+        data: The bytes of the document, or a buffer such as an mmap.
+
+        chunk_size: The approximate number of bytes in each chunk.
+
+    Returns:
+        A SegmentLayout, or None if the document cannot be divided by
+        matching bytes, for example because it is not well-formed. The
+        root_header is any prolog followed by the start tag of the root
+        element, and root_footer its end tag. The skeleton is the whole
+        document with the content of each <trkseg> containing points
+        removed. The segment_chunks list has an item for each <trkseg> in
+        document order: None if it is left in the skeleton, otherwise a list
+        of (header, start, end, footer) tuples, one for each chunk, where
+        start and end are byte offsets into the document, and header and
+        footer are the bytes to wrap around the chunk to make a document.
+    """
+    if WIDE_ENCODING_REGEX.match(data[:256]):
+        return None
+
+    root_name = None
+    root_header = None
+    prefix = None
+    track_tag = None
+    track_name = None
+    segment = None
+    segment_chunks = []
+    skeleton = []
+    copied = 0
+
+    for match in BOUNDARY_TAG_REGEX.finditer(data):
+        name = match.group(2)
+        if name is None:
+            continue
+        is_end = bool(match.group(1))
+        local_name = match.group(3)
+        if root_name is None:
+            if is_end or local_name != b'gpx':
+                return None
+            root_name = name
+            prefix = name[:-len(local_name)]
+            prolog = data[:match.start()]
+            if b'<!DOCTYPE' in prolog:
+                return None
+            tag_end = find_tag_end(data, match.end())
+            if tag_end is None:
+                return None
+            root_header = prolog + data[match.start():tag_end]
+            continue
+        if name[:-len(local_name)] != prefix:
+            continue
+
+        if local_name == b'trkpt':
+            if segment is not None and not is_end:
+                segment[2].append(match.start())
+        elif local_name == b'trkseg':
+            if is_end:
+                if segment is not None and not segment[2]:
+                    segment_chunks.append(None)
+                elif segment is not None:
+                    segment_tag, content_start, point_starts = segment
+                    content_end = match.start()
+                    skeleton.append(data[copied:content_start])
+                    copied = content_end
+                    header = root_header + track_tag + segment_tag
+                    footer = b''.join([b'</', name, b'></', track_name, b'></', root_name, b'>'])
+                    segment_chunks.append(
+                        [(header, start, end, footer) for start, end in
+                         _chunk_ranges(content_start, content_end, point_starts, chunk_size)])
+                segment = None
+            elif track_tag is not None:
+                tag_end = find_tag_end(data, match.end())
+                if tag_end is None:
+                    return None
+                if data[tag_end - 2:tag_end] == b'/>':
+                    segment_chunks.append(None)
+                else:
+                    segment = (data[match.start():tag_end], tag_end, [])
+        elif local_name == b'trk':
+            if is_end:
+                track_tag = None
+            else:
+                tag_end = find_tag_end(data, match.end())
+                if tag_end is None:
+                    return None
+                if data[tag_end - 2:tag_end] != b'/>':
+                    track_tag = data[match.start():tag_end]
+                    track_name = name
+
+    if root_name is None or segment is not None:
+        return None
+    skeleton.append(data[copied:])
+    root_footer = b''.join([b'</', root_name, b'>'])
+    return SegmentLayout(root_header, root_footer, b''.join(skeleton), segment_chunks)
+
+
+def _chunk_ranges(content_start, content_end, point_starts, chunk_size):
+    """Divide the content of a segment at point boundaries into (start, end) ranges."""
+    boundaries = [content_start]
+    for point_start in point_starts[1:]:
+        if point_start - boundaries[-1] >= chunk_size:
+            boundaries.append(point_start)
+    boundaries.append(content_end)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def _parse_segment_chunk(path, version, gpxns, options, header, start, end, footer):
+    with open(path, 'rb') as xml:
+        xml.seek(start)
+        content = xml.read(end - start)
+    try:
+        root = etree.fromstring(header + content + footer)
+    except etree.LxmlError as error:
+        raise ValueError("Could not parse bytes {0} to {1} of {2} as XML: {3}".format(
+                         start, end, path, error)) from None
+    segment_element = next(root.iter(gpxns + 'trkseg'))
+    return VERSION_PARSERS[version].parse_segment(segment_element, gpxns, options)
+
+
+def _make_pool(executor, workers):
+    if isinstance(executor, Executor):
+        return executor
+    try:
+        executor_type = EXECUTOR_TYPES[executor]
+    except KeyError:
+        raise ValueError("Executor {0!r} not one of {1}".format(
+                         executor, ', '.join(EXECUTOR_TYPES)))
+    return executor_type(max_workers=workers)
+
+
+def _read_gpx(path, gpxns, options):
+    # The exceptions raised by lxml cannot be pickled, so are replaced with
+    # ones which can be returned from a worker process.
+    try:
+        return read_gpx(path, gpxns, options)
+    except etree.LxmlError as error:
+        raise ValueError("Could not parse {0} as XML: {1}".format(path, error)) from None
+
+
+def _result(future, index, path, capture_errors):
+    try:
+        gpx = future.result()
+    except Exception as error:
+        if not capture_errors:
+            raise
+        return ReadResult(index, path, None, error)
+    return ReadResult(index, path, gpx, None)
@@ -4,7 +4,7 @@ from trailer.readers.common import determine_gpx_namespace
 from trailer.readers.gpx_1_0.parser import parse_gpx as parse_gpx_1_0
 from trailer.readers.gpx_1_1.parser import parse_gpx as parse_gpx_1_1
 
-def read_gpx(xml, gpxns=None):
+def read_gpx(xml, gpxns=None, options=None):
     """Parse a GPX file into a GpxModel.
 
     Args:
@@ -17,6 +17,10 @@ def read_gpx(xml, gpxns=None):
              by curly braces). If None, (the default) the namespace used in
              the document will be determined automatically.
 
+        options: An optional ReaderOptions controlling the representation of
+             the model. If None, (the default) the model is built from
+             Segments containing Waypoints.
+
     Returns:
         A GpxModel representing the data from the supplies xml.
 
@@ -25,9 +29,9 @@ def read_gpx(xml, gpxns=None):
     """
     tree = etree.parse(xml)
     gpx_element = tree.getroot()
-    return parse_gpx(gpx_element, gpxns)
+    return parse_gpx(gpx_element, gpxns, options)
 
-def parse_gpx(gpx_element, gpxns=None):
+def parse_gpx(gpx_element, gpxns=None, options=None):
     """Parse a GPX file into a GpxModel.
 
     Args:
@@ -37,6 +41,10 @@ def parse_gpx(gpx_element, gpxns=None):
         gpxns: The XML namespace for GPX in Clarke notation (i.e. delimited
              by curly braces).
 
+        options: An optional ReaderOptions controlling the representation of
+             the model. If None, (the default) the model is built from
+             Segments containing Waypoints.
+
     Returns:
         A GpxModel representing the data from the supplies xml.
 
@@ -51,9 +59,9 @@ def parse_gpx(gpx_element, gpxns=None):
     version = gpx_element.attrib['version']
 
     if version == '1.0':
-        return parse_gpx_1_0(gpx_element, gpxns=gpxns)
+        return parse_gpx_1_0(gpx_element, gpxns=gpxns, options=options)
     elif version == '1.1':
-        return parse_gpx_1_1(gpx_element, gpxns=gpxns)
+        return parse_gpx_1_1(gpx_element, gpxns=gpxns, options=options)
     else:
         raise ValueError("Cannot parse GPX version {0}".format(version))
 
@@ -0,0 +1,266 @@
+"""Incremental GPX readers which produce model objects as the XML is parsed.
+
+Unlike read_gpx(), which builds the whole element tree and a complete
+GpxModel before returning, the functions in this module yield model objects
+as soon as the corresponding element has been closed, and discard the
+processed elements so that memory use stays flat regardless of the size of
+the document.
+"""
+from collections import namedtuple
+import copy
+
+from lxml import etree
+
+from trailer.readers.common import determine_gpx_namespace
+from trailer.readers.gpx_1_0 import parser as gpx_1_0
+from trailer.readers.gpx_1_1 import parser as gpx_1_1
+from trailer.readers.options import DEFAULT_OPTIONS
+
+__author__ = 'rjs'
+
+
+TrackContext = namedtuple('TrackContext', ['track_index', 'segment_index', 'track'])
+
+TrackPoint = namedtuple('TrackPoint', ['track_index', 'segment_index', 'point_index',
+                                       'track', 'waypoint'])
+
+VERSION_PARSERS = {
+    '1.0': gpx_1_0,
+    '1.1': gpx_1_1,
+}
+
+# Only these elements generate parser events. The namespace is checked
+# against the document's GPX namespace once it is known.
+STREAMED_TAGS = ('{*}gpx', '{*}metadata', '{*}wpt', '{*}rte', '{*}trk',
+                 '{*}trkseg', '{*}trkpt')
+
+STREAMED_EVENTS = ('start', 'end')
+
+NO_EVENTS = ()
+
+
+def iter_gpx_events(xml, gpxns=None, options=None):
+    """Incrementally parse a GPX file, yielding model objects as they close.
+
+    Args:
+        xml: A filename or a file-like-object opened in binary mode. The root
+             element of the XML should be a <gpx> element containing a version
+             attribute. GPX versions 1.0 and 1.1 are supported.
+
+        gpxns: The XML namespace for GPX in Clarke notation (i.e. delimited
+             by curly braces). If None, (the default) the namespace used in
+             the document will be determined automatically.
+
+        options: An optional ReaderOptions controlling the representation of
+             the model objects.
+
+    Yields:
+        (event, value) pairs in document order, where event is one of:
+
+            'metadata'      - value is a Metadata
+            'waypoint'      - value is a Waypoint
+            'route'         - value is a Route
+            'track_start'   - value is a TrackContext
+            'segment_start' - value is a TrackContext
+            'trackpoint'    - value is a TrackPoint
+            'segment_end'   - value is a TrackContext
+            'track_end'     - value is a TrackContext
+
+        The Track carried by TrackContext and TrackPoint values describes the
+        track (name, links, number and so on) but has no segments.
+
+    Raises:
+        ValueError: The supplied XML could not be parsed as GPX.
+    """
+    handler = GpxStreamHandler(gpxns, options)
+    for event, element in etree.iterparse(xml, events=STREAMED_EVENTS, tag=STREAMED_TAGS):
+        for item in handler.handle(event, element):
+            yield item
+    handler.close()
+
+
+def iter_trackpoints(xml, gpxns=None, options=None):
+    """Incrementally parse a GPX file, yielding only the track points.
+
+    Args:
+        xml: A filename or a file-like-object opened in binary mode.
+
+        gpxns: The XML namespace for GPX in Clarke notation (i.e. delimited
+             by curly braces). If None, (the default) the namespace used in
+             the document will be determined automatically.
+
+        options: An optional ReaderOptions controlling the representation of
+             the model objects.
+
+    Yields:
+        A TrackPoint for each <trkpt> element, in document order.
+    """
+    for event, value in iter_gpx_events(xml, gpxns, options):
+        if event == 'trackpoint':
+            yield value
+
+
+class GpxStreamHandler:
+    """Converts a sequence of lxml (event, element) pairs into model events.
+
+    The handler is independent of the source of the events so it can be
+    driven by etree.iterparse() or by an etree.XMLPullParser. It expects
+    'start' and 'end' events for at least the elements in STREAMED_TAGS.
+    Elements are removed from the tree once they have been converted.
+    """
+
+    def __init__(self, gpxns=None, options=None):
+        self._gpxns = gpxns
+        self._options = options if options is not None else DEFAULT_OPTIONS
+        self._parser = None
+        self._root = None
+        self._start_handlers = {}
+        self._end_handlers = {}
+        self._metadata_pending = False
+        self._track_index = -1
+        self._segment_index = -1
+        self._point_index = -1
+        self._track = None
+
+    def handle(self, event, element):
+        """Process a single lxml event.
+
+        Returns:
+            A sequence of zero or more (event, value) pairs.
+        """
+        if self._root is None:
+            return self._start_document(element)
+
+        handlers = self._start_handlers if event == 'start' else self._end_handlers
+        handler = handlers.get(element.tag)
+        if handler is None:
+            return NO_EVENTS
+        return handler(element)
+
+    def close(self):
+        """Check that a complete document was processed.
+
+        Raises:
+            ValueError: No <gpx> root element was seen.
+        """
+        if self._root is None:
+            raise ValueError("No gpx root element")
+
+    def _start_document(self, gpx_element):
+        gpxns = self._gpxns if self._gpxns is not None else determine_gpx_namespace(gpx_element)
+
+        if gpx_element.tag != gpxns+'gpx':
+            raise ValueError("No gpx root element")
+
+        version = gpx_element.attrib['version']
+        try:
+            self._parser = VERSION_PARSERS[version]
+        except KeyError:
+            raise ValueError("Cannot parse GPX version {0}".format(version))
+
+        self._gpxns = gpxns
+        self._root = gpx_element
+        self._metadata_pending = version == '1.0'
+
+        self._start_handlers = {
+            gpxns+'wpt': self._start_body,
+            gpxns+'rte': self._start_body,
+            gpxns+'trk': self._start_track,
+            gpxns+'trkseg': self._start_segment,
+        }
+        self._end_handlers = {
+            gpxns+'gpx': self._end_document,
+            gpxns+'metadata': self._end_metadata,
+            gpxns+'wpt': self._end_waypoint,
+            gpxns+'rte': self._end_route,
+            gpxns+'trk': self._end_track,
+            gpxns+'trkseg': self._end_segment,
+            gpxns+'trkpt': self._end_trackpoint,
+        }
+        return NO_EVENTS
+
+    def _start_body(self, element):
+        # GPX 1.0 keeps its metadata as children of the root which precede
+        # the first waypoint, route or track.
+        if self._metadata_pending:
+            self._metadata_pending = False
+            return (('metadata', self._parser.parse_metadata(self._root, self._gpxns, self._options)),)
+        return NO_EVENTS
+
+    def _start_track(self, element):
+        events = self._start_body(element)
+        self._track_index += 1
+        self._segment_index = -1
+        self._track = None
+        return events
+
+    def _start_segment(self, element):
+        events = []
+        if self._track is None:
+            events.append(self._begin_track(element.getparent()))
+        self._segment_index += 1
+        self._point_index = -1
+        events.append(('segment_start', self._context(self._segment_index)))
+        return events
+
+    def _end_trackpoint(self, element):
+        waypoint = self._parser.parse_waypoint(element, self._gpxns, self._options)
+        self._point_index += 1
+        self._discard(element)
+        return (('trackpoint', TrackPoint(self._track_index, self._segment_index,
+                                          self._point_index, self._track, waypoint)),)
+
+    def _end_segment(self, element):
+        self._discard(element)
+        return (('segment_end', self._context(self._segment_index)),)
+
+    def _end_track(self, element):
+        events = []
+        if self._track is None:
+            events.append(self._begin_track(element))
+        self._discard(element)
+        events.append(('track_end', self._context(None)))
+        return events
+
+    def _end_metadata(self, element):
+        if element.getparent() is not self._root:
+            return NO_EVENTS
+        metadata = self._parser.parse_metadata(element, self._gpxns, self._options)
+        self._discard(element)
+        return (('metadata', metadata),)
+
+    def _end_waypoint(self, element):
+        waypoint = self._parser.parse_waypoint(element, self._gpxns, self._options)
+        self._discard(element)
+        return (('waypoint', waypoint),)
+
+    def _end_route(self, element):
+        route = self._parser.parse_route(element, self._gpxns, self._options)
+        self._discard(element)
+        return (('route', route),)
+
+    def _end_document(self, element):
+        return self._start_body(element)
+
+    def _begin_track(self, track_element):
+        self._track = self._parse_track_header(track_element)
+        return ('track_start', self._context(None))
+
+    def _parse_track_header(self, track_element):
+        # Parse a copy of the track without its segments, which are
+        # delivered separately as they are read.
+        segment_tag = self._gpxns + 'trkseg'
+        header_element = etree.Element(track_element.tag, nsmap=track_element.nsmap)
+        header_element.extend(copy.deepcopy(child) for child in track_element
+                              if child.tag != segment_tag)
+        return self._parser.parse_track(header_element, self._gpxns, self._options)
+
+    def _context(self, segment_index):
+        return TrackContext(self._track_index, segment_index, self._track)
+
+    @staticmethod
+    def _discard(element):
+        element.clear()
+        parent = element.getparent()
+        if parent is not None:
+            parent.remove(element)
@@ -0,0 +1,216 @@
+"""The trailer binary format for GpxModels.
+
+A compact representation of a whole GpxModel, designed to be loaded many
+times faster than the GPX XML it was read from. It is written by
+trailer.writers.binary.writer and read by trailer.readers.binary.reader.
+
+Layout
+------
+
+All multi-byte fixed-width integers and floats are little-endian. Variable
+length unsigned integers ("uvarint") are LEB128: seven bits per byte, least
+significant group first, with the high bit set on all but the last byte.
+Signed variable length integers ("svarint") are zigzag encoded uvarints, so
+that 0, -1, 1, -2, ... encode as 0, 1, 2, 3, ...
+
+A file is:
+
+    MAGIC                  b'TRLB'
+    version                one byte, FORMAT_VERSION
+    string count           uvarint
+    strings                for each, a uvarint length and that many bytes
+                           of UTF-8
+    model                  see below
+
+Strings anywhere in the model are written as a "string reference": a
+uvarint which is zero for None, or otherwise one more than the index of the
+string in the string table. Each distinct string is stored only once.
+
+The model is a sequence of records in a fixed order, with optional records
+preceded by a presence byte of 0 or 1:
+
+    GpxModel:  creator (string), optional Metadata, point list of waypoints,
+               uvarint route count and Routes, uvarint track count and
+               Tracks, extensions (value)
+    Metadata:  name, description (strings), optional Person, optional
+               Copyright, links, time (value), keywords (string), optional
+               bounds as four values, extensions (value)
+    Person:    name, email (strings), optional Link
+    Copyright: author (string), year as the start of the year in its
+               time zone (value), license (string)
+    Link:      href, text, mime (strings)
+    Route:     name, comment, description, source (strings), links,
+               number (value), classification (string), extensions (value),
+               point list
+    Track:     as for Route, but with a uvarint segment count and Segments
+               in place of the point list
+    Segment:   extensions (value), point list
+
+where "links" is a uvarint count followed by that many Links.
+
+Point lists
+-----------
+
+The waypoints, route points and track points are stored by column rather
+than by point, so that they can be decoded in bulk. A point list is a
+uvarint point count n, a byte giving the numeric representation of the
+points written (NUMERIC_DECIMAL or NUMERIC_FLOAT), then a column for each
+field which has a value for at least one point, each introduced by its
+index in POINT_FIELDS, and finally END_OF_COLUMNS. A column is:
+
+    presence               one byte: ALL_PRESENT, or SOME_PRESENT followed
+                           by n bytes which are 1 for the points with a
+                           value and 0 otherwise
+    values                 the m present values, in a form which depends
+                           on the kind of the field
+
+The forms of the values of each kind of field are:
+
+    NUMBER    an encoding byte, then for
+                  SCALED: the values are coefficient * 10 ** exponent. An
+                      exponent byte, EXPONENT_UNIFORM followed by one
+                      svarint exponent, or EXPONENT_PER_VALUE followed by m
+                      signed bytes, then the coefficients as an integer
+                      array of differences from the previous coefficient
+                      (the first from zero). The exponents preserve the
+                      digits of Decimals, so '1.50' remains '1.50'.
+                  FLOAT64: m 8-byte IEEE 754 doubles.
+                  TEXT: m string references, for values which cannot be
+                      scaled, such as NaN.
+    TIME      an encoding byte, then for
+                  MICROSECONDS: an offset byte, OFFSETS_UTC, OFFSETS_NAIVE,
+                      OFFSETS_UNIFORM followed by an svarint offset from
+                      UTC in minutes, or OFFSETS_PER_VALUE followed by m
+                      2-byte signed offsets, in which NAIVE_OFFSET marks a
+                      naive time; then the times as an integer array of
+                      differences from the previous time, in microseconds
+                      since 1970-01-01T00:00:00 UTC, or in local time for
+                      naive times.
+                  TEXT: m string references to ISO 8601 timestamps.
+    INTEGER   an integer array of the values.
+    TEXT      m string references, for string fields and fix.
+    VALUE     m values, for links and extensions.
+
+An integer array is a byte giving the width in bytes of each element, which
+is 1, 2, 4 or 8, followed by m signed integers of that width.
+
+Values
+------
+
+Extensions, and a few rarely used fields, are stored as tagged values: a
+tag byte from the VALUE_ constants below followed by
+
+    VALUE_NONE, VALUE_TRUE, VALUE_FALSE   nothing
+    VALUE_INTEGER                         an svarint
+    VALUE_FLOAT                           an 8-byte double
+    VALUE_STRING, VALUE_DECIMAL           a string reference to the text
+    VALUE_DATETIME                        a string reference to an ISO
+                                          8601 timestamp
+    VALUE_LIST                            a uvarint count and that many
+                                          values
+    VALUE_DICT                            a uvarint count and that many
+                                          pairs of key and value
+    VALUE_ELEMENT                         a string reference to the
+                                          serialised XML of an lxml element
+    VALUE_LINK                            a Link
+
+Reading a file with a different version byte is an error. The format
+version is incremented whenever the layout changes.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+__author__ = 'rjs'
+
+MAGIC = b'TRLB'
+
+FORMAT_VERSION = 1
+
+# The numeric representation of the points written in a point list.
+NUMERIC_DECIMAL = 0
+NUMERIC_FLOAT = 1
+
+NUMBER = 'number'
+TIME = 'time'
+INTEGER = 'integer'
+TEXT = 'text'
+VALUE = 'value'
+
+# The fields of a point in Waypoint.__slots__ order, with their kinds. The
+# index of a field in this tuple identifies its column in a point list.
+POINT_FIELDS = (
+    ('latitude', NUMBER),
+    ('longitude', NUMBER),
+    ('elevation', NUMBER),
+    ('time', TIME),
+    ('magvar', NUMBER),
+    ('geoid_height', NUMBER),
+    ('name', TEXT),
+    ('comment', TEXT),
+    ('description', TEXT),
+    ('source', TEXT),
+    ('links', VALUE),
+    ('symbol', TEXT),
+    ('classification', TEXT),
+    ('fix', TEXT),
+    ('num_satellites', INTEGER),
+    ('hdop', NUMBER),
+    ('vdop', NUMBER),
+    ('pdop', NUMBER),
+    ('seconds_since_dgps_update', NUMBER),
+    ('dgps_station_type', INTEGER),
+    ('speed', NUMBER),
+    ('course', NUMBER),
+    ('extensions', VALUE),
+)
+
+END_OF_COLUMNS = 0xFF
+
+ALL_PRESENT = 0
+SOME_PRESENT = 1
+
+# Encodings of NUMBER columns.
+SCALED = 0
+FLOAT64 = 1
+NUMBER_TEXT = 2
+
+EXPONENT_UNIFORM = 0
+EXPONENT_PER_VALUE = 1
+
+# Encodings of TIME columns.
+MICROSECONDS = 0
+TIME_TEXT = 1
+
+OFFSETS_UTC = 0
+OFFSETS_NAIVE = 1
+OFFSETS_UNIFORM = 2
+OFFSETS_PER_VALUE = 3
+
+NAIVE_OFFSET = -0x8000
+
+EPOCH = datetime(1970, 1, 1)
+
+UTC_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+# The array typecodes of the integer array element widths.
+INTEGER_TYPECODES = {
+    1: 'b',
+    2: 'h',
+    4: 'i',
+    8: 'q',
+}
+
+VALUE_NONE = 0
+VALUE_TRUE = 1
+VALUE_FALSE = 2
+VALUE_INTEGER = 3
+VALUE_FLOAT = 4
+VALUE_STRING = 5
+VALUE_DECIMAL = 6
+VALUE_DATETIME = 7
+VALUE_LIST = 8
+VALUE_DICT = 9
+VALUE_ELEMENT = 10
+VALUE_LINK = 11
@@ -0,0 +1,561 @@
+"""Write GpxModels in the trailer binary format.
+
+See trailer.writers.binary.format for a description of the format.
+"""
+from array import array
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import chain
+from operator import attrgetter, sub
+import os
+import sys
+
+from lxml import etree
+
+from trailer.model.link import Link
+from trailer.writers.binary.format import (
+    ALL_PRESENT, END_OF_COLUMNS, EPOCH, EXPONENT_PER_VALUE, EXPONENT_UNIFORM,
+    FLOAT64, FORMAT_VERSION, INTEGER, INTEGER_TYPECODES, MAGIC, MICROSECONDS,
+    NAIVE_OFFSET, NUMBER, NUMBER_TEXT, NUMERIC_DECIMAL, NUMERIC_FLOAT,
+    OFFSETS_NAIVE, OFFSETS_PER_VALUE, OFFSETS_UNIFORM, OFFSETS_UTC,
+    ONE_MICROSECOND, POINT_FIELDS, SCALED, SOME_PRESENT, TEXT, TIME, TIME_TEXT,
+    UTC_EPOCH, VALUE, VALUE_DATETIME, VALUE_DECIMAL, VALUE_DICT, VALUE_ELEMENT,
+    VALUE_FALSE, VALUE_FLOAT, VALUE_INTEGER, VALUE_LINK, VALUE_LIST,
+    VALUE_NONE, VALUE_STRING, VALUE_TRUE)
+
+try:
+    import numpy
+    from trailer.model.columnar import NAIVE, NO_EXPONENT, ColumnarSegment
+except ImportError:
+    ColumnarSegment = None
+
+__author__ = 'rjs'
+
+_FIELD_GETTERS = tuple((attrgetter(name), kind) for name, kind in POINT_FIELDS)
+
+_INTEGER_LIMITS = tuple((width, -(1 << (8 * width - 1)), (1 << (8 * width - 1)) - 1)
+                        for width in sorted(INTEGER_TYPECODES))
+
+# Decimal coefficients are limited to the default precision of the decimal
+# module, so that the reader can rescale them exactly.
+_MAXIMUM_COEFFICIENT = 10 ** 28
+
+# Integers up to this magnitude convert to floats exactly.
+_MAXIMUM_FLOAT_COEFFICIENT = 2 ** 53
+
+_ONE_MINUTE = timedelta(minutes=1)
+
+
+def write_binary(gpx_model, destination):
+    """Write a GpxModel in the trailer binary format.
+
+    Args:
+        gpx_model: The GpxModel to write.
+
+        destination: A filename or a file-like-object opened in binary mode.
+
+    Raises:
+        TypeError: The model contains an extension value of a type which
+            cannot be written.
+    """
+    data = render_binary(gpx_model)
+    if isinstance(destination, (str, bytes, os.PathLike)):
+        with open(destination, 'wb') as f:
+            f.write(data)
+    else:
+        destination.write(data)
+
+
+def render_binary(gpx_model):
+    """Render a GpxModel in the trailer binary format.
+
+    Args:
+        gpx_model: The GpxModel to render.
+
+    Returns:
+        The binary representation as bytes.
+
+    Raises:
+        TypeError: The model contains an extension value of a type which
+            cannot be written.
+    """
+    writer = BinaryWriter()
+    writer.write_model(gpx_model)
+    return writer.getvalue()
+
+
+class BinaryWriter:
+    """Accumulates the binary representation of a model.
+
+    The body is written first while the string table is collected, and the
+    two are joined by getvalue().
+    """
+
+    def __init__(self):
+        self._strings = {}
+        self._out = bytearray()
+
+    def getvalue(self):
+        """The complete binary representation, including the string table."""
+        header = bytearray(MAGIC)
+        header.append(FORMAT_VERSION)
+        _append_uvarint(header, len(self._strings))
+        for string in self._strings:
+            encoded = string.encode('utf-8')
+            _append_uvarint(header, len(encoded))
+            header += encoded
+        return bytes(header + self._out)
+
+    def write_model(self, gpx_model):
+        self.write_string(gpx_model.creator)
+        if self._write_presence(gpx_model.metadata):
+            self.write_metadata(gpx_model.metadata)
+        self.write_points(gpx_model.waypoints)
+        self.write_uvarint(len(gpx_model.routes))
+        for route in gpx_model.routes:
+            self.write_route(route)
+        self.write_uvarint(len(gpx_model.tracks))
+        for track in gpx_model.tracks:
+            self.write_track(track)
+        self.write_value(gpx_model.extensions)
+
+    def write_metadata(self, metadata):
+        self.write_string(metadata.name)
+        self.write_string(metadata.description)
+        if self._write_presence(metadata.author):
+            self.write_person(metadata.author)
+        if self._write_presence(metadata.copyright):
+            self.write_copyright(metadata.copyright)
+        self.write_links(metadata.links)
+        self.write_value(metadata.time)
+        self.write_string(metadata.keywords)
+        bounds = metadata.bounds
+        if self._write_presence(bounds):
+            self.write_value(bounds.minimum_latitude)
+            self.write_value(bounds.minimum_longitude)
+            self.write_value(bounds.maximum_latitude)
+            self.write_value(bounds.maximum_longitude)
+        self.write_value(metadata.extensions)
+
+    def write_person(self, person):
+        self.write_string(person.name)
+        self.write_string(person.email)
+        if self._write_presence(person.link):
+            self.write_link(person.link)
+
+    def write_copyright(self, copyright):
+        self.write_string(copyright.author)
+        year = copyright.year
+        self.write_value(datetime(year.year, 1, 1, tzinfo=year.tzinfo) if year is not None else None)
+        self.write_string(copyright.license)
+
+    def write_link(self, link):
+        self.write_string(link.href)
+        self.write_string(link.text)
+        self.write_string(link.mime)
+
+    def write_links(self, links):
+        self.write_uvarint(len(links))
+        for link in links:
+            self.write_link(link)
+
+    def write_route(self, route):
+        self._write_item(route)
+        self.write_points(route.points)
+
+    def write_track(self, track):
+        self._write_item(track)
+        self.write_uvarint(len(track.segments))
+        for segment in track.segments:
+            self.write_value(segment.extensions)
+            if ColumnarSegment is not None and isinstance(segment, ColumnarSegment):
+                self.write_columnar_points(segment)
+            else:
+                self.write_points(segment.points)
+
+    def _write_item(self, item):
+        self.write_string(item.name)
+        self.write_string(item.comment)
+        self.write_string(item.description)
+        self.write_string(item.source)
+        self.write_links(item.links)
+        self.write_value(item.number)
+        self.write_string(item.classification)
+        self.write_value(item.extensions)
+
+    def write_points(self, points):
+        """Write a point list, column by column."""
+        points = list(points)
+        count = len(points)
+        self.write_uvarint(count)
+        is_float = count > 0 and getattr(points[0], 'number', Decimal) is float
+        self._out.append(NUMERIC_FLOAT if is_float else NUMERIC_DECIMAL)
+
+        for index, (getter, kind) in enumerate(_FIELD_GETTERS):
+            values = list(map(getter, points))
+            if kind is VALUE:
+                # Empty lists of links or extensions are absent values.
+                present = [bool(value) for value in values]
+                present_count = sum(present)
+            else:
+                present_count = count - values.count(None)
+                present = None
+            if present_count == 0:
+                continue
+
+            if present_count < count:
+                if present is None:
+                    present = [value is not None for value in values]
+                values = [value for value, is_present in zip(values, present) if is_present]
+            self._write_presence_column(index, present, present_count, count)
+            self._write_values(index, kind, values)
+
+        self._out.append(END_OF_COLUMNS)
+
+    def write_columnar_points(self, segment):
+        """Write the points of a ColumnarSegment, column by column, from its arrays.
+
+        The result is the same as writing its Waypoints with write_points(),
+        but no Waypoints are created.
+        """
+        count = len(segment)
+        self.write_uvarint(count)
+        is_float = count > 0 and segment.waypoint_type.number is float
+        self._out.append(NUMERIC_FLOAT if is_float else NUMERIC_DECIMAL)
+
+        for index, (name, kind) in enumerate(POINT_FIELDS):
+            if kind is TEXT or kind is VALUE:
+                sparse = segment.sparse(name)
+                # As for Waypoints, empty lists of links or extensions are absent.
+                positions = sorted(position for position, value in sparse.items()
+                                   if (value if kind is VALUE else value is not None))
+                present = numpy.zeros(count, dtype=bool)
+                present[positions] = True
+                values = [sparse[position] for position in positions]
+            else:
+                present = segment.present(name)
+                positions = numpy.flatnonzero(present)
+                values = segment.column(name)[positions]
+            if not len(positions):
+                continue
+
+            self._write_presence_column(index, present, len(positions), count)
+            if kind is NUMBER:
+                values = values.tolist()
+                if not is_float:
+                    values = _decimal_texts(positions, values, segment.digits(name))
+                self._write_numbers(values)
+            elif kind is TIME:
+                offsets = segment.time_offsets()[positions]
+                if not self._write_microseconds(values.astype(numpy.int64).tolist(),
+                                                numpy.where(offsets == NAIVE, NAIVE_OFFSET, offsets).tolist()):
+                    points = segment.points
+                    self._write_times([points[position].time for position in positions.tolist()])
+            else:
+                self._write_values(index, kind, values.tolist() if kind is INTEGER else values)
+
+        self._out.append(END_OF_COLUMNS)
+
+    def _write_presence_column(self, index, present, present_count, count):
+        """Start a column with its index and which of the points have a value."""
+        self._out.append(index)
+        if present_count == count:
+            self._out.append(ALL_PRESENT)
+        else:
+            self._out.append(SOME_PRESENT)
+            self._out += bytes(present)
+
+    def _write_values(self, index, kind, values):
+        if kind is NUMBER:
+            self._write_numbers(values)
+        elif kind is TIME:
+            self._write_times(values)
+        elif kind is INTEGER:
+            if not self._write_integers(values):
+                raise ValueError("Integer field {0} out of range".format(POINT_FIELDS[index][0]))
+        elif kind is TEXT:
+            write_string = self.write_string
+            for value in values:
+                write_string(str(value))
+        else:
+            write_value = self.write_value
+            for value in values:
+                write_value(value)
+
+    def _write_numbers(self, values):
+        scaled = _scale(values)
+        if scaled is not None and all(value.__class__ is float for value in values):
+            # The shortest reprs of floats have varying numbers of digits,
+            # which would prevent bulk rescaling by one power of ten.
+            scaled = _uniform_scale(values, *scaled) or scaled
+        if scaled is not None:
+            coefficients, exponents = scaled
+            deltas = list(map(sub, coefficients, chain((0,), coefficients)))
+            if _integer_width(deltas) is not None:
+                self._out.append(SCALED)
+                first = exponents[0]
+                if exponents.count(first) == len(exponents):
+                    self._out.append(EXPONENT_UNIFORM)
+                    self.write_svarint(first)
+                else:
+                    self._out.append(EXPONENT_PER_VALUE)
+                    self._out += array('b', exponents).tobytes()
+                self._write_integers(deltas)
+                return
+
+        if all(value.__class__ is float for value in values):
+            self._out.append(FLOAT64)
+            self._out += _little_endian(array('d', values))
+        else:
+            self._out.append(NUMBER_TEXT)
+            write_string = self.write_string
+            for value in values:
+                write_string(str(value))
+
+    def _write_times(self, values):
+        microseconds = []
+        offsets = []
+        for time in values:
+            offset = time.utcoffset()
+            if offset is None:
+                microseconds.append((time - EPOCH) // ONE_MICROSECOND)
+                offsets.append(NAIVE_OFFSET)
+            else:
+                minutes, remainder = divmod(offset, _ONE_MINUTE)
+                if remainder or not NAIVE_OFFSET < minutes < -NAIVE_OFFSET:
+                    break
+                microseconds.append((time - UTC_EPOCH) // ONE_MICROSECOND)
+                offsets.append(minutes)
+        else:
+            if self._write_microseconds(microseconds, offsets):
+                return
+
+        # Offsets which are not whole minutes, or times too far apart.
+        self._out.append(TIME_TEXT)
+        for time in values:
+            self.write_string(time.isoformat())
+
+    def _write_microseconds(self, microseconds, offsets):
+        """Write times as microseconds and offsets, or return False if they cannot be.
+
+        Args:
+            microseconds: The times in microseconds since the epoch, in UTC,
+                or in local time for naive times.
+
+            offsets: The offsets from UTC in minutes, or NAIVE_OFFSET for
+                naive times.
+        """
+        if any(not NAIVE_OFFSET <= offset < -NAIVE_OFFSET for offset in offsets):
+            return False
+        deltas = list(map(sub, microseconds, chain((0,), microseconds)))
+        if _integer_width(deltas) is None:
+            return False
+        self._out.append(MICROSECONDS)
+        first = offsets[0]
+        if offsets.count(first) != len(offsets):
+            self._out.append(OFFSETS_PER_VALUE)
+            self._out += _little_endian(array('h', offsets))
+        elif first == 0:
+            self._out.append(OFFSETS_UTC)
+        elif first == NAIVE_OFFSET:
+            self._out.append(OFFSETS_NAIVE)
+        else:
+            self._out.append(OFFSETS_UNIFORM)
+            self.write_svarint(first)
+        self._write_integers(deltas)
+        return True
+
+    def _write_integers(self, values):
+        """Write an integer array, or return False if the values are too large."""
+        width = _integer_width(values)
+        if width is None:
+            return False
+        self._out.append(width)
+        self._out += _little_endian(array(INTEGER_TYPECODES[width], values))
+        return True
+
+    def write_value(self, value):
+        """Write a tagged value, such as an extension."""
+        out = self._out
+        if value is None:
+            out.append(VALUE_NONE)
+        elif value is True:
+            out.append(VALUE_TRUE)
+        elif value is False:
+            out.append(VALUE_FALSE)
+        elif isinstance(value, int):
+            out.append(VALUE_INTEGER)
+            self.write_svarint(value)
+        elif isinstance(value, float):
+            out.append(VALUE_FLOAT)
+            out += _little_endian(array('d', (value,)))
+        elif isinstance(value, str):
+            out.append(VALUE_STRING)
+            self.write_string(value)
+        elif isinstance(value, Decimal):
+            out.append(VALUE_DECIMAL)
+            self.write_string(str(value))
+        elif isinstance(value, datetime):
+            out.append(VALUE_DATETIME)
+            self.write_string(value.isoformat())
+        elif isinstance(value, (list, tuple)):
+            out.append(VALUE_LIST)
+            self.write_uvarint(len(value))
+            for item in value:
+                self.write_value(item)
+        elif isinstance(value, dict):
+            out.append(VALUE_DICT)
+            self.write_uvarint(len(value))
+            for key, item in value.items():
+                self.write_value(key)
+                self.write_value(item)
+        elif isinstance(value, Link):
+            out.append(VALUE_LINK)
+            self.write_link(value)
+        elif isinstance(value, etree._Element):
+            out.append(VALUE_ELEMENT)
+            self.write_string(etree.tostring(value, encoding='unicode'))
+        else:
+            raise TypeError("Cannot write a value of type {0}".format(type(value).__name__))
+
+    def write_string(self, string):
+        """Write a reference to a string in the string table."""
+        if string is None:
+            self._out.append(0)
+            return
+        strings = self._strings
+        reference = strings.get(string)
+        if reference is None:
+            reference = strings[string] = len(strings) + 1
+        self.write_uvarint(reference)
+
+    def write_uvarint(self, value):
+        _append_uvarint(self._out, value)
+
+    def write_svarint(self, value):
+        _append_uvarint(self._out, value << 1 if value >= 0 else ((-value) << 1) - 1)
+
+    def _write_presence(self, value):
+        present = value is not None
+        self._out.append(present)
+        return present
+
+
+def _append_uvarint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _scale(values):
+    """Represent numbers as integer coefficients and decimal exponents.
+
+    Returns:
+        A pair of lists of coefficients and exponents, or None if a value
+        cannot be represented exactly in a way which the reader can rescale,
+        such as NaN, negative zero, or a float whose shortest repr does not
+        convert back exactly by dividing by a power of ten.
+    """
+    coefficients = []
+    exponents = []
+    for value in values:
+        is_float = value.__class__ is float
+        text = repr(value) if is_float else str(value)
+        if not text[-1].isdigit():
+            return None
+        mantissa, _, exponent = text.partition('e' if is_float else 'E')
+        exponent = int(exponent) if exponent else 0
+        point = mantissa.find('.')
+        if point < 0:
+            coefficient = int(mantissa)
+        else:
+            coefficient = int(mantissa[:point] + mantissa[point + 1:])
+            exponent -= len(mantissa) - point - 1
+        if coefficient == 0 and text[0] == '-':
+            return None
+        if not -0x80 <= exponent < 0x80:
+            return None
+        if is_float:
+            if (abs(coefficient) >= _MAXIMUM_FLOAT_COEFFICIENT or not -22 <= exponent <= 22
+                    or _rescale_float(coefficient, exponent) != value):
+                return None
+        elif abs(coefficient) >= _MAXIMUM_COEFFICIENT:
+            return None
+        coefficients.append(coefficient)
+        exponents.append(exponent)
+    return coefficients, exponents
+
+
+def _decimal_texts(positions, values, digits):
+    """The text of the Decimals of the Waypoints of a ColumnarSegment, as str() gives it.
+
+    Args:
+        positions: An array of the indices of the points with values.
+
+        values: The float values of those points.
+
+        digits: The digits of the column, as from ColumnarSegment.digits().
+    """
+    if digits is None:
+        return list(map(_float_decimal_text, values))
+    exponents, exact = digits
+    texts = []
+    for position, value, exponent in zip(positions.tolist(), values, exponents[positions].tolist()):
+        if exponent == NO_EXPONENT:
+            decimal = exact.get(position)
+            texts.append(_float_decimal_text(value) if decimal is None else str(decimal))
+        elif exponent <= 0 and (exponent >= -6 or abs(value) >= 1e-6):
+            # The value has few enough digits that its float, rounded to
+            # them, gives them back, and is not small enough for str() to
+            # use an exponent.
+            texts.append('{0:.{1}f}'.format(value, -exponent))
+        else:
+            texts.append(str(Decimal(repr(value)).quantize(Decimal((0, (1,), exponent)))))
+    return texts
+
+
+def _float_decimal_text(value):
+    """The text of the Decimal of the shortest repr of a float."""
+    text = repr(value)
+    return str(Decimal(text)) if 'e' in text else text
+
+
+def _uniform_scale(values, coefficients, exponents):
+    """Rescale the coefficients of floats to the smallest of their exponents.
+
+    Returns:
+        A pair of lists of coefficients and exponents, or None if the
+        rescaled floats could not be converted back exactly.
+    """
+    exponent = min(exponents)
+    if exponent == max(exponents) or exponent < -22:
+        return None
+    coefficients = [coefficient * 10 ** (value_exponent - exponent)
+                    for coefficient, value_exponent in zip(coefficients, exponents)]
+    for coefficient, value in zip(coefficients, values):
+        if abs(coefficient) >= _MAXIMUM_FLOAT_COEFFICIENT or _rescale_float(coefficient, exponent) != value:
+            return None
+    return coefficients, [exponent] * len(coefficients)
+
+
+def _rescale_float(coefficient, exponent):
+    """The float nearest coefficient * 10 ** exponent, computed as the reader does."""
+    return coefficient / 10.0 ** -exponent if exponent < 0 else coefficient * 10.0 ** exponent
+
+
+def _integer_width(values):
+    """The narrowest integer array element width which holds the values, or None."""
+    lowest = min(values)
+    highest = max(values)
+    for width, minimum, maximum in _INTEGER_LIMITS:
+        if minimum <= lowest and highest <= maximum:
+            return width
+    return None
+
+
+def _little_endian(values):
+    """The bytes of an array in little-endian order."""
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tobytes()
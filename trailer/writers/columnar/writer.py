@@ -0,0 +1,372 @@
+"""Export track points as columns, to CSV or Arrow IPC files.
+
+Each row is one track point, and each column one field: the indices of the
+track, segment and point, the name of the track, and the fields of the
+Waypoint, named as the elements of GPX. The points are gathered into
+batches of column lists, a field at a time, without creating an object per
+point: from the arrays of a ColumnarSegment, or with map() over Waypoints.
+Batches are then written with a single csv writerows() call, or as an Arrow
+record batch.
+
+Times are written in UTC, as naive values, with the offset of the original
+time zone in minutes in the time_offset column. Naive times are written as
+they are, with no offset.
+
+Arrow IPC files, which are also Feather version 2 files, are written only
+if pyarrow is installed.
+"""
+import csv
+from datetime import timedelta
+from itertools import islice
+from operator import attrgetter
+import os
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+try:
+    from trailer.model.columnar import ColumnarSegment, NAIVE
+except ImportError:
+    ColumnarSegment = None
+
+__author__ = 'rjs'
+
+BATCH_SIZE = 10000
+
+# Kinds of column
+INDEX = 'index'
+INTEGER = 'integer'
+NUMBER = 'number'
+TIME = 'time'
+OFFSET = 'offset'
+TEXT = 'text'
+
+# The name of each column, with the Waypoint attribute from which its value
+# is taken, or None for the position of the point within the model, and its
+# kind.
+COLUMNS = {
+    'track_idx': (None, INDEX),
+    'segment_idx': (None, INDEX),
+    'point_idx': (None, INDEX),
+    'track_name': (None, TEXT),
+    'lat': ('latitude', NUMBER),
+    'lon': ('longitude', NUMBER),
+    'ele': ('elevation', NUMBER),
+    'time': ('time', TIME),
+    'time_offset': ('time', OFFSET),
+    'magvar': ('magvar', NUMBER),
+    'geoidheight': ('geoid_height', NUMBER),
+    'name': ('name', TEXT),
+    'cmt': ('comment', TEXT),
+    'desc': ('description', TEXT),
+    'src': ('source', TEXT),
+    'sym': ('symbol', TEXT),
+    'type': ('classification', TEXT),
+    'fix': ('fix', TEXT),
+    'sat': ('num_satellites', INTEGER),
+    'hdop': ('hdop', NUMBER),
+    'vdop': ('vdop', NUMBER),
+    'pdop': ('pdop', NUMBER),
+    'ageofdgpsdata': ('seconds_since_dgps_update', NUMBER),
+    'dgpsid': ('dgps_station_type', INTEGER),
+    'speed': ('speed', NUMBER),
+    'course': ('course', NUMBER),
+}
+
+DEFAULT_COLUMNS = ('track_idx', 'segment_idx', 'point_idx', 'lat', 'lon', 'ele', 'time', 'time_offset',
+                   'sat', 'hdop')
+
+_ONE_MINUTE = timedelta(minutes=1)
+
+_get_waypoint = attrgetter('waypoint')
+
+_TRACKPOINT_ATTRIBUTES = {
+    'track_idx': 'track_index',
+    'segment_idx': 'segment_index',
+    'point_idx': 'point_index',
+    'track_name': 'track.name',
+}
+
+
+def write_csv(gpx_model, destination, columns=DEFAULT_COLUMNS, batch_size=BATCH_SIZE):
+    """Write the track points of a GpxModel as CSV, with a header row.
+
+    Args:
+        gpx_model: The GpxModel whose track points are written.
+
+        destination: A filename, or a file-like-object opened in text mode
+            with newline=''.
+
+        columns: The names of the columns, from COLUMNS, in order.
+
+        batch_size: The number of points to gather into columns at a time.
+
+    Raises:
+        ValueError: There are no columns, or a column name is not in COLUMNS.
+    """
+    _write_csv(iter_model_batches(gpx_model, columns, batch_size), destination, columns)
+
+
+def write_csv_trackpoints(trackpoints, destination, columns=DEFAULT_COLUMNS, batch_size=BATCH_SIZE):
+    """Write a series of track points as CSV, with a header row.
+
+    Args:
+        trackpoints: An iterable series of TrackPoints, as yielded by
+            trailer.readers.stream.iter_trackpoints(), which is consumed as
+            the rows are written.
+
+        destination: As for write_csv().
+
+        columns: As for write_csv().
+
+        batch_size: As for write_csv().
+
+    Raises:
+        ValueError: There are no columns, or a column name is not in COLUMNS.
+    """
+    _write_csv(iter_trackpoint_batches(trackpoints, columns, batch_size), destination, columns)
+
+
+def write_arrow(gpx_model, destination, columns=DEFAULT_COLUMNS, batch_size=BATCH_SIZE):
+    """Write the track points of a GpxModel as an Arrow IPC (Feather version 2) file.
+
+    Args:
+        gpx_model: The GpxModel whose track points are written.
+
+        destination: A filename, or a file-like-object opened in binary mode.
+
+        columns: The names of the columns, from COLUMNS, in order.
+
+        batch_size: The number of points in each record batch.
+
+    Raises:
+        ImportError: pyarrow is not installed.
+        ValueError: There are no columns, or a column name is not in COLUMNS.
+    """
+    _write_arrow(iter_model_batches(gpx_model, columns, batch_size), destination, columns)
+
+
+def write_arrow_trackpoints(trackpoints, destination, columns=DEFAULT_COLUMNS, batch_size=BATCH_SIZE):
+    """Write a series of track points as an Arrow IPC (Feather version 2) file.
+
+    Args:
+        trackpoints: An iterable series of TrackPoints, as yielded by
+            trailer.readers.stream.iter_trackpoints(), which is consumed as
+            the record batches are written.
+
+        destination: As for write_arrow().
+
+        columns: As for write_arrow().
+
+        batch_size: As for write_arrow().
+
+    Raises:
+        ImportError: pyarrow is not installed.
+        ValueError: There are no columns, or a column name is not in COLUMNS.
+    """
+    _write_arrow(iter_trackpoint_batches(trackpoints, columns, batch_size), destination, columns)
+
+
+def iter_model_batches(gpx_model, columns=DEFAULT_COLUMNS, batch_size=BATCH_SIZE):
+    """Gather the track points of a GpxModel into batches of columns.
+
+    Args:
+        gpx_model: A GpxModel.
+
+        columns: The names of the columns, from COLUMNS.
+
+        batch_size: The number of points in each batch but the last.
+
+    Yields:
+        A dictionary mapping each column name to a list of values, with None
+        for absent values. Numbers are floats, whether or not the model has
+        Decimals, and times are naive datetimes.
+
+    Raises:
+        ValueError: There are no columns, or a column name is not in COLUMNS.
+    """
+    _check_columns(columns)
+    return _merged(_iter_segment_batches(gpx_model, columns, batch_size), columns, batch_size)
+
+
+def iter_trackpoint_batches(trackpoints, columns=DEFAULT_COLUMNS, batch_size=BATCH_SIZE):
+    """Gather a series of track points into batches of columns.
+
+    Args:
+        trackpoints: An iterable series of TrackPoints.
+
+        columns: The names of the columns, from COLUMNS.
+
+        batch_size: The number of points in each batch but the last.
+
+    Yields:
+        A dictionary of column lists, as for iter_model_batches().
+
+    Raises:
+        ValueError: There are no columns, or a column name is not in COLUMNS.
+    """
+    _check_columns(columns)
+    return _iter_trackpoint_batches(trackpoints, columns, batch_size)
+
+
+def _check_columns(columns):
+    if not columns:
+        raise ValueError("At least one column is required")
+    unknown = [name for name in columns if name not in COLUMNS]
+    if unknown:
+        raise ValueError("Unknown columns {0}".format(', '.join(map(repr, unknown))))
+
+
+def _iter_trackpoint_batches(trackpoints, columns, batch_size):
+    iterator = iter(trackpoints)
+    chunk = list(islice(iterator, batch_size))
+    while chunk:
+        batch = _waypoint_columns(list(map(_get_waypoint, chunk)), columns)
+        for name in columns:
+            if name in _TRACKPOINT_ATTRIBUTES:
+                batch[name] = list(map(attrgetter(_TRACKPOINT_ATTRIBUTES[name]), chunk))
+        yield batch
+        chunk = list(islice(iterator, batch_size))
+
+
+def _iter_segment_batches(gpx_model, columns, batch_size):
+    # Yield a (batch, count) pair for each run of at most batch_size points of
+    # each segment.
+    for track_index, track in enumerate(gpx_model.tracks):
+        for segment_index, segment in enumerate(track.segments):
+            count = len(segment.points)
+            for start in range(0, count, batch_size):
+                end = min(start + batch_size, count)
+                if ColumnarSegment is not None and isinstance(segment, ColumnarSegment):
+                    batch = _array_columns(segment, start, end, columns)
+                else:
+                    batch = _waypoint_columns(segment.points[start:end], columns)
+                positions = {
+                    'track_idx': [track_index] * (end - start),
+                    'segment_idx': [segment_index] * (end - start),
+                    'point_idx': list(range(start, end)),
+                    'track_name': [track.name] * (end - start),
+                }
+                for name in columns:
+                    if name in positions:
+                        batch[name] = positions[name]
+                yield batch, end - start
+
+
+def _merged(batches, columns, batch_size):
+    """Merge consecutive small batches, as from short segments, into batches of batch_size."""
+    pending = None
+    pending_count = 0
+    for batch, count in batches:
+        if pending is None:
+            pending, pending_count = batch, count
+        else:
+            for name in columns:
+                pending[name].extend(batch[name])
+            pending_count += count
+        if pending_count >= batch_size:
+            yield pending
+            pending = None
+    if pending is not None:
+        yield pending
+
+
+def _waypoint_columns(waypoints, columns):
+    batch = {}
+    times = None
+    for name in columns:
+        attribute, kind = COLUMNS[name]
+        if attribute is None:
+            continue
+        if kind is TIME or kind is OFFSET:
+            if times is None:
+                times = _split_times(list(map(attrgetter('time'), waypoints)))
+            batch[name] = times[0] if kind is TIME else times[1]
+        else:
+            values = list(map(attrgetter(attribute), waypoints))
+            if kind is NUMBER:
+                values = [None if value is None else float(value) for value in values]
+            elif name == 'fix':
+                values = [None if value is None else str(value) for value in values]
+            batch[name] = values
+    return batch
+
+
+def _split_times(times):
+    """Split times into naive times in UTC, and offsets from UTC in minutes."""
+    utc_times = []
+    offsets = []
+    for time in times:
+        offset = time.utcoffset() if time is not None else None
+        if offset is None:
+            utc_times.append(time and time.replace(tzinfo=None))
+            offsets.append(None)
+        else:
+            utc_times.append((time - offset).replace(tzinfo=None))
+            offsets.append(offset // _ONE_MINUTE)
+    return utc_times, offsets
+
+
+def _array_columns(segment, start, end, columns):
+    batch = {}
+    for name in columns:
+        attribute, kind = COLUMNS[name]
+        if attribute is None:
+            continue
+        if kind is TEXT:
+            values = segment.sparse(attribute)
+            values = [values.get(index) for index in range(start, end)]
+            if name == 'fix':
+                values = [None if value is None else str(value) for value in values]
+        elif kind is OFFSET:
+            values = [None if offset == NAIVE else offset
+                      for offset in segment.time_offsets()[start:end].tolist()]
+        else:
+            # Absent times are NaT, which tolist() converts to None.
+            values = segment.column(attribute)[start:end].tolist()
+            if kind is not TIME:
+                present = segment.present(attribute)[start:end]
+                if not present.all():
+                    values = [value if has_value else None
+                              for value, has_value in zip(values, present.tolist())]
+        batch[name] = values
+    return batch
+
+
+def _write_csv(batches, destination, columns):
+    if isinstance(destination, (str, bytes, os.PathLike)):
+        with open(destination, 'w', encoding='utf-8', newline='') as output:
+            _write_csv_rows(batches, output, columns)
+    else:
+        _write_csv_rows(batches, destination, columns)
+
+
+def _write_csv_rows(batches, output, columns):
+    writer = csv.writer(output, lineterminator='\n')
+    writer.writerow(columns)
+    time_columns = [name for name in columns if COLUMNS[name][1] is TIME]
+    for batch in batches:
+        for name in time_columns:
+            batch[name] = [None if time is None else time.isoformat() for time in batch[name]]
+        writer.writerows(zip(*(batch[name] for name in columns)))
+
+
+def _write_arrow(batches, destination, columns):
+    if pyarrow is None:
+        raise ImportError("Arrow export requires pyarrow")
+    types = {
+        INDEX: pyarrow.int64(),
+        INTEGER: pyarrow.int32(),
+        NUMBER: pyarrow.float64(),
+        TIME: pyarrow.timestamp('us', tz='UTC'),
+        OFFSET: pyarrow.int32(),
+        TEXT: pyarrow.string(),
+    }
+    schema = pyarrow.schema([(name, types[COLUMNS[name][1]]) for name in columns])
+    with pyarrow.ipc.new_file(destination, schema) as writer:
+        for batch in batches:
+            arrays = [pyarrow.array(batch[name], type=field.type) for name, field in zip(columns, schema)]
+            writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema=schema))
@@ -0,0 +1,377 @@
+"""Write GPX data as a GeoJSON FeatureCollection.
+
+Waypoints become Point features, routes LineString features, and tracks
+MultiLineString features with one line per non-empty segment. The other
+fields of each item become the properties of its feature, named as by
+GpxJsonEncoder. Positions are [longitude, latitude] or, for points with an
+elevation, [longitude, latitude, elevation].
+
+The positions of a segment or route are built in bulk, a chunk of points at
+a time, rather than by visiting each point: the coordinates are gathered
+into lists, or for a ColumnarSegment sliced from its NumPy arrays, rounded
+with map(), and encoded by the json module in a single call. The document
+is written to a file as it is produced, so GpxGeoJsonWriter and
+write_geojson_events() can convert a document of any size from a streaming
+source of points with bounded memory.
+
+The metadata of a GPX document has no counterpart in GeoJSON, and is not
+written.
+"""
+from contextlib import ExitStack, contextmanager
+from io import StringIO
+from itertools import islice, repeat
+from operator import attrgetter
+import os
+
+from trailer.writers.json.renderer import (FieldTable, GpxJsonEncoder, ROUTE_FIELDS, TRACK_FIELDS,
+                                           WAYPOINT_FIELDS)
+
+try:
+    from trailer.model.columnar import ColumnarSegment
+except ImportError:
+    ColumnarSegment = None
+
+__author__ = 'rjs'
+
+CHUNK_SIZE = 1000
+
+SEPARATORS = (',', ':')
+
+
+def _without(table, *attributes):
+    return FieldTable(*(field for field in table.fields if field[0] not in attributes))
+
+
+WAYPOINT_PROPERTIES = _without(WAYPOINT_FIELDS, 'latitude', 'longitude', 'elevation')
+
+ROUTE_PROPERTIES = _without(ROUTE_FIELDS, 'points')
+
+TRACK_PROPERTIES = _without(TRACK_FIELDS, 'segments')
+
+_get_coordinates = attrgetter('longitude', 'latitude', 'elevation')
+
+
+def render_geojson(gpx_model, precision=None):
+    """Render a GpxModel as the text of a GeoJSON FeatureCollection.
+
+    Args:
+        gpx_model: The GpxModel to render.
+
+        precision: The number of decimal places to which coordinates are
+            rounded, or None (the default) to write them in full. Six
+            places resolve positions to about 0.1 m.
+
+    Returns:
+        A string containing the GeoJSON.
+    """
+    stream = StringIO()
+    write_geojson(gpx_model, stream, precision)
+    return stream.getvalue()
+
+
+def write_geojson(gpx_model, destination, precision=None):
+    """Write a GpxModel as a GeoJSON FeatureCollection.
+
+    Args:
+        gpx_model: The GpxModel to write.
+
+        destination: A filename, or a file-like-object opened in text mode.
+
+        precision: As for render_geojson().
+    """
+    with GpxGeoJsonWriter(destination, precision) as writer:
+        for waypoint in gpx_model.waypoints:
+            writer.write_waypoint(waypoint)
+        for route in gpx_model.routes:
+            writer.write_route(route)
+        for track in gpx_model.tracks:
+            writer.write_track(track)
+
+
+def write_geojson_events(events, destination, precision=None):
+    """Write a GeoJSON FeatureCollection from the events of a streaming reader.
+
+    Together with iter_gpx_events(), this converts a GPX document of any size
+    to GeoJSON without holding more than one item, or one chunk of track
+    points, in memory.
+
+    Args:
+        events: An iterable series of (event, value) pairs, as yielded by
+            trailer.readers.stream.iter_gpx_events().
+
+        destination: As for write_geojson().
+
+        precision: As for render_geojson().
+    """
+    with GpxGeoJsonWriter(destination, precision) as writer:
+        with ExitStack() as track_stack, ExitStack() as segment_stack:
+            for event, value in events:
+                if event == 'trackpoint':
+                    writer.write_trackpoint(value.waypoint)
+                elif event == 'waypoint':
+                    writer.write_waypoint(value)
+                elif event == 'route':
+                    writer.write_route(value)
+                elif event == 'track_start':
+                    track_stack.enter_context(writer.track(value.track))
+                elif event == 'segment_start':
+                    segment_stack.enter_context(writer.segment())
+                elif event == 'segment_end':
+                    segment_stack.close()
+                elif event == 'track_end':
+                    track_stack.close()
+
+
+class GpxGeoJsonWriter:
+    """Writes a GeoJSON FeatureCollection incrementally.
+
+    A GpxGeoJsonWriter is a context manager. The collection is started on
+    entry and finished on exit. Between those, features may be written in
+    any order.
+
+        with GpxGeoJsonWriter('walk.geojson', precision=6) as writer:
+            with writer.track(track), writer.segment():
+                for point in points:
+                    writer.write_trackpoint(point)
+
+    Track points written one at a time are buffered, and their positions
+    built in chunks of chunk_size.
+
+    Args:
+        destination: A filename, or a file-like-object opened in text mode.
+            A file-like-object is not closed when the collection is finished.
+
+        precision: The number of decimal places to which coordinates are
+            rounded, or None to write them in full.
+
+        chunk_size: The number of points for which positions are built at a
+            time.
+    """
+
+    def __init__(self, destination, precision=None, chunk_size=CHUNK_SIZE):
+        self._destination = destination
+        self._precision = precision
+        self._chunk_size = chunk_size
+        self._encoder = GpxJsonEncoder(separators=SEPARATORS)
+        self._stack = None
+        self._write = None
+        self._has_features = False
+        self._in_track = False
+        self._has_lines = False
+        self._in_segment = False
+        self._has_positions = False
+        self._pending_points = []
+
+    def __enter__(self):
+        with ExitStack() as stack:
+            output = self._destination
+            if isinstance(output, (str, bytes, os.PathLike)):
+                output = stack.enter_context(open(output, 'w', encoding='utf-8'))
+            self._write = output.write
+            self._write('{"type":"FeatureCollection","features":[')
+            stack.callback(self._finish)
+            self._stack = stack.pop_all()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            # Leave the incomplete collection as it is.
+            self._write = None
+        stack, self._stack = self._stack, None
+        return stack.__exit__(exc_type, exc_value, traceback)
+
+    def _finish(self):
+        if self._write is not None:
+            self._write(']}\n')
+            self._write = None
+
+    def write_waypoint(self, waypoint):
+        """Write a waypoint as a Point feature."""
+        self._begin_feature(waypoint, WAYPOINT_PROPERTIES, 'Point')
+        self._write(self._encoder.encode(_position(_get_coordinates(waypoint), self._precision)))
+        self._write('}}')
+
+    def write_route(self, route):
+        """Write a route as a LineString feature."""
+        self._begin_feature(route, ROUTE_PROPERTIES, 'LineString')
+        self._write('[')
+        self._has_positions = False
+        self._write_line(route.points)
+        self._write(']}}')
+
+    def write_track(self, track):
+        """Write a track as a MultiLineString feature.
+
+        The positions of a ColumnarSegment are built from its arrays.
+        """
+        with self.track(track):
+            for segment in track.segments:
+                with self.segment():
+                    if ColumnarSegment is not None and isinstance(segment, ColumnarSegment):
+                        self._write_columns(segment)
+                    else:
+                        self.write_trackpoints(segment.points)
+
+    @contextmanager
+    def track(self, track=None):
+        """A context manager which writes the start and end of a MultiLineString feature.
+
+        Args:
+            track: An optional Track, the name, links and other descriptive
+                fields of which are written as the properties of the feature.
+                Its segments are ignored; segments are written with segment().
+        """
+        if self._in_track:
+            raise ValueError("Tracks cannot be nested")
+        self._begin_feature(track, TRACK_PROPERTIES, 'MultiLineString')
+        self._write('[')
+        self._in_track = True
+        self._has_lines = False
+        try:
+            yield self
+        finally:
+            self._in_track = False
+        self._write(']}}')
+
+    @contextmanager
+    def segment(self):
+        """A context manager which writes a line of the MultiLineString of a track().
+
+        The points of the segment are written with write_trackpoint() or
+        write_trackpoints(). A segment without points is omitted.
+        """
+        if not self._in_track:
+            raise ValueError("Segments must be written within a track")
+        if self._in_segment:
+            raise ValueError("Segments cannot be nested")
+        self._in_segment = True
+        self._has_positions = False
+        try:
+            yield self
+            self._flush_points()
+        finally:
+            self._in_segment = False
+            self._pending_points = []
+        if self._has_positions:
+            self._write(']')
+
+    def write_trackpoint(self, point):
+        """Write the position of a track point within a segment().
+
+        Points are buffered, and written in chunks.
+        """
+        if not self._in_segment:
+            raise ValueError("Track points must be written within a segment")
+        pending = self._pending_points
+        pending.append(point)
+        if len(pending) >= self._chunk_size:
+            self._flush_points()
+
+    def write_trackpoints(self, points):
+        """Write the positions of an iterable series of Waypoints within a segment()."""
+        if not self._in_segment:
+            raise ValueError("Track points must be written within a segment")
+        self._flush_points()
+        self._write_line(points)
+
+    def _begin_feature(self, item, properties, geometry_type):
+        if self._write is None:
+            raise ValueError("GpxGeoJsonWriter must be used as a context manager")
+        if self._in_track:
+            raise ValueError("Cannot write other features within a track")
+        if self._has_features:
+            self._write(',')
+        self._has_features = True
+        properties = self._encoder.visit_fields(item, properties) if item is not None else {}
+        self._write('{"type":"Feature","properties":')
+        self._write(self._encoder.encode(properties))
+        self._write(',"geometry":{"type":"' + geometry_type + '","coordinates":')
+
+    def _flush_points(self):
+        pending = self._pending_points
+        if pending:
+            self._pending_points = []
+            self._write_line(pending)
+
+    def _write_line(self, points):
+        iterator = iter(points)
+        chunk_size = self._chunk_size
+        chunk = list(islice(iterator, chunk_size))
+        while chunk:
+            self._write_positions(_positions(chunk, self._precision))
+            chunk = list(islice(iterator, chunk_size))
+
+    def _write_columns(self, segment):
+        columns = (segment.column('longitude'), segment.column('latitude'), segment.column('elevation'))
+        present = segment.present('elevation')
+        chunk_size = self._chunk_size
+        for start in range(0, len(segment), chunk_size):
+            end = start + chunk_size
+            self._write_positions(_column_positions([column[start:end] for column in columns],
+                                                    present[start:end], self._precision))
+
+    def _write_positions(self, positions):
+        # Write positions as further items of the open line, opening it if
+        # necessary.
+        text = self._encoder.encode(positions)
+        if self._has_positions:
+            self._write(',')
+        else:
+            if self._in_track:
+                if self._has_lines:
+                    self._write(',')
+                self._has_lines = True
+                self._write('[')
+            self._has_positions = True
+        self._write(text[1:-1])
+
+
+def _position(coordinates, precision):
+    longitude, latitude, elevation = coordinates
+    position = [float(longitude), float(latitude)]
+    if elevation is not None:
+        position.append(float(elevation))
+    if precision is not None:
+        position = [round(value, precision) for value in position]
+    return position
+
+
+def _positions(points, precision):
+    """The positions of a list of Waypoints."""
+    longitudes, latitudes, elevations = zip(*map(_get_coordinates, points))
+    present = [elevation is not None for elevation in elevations]
+    if not any(present):
+        return list(zip(_floats(longitudes, precision), _floats(latitudes, precision)))
+    if not all(present):
+        elevations = [0 if elevation is None else elevation for elevation in elevations]
+    return _combine(_floats(longitudes, precision), _floats(latitudes, precision),
+                    _floats(elevations, precision), present)
+
+
+def _floats(values, precision):
+    return _rounded(list(map(float, values)), precision)
+
+
+def _rounded(floats, precision):
+    if precision is None:
+        return floats
+    return list(map(round, floats, repeat(precision)))
+
+
+def _column_positions(columns, present, precision):
+    """The positions of slices of the longitude, latitude and elevation columns of a ColumnarSegment."""
+    # Rounded with round() rather than numpy.round(), which is not exact, so
+    # that the text is the same as for the equivalent Waypoints.
+    longitudes, latitudes, elevations = (_rounded(column.tolist(), precision) for column in columns)
+    return _combine(longitudes, latitudes, elevations, present.tolist())
+
+
+def _combine(longitudes, latitudes, elevations, present):
+    """Combine coordinates into positions, including the elevations which are present."""
+    if all(present):
+        return list(zip(longitudes, latitudes, elevations))
+    if not any(present):
+        return list(zip(longitudes, latitudes))
+    return [(longitude, latitude, elevation) if has_elevation else (longitude, latitude)
+            for longitude, latitude, elevation, has_elevation
+            in zip(longitudes, latitudes, elevations, present)]
@@ -0,0 +1,483 @@
+"""Write GPX 1.1 documents incrementally.
+
+Documents are written with lxml's incremental xmlfile serialiser, element by
+element, straight to a file or stream, so that memory use does not depend on
+the size of the document. A GpxModel can be written in one call with
+write_gpx(), while GpxWriter accepts the parts of a document one at a time,
+so that a document can be written from a streaming source of points, such
+as the events of trailer.readers.stream.iter_gpx_events().
+
+GPX 1.1 has no elements for the speed and course of a waypoint, which are
+GPX 1.0 fields, so they are not written. Extensions are written if they are
+lxml elements.
+"""
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+import gzip
+from operator import attrgetter
+import os
+
+from lxml import etree
+
+__author__ = 'rjs'
+
+GPX_1_1_NAMESPACE = 'http://www.topografix.com/GPX/1/1'
+
+GPXNS = '{' + GPX_1_1_NAMESPACE + '}'
+
+GZIP_SUFFIX = '.gz'
+
+# The child elements of <wpt>, <rtept> and <trkpt> in schema order, with the
+# corresponding Waypoint attributes.
+WAYPOINT_FIELDS = (
+    ('ele', 'elevation'),
+    ('time', 'time'),
+    ('magvar', 'magvar'),
+    ('geoidheight', 'geoid_height'),
+    ('name', 'name'),
+    ('cmt', 'comment'),
+    ('desc', 'description'),
+    ('src', 'source'),
+    ('link', 'links'),
+    ('sym', 'symbol'),
+    ('type', 'classification'),
+    ('fix', 'fix'),
+    ('sat', 'num_satellites'),
+    ('hdop', 'hdop'),
+    ('vdop', 'vdop'),
+    ('pdop', 'pdop'),
+    ('ageofdgpsdata', 'seconds_since_dgps_update'),
+    ('dgpsid', 'dgps_station_type'),
+    ('extensions', 'extensions'),
+)
+
+# The child elements of <rte> and <trk> which precede the points or segments.
+ITEM_FIELDS = (
+    ('name', 'name'),
+    ('cmt', 'comment'),
+    ('desc', 'description'),
+    ('src', 'source'),
+    ('link', 'links'),
+    ('number', 'number'),
+    ('type', 'classification'),
+    ('extensions', 'extensions'),
+)
+
+# The order in which the children of <gpx> must appear.
+METADATA, WAYPOINTS, ROUTES, TRACKS, EXTENSIONS = range(5)
+
+_ONE_MINUTE = timedelta(minutes=1)
+
+
+def write_gpx(gpx_model, destination, compress=None):
+    """Write a GpxModel as a GPX 1.1 document.
+
+    Args:
+        gpx_model: The GpxModel to write.
+
+        destination: A filename, or a file-like-object opened in binary mode,
+            such as a file or the result of socket.makefile('wb').
+
+        compress: If True, the document is compressed with gzip. If None,
+            (the default) the document is compressed if destination is a
+            filename ending in GZIP_SUFFIX.
+
+    Raises:
+        TypeError: An extension is not an lxml element.
+    """
+    with GpxWriter(destination, gpx_model.creator, compress) as writer:
+        if gpx_model.metadata is not None:
+            writer.write_metadata(gpx_model.metadata)
+        for waypoint in gpx_model.waypoints:
+            writer.write_waypoint(waypoint)
+        for route in gpx_model.routes:
+            writer.write_route(route)
+        for track in gpx_model.tracks:
+            writer.write_track(track)
+        writer.write_extensions(gpx_model.extensions)
+
+
+def write_gpx_events(events, destination, creator, compress=None):
+    """Write a GPX 1.1 document from the events of a streaming reader.
+
+    Together with iter_gpx_events(), this converts a document of any size,
+    for example from GPX 1.0 to GPX 1.1, without holding more than one item
+    in memory.
+
+    Args:
+        events: An iterable series of (event, value) pairs, as yielded by
+            trailer.readers.stream.iter_gpx_events().
+
+        destination: As for write_gpx().
+
+        creator: The name of the program creating the document.
+
+        compress: As for write_gpx().
+    """
+    with GpxWriter(destination, creator, compress) as writer:
+        with ExitStack() as track_stack, ExitStack() as segment_stack:
+            for event, value in events:
+                if event == 'trackpoint':
+                    writer.write_trackpoint(value.waypoint)
+                elif event == 'waypoint':
+                    writer.write_waypoint(value)
+                elif event == 'route':
+                    writer.write_route(value)
+                elif event == 'metadata':
+                    writer.write_metadata(value)
+                elif event == 'track_start':
+                    track_stack.enter_context(writer.track(value.track))
+                elif event == 'segment_start':
+                    segment_stack.enter_context(writer.segment())
+                elif event == 'segment_end':
+                    segment_stack.close()
+                elif event == 'track_end':
+                    track_stack.close()
+
+
+def write_gpx_track(points, destination, creator, track=None, compress=None):
+    """Write a GPX 1.1 document containing a single track with one segment.
+
+    Args:
+        points: An iterable series of Waypoints, which is consumed as the
+            document is written.
+
+        destination: As for write_gpx().
+
+        creator: The name of the program creating the document.
+
+        track: An optional Track, the name, links and other descriptive
+            fields of which are written. Its segments are ignored.
+
+        compress: As for write_gpx().
+    """
+    with GpxWriter(destination, creator, compress) as writer:
+        with writer.track(track), writer.segment():
+            writer.write_trackpoints(points)
+
+
+class GpxWriter:
+    """Writes a GPX 1.1 document incrementally.
+
+    A GpxWriter is a context manager. The document is started on entry and
+    finished on exit. Between those, the children of the root <gpx> element
+    must be written in schema order: metadata, then waypoints, routes,
+    tracks and finally extensions.
+
+        with GpxWriter('walk.gpx.gz', 'my program') as writer:
+            writer.write_waypoint(start)
+            with writer.track(track), writer.segment():
+                for point in points:
+                    writer.write_trackpoint(point)
+
+    Args:
+        destination: A filename, or a file-like-object opened in binary mode.
+            A file-like-object is not closed when the document is finished.
+
+        creator: The name of the program creating the document.
+
+        compress: If True, the document is compressed with gzip. If None,
+            (the default) the document is compressed if destination is a
+            filename ending in GZIP_SUFFIX.
+
+        encoding: The character encoding of the document.
+    """
+
+    def __init__(self, destination, creator, compress=None, encoding='utf-8'):
+        self._destination = destination
+        self._creator = creator
+        is_filename = isinstance(destination, (str, bytes, os.PathLike))
+        if compress is None:
+            compress = is_filename and os.fsdecode(destination).endswith(GZIP_SUFFIX)
+        self._compress = compress
+        self._encoding = encoding
+        self._stack = None
+        self._xf = None
+        self._stage = METADATA
+        self._metadata_written = False
+        self._in_track = False
+        self._in_segment = False
+
+    def __enter__(self):
+        with ExitStack() as stack:
+            output = self._destination
+            if isinstance(output, (str, bytes, os.PathLike)):
+                output = stack.enter_context(open(output, 'wb'))
+            if self._compress:
+                output = stack.enter_context(gzip.GzipFile(fileobj=output, mode='wb'))
+            self._xf = stack.enter_context(etree.xmlfile(output, encoding=self._encoding))
+            self._xf.write_declaration()
+            stack.enter_context(self._xf.element(GPXNS + 'gpx', {'version': '1.1', 'creator': self._creator},
+                                                 nsmap={None: GPX_1_1_NAMESPACE}))
+            self._newline()
+            self._stack = stack.pop_all()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        stack, self._stack = self._stack, None
+        return stack.__exit__(exc_type, exc_value, traceback)
+
+    def write_metadata(self, metadata):
+        """Write the <metadata> element, which must be the first child of <gpx>."""
+        self._advance(METADATA)
+        if self._metadata_written:
+            raise ValueError("Metadata must be written only once")
+        self._metadata_written = True
+        element = self._xf.element
+        with element(GPXNS + 'metadata'):
+            self._write_text('name', metadata.name)
+            self._write_text('desc', metadata.description)
+            if metadata.author is not None:
+                self._write_person(metadata.author)
+            if metadata.copyright is not None:
+                self._write_copyright(metadata.copyright)
+            self._write_links(metadata.links)
+            self._write_text('time', _format_time(metadata.time))
+            self._write_text('keywords', metadata.keywords)
+            bounds = metadata.bounds
+            if bounds is not None:
+                with element(GPXNS + 'bounds', {
+                        'minlat': format_number(bounds.minimum_latitude),
+                        'minlon': format_number(bounds.minimum_longitude),
+                        'maxlat': format_number(bounds.maximum_latitude),
+                        'maxlon': format_number(bounds.maximum_longitude)}):
+                    pass
+            self._write_extensions(metadata.extensions)
+        self._newline()
+
+    def write_waypoint(self, waypoint):
+        """Write a <wpt> element."""
+        self._advance(WAYPOINTS)
+        self._write_point('wpt', waypoint)
+        self._newline()
+
+    def write_route(self, route):
+        """Write an <rte> element, including its points."""
+        self._advance(ROUTES)
+        with self._xf.element(GPXNS + 'rte'):
+            self._write_item_fields(route)
+            for point in route.points:
+                self._write_point('rtept', point)
+        self._newline()
+
+    def write_track(self, track):
+        """Write a <trk> element, including all its segments."""
+        with self.track(track):
+            for segment in track.segments:
+                with self.segment(segment.extensions):
+                    self.write_trackpoints(segment.points)
+
+    @contextmanager
+    def track(self, track=None):
+        """A context manager which writes the start and end of a <trk> element.
+
+        Args:
+            track: An optional Track, the name, links and other descriptive
+                fields of which are written at the start of the element. Its
+                segments are ignored; segments are written with segment().
+        """
+        self._advance(TRACKS)
+        if self._in_track:
+            raise ValueError("Tracks cannot be nested")
+        self._in_track = True
+        try:
+            with self._xf.element(GPXNS + 'trk'):
+                if track is not None:
+                    self._write_item_fields(track)
+                self._newline()
+                yield self
+            self._newline()
+        finally:
+            self._in_track = False
+
+    @contextmanager
+    def segment(self, extensions=None):
+        """A context manager which writes the start and end of a <trkseg> element.
+
+        Must be used within track(). The points of the segment are written
+        with write_trackpoint() or write_trackpoints().
+
+        Args:
+            extensions: The extensions of the segment, which are written at
+                the end of the element.
+        """
+        if not self._in_track:
+            raise ValueError("Segments must be written within a track")
+        if self._in_segment:
+            raise ValueError("Segments cannot be nested")
+        self._in_segment = True
+        try:
+            with self._xf.element(GPXNS + 'trkseg'):
+                self._newline()
+                yield self
+                self._write_extensions(extensions)
+            self._newline()
+        finally:
+            self._in_segment = False
+
+    def write_trackpoint(self, point):
+        """Write a <trkpt> element within a segment()."""
+        if not self._in_segment:
+            raise ValueError("Track points must be written within a segment")
+        self._write_point('trkpt', point)
+        self._newline()
+
+    def write_trackpoints(self, points):
+        """Write a <trkpt> element for each of an iterable series of Waypoints."""
+        if not self._in_segment:
+            raise ValueError("Track points must be written within a segment")
+        write_point = self._write_point
+        newline = self._newline
+        for point in points:
+            write_point('trkpt', point)
+            newline()
+
+    def write_extensions(self, extensions):
+        """Write the <extensions> element of the document, which must be the last child of <gpx>."""
+        self._advance(EXTENSIONS)
+        if extensions:
+            self._write_extensions(extensions)
+            self._newline()
+
+    def _advance(self, stage):
+        if self._xf is None:
+            raise ValueError("GpxWriter must be used as a context manager")
+        if self._in_track:
+            raise ValueError("Cannot write other elements within a track")
+        if stage < self._stage:
+            raise ValueError("The children of <gpx> must be written in the order "
+                             "metadata, waypoints, routes, tracks, extensions")
+        self._stage = stage
+
+    def _write_point(self, tag, point):
+        xf = self._xf
+        element = xf.element
+        write = xf.write
+        with element(GPXNS + tag, {'lat': format_number(point.latitude),
+                                   'lon': format_number(point.longitude)}):
+            for (child_tag, kind), value in zip(_WAYPOINT_TAGS, _get_waypoint_fields(point)):
+                if value is None:
+                    continue
+                if kind is _LINKS:
+                    self._write_links(value)
+                elif kind is _EXTENSIONS:
+                    self._write_extensions(value)
+                else:
+                    with element(child_tag):
+                        write(kind(value))
+
+    def _write_item_fields(self, item):
+        for tag, name in ITEM_FIELDS:
+            value = getattr(item, name)
+            if name == 'links':
+                self._write_links(value)
+            elif name == 'extensions':
+                self._write_extensions(value)
+            elif value is not None:
+                self._write_text(tag, str(value))
+
+    def _write_person(self, person):
+        element = self._xf.element
+        with element(GPXNS + 'author'):
+            self._write_text('name', person.name)
+            if person.email is not None:
+                identifier, _, domain = person.email.partition('@')
+                with element(GPXNS + 'email', {'id': identifier, 'domain': domain}):
+                    pass
+            if person.link is not None:
+                self._write_link(person.link)
+
+    def _write_copyright(self, copyright):
+        with self._xf.element(GPXNS + 'copyright', {'author': copyright.author}):
+            if copyright.year is not None:
+                self._write_text('year', _format_year(copyright.year))
+            self._write_text('license', copyright.license)
+
+    def _write_links(self, links):
+        for link in links:
+            self._write_link(link)
+
+    def _write_link(self, link):
+        with self._xf.element(GPXNS + 'link', {'href': link.href}):
+            self._write_text('text', link.text)
+            self._write_text('type', link.mime)
+
+    def _write_extensions(self, extensions):
+        if not extensions:
+            return
+        with self._xf.element(GPXNS + 'extensions'):
+            for extension in extensions:
+                if not isinstance(extension, etree._Element):
+                    raise TypeError("Cannot write an extension of type {0} as GPX".format(
+                                    type(extension).__name__))
+                self._xf.write(extension)
+
+    def _write_text(self, tag, text):
+        if text is not None:
+            with self._xf.element(GPXNS + tag):
+                self._xf.write(text)
+
+    def _newline(self):
+        self._xf.write('\n')
+
+
+def format_number(value):
+    """Format a number as an xsd:decimal, without an exponent.
+
+    Decimals keep their digits, including trailing zeros, and floats are
+    written with the fewest digits which convert back to the same float.
+    """
+    if isinstance(value, int):
+        return str(value)
+    if value.__class__ is float:
+        text = repr(value)
+        if 'e' not in text and 'n' not in text:
+            return text
+        value = Decimal(text)
+    return format(value, 'f')
+
+
+def _format_time(time):
+    if time is None:
+        return None
+    text = time.isoformat()
+    if text.endswith('+00:00'):
+        text = text[:-6] + 'Z'
+    return text
+
+
+def _format_year(year):
+    text = '{0:04d}'.format(year.year)
+    if year.tzinfo is None:
+        return text
+    offset = year.tzinfo.utcoffset(datetime(year.year, 1, 1))
+    if not offset:
+        return text + 'Z'
+    minutes = offset // _ONE_MINUTE
+    sign = '-' if minutes < 0 else '+'
+    return '{0}{1}{2:02d}:{3:02d}'.format(text, sign, *divmod(abs(minutes), 60))
+
+
+_LINKS = 'links'
+
+_EXTENSIONS = 'extensions'
+
+# The kind of each waypoint field: a function which formats the value as
+# text, or _LINKS or _EXTENSIONS for fields written as elements.
+_WAYPOINT_KINDS = {
+    'elevation': format_number,
+    'time': _format_time,
+    'magvar': format_number,
+    'geoid_height': format_number,
+    'links': _LINKS,
+    'hdop': format_number,
+    'vdop': format_number,
+    'pdop': format_number,
+    'seconds_since_dgps_update': format_number,
+    'extensions': _EXTENSIONS,
+}
+
+_WAYPOINT_TAGS = tuple((GPXNS + tag, _WAYPOINT_KINDS.get(name, str)) for tag, name in WAYPOINT_FIELDS)
+
+_get_waypoint_fields = attrgetter(*(name for _, name in WAYPOINT_FIELDS))
@@ -1,6 +1,6 @@
-from collections import OrderedDict
-import datetime
+from datetime import datetime
 import json
+from operator import attrgetter
 
 __author__ = 'rjs'
 
@@ -22,116 +22,219 @@ class Visitor:
         raise AttributeError("No visit_" + __class__.__name__ + "method.")
 
 
-class DecimalSerializableFloat(float):
-    """A sublcass of float which can store a decimal.
+# Kinds of field in a FieldTable
+SCALAR = False
+LIST = True
 
-    This horrible little class is used only to trick the JSON serializer
-    to render decimals as numbers without losing precision via float.
+
+class FieldTable:
+    """The fields of a model class which are rendered as members of a JSON object.
+
+    Fields are rendered in order. A scalar field is omitted if it is None,
+    and a list field is omitted if it is empty.
+
+    Args:
+        *fields: A (attribute name, JSON name, kind) triple for each field,
+            where kind is SCALAR or LIST. The JSON name defaults to the
+            attribute name if it is None.
     """
-    def __init__(self, value):
-        self._value = value
 
-    def __repr__(self):
-        return str(self._value)
+    def __init__(self, *fields):
+        self.fields = fields
+        self.get_values = attrgetter(*(attribute for attribute, _, _ in fields))
+        self.members = tuple((json_name or attribute, kind) for attribute, json_name, kind in fields)
+
+
+GPX_MODEL_FIELDS = FieldTable(
+    ('creator', None, SCALAR),
+    ('metadata', None, SCALAR),
+    ('waypoints', None, LIST),
+    ('routes', None, LIST),
+    ('tracks', None, LIST),
+    ('extensions', None, LIST),
+)
+
+METADATA_FIELDS = FieldTable(
+    ('name', None, SCALAR),
+    ('description', None, SCALAR),
+    ('author', None, SCALAR),
+    ('copyright', None, SCALAR),
+    ('links', None, LIST),
+    ('time', None, SCALAR),
+    ('keywords', None, SCALAR),
+    ('bounds', None, SCALAR),
+    ('extensions', None, LIST),
+)
+
+PERSON_FIELDS = FieldTable(
+    ('name', None, SCALAR),
+    ('email', None, SCALAR),
+    ('link', None, SCALAR),
+)
+
+COPYRIGHT_FIELDS = FieldTable(
+    ('author', None, SCALAR),
+    ('year', None, SCALAR),
+    ('license', None, SCALAR),
+)
+
+LINK_FIELDS = FieldTable(
+    ('href', None, SCALAR),
+    ('text', None, SCALAR),
+    ('mime', None, SCALAR),
+)
+
+BOUNDS_FIELDS = FieldTable(
+    ('minimum_latitude', 'minLat', SCALAR),
+    ('minimum_longitude', 'minLon', SCALAR),
+    ('maximum_latitude', 'maxLat', SCALAR),
+    ('maximum_longitude', 'maxLon', SCALAR),
+)
+
+WAYPOINT_FIELDS = FieldTable(
+    ('latitude', 'lat', SCALAR),
+    ('longitude', 'lon', SCALAR),
+    ('elevation', 'ele', SCALAR),
+    ('time', None, SCALAR),
+    ('magvar', None, SCALAR),
+    ('geoid_height', 'geoidHeight', SCALAR),
+    ('name', None, SCALAR),
+    ('comment', None, SCALAR),
+    ('description', None, SCALAR),
+    ('source', None, SCALAR),
+    ('links', None, LIST),
+    ('symbol', None, SCALAR),
+    ('classification', 'type', SCALAR),
+    ('fix', None, SCALAR),
+    ('num_satellites', 'numSatellites', SCALAR),
+    ('hdop', None, SCALAR),
+    ('vdop', None, SCALAR),
+    ('pdop', None, SCALAR),
+    ('seconds_since_dgps_update', 'secondsSinceDgpsUpdate', SCALAR),
+    ('speed', None, SCALAR),
+    ('course', None, SCALAR),
+    ('extensions', None, LIST),
+)
+
+ROUTE_FIELDS = FieldTable(
+    ('name', None, SCALAR),
+    ('comment', None, SCALAR),
+    ('description', None, SCALAR),
+    ('source', None, SCALAR),
+    ('links', None, LIST),
+    ('number', None, SCALAR),
+    ('classification', 'type', SCALAR),
+    ('extensions', None, LIST),
+    ('points', None, LIST),
+)
+
+TRACK_FIELDS = FieldTable(
+    ('name', None, SCALAR),
+    ('comment', None, SCALAR),
+    ('description', None, SCALAR),
+    ('source', None, SCALAR),
+    ('links', None, LIST),
+    ('number', None, SCALAR),
+    ('classification', 'type', SCALAR),
+    ('extensions', None, LIST),
+    ('segments', None, LIST),
+)
+
+SEGMENT_FIELDS = FieldTable(
+    ('points', None, LIST),
+    ('extensions', None, LIST),
+)
 
 
 class GpxJsonEncoder(json.JSONEncoder, Visitor):
+    """A JSON encoder for GpxModels and the model objects they contain.
 
-    def default(self, obj):
-        return self.visit(obj)
+    Use with json.dump() or json.dumps(), for example:
 
+        json.dumps(gpx_model, cls=GpxJsonEncoder, indent=4)
 
-    def generic_visit(self, obj, *args, **kwargs):
-        return obj
+    Each model object is rendered as a JSON object of its fields, as
+    described by a FieldTable, omitting absent fields. Decimals are
+    rendered as JSON numbers with the value of the nearest float.
 
+    The visit_ method for each class of object is found from the class
+    names in its __mro__, as for Visitor, but only once per class; the
+    method is then cached for the lifetime of the encoder.
+    """
 
-    def optional_attribute_scalar(self, data, obj, name, json_name=None):
-        json_name = json_name or name
-        value = getattr(obj, name)
-        if value is not None:
-            data[json_name] = self.visit(value)
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._visitors = {}
 
 
-    def optional_attribute_list(self, data, obj, name, json_name=None):
-        json_name = json_name or name
-        values = getattr(obj, name)
-        if values:
-            data[json_name] = [ self.visit(item) for item in values ]
+    def default(self, obj):
+        return self.visit(obj)
 
 
-    def visit_GpxModel(self, gpx_model, *args, **kwargs):
-        """Render a GPXModel as a single JSON structure."""
-        result = OrderedDict()
+    def visit(self, node, *args, **kwargs):
+        try:
+            method = self._visitors[node.__class__]
+        except KeyError:
+            method = self._find_visitor(node.__class__)
+        return method(node, *args, **kwargs)
 
-        put_scalar = lambda name, json_name=None: self.optional_attribute_scalar(result, gpx_model, name, json_name)
-        put_list = lambda name, json_name=None: self.optional_attribute_list(result, gpx_model, name, json_name)
 
-        put_scalar('creator')
-        put_scalar('metadata')
-        put_list('waypoints')
-        put_list('routes')
-        put_list('tracks')
-        put_list('extensions')
+    def _find_visitor(self, cls):
+        for base in cls.__mro__:
+            method = getattr(self, 'visit_' + base.__name__, None)
+            if method:
+                break
+        else:
+            method = self.generic_visit
+        self._visitors[cls] = method
+        return method
 
-        return result
 
+    def generic_visit(self, obj, *args, **kwargs):
+        return obj
 
-    def visit_Metadata(self, metadata, *args, **kwargs):
-        """Render GPX Metadata as a single JSON structure."""
-        result = OrderedDict()
-        put_scalar = lambda name, json_name=None: self.optional_attribute_scalar(result, metadata, name, json_name)
-        put_list = lambda name, json_name=None: self.optional_attribute_list(result, metadata, name, json_name)
-
-        put_scalar('name')
-        put_scalar('description')
-        put_scalar('author')
-        put_scalar('copyright')
-        put_list('links')
-        put_scalar('time')
-        put_scalar('keywords')
-        put_scalar('bounds')
-        put_list('extensions')
 
+    def visit_fields(self, obj, table):
+        """Render the fields of obj described by a FieldTable as a dictionary."""
+        visitors = self._visitors
+        find_visitor = self._find_visitor
+        result = {}
+        for (json_name, kind), value in zip(table.members, table.get_values(obj)):
+            if kind is LIST:
+                if value:
+                    result[json_name] = [(visitors.get(item.__class__) or find_visitor(item.__class__))(item)
+                                         for item in value]
+            elif value is not None:
+                result[json_name] = (visitors.get(value.__class__) or find_visitor(value.__class__))(value)
         return result
 
 
-    def visit_Person(self, person, *args, **kwargs):
-        result = OrderedDict()
-        put_scalar = lambda name, json_name=None: self.optional_attribute_scalar(result, person, name, json_name)
+    def visit_GpxModel(self, gpx_model, *args, **kwargs):
+        """Render a GPXModel as a single JSON structure."""
+        return self.visit_fields(gpx_model, GPX_MODEL_FIELDS)
 
-        put_scalar('name')
-        put_scalar('email')
-        put_scalar('link')
 
-        return result
+    def visit_Metadata(self, metadata, *args, **kwargs):
+        """Render GPX Metadata as a single JSON structure."""
+        return self.visit_fields(metadata, METADATA_FIELDS)
 
 
-    def visit_Copyright(self, copyright, *args, **kwargs):
-        result = OrderedDict()
-        put_scalar = lambda name, json_name=None: self.optional_attribute_scalar(result, copyright, name, json_name)
+    def visit_Person(self, person, *args, **kwargs):
+        return self.visit_fields(person, PERSON_FIELDS)
 
-        put_scalar('author')
-        put_scalar('year')
-        put_scalar('license')
 
-        return result
+    def visit_Copyright(self, copyright, *args, **kwargs):
+        return self.visit_fields(copyright, COPYRIGHT_FIELDS)
 
 
     def visit_Year(self, year, *args, **kwargs):
-        dt = datetime.datetime(year=year.year, month=1, day=1, tzinfo=year.tzinfo)
+        dt = datetime(year=year.year, month=1, day=1, tzinfo=year.tzinfo)
         result = dt.strftime("%Y%z")
         return result
 
 
     def visit_Link(self, link, *args, **kwargs):
-        result = OrderedDict()
-        put_scalar = lambda name, json_name=None: self.optional_attribute_scalar(result, link, name, json_name)
-
-        put_scalar('href')
-        put_scalar('text')
-        put_scalar('mime')
-
-        return result
+        return self.visit_fields(link, LINK_FIELDS)
 
 
     def visit_datetime(self, dt, *args, **kwargs):
@@ -139,95 +242,28 @@ class GpxJsonEncoder(json.JSONEncoder, Visitor):
 
 
     def visit_Bounds(self, bounds, *args, **kwargs):
-        result = OrderedDict()
-        put_scalar = lambda name, json_name=None: self.optional_attribute_scalar(result, bounds, name, json_name)
-
-        put_scalar('minimum_latitude', 'minLat')
-        put_scalar('minimum_longitude', 'minLon')
-        put_scalar('maximum_latitude', 'maxLat')
-        put_scalar('maximum_longitude', 'maxLon')
-
-        return result
+        return self.visit_fields(bounds, BOUNDS_FIELDS)
 
 
     def visit_Decimal(self, d, *args, **kwargs):
-        return DecimalSerializableFloat(d)
+        # The json module renders any float, including a subclass, with
+        # float.__repr__, so a Decimal is rendered as the nearest float.
+        return float(d)
 
 
     def visit_Waypoint(self, waypoint, *args, **kwargs):
-        result = OrderedDict()
-        put_scalar = lambda name, json_name=None: self.optional_attribute_scalar(result, waypoint, name, json_name)
-        put_list = lambda name, json_name=None: self.optional_attribute_list(result, waypoint, name, json_name)
-
-        put_scalar('latitude', 'lat')
-        put_scalar('longitude', 'lon')
-        put_scalar('elevation', 'ele')
-        put_scalar('time')
-        put_scalar('magvar')
-        put_scalar('geoid_height', 'geoidHeight')
-        put_scalar('name')
-        put_scalar('comment')
-        put_scalar('description')
-        put_scalar('source')
-        put_list('links')
-        put_scalar('symbol')
-        put_scalar('classification', 'type')
-        put_scalar('fix')
-        put_scalar('num_satellites', 'numSatellites')
-        put_scalar('hdop')
-        put_scalar('vdop')
-        put_scalar('pdop')
-        put_scalar('seconds_since_dgps_update', 'secondsSinceDgpsUpdate')
-        put_scalar('speed')
-        put_scalar('course')
-        put_list('extensions')
-
-        return result
+        return self.visit_fields(waypoint, WAYPOINT_FIELDS)
 
 
     def visit_Route(self, route, *args, **kwargs):
-        result = OrderedDict()
-        put_scalar = lambda name, json_name=None: self.optional_attribute_scalar(result, route, name, json_name)
-        put_list = lambda name, json_name=None: self.optional_attribute_list(result, route, name, json_name)
-
-        put_scalar('name')
-        put_scalar('comment')
-        put_scalar('description')
-        put_scalar('source')
-        put_list('links')
-        put_scalar('number')
-        put_scalar('classification', 'type')
-        put_list('extensions')
-        put_list('points')
-
-        return result
+        return self.visit_fields(route, ROUTE_FIELDS)
 
 
     def visit_Track(self, track, *args, **kwargs):
-        result = OrderedDict()
-        put_scalar = lambda name, json_name=None: self.optional_attribute_scalar(result, track, name, json_name)
-        put_list = lambda name, json_name=None: self.optional_attribute_list(result, track, name, json_name)
-
-        put_scalar('name')
-        put_scalar('comment')
-        put_scalar('description')
-        put_scalar('source')
-        put_list('links')
-        put_scalar('number')
-        put_scalar('classification', 'type')
-        put_list('extensions')
-        put_list('segments')
-
-        return result
+        return self.visit_fields(track, TRACK_FIELDS)
 
     def visit_Segment(self, segment, *args, **kwargs):
-        result = OrderedDict()
-        put_list = lambda name, json_name=None: self.optional_attribute_list(result, segment, name, json_name)
-
-        put_list('points')
-        put_list('extensions')
-
-        return result
+        return self.visit_fields(segment, SEGMENT_FIELDS)
 
     def visit_Fix(self, fix):
         return str(fix)
@@ -242,4 +278,4 @@ def main():
 
 if __name__ == '__main__':
     json_data = main()
-    print(json_data)
\ No newline at end of file
+    print(json_data)
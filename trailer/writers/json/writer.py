@@ -0,0 +1,414 @@
+"""Write the JSON rendering of a GPX document incrementally.
+
+json.dumps(gpx_model, cls=GpxJsonEncoder) builds the whole structure, and
+then the whole string, in memory. The functions and JsonWriter here write
+the same text, byte for byte, to a file as they go: points are encoded in
+chunks of CHUNK_SIZE, so memory use does not depend on the number of points.
+JsonWriter accepts the parts of a document one at a time, so the JSON can
+be written straight from a streaming source of points, such as the events of
+trailer.readers.stream.iter_gpx_events().
+"""
+from contextlib import ExitStack, contextmanager
+from itertools import islice
+import os
+
+from trailer.writers.json.renderer import FieldTable, GpxJsonEncoder, TRACK_FIELDS
+
+__author__ = 'rjs'
+
+CHUNK_SIZE = 1000
+
+# The order in which the members of the document object must appear.
+METADATA, WAYPOINTS, ROUTES, TRACKS, EXTENSIONS = range(5)
+
+_STAGE_NAMES = {WAYPOINTS: 'waypoints', ROUTES: 'routes', TRACKS: 'tracks'}
+
+# The fields of a track written at its start, before its segments.
+TRACK_HEADER_FIELDS = FieldTable(*(field for field in TRACK_FIELDS.fields if field[0] != 'segments'))
+
+
+def write_json(gpx_model, destination, indent=None, separators=None, encoder=GpxJsonEncoder):
+    """Write a GpxModel as JSON.
+
+    The text written is the same as json.dumps(gpx_model, cls=encoder,
+    indent=indent, separators=separators).
+
+    Args:
+        gpx_model: The GpxModel to write.
+
+        destination: A filename, or a file-like-object opened in text mode.
+
+        indent: As for json.dumps().
+
+        separators: As for json.dumps().
+
+        encoder: The GpxJsonEncoder class with which to render each part of
+            the model.
+    """
+    with JsonWriter(destination, gpx_model.creator, indent, separators, encoder) as writer:
+        if gpx_model.metadata is not None:
+            writer.write_metadata(gpx_model.metadata)
+        writer.write_waypoints(gpx_model.waypoints)
+        for route in gpx_model.routes:
+            writer.write_route(route)
+        for track in gpx_model.tracks:
+            writer.write_track(track)
+        writer.write_extensions(gpx_model.extensions)
+
+
+def write_json_events(events, destination, creator, indent=None, separators=None, encoder=GpxJsonEncoder):
+    """Write the JSON rendering of a document from the events of a streaming reader.
+
+    Together with iter_gpx_events(), this converts a GPX document of any size
+    to JSON without holding more than one item, or one chunk of track points,
+    in memory.
+
+    Args:
+        events: An iterable series of (event, value) pairs, as yielded by
+            trailer.readers.stream.iter_gpx_events().
+
+        destination: As for write_json().
+
+        creator: The name of the program which created the document.
+
+        indent: As for json.dumps().
+
+        separators: As for json.dumps().
+
+        encoder: As for write_json().
+    """
+    with JsonWriter(destination, creator, indent, separators, encoder) as writer:
+        with ExitStack() as track_stack, ExitStack() as segment_stack:
+            for event, value in events:
+                if event == 'trackpoint':
+                    writer.write_trackpoint(value.waypoint)
+                elif event == 'waypoint':
+                    writer.write_waypoint(value)
+                elif event == 'route':
+                    writer.write_route(value)
+                elif event == 'metadata':
+                    writer.write_metadata(value)
+                elif event == 'track_start':
+                    track_stack.enter_context(writer.track(value.track))
+                elif event == 'segment_start':
+                    segment_stack.enter_context(writer.segment())
+                elif event == 'segment_end':
+                    segment_stack.close()
+                elif event == 'track_end':
+                    track_stack.close()
+
+
+def write_json_track(points, destination, creator, track=None, indent=None, separators=None,
+                     encoder=GpxJsonEncoder):
+    """Write the JSON rendering of a document containing a single track with one segment.
+
+    Args:
+        points: An iterable series of Waypoints, which is consumed as the
+            document is written.
+
+        destination: As for write_json().
+
+        creator: The name of the program which created the document.
+
+        track: An optional Track, the name, links and other descriptive
+            fields of which are written. Its segments are ignored.
+
+        indent: As for json.dumps().
+
+        separators: As for json.dumps().
+
+        encoder: As for write_json().
+    """
+    with JsonWriter(destination, creator, indent, separators, encoder) as writer:
+        with writer.track(track), writer.segment():
+            writer.write_trackpoints(points)
+
+
+class JsonWriter:
+    """Writes the JSON rendering of a GPX document incrementally.
+
+    A JsonWriter is a context manager. The document object is started on
+    entry and finished on exit. Between those, its members must be written
+    in the order in which GpxJsonEncoder renders them: metadata, then
+    waypoints, routes, tracks and finally extensions.
+
+        with JsonWriter('walk.json', 'my program') as writer:
+            with writer.track(track), writer.segment():
+                for point in points:
+                    writer.write_trackpoint(point)
+
+    Track points written one at a time are buffered, and encoded in chunks
+    of chunk_size.
+
+    Args:
+        destination: A filename, or a file-like-object opened in text mode.
+            A file-like-object is not closed when the document is finished.
+
+        creator: The name of the program which created the document.
+
+        indent: As for json.dumps().
+
+        separators: As for json.dumps().
+
+        encoder: The GpxJsonEncoder class with which to render each part of
+            the document.
+
+        chunk_size: The number of track points to encode at a time.
+    """
+
+    def __init__(self, destination, creator, indent=None, separators=None, encoder=GpxJsonEncoder,
+                 chunk_size=CHUNK_SIZE):
+        self._destination = destination
+        self._creator = creator
+        self._encoder = encoder(indent=indent, separators=separators)
+        if isinstance(indent, int):
+            indent = ' ' * indent
+        self._indent = indent
+        self._chunk_size = chunk_size
+        self._stack = None
+        self._write = None
+        # For each open object or list, whether anything has been written within it.
+        self._has_items = []
+        self._stage = METADATA
+        self._open_list = None
+        self._in_track = False
+        self._segments_open = False
+        self._in_segment = False
+        self._points_open = False
+        self._pending_points = []
+
+    def __enter__(self):
+        with ExitStack() as stack:
+            output = self._destination
+            if isinstance(output, (str, bytes, os.PathLike)):
+                output = stack.enter_context(open(output, 'w', encoding='utf-8'))
+            self._write = output.write
+            self._begin('{')
+            if self._creator is not None:
+                self._member('creator', self._creator)
+            stack.callback(self._finish)
+            self._stack = stack.pop_all()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            # Leave the incomplete document as it is.
+            self._write = None
+        stack, self._stack = self._stack, None
+        return stack.__exit__(exc_type, exc_value, traceback)
+
+    def _finish(self):
+        if self._write is not None:
+            self._close_list()
+            self._end('}')
+            self._write = None
+
+    def write_metadata(self, metadata):
+        """Write the metadata member, which must precede all others but the creator."""
+        self._advance(METADATA)
+        self._member('metadata', metadata)
+        self._stage = WAYPOINTS
+
+    def write_waypoint(self, waypoint):
+        """Write a waypoint to the waypoints member."""
+        self.write_waypoints((waypoint,))
+
+    def write_waypoints(self, waypoints):
+        """Write each of an iterable series of waypoints to the waypoints member."""
+        self._write_list_items(WAYPOINTS, waypoints)
+
+    def write_route(self, route):
+        """Write a route, including its points, to the routes member."""
+        self._write_list_items(ROUTES, (route,))
+
+    def write_track(self, track):
+        """Write a track, including all its segments, to the tracks member."""
+        with self.track(track):
+            for segment in track.segments:
+                with self.segment(segment.extensions):
+                    self.write_trackpoints(segment.points)
+
+    @contextmanager
+    def track(self, track=None):
+        """A context manager which writes the start and end of a track.
+
+        Args:
+            track: An optional Track, the name, links and other descriptive
+                fields of which are written at the start of the track. Its
+                segments are ignored; segments are written with segment().
+        """
+        self._advance(TRACKS)
+        if self._in_track:
+            raise ValueError("Tracks cannot be nested")
+        self._open_list_member(TRACKS)
+        self._separate()
+        self._begin('{')
+        if track is not None:
+            for name, value in self._encoder.visit_fields(track, TRACK_HEADER_FIELDS).items():
+                self._member(name, value)
+        self._in_track = True
+        self._segments_open = False
+        try:
+            yield self
+        finally:
+            self._in_track = False
+        if self._segments_open:
+            self._end(']')
+        self._end('}')
+
+    @contextmanager
+    def segment(self, extensions=None):
+        """A context manager which writes the start and end of a segment within track().
+
+        The points of the segment are written with write_trackpoint() or
+        write_trackpoints().
+
+        Args:
+            extensions: The extensions of the segment, which are written
+                after its points.
+        """
+        if not self._in_track:
+            raise ValueError("Segments must be written within a track")
+        if self._in_segment:
+            raise ValueError("Segments cannot be nested")
+        if not self._segments_open:
+            self._key('segments')
+            self._begin('[')
+            self._segments_open = True
+        self._separate()
+        self._begin('{')
+        self._in_segment = True
+        self._points_open = False
+        try:
+            yield self
+            self._flush_points()
+        finally:
+            self._in_segment = False
+            self._pending_points = []
+        if self._points_open:
+            self._end(']')
+        if extensions:
+            self._member('extensions', list(extensions))
+        self._end('}')
+
+    def write_trackpoint(self, point):
+        """Write a track point within a segment().
+
+        Points are buffered, and written in chunks.
+        """
+        if not self._in_segment:
+            raise ValueError("Track points must be written within a segment")
+        pending = self._pending_points
+        pending.append(point)
+        if len(pending) >= self._chunk_size:
+            self._flush_points()
+
+    def write_trackpoints(self, points):
+        """Write each of an iterable series of Waypoints as a track point within a segment()."""
+        if not self._in_segment:
+            raise ValueError("Track points must be written within a segment")
+        self._flush_points()
+        for chunk in self._chunks(points):
+            self._write_points(chunk)
+
+    def write_extensions(self, extensions):
+        """Write the extensions member of the document, which must be the last."""
+        self._advance(EXTENSIONS)
+        self._close_list()
+        if extensions:
+            self._member('extensions', list(extensions))
+
+    def _advance(self, stage):
+        if self._write is None:
+            raise ValueError("JsonWriter must be used as a context manager")
+        if self._in_track:
+            raise ValueError("Cannot write other members within a track")
+        if stage < self._stage:
+            raise ValueError("The members of the document must be written in the order "
+                             "metadata, waypoints, routes, tracks, extensions")
+        self._stage = stage
+
+    def _chunks(self, items):
+        iterator = iter(items)
+        chunk_size = self._chunk_size
+        chunk = list(islice(iterator, chunk_size))
+        while chunk:
+            yield chunk
+            chunk = list(islice(iterator, chunk_size))
+
+    def _write_list_items(self, stage, items):
+        self._advance(stage)
+        for chunk in self._chunks(items):
+            self._open_list_member(stage)
+            self._write_items(chunk)
+
+    def _open_list_member(self, stage):
+        if self._open_list != stage:
+            self._close_list()
+            self._key(_STAGE_NAMES[stage])
+            self._begin('[')
+            self._open_list = stage
+
+    def _close_list(self):
+        if self._open_list is not None:
+            self._end(']')
+            self._open_list = None
+
+    def _flush_points(self):
+        pending = self._pending_points
+        if pending:
+            self._pending_points = []
+            self._write_points(pending)
+
+    def _write_points(self, points):
+        if not self._points_open:
+            self._key('points')
+            self._begin('[')
+            self._points_open = True
+        self._write_items(points)
+
+    def _begin(self, bracket):
+        self._write(bracket)
+        self._has_items.append(False)
+
+    def _end(self, bracket):
+        has_items = self._has_items.pop()
+        if has_items and self._indent is not None:
+            self._write('\n' + self._indent * len(self._has_items))
+        self._write(bracket)
+
+    def _separate(self):
+        # Write what precedes a member of an object or an item of a list.
+        has_items = self._has_items
+        if has_items[-1]:
+            self._write(self._encoder.item_separator)
+        else:
+            has_items[-1] = True
+        if self._indent is not None:
+            self._write('\n' + self._indent * len(has_items))
+
+    def _key(self, name):
+        self._separate()
+        self._write(self._encoder.encode(name) + self._encoder.key_separator)
+
+    def _member(self, name, value):
+        self._key(name)
+        text = self._encoder.encode(value)
+        if self._indent is not None:
+            text = text.replace('\n', '\n' + self._indent * len(self._has_items))
+        self._write(text)
+
+    def _write_items(self, items):
+        # Encode a list of items, and write its contents as further items of
+        # the open list.
+        text = self._encoder.encode(items)
+        if self._indent is None:
+            text = text[1:-1]
+        else:
+            text = text[1:-2].replace('\n', '\n' + self._indent * (len(self._has_items) - 1))
+        has_items = self._has_items
+        if has_items[-1]:
+            self._write(self._encoder.item_separator)
+        else:
+            has_items[-1] = True
+        self._write(text)
@@ -0,0 +1,192 @@
+"""Write track points as newline-delimited JSON, one flat record per point.
+
+Each line is a JSON object with the selected fields of one track point, in
+the order selected: the indices of its track, segment and point, the name
+of its track, and any of the fields of the Waypoint, named as by
+GpxJsonEncoder. Absent values, including empty lists of links or
+extensions, are null, so that every record has the same members. Each line
+is the same as json.dumps(record, separators=(',', ':')).
+
+write_ndjson_trackpoints() accepts any iterable of TrackPoints, such as
+trailer.readers.stream.iter_trackpoints(), so a GPX file of any size can be
+converted with constant memory:
+
+    write_ndjson_trackpoints(iter_trackpoints('huge.gpx'), 'huge.ndjson')
+
+Records are built a chunk of points at a time: each field is converted to
+JSON text for the whole chunk at once, and the texts for each point are
+then substituted into a template of the record.
+"""
+from json.encoder import encode_basestring_ascii
+from itertools import islice
+from operator import attrgetter
+import os
+
+from trailer.readers.stream import TrackPoint
+from trailer.writers.json.renderer import GpxJsonEncoder
+
+__author__ = 'rjs'
+
+CHUNK_SIZE = 1000
+
+# Kinds of field, which determine how values are converted to JSON
+INTEGER = 'integer'
+NUMBER = 'number'
+TIME = 'time'
+TEXT = 'text'
+VALUE = 'value'
+
+# The name of each field in a record, with the TrackPoint attribute from
+# which its value is taken and its kind.
+FIELDS = {
+    'track': ('track_index', INTEGER),
+    'segment': ('segment_index', INTEGER),
+    'point': ('point_index', INTEGER),
+    'trackName': ('track.name', TEXT),
+    'lat': ('waypoint.latitude', NUMBER),
+    'lon': ('waypoint.longitude', NUMBER),
+    'ele': ('waypoint.elevation', NUMBER),
+    'time': ('waypoint.time', TIME),
+    'magvar': ('waypoint.magvar', NUMBER),
+    'geoidHeight': ('waypoint.geoid_height', NUMBER),
+    'name': ('waypoint.name', TEXT),
+    'comment': ('waypoint.comment', TEXT),
+    'description': ('waypoint.description', TEXT),
+    'source': ('waypoint.source', TEXT),
+    'links': ('waypoint.links', VALUE),
+    'symbol': ('waypoint.symbol', TEXT),
+    'type': ('waypoint.classification', TEXT),
+    'fix': ('waypoint.fix', TEXT),
+    'numSatellites': ('waypoint.num_satellites', INTEGER),
+    'hdop': ('waypoint.hdop', NUMBER),
+    'vdop': ('waypoint.vdop', NUMBER),
+    'pdop': ('waypoint.pdop', NUMBER),
+    'secondsSinceDgpsUpdate': ('waypoint.seconds_since_dgps_update', NUMBER),
+    'dgpsStationType': ('waypoint.dgps_station_type', INTEGER),
+    'speed': ('waypoint.speed', NUMBER),
+    'course': ('waypoint.course', NUMBER),
+    'extensions': ('waypoint.extensions', VALUE),
+}
+
+DEFAULT_FIELDS = ('track', 'segment', 'point', 'trackName', 'lat', 'lon', 'ele', 'time')
+
+_NULL = 'null'
+
+# The json module's text for the non-finite floats, where it differs from repr().
+_NON_FINITE = {'nan': 'NaN', 'inf': 'Infinity', '-inf': '-Infinity'}
+
+_float_repr = float.__repr__
+
+_int_repr = int.__repr__
+
+
+def write_ndjson(gpx_model, destination, fields=DEFAULT_FIELDS):
+    """Write the track points of a GpxModel as newline-delimited JSON.
+
+    Args:
+        gpx_model: The GpxModel whose track points are written.
+
+        destination: A filename, or a file-like-object opened in text mode.
+
+        fields: The names of the fields of each record, from FIELDS, in order.
+
+    Raises:
+        ValueError: There are no fields, or a field name is not in FIELDS.
+    """
+    write_ndjson_trackpoints(iter_model_trackpoints(gpx_model), destination, fields)
+
+
+def write_ndjson_trackpoints(trackpoints, destination, fields=DEFAULT_FIELDS, chunk_size=CHUNK_SIZE):
+    """Write a series of track points as newline-delimited JSON.
+
+    Args:
+        trackpoints: An iterable series of TrackPoints, as yielded by
+            trailer.readers.stream.iter_trackpoints(), which is consumed as
+            the records are written.
+
+        destination: A filename, or a file-like-object opened in text mode.
+            A file-like-object is not closed.
+
+        fields: The names of the fields of each record, from FIELDS, in order.
+
+        chunk_size: The number of records to build at a time.
+
+    Raises:
+        ValueError: There are no fields, or a field name is not in FIELDS.
+    """
+    render = _chunk_renderer(fields)
+    if isinstance(destination, (str, bytes, os.PathLike)):
+        with open(destination, 'w', encoding='utf-8') as output:
+            _write_chunks(trackpoints, output.write, render, chunk_size)
+    else:
+        _write_chunks(trackpoints, destination.write, render, chunk_size)
+
+
+def iter_model_trackpoints(gpx_model):
+    """Iterate over the track points of a GpxModel.
+
+    Args:
+        gpx_model: A GpxModel.
+
+    Yields:
+        A TrackPoint for each point of each segment of each track, in order,
+        as for trailer.readers.stream.iter_trackpoints(). The track of each
+        TrackPoint is the Track in the model, including its segments.
+    """
+    for track_index, track in enumerate(gpx_model.tracks):
+        for segment_index, segment in enumerate(track.segments):
+            for point_index, point in enumerate(segment.points):
+                yield TrackPoint(track_index, segment_index, point_index, track, point)
+
+
+def _write_chunks(trackpoints, write, render, chunk_size):
+    iterator = iter(trackpoints)
+    chunk = list(islice(iterator, chunk_size))
+    while chunk:
+        write(render(chunk))
+        chunk = list(islice(iterator, chunk_size))
+
+
+def _chunk_renderer(fields):
+    """Make a function which renders a list of TrackPoints as lines of newline-delimited JSON."""
+    if not fields:
+        raise ValueError("At least one NDJSON field is required")
+    unknown = [name for name in fields if name not in FIELDS]
+    if unknown:
+        raise ValueError("Unknown NDJSON fields {0}".format(', '.join(map(repr, unknown))))
+    encoder = GpxJsonEncoder(separators=(',', ':'))
+    converters = {
+        INTEGER: _integer_texts,
+        NUMBER: _number_texts,
+        TIME: _time_texts,
+        TEXT: _text_texts,
+        # Empty lists of links or extensions are absent values.
+        VALUE: lambda values: [encoder.encode(value) if value else _NULL for value in values],
+    }
+    columns = tuple((attrgetter(FIELDS[name][0]), converters[FIELDS[name][1]]) for name in fields)
+    template = '{' + ','.join(encode_basestring_ascii(name) + ':%s' for name in fields) + '}\n'
+
+    def render(trackpoints):
+        texts = [convert(list(map(get, trackpoints))) for get, convert in columns]
+        return ''.join(map(template.__mod__, zip(*texts)))
+
+    return render
+
+
+def _integer_texts(values):
+    return [_NULL if value is None else _int_repr(value) for value in values]
+
+
+def _number_texts(values):
+    texts = [_NULL if value is None else _float_repr(float(value)) for value in values]
+    if 'nan' in texts or 'inf' in texts or '-inf' in texts:
+        texts = [_NON_FINITE.get(text, text) for text in texts]
+    return texts
+
+
+def _time_texts(values):
+    return [_NULL if value is None else '"' + value.isoformat() + '"' for value in values]
+
+
+def _text_texts(values):
+    return [_NULL if value is None else encode_basestring_ascii(str(value)) for value in values]